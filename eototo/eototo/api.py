@@ -0,0 +1,358 @@
+"""Python API of eototo for orchestrators driving many runs from one process.
+
+The CLI commands exit the interpreter and look everything up again on every
+call. A ``Session`` looks up the repo name, user, Dockerfile locations of the
+runtime environment config and image fingerprints once and reuses them, builds
+each image at most once and can keep a container per runtime environment running
+so that ``exec`` only pays for a ``docker exec``. Every method returns a
+result object instead of exiting::
+
+    with Session(runtime_environment="cuda12") as session:
+        session.build()
+        result = session.exec(["tawa-inner-cli", "lint"], capture_output=True)
+        if not result.ok:
+            print(result.output)
+"""
+
+import contextlib
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+from eototo.commands.commands import get_user_id_group_id
+from eototo.commands.git import get_repo_name
+from eototo.docker.docker_utils import (
+    WELLKNOWN_BASE_ENV_KEY,
+    WELLKNOWN_PROJECT_ENV_KEY,
+    build_dockerfile_from_path,
+    exec_in_container,
+    get_base_image,
+    get_image_id,
+    get_user_image,
+    pull_build_location_from_config,
+    run_generic_command,
+    select_runtime_environment,
+    start_persistent_container,
+    stop_container,
+)
+from eototo.docker.environments import get_runtime_environment
+from eototo.utils.environment import get_aws_creds
+
+
+@dataclass
+class BuildResult:
+    """Outcome of an image build."""
+
+    image: str
+    image_id: Optional[str]
+    returncode: int
+    duration: float
+    built: bool
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a command run in a container."""
+
+    command: List[str]
+    returncode: int
+    duration: float
+    output: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+class Session:
+    """Reusable state for building images and running commands in runtime containers.
+
+    Not thread safe, use one session per thread.
+
+    Args:
+        runtime_environment (Optional[str], optional): Runtime environment of calls that don't pass one.
+            Defaults to None (cpu on hosts without gpus, cuda12 otherwise).
+        build_buildx (bool, optional): Whether to build with buildx. Defaults to False.
+        env_vars (Optional[Dict[str, Any]], optional): Env vars passed to every container. Defaults to None.
+        log_dir (Optional[str], optional): Directory to archive the output of builds and runs to.
+            Defaults to None.
+        port_aws_creds (bool, optional): Pass the host aws creds to every container. Defaults to False.
+        quiet (bool, optional): Build without docker output, its last lines are logged on failure.
+            Defaults to True.
+    """
+
+    def __init__(
+        self,
+        runtime_environment: Optional[str] = None,
+        build_buildx: bool = False,
+        env_vars: Optional[Dict[str, Any]] = None,
+        log_dir: Optional[str] = None,
+        port_aws_creds: bool = False,
+        quiet: bool = True,
+    ):
+        self.runtime_environment = select_runtime_environment(runtime_environment)
+        self.build_buildx = build_buildx
+        self.env_vars = dict(env_vars or {})
+        if port_aws_creds:
+            self.env_vars.update(get_aws_creds())
+        self.log_dir = log_dir
+        self.quiet = quiet
+        self._dockerfile_paths: Dict[Tuple[str, str], str] = {}
+        self._image_ids: Dict[str, Optional[str]] = {}
+        self._built: Dict[str, BuildResult] = {}
+        self._containers: Dict[str, str] = {}
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @cached_property
+    def repo_name(self) -> str:
+        return get_repo_name()
+
+    @cached_property
+    def user(self) -> Tuple[int, int]:
+        """User id and group id the containers run as."""
+        return get_user_id_group_id()
+
+    def get_image(self, runtime_environment: Optional[str] = None, base: bool = False) -> str:
+        """Get the project or base image name of a runtime environment.
+
+        Args:
+            runtime_environment (Optional[str], optional): Runtime environment, the session's if None.
+                Defaults to None.
+            base (bool, optional): Get the base image instead of the project image. Defaults to False.
+
+        Returns:
+            str: Name of the image
+        """
+        get_image = get_base_image if base else get_user_image
+        return get_image(runtime_environment=runtime_environment or self.runtime_environment, repo_name=self.repo_name)
+
+    def get_image_id(self, image: str) -> Optional[str]:
+        """Get the fingerprint of a local image, cached until the session rebuilds it.
+
+        Args:
+            image (str): Name of the image
+
+        Returns:
+            Optional[str]: The image id, None if the image does not exist locally
+        """
+        if image not in self._image_ids:
+            self._image_ids[image] = get_image_id(image)
+        return self._image_ids[image]
+
+    def get_dockerfile_path(self, runtime_environment: str, file_key: str) -> str:
+        """Get the Dockerfile of a runtime environment, looked up and checked once per key.
+
+        Args:
+            runtime_environment (str): Runtime environment
+            file_key (str): File key in the runtime environment config
+
+        Returns:
+            str: Path of the Dockerfile
+        """
+        key = (runtime_environment, file_key)
+        if key not in self._dockerfile_paths:
+            self._dockerfile_paths[key] = pull_build_location_from_config(runtime_environment, file_key)
+        return self._dockerfile_paths[key]
+
+    def build(
+        self,
+        runtime_environment: Optional[str] = None,
+        base: bool = False,
+        build_args: Optional[Dict[str, str]] = None,
+        force: bool = False,
+    ) -> BuildResult:
+        """Build the project or base image of a runtime environment.
+
+        An image the session already built successfully is not built again
+        unless forced, docker's layer cache still applies to every build.
+
+        Args:
+            runtime_environment (Optional[str], optional): Runtime environment, the session's if None.
+                Defaults to None.
+            base (bool, optional): Build the base image instead of the project image. Defaults to False.
+            build_args (Optional[Dict[str, str]], optional): Docker build args, merged over the defaults of
+                the runtime environment. Defaults to None.
+            force (bool, optional): Build even if the session built the image before. Defaults to False.
+
+        Returns:
+            BuildResult: Outcome of the build, ``built`` is False when an earlier build was reused
+        """
+        runtime_environment = runtime_environment or self.runtime_environment
+        image = self.get_image(runtime_environment, base=base)
+        previous = self._built.get(image)
+        if previous is not None and not force:
+            return BuildResult(image=image, image_id=previous.image_id, returncode=0, duration=0.0, built=False)
+
+        dockerfile_path = self.get_dockerfile_path(
+            runtime_environment, WELLKNOWN_BASE_ENV_KEY if base else WELLKNOWN_PROJECT_ENV_KEY
+        )
+        environment = get_runtime_environment(runtime_environment)
+        start = time.monotonic()
+        try:
+            build_dockerfile_from_path(
+                buildx=self.build_buildx,
+                build_args=environment.get_build_args(build_args),
+                cache_from=environment.cache_from,
+                dockerfile_path=dockerfile_path,
+                image=image,
+                log_dir=self.log_dir,
+                quiet=self.quiet,
+            )
+            returncode = 0
+        except subprocess.CalledProcessError as error:
+            returncode = error.returncode
+        duration = time.monotonic() - start
+
+        self._image_ids.pop(image, None)
+        if returncode != 0:
+            return BuildResult(image=image, image_id=None, returncode=returncode, duration=duration, built=True)
+        result = BuildResult(
+            image=image, image_id=self.get_image_id(image), returncode=0, duration=duration, built=True
+        )
+        self._built[image] = result
+        return result
+
+    def run(
+        self,
+        command: Union[str, List[str]],
+        runtime_environment: Optional[str] = None,
+        build: bool = True,
+        capture_output: bool = False,
+        cpus: Optional[float] = None,
+        env_vars: Optional[Dict[str, Any]] = None,
+        gpus: bool = False,
+        memory: Optional[str] = None,
+        read_write: bool = True,
+        root: bool = False,
+    ) -> CommandResult:
+        """Run a command in a new runtime container.
+
+        Args:
+            command (Union[str, List[str]]): Command, a string is split like a shell would
+            runtime_environment (Optional[str], optional): Runtime environment, the session's if None.
+                Defaults to None.
+            build (bool, optional): Build the image first if the session did not yet. Defaults to True.
+            capture_output (bool, optional): Return the stdout and stderr of the command instead of
+                printing them. Defaults to False.
+            cpus (Optional[float], optional): Limit on the CPUs of the container. Defaults to None.
+            env_vars (Optional[Dict[str, Any]], optional): Env vars on top of the session's. Defaults to None.
+            gpus (bool, optional): Attach the gpus. Defaults to False.
+            memory (Optional[str], optional): Limit on the memory of the container, ex: 4g. Defaults to None.
+            read_write (bool, optional): Mount the repo read write. Defaults to True.
+            root (bool, optional): Run as root instead of the current user. Defaults to False.
+
+        Returns:
+            CommandResult: Outcome of the command, a failed build is returned as the result
+        """
+        entrypoint_args = shlex.split(command) if isinstance(command, str) else list(command)
+        runtime_environment = runtime_environment or self.runtime_environment
+        if build:
+            build_result = self.build(runtime_environment)
+            if not build_result.ok:
+                return CommandResult(
+                    command=entrypoint_args, returncode=build_result.returncode, duration=build_result.duration
+                )
+
+        user_id, group_id = self.user
+        start = time.monotonic()
+        with _output_file(capture_output) as stdout:
+            ret = run_generic_command(
+                build=False,
+                cpus=cpus,
+                display_cmd=not self.quiet,
+                entrypoint_args=entrypoint_args,
+                env_vars={**self.env_vars, **(env_vars or {})},
+                gpus=gpus,
+                image=self.get_image(runtime_environment),
+                log_dir=self.log_dir,
+                memory=memory,
+                read_write=read_write,
+                root=root,
+                runtime_environment=runtime_environment,
+                stdout=stdout,
+                user_gid=group_id,
+                user_id=user_id,
+            )
+            output = _read_output(stdout)
+        return CommandResult(
+            command=entrypoint_args, returncode=ret.returncode, duration=time.monotonic() - start, output=output
+        )
+
+    def exec(
+        self,
+        command: Union[str, List[str]],
+        runtime_environment: Optional[str] = None,
+        capture_output: bool = False,
+    ) -> CommandResult:
+        """Run a command in the session's persistent container of a runtime environment.
+
+        The container is started on first use with the session's env vars and
+        stays up until the session is closed, later calls skip the container
+        startup. It runs as the current user with a read write mount and
+        without gpus, use ``run`` for anything else.
+
+        Args:
+            command (Union[str, List[str]]): Command, a string is split like a shell would
+            runtime_environment (Optional[str], optional): Runtime environment, the session's if None.
+                Defaults to None.
+            capture_output (bool, optional): Return the stdout and stderr of the command instead of
+                printing them. Defaults to False.
+
+        Returns:
+            CommandResult: Outcome of the command, a failed build is returned as the result
+        """
+        entrypoint_args = shlex.split(command) if isinstance(command, str) else list(command)
+        runtime_environment = runtime_environment or self.runtime_environment
+        if runtime_environment not in self._containers:
+            build_result = self.build(runtime_environment)
+            if not build_result.ok:
+                return CommandResult(
+                    command=entrypoint_args, returncode=build_result.returncode, duration=build_result.duration
+                )
+            user_id, group_id = self.user
+            self._containers[runtime_environment] = start_persistent_container(
+                image=self.get_image(runtime_environment),
+                name=f"eototo-session-{os.getpid()}-{id(self):x}-{runtime_environment}",
+                env_vars=self.env_vars,
+                user_gid=group_id,
+                user_id=user_id,
+            )
+
+        start = time.monotonic()
+        with _output_file(capture_output) as stdout:
+            ret = exec_in_container(self._containers[runtime_environment], entrypoint_args, stdout=stdout)
+            output = _read_output(stdout)
+        return CommandResult(
+            command=entrypoint_args, returncode=ret.returncode, duration=time.monotonic() - start, output=output
+        )
+
+    def close(self) -> None:
+        """Stop the session's persistent containers."""
+        while self._containers:
+            _, container = self._containers.popitem()
+            stop_container(container)
+
+
+def _output_file(capture_output: bool):
+    return tempfile.TemporaryFile(mode="w+b") if capture_output else contextlib.nullcontext()
+
+
+def _read_output(stdout: Optional[IO]) -> Optional[str]:
+    if stdout is None:
+        return None
+    stdout.seek(0)
+    return stdout.read().decode(errors="replace")
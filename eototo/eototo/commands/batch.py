@@ -0,0 +1,351 @@
+"""Batch execution of many user commands across a bounded pool of runtime containers.
+
+Each line of a batch file is one command that would otherwise be passed to
+``eototo exec --command``. Jobs are admitted into the pool only while the
+host has enough free CPU and memory for the job's requested limits, which are
+also passed on to ``docker run`` so a single job can't starve the others.
+"""
+
+import logging
+import os
+import shlex
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from eototo.docker.docker_utils import run_generic_command
+
+# docker style memory suffixes, https://docs.docker.com/config/containers/resource_constraints/
+MEMORY_SUFFIXES = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+DEFAULT_BATCH_LOG_DIR = ".eototo/batch"
+
+
+@dataclass
+class BatchJobResult:
+    """Outcome of one job in a batch run."""
+
+    index: int
+    command: str
+    returncode: int
+    duration: float
+    attempts: int
+    log_path: str
+
+
+def parse_memory_size(size: str) -> int:
+    """Parse a docker style memory size such as ``512m`` or ``4g`` into bytes.
+
+    Args:
+        size (str): Memory size, a number with an optional b, k, m or g suffix
+
+    Raises:
+        ValueError: If the size can't be parsed
+
+    Returns:
+        int: Size in bytes
+    """
+    size = size.strip().lower()
+    multiplier = 1
+    if size and size[-1] in MEMORY_SUFFIXES:
+        multiplier = MEMORY_SUFFIXES[size[-1]]
+        size = size[:-1]
+    try:
+        return int(float(size) * multiplier)
+    except ValueError:
+        raise ValueError(f"Invalid memory size: {size}, expected a number with an optional b, k, m or g suffix")
+
+
+def get_host_resources() -> Tuple[float, int]:
+    """Get the CPUs and memory available on the host for scheduling.
+
+    Returns:
+        Tuple[float, int]: Number of usable CPUs and total physical memory in bytes
+    """
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+    memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return cpus, memory
+
+
+def read_batch_jobs(batch_file: str) -> List[str]:
+    """Read the commands of a batch file, one per line.
+
+    Blank lines and lines starting with ``#`` are skipped.
+
+    Args:
+        batch_file (str): Path to the batch file, ``-`` reads from stdin
+
+    Returns:
+        List[str]: Commands to run
+    """
+    if batch_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(batch_file, "r") as batch_buffer:
+            lines = batch_buffer.read().splitlines()
+
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+class ResourcePool:
+    """CPU and memory admission control for concurrently running jobs.
+
+    Jobs block in ``acquire`` until their requested resources fit within
+    the pool capacity alongside the jobs already running.
+    """
+
+    def __init__(self, cpus: float, memory: int):
+        self.cpus = cpus
+        self.memory = memory
+        self._used_cpus = 0.0
+        self._used_memory = 0
+        self._condition = threading.Condition()
+
+    def check_fits(self, cpus: float, memory: int) -> None:
+        """Ensure a single job request can ever be admitted.
+
+        Args:
+            cpus (float): CPUs requested by the job
+            memory (int): Memory requested by the job in bytes
+
+        Raises:
+            ValueError: If the request is larger than the pool capacity
+        """
+        if cpus > self.cpus:
+            raise ValueError(f"Job requests {cpus} cpus but only {self.cpus} are available")
+        if memory > self.memory:
+            raise ValueError(f"Job requests {memory} bytes of memory but only {self.memory} are available")
+
+    def acquire(self, cpus: float, memory: int) -> None:
+        """Block until the requested resources are free and reserve them.
+
+        Args:
+            cpus (float): CPUs to reserve
+            memory (int): Memory to reserve in bytes
+        """
+        self.check_fits(cpus, memory)
+        with self._condition:
+            while self._used_cpus + cpus > self.cpus or self._used_memory + memory > self.memory:
+                self._condition.wait()
+            self._used_cpus += cpus
+            self._used_memory += memory
+
+    def release(self, cpus: float, memory: int) -> None:
+        """Release previously acquired resources and wake waiting jobs.
+
+        Args:
+            cpus (float): CPUs to release
+            memory (int): Memory to release in bytes
+        """
+        with self._condition:
+            self._used_cpus -= cpus
+            self._used_memory -= memory
+            self._condition.notify_all()
+
+
+def run_batch_job(
+    index: int,
+    command: str,
+    pool: ResourcePool,
+    job_cpus: float,
+    job_memory: Optional[str],
+    log_dir: str,
+    retries: int,
+    env_vars: Dict[str, str],
+    gpus: bool,
+    read_write: bool,
+    root: bool,
+    runtime_environment: str,
+    user_gid: int,
+    user_id: int,
+) -> BatchJobResult:
+    """Run one batch job in its own container, retrying on failure.
+
+    All attempts are appended to the same per job log file.
+
+    Args:
+        index (int): Position of the job in the batch
+        command (str): Command to run in the container
+        pool (ResourcePool): Pool to admit the job through
+        job_cpus (float): CPUs reserved for and limited on the job container
+        job_memory (Optional[str]): Memory reserved for and limited on the job container
+        log_dir (str): Directory to write the job log into
+        retries (int): Number of times to retry a failed job
+        env_vars (Dict[str, str]): Env vars to pass to the container
+        gpus (bool): Run with gpus attached
+        read_write (bool): Mount the project read write
+        root (bool): Run as the root user
+        runtime_environment (str): Environment to run inside
+        user_gid (int): Group id to run the container as
+        user_id (int): User id to run the container as
+
+    Returns:
+        BatchJobResult: Outcome of the job
+    """
+    memory_bytes = parse_memory_size(job_memory) if job_memory else 0
+    log_path = os.path.join(log_dir, f"job-{index:04d}.log")
+
+    pool.acquire(job_cpus, memory_bytes)
+    try:
+        start = time.monotonic()
+        returncode = -1
+        attempts = 0
+        with open(log_path, "w") as log_buffer:
+            while attempts <= retries:
+                attempts += 1
+                log_buffer.write(f"# attempt {attempts}: {command}\n")
+                log_buffer.flush()
+                logging.info(f"Starting job {index} (attempt {attempts}): {command}")
+                ret = run_generic_command(
+                    build=False,
+                    cpus=job_cpus,
+                    display_cmd=False,
+                    entrypoint_args=shlex.split(command),
+                    env_vars=env_vars,
+                    gpus=gpus,
+                    memory=job_memory,
+                    read_write=read_write,
+                    root=root,
+                    runtime_environment=runtime_environment,
+                    stdout=log_buffer,
+                    user_gid=user_gid,
+                    user_id=user_id,
+                )
+                returncode = ret.returncode
+                if returncode == 0:
+                    break
+                logging.warning(f"Job {index} failed with exit code {returncode}")
+        duration = time.monotonic() - start
+    finally:
+        pool.release(job_cpus, memory_bytes)
+
+    return BatchJobResult(
+        index=index,
+        command=command,
+        returncode=returncode,
+        duration=duration,
+        attempts=attempts,
+        log_path=log_path,
+    )
+
+
+def run_batch(
+    commands: List[str],
+    env_vars: Dict[str, str],
+    gpus: bool,
+    job_cpus: float,
+    job_memory: Optional[str],
+    log_dir: str,
+    max_parallel: Optional[int],
+    read_write: bool,
+    retries: int,
+    root: bool,
+    runtime_environment: str,
+    user_gid: int,
+    user_id: int,
+) -> List[BatchJobResult]:
+    """Schedule all batch commands across a bounded pool of containers.
+
+    Args:
+        commands (List[str]): Commands to run, one container each
+        env_vars (Dict[str, str]): Env vars to pass to every container
+        gpus (bool): Run with gpus attached
+        job_cpus (float): CPUs reserved for each job
+        job_memory (Optional[str]): Memory reserved for each job, docker format
+        log_dir (str): Directory to write per job logs into
+        max_parallel (Optional[int]): Upper bound on concurrently running containers,
+            defaults to the number of host CPUs
+        read_write (bool): Mount the project read write
+        retries (int): Number of times to retry each failed job
+        root (bool): Run as the root user
+        runtime_environment (str): Environment to run inside
+        user_gid (int): Group id to run the containers as
+        user_id (int): User id to run the containers as
+
+    Returns:
+        List[BatchJobResult]: Outcome of every job in batch order
+    """
+    host_cpus, host_memory = get_host_resources()
+    pool = ResourcePool(cpus=host_cpus, memory=host_memory)
+    # fail before anything starts instead of hanging on a job that never fits
+    pool.check_fits(job_cpus, parse_memory_size(job_memory) if job_memory else 0)
+
+    if max_parallel is None:
+        max_parallel = max(1, int(host_cpus))
+
+    os.makedirs(log_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = [
+            executor.submit(
+                run_batch_job,
+                index=index,
+                command=command,
+                pool=pool,
+                job_cpus=job_cpus,
+                job_memory=job_memory,
+                log_dir=log_dir,
+                retries=retries,
+                env_vars=env_vars,
+                gpus=gpus,
+                read_write=read_write,
+                root=root,
+                runtime_environment=runtime_environment,
+                user_gid=user_gid,
+                user_id=user_id,
+            )
+            for index, command in enumerate(commands)
+        ]
+        return [future.result() for future in futures]
+
+
+def format_batch_summary(results: List[BatchJobResult], max_command_width: int = 60) -> str:
+    """Format batch results as a plain text table.
+
+    Args:
+        results (List[BatchJobResult]): Results to format
+        max_command_width (int, optional): Width to truncate commands to. Defaults to 60.
+
+    Returns:
+        str: Summary table
+    """
+    header = ("JOB", "EXIT", "ATTEMPTS", "DURATION", "COMMAND", "LOG")
+    rows = [header]
+    for result in results:
+        command = result.command
+        if len(command) > max_command_width:
+            command = command[: max_command_width - 3] + "..."
+        rows.append(
+            (
+                str(result.index),
+                str(result.returncode),
+                str(result.attempts),
+                f"{result.duration:.1f}s",
+                command,
+                result.log_path,
+            )
+        )
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def get_batch_log_dir(log_dir: Optional[str] = None) -> str:
+    """Get the log directory for a batch run, timestamped when not provided.
+
+    Args:
+        log_dir (Optional[str], optional): User provided log directory. Defaults to None.
+
+    Returns:
+        str: Directory to write batch job logs into
+    """
+    if log_dir is not None:
+        return log_dir
+    return os.path.join(DEFAULT_BATCH_LOG_DIR, time.strftime("%Y%m%d-%H%M%S"))
+
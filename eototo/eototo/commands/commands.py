@@ -1,19 +1,182 @@
 import getpass
+import os
 import shlex
 import sys
 from pwd import getpwnam
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import click
 
+from eototo.commands.batch import format_batch_summary, get_batch_log_dir, read_batch_jobs, run_batch
+from eototo.commands.watch import get_affected_tests
 from eototo.docker.docker_utils import (
     build_user_env_docker_image,
     build_base_env_docker_image,
+    exec_in_container,
+    get_container_path,
     get_user_image,
     get_base_image,
     run_generic_command,
+    start_persistent_container,
+    stop_container,
 )
+from eototo.tasks.action_cache import ActionCache
+from eototo.tasks.tasks import TASK_CACHED, TASK_SUCCEEDED, load_tasks, run_tasks, topological_order
 from eototo.utils.environment import get_aws_creds
+from eototo.utils.profiles import format_profile_summary, get_memprofile_dir, get_profile_path, summarize_speedscope
+from eototo.utils.watcher import get_file_watcher
+
+
+def batch_exec_command(
+    batch: str,
+    build_buildx: bool,
+    gpus: bool,
+    job_cpus: float,
+    job_memory: Optional[str],
+    log_dir: Optional[str],
+    max_parallel: Optional[int],
+    port_aws_creds: bool,
+    read_write: bool,
+    retries: int,
+    root: bool,
+    runtime_environment: str,
+    quiet: bool,
+) -> None:
+    """Run every command of a batch file in tawa runtime containers.
+
+    The image is built once up front, then each job gets its own container
+    from a bounded pool with per job log files and a summary table at the end.
+
+    Args:
+        batch (str): Path to the batch file with one command per line, ``-`` for stdin
+        build_buildx (bool): Whether to use buildx
+        gpus (bool): run commands with gpus attached
+        job_cpus (float): CPUs reserved for and limited on each job container
+        job_memory (Optional[str]): Memory reserved for and limited on each job container
+        log_dir (Optional[str]): Directory for per job logs, timestamped under .eototo/batch if None
+        max_parallel (Optional[int]): Maximum number of containers running at once
+        port_aws_creds (bool): Whether to port host aws creds to container
+        read_write (bool): whether to mount volume as read write
+        retries (int): Number of retries for each failed job
+        root (bool): whether to pass root user access or not
+        runtime_environment (str): Environment to run inside
+        quiet (bool): Build quiet flag
+    """
+    user_id, group_id = get_user_id_group_id()
+
+    env_vars = get_aws_creds() if port_aws_creds else {}
+
+    commands = read_batch_jobs(batch)
+    if not commands:
+        click.secho(f"No commands found in batch: {batch}", bg="black", fg="red", err=True, bold=True)
+        sys.exit(1)
+
+    build_user_env_docker_image(
+        buildx=build_buildx,
+        image=get_user_image(runtime_environment=runtime_environment),
+        quiet=quiet,
+        runtime_environment=runtime_environment,
+    )
+
+    results = run_batch(
+        commands=commands,
+        env_vars=env_vars,
+        gpus=gpus,
+        job_cpus=job_cpus,
+        job_memory=job_memory,
+        log_dir=get_batch_log_dir(log_dir),
+        max_parallel=max_parallel,
+        read_write=read_write,
+        retries=retries,
+        root=root,
+        runtime_environment=runtime_environment,
+        user_gid=group_id,
+        user_id=user_id,
+    )
+
+    click.echo(format_batch_summary(results))
+
+    failed = [result for result in results if result.returncode != 0]
+    if failed:
+        click.secho(
+            f"{len(failed)} of {len(results)} batch jobs failed",
+            bg="black",
+            fg="red",
+            err=True,
+            bold=True,
+        )
+        sys.exit(1)
+    click.secho(f"Successfully ran {len(results)} batch jobs", bg="blue", fg="green")
+
+
+def bench_command(
+    build_buildx: bool,
+    compare: Optional[str],
+    cpu: Optional[int],
+    keyword: Optional[str],
+    max_regression: float,
+    no_pin: bool,
+    path: List[str],
+    quiet: bool,
+    rounds: int,
+    runtime_environment: str,
+    save_baseline: Optional[str],
+    warmup: int,
+) -> None:
+    """Run tawa's benchmarks in the runtime container.
+
+    Results are stored by tawa-inner-cli per commit and runtime environment,
+    the command fails when a benchmark regresses against the compared results.
+
+    Args:
+        build_buildx (bool): Whether to use buildx for docker
+        compare (Optional[str]): Baseline name or commit hash prefix to compare against
+        cpu (Optional[int]): CPU to pin the benchmarks to, the highest allowed CPU if None
+        keyword (Optional[str]): Only run benchmarks whose name contains this
+        max_regression (float): Allowed slowdown relative to the compared results
+        no_pin (bool): Don't pin the benchmarks to a single CPU
+        path (List[str]): Benchmark files or directories
+        quiet (bool): Run in quiet mode without docker output
+        rounds (int): Number of timed rounds
+        runtime_environment (str): Runtime environment to run commands within
+        save_baseline (Optional[str]): Also save the results as this named baseline
+        warmup (int): Number of untimed rounds before timing
+    """
+    user_id, group_id = get_user_id_group_id()
+
+    entrypoint = ["tawa-inner-cli", "bench", "--warmup", str(warmup), "--rounds", str(rounds)]
+    for f_or_d in path:
+        entrypoint.extend(["--path", f_or_d])
+    if keyword:
+        entrypoint.extend(["--keyword", keyword])
+    if cpu is not None:
+        entrypoint.extend(["--cpu", str(cpu)])
+    if no_pin:
+        entrypoint.append("--no-pin")
+    if save_baseline:
+        entrypoint.extend(["--save-baseline", save_baseline])
+    if compare:
+        entrypoint.extend(["--compare", compare, "--max-regression", str(max_regression)])
+
+    ret_code = run_generic_command(
+        build_buildx=build_buildx,
+        entrypoint_args=entrypoint,
+        env_vars={"TAWA_RUNTIME_ENVIRONMENT": runtime_environment},
+        quiet=quiet,
+        runtime_environment=runtime_environment,
+        user_gid=group_id,
+        user_id=user_id,
+    )
+
+    if ret_code.returncode != 0:
+        click.secho(
+            "Benchmarks failed or regressed",
+            bg="black",
+            fg="red",
+            err=True,
+            bold=True,
+        )
+        sys.exit(1)
 
 
 def build_base_command(
@@ -22,6 +185,7 @@ def build_base_command(
     forward_artifactory_creds: bool,
     quiet: bool,
     runtime_environment: str,
+    log_dir: Optional[str] = None,
 ) -> None:
     """Build the base image in runtime dir if it exists.
 
@@ -31,12 +195,14 @@ def build_base_command(
         forward_artifactory_creds (bool): To forward artifactory secrets to build through docker secrets
         quiet (bool): Build quiet flag
         runtime_environment (str): Environment for which to build image
+        log_dir (Optional[str], optional): Directory to archive the build output to. Defaults to None.
     """
     build_base_env_docker_image(
         build_args=dict(additional_docker_build_args),
         buildx=buildx,
         forward_artifactory_creds=forward_artifactory_creds,
         image=get_base_image(runtime_environment=runtime_environment),
+        log_dir=log_dir,
         quiet=quiet,
         runtime_environment=runtime_environment,
     )
@@ -48,6 +214,7 @@ def build_command(
     forward_artifactory_creds: bool,
     quiet: bool,
     runtime_environment: str,
+    log_dir: Optional[str] = None,
 ) -> None:
     """Build the project image.
 
@@ -57,17 +224,83 @@ def build_command(
         forward_artifactory_creds (bool): To forward artifactory secrets to build through docker secrets
         quiet (bool): Build quiet flag
         runtime_environment (str): Environment for which to build image
+        log_dir (Optional[str], optional): Directory to archive the build output to. Defaults to None.
     """
     build_user_env_docker_image(
         build_args=dict(additional_docker_build_args),
         buildx=buildx,
         forward_artifactory_creds=forward_artifactory_creds,
         image=get_user_image(runtime_environment=runtime_environment),
+        log_dir=log_dir,
         quiet=quiet,
         runtime_environment=runtime_environment,
     )
 
 
+def get_changed_files_args(changed_since: Optional[str], staged: bool) -> List[str]:
+    """Get the tawa-inner-cli args restricting lint and format to changed files.
+
+    Args:
+        changed_since (Optional[str]): Git ref to diff against
+        staged (bool): Restrict to staged changes
+
+    Returns:
+        List[str]: Args to append to the inner command
+    """
+    args = []
+    if changed_since is not None:
+        args.extend(["--changed-since", changed_since])
+    if staged:
+        args.append("--staged")
+    return args
+
+
+def get_host_owned_entrypoint_args(
+    entrypoint_args: List[str], container_path: str, root: bool, user_id: int, group_id: int
+) -> List[str]:
+    """Hand the files a container command writes to the host user when the container runs as root.
+
+    Args:
+        entrypoint_args (List[str]): Container command
+        container_path (str): File or directory the command writes, in the container
+        root (bool): Whether the container runs as root
+        user_id (int): Host user id
+        group_id (int): Host group id
+
+    Returns:
+        List[str]: Container command, followed by a chown of the written files when run as root
+    """
+    if not root:
+        return entrypoint_args
+    chown_command = shlex.join(["chown", "-R", f"{user_id}:{group_id}", container_path])
+    return ["sh", "-c", f"{shlex.join(entrypoint_args)}; status=$?; {chown_command}; exit $status"]
+
+
+def get_profile_entrypoint_args(entrypoint_args: List[str], container_profile_path: str, rate: int) -> List[str]:
+    """Wrap a container command in the py-spy sampling profiler.
+
+    Args:
+        entrypoint_args (List[str]): Command to profile
+        container_profile_path (str): Path of the speedscope output in the container
+        rate (int): Samples per second
+
+    Returns:
+        List[str]: Profiled command
+    """
+    return [
+        "py-spy",
+        "record",
+        "--subprocesses",
+        "--rate",
+        str(rate),
+        "--format",
+        "speedscope",
+        "--output",
+        container_profile_path,
+        "--",
+    ] + entrypoint_args
+
+
 def get_user_id_group_id() -> Tuple[int, int]:
     """Get current user group id and user id."""
     user = getpwnam(getpass.getuser())
@@ -125,6 +358,10 @@ def exec_command(
     root: bool,
     runtime_environment: str,
     quiet: bool,
+    profile: bool = False,
+    profile_rate: int = 100,
+    memprofile: bool = False,
+    log_dir: Optional[str] = None,
 ) -> None:
     """Run user provided command in tawa runtime.
 
@@ -138,17 +375,59 @@ def exec_command(
         root (bool): whether to pass root user access or not
         runtime_environment (str): Environment to run inside
         quiet (bool): Build quiet flag
+        profile (bool, optional): Run the command under the py-spy sampling profiler, including
+            its subprocesses and threads, and summarize the hottest functions. Defaults to False.
+        profile_rate (int, optional): Profiler samples per second. Defaults to 100.
+        memprofile (bool, optional): Record the peak RSS of every process of the command and the
+            allocation sites of its Python processes into .eototo/memprofiles. Defaults to False.
+        log_dir (Optional[str], optional): Directory to archive the build and command output to.
+            Defaults to None.
     """
     user_id, group_id = get_user_id_group_id()
 
     env_vars = get_aws_creds() if port_aws_creds else {}
 
+    entrypoint_args = shlex.split(command)
+    cap_add = None
+    profile_path = None
+    memprofile_dir = None
+    if (profile or memprofile) and not read_write:
+        click.secho("Profiling needs a read write mount to write the profile", fg="red", err=True, bold=True)
+        sys.exit(1)
+    if profile and memprofile:
+        click.secho("--profile and --memprofile can not be combined", fg="red", err=True, bold=True)
+        sys.exit(1)
+    if memprofile:
+        memprofile_dir = get_memprofile_dir()
+        container_memprofile_dir = get_container_path(memprofile_dir)
+        entrypoint_args = get_host_owned_entrypoint_args(
+            ["tawa-inner-cli", "memprofile", "--output-dir", container_memprofile_dir, "--"] + entrypoint_args,
+            container_memprofile_dir,
+            root,
+            user_id,
+            group_id,
+        )
+    if profile:
+        profile_path = get_profile_path()
+        container_profile_path = get_container_path(profile_path)
+        entrypoint_args = get_host_owned_entrypoint_args(
+            get_profile_entrypoint_args(entrypoint_args, container_profile_path, profile_rate),
+            container_profile_path,
+            root,
+            user_id,
+            group_id,
+        )
+        # py-spy reads the memory of the profiled processes through ptrace
+        cap_add = ["SYS_PTRACE"]
+
     ret_code = run_generic_command(
         build_buildx=build_buildx,
-        entrypoint_args=shlex.split(command),
+        cap_add=cap_add,
+        entrypoint_args=entrypoint_args,
         env_vars=env_vars,
         gpus=gpus,
         interactive=interactive,
+        log_dir=log_dir,
         quiet=quiet,
         read_write=read_write,
         root=root,
@@ -157,6 +436,15 @@ def exec_command(
         user_id=user_id,
     )
 
+    if profile_path is not None:
+        if os.path.exists(profile_path):
+            click.echo(format_profile_summary(summarize_speedscope(profile_path)))
+            click.secho(f"Profile written to {profile_path}, open it in https://www.speedscope.app", fg="green")
+        else:
+            click.secho("No profile was recorded", fg="red", err=True)
+    if memprofile_dir is not None:
+        click.secho(f"Memory profile written to {memprofile_dir}", fg="green")
+
     if ret_code.returncode != 0:
         click.secho(
             f"Failed command: {command}",
@@ -175,6 +463,9 @@ def lint_command(
     read_write: bool,
     runtime_environment: str,
     quiet: bool,
+    no_cache: bool = False,
+    changed_since: Optional[str] = None,
+    staged: bool = False,
 ) -> None:
     """Run lint command inside runtime environment container
 
@@ -184,12 +475,19 @@ def lint_command(
         read_write (bool): Whether to mount with read write
         runtime_environment (str): Environment to run inside
         quiet (bool): Build quiet flag
+        no_cache (bool, optional): Lint even if linting passed on an unchanged tree. Defaults to False.
+        changed_since (Optional[str], optional): Only lint Python files changed since this git ref.
+            Defaults to None.
+        staged (bool, optional): Only lint Python files with staged changes. Defaults to False.
     """
     user_id, group_id = get_user_id_group_id()
 
     command = ["tawa-inner-cli", "lint"]
     if fix:
         command.append("--fix")
+    if no_cache:
+        command.append("--no-cache")
+    command.extend(get_changed_files_args(changed_since, staged))
 
     ret_code = run_generic_command(
         build_buildx=build_buildx,
@@ -220,20 +518,31 @@ def format_command(
     quiet: bool,
     read_write: bool,
     runtime_environment: str,
+    no_cache: bool = False,
+    changed_since: Optional[str] = None,
+    staged: bool = False,
 ) -> None:
     """Run the format command inside the chosen runtime container.
 
     Args:
         build_buildx (bool): Whether to use buildx
+        check (bool): Check formatting without modifying the files
         quiet (bool): Build quiet flag
         read_write (bool): Run container with read write mounting
         runtime_environment (str): Runtime container to run inside
+        no_cache (bool, optional): Check even if the check passed on an unchanged tree. Defaults to False.
+        changed_since (Optional[str], optional): Only format Python files changed since this git ref.
+            Defaults to None.
+        staged (bool, optional): Only format Python files with staged changes. Defaults to False.
     """
     user_id, group_id = get_user_id_group_id()
 
     entrypoint_args = ["tawa-inner-cli", "format"]
     if check:
         entrypoint_args.append("--check")
+    if no_cache:
+        entrypoint_args.append("--no-cache")
+    entrypoint_args.extend(get_changed_files_args(changed_since, staged))
 
     ret_code = run_generic_command(
         build_buildx=build_buildx,
@@ -258,12 +567,88 @@ def format_command(
     sys.exit(0)
 
 
+def run_command(
+    build_buildx: bool,
+    force: bool,
+    max_parallel: int,
+    port_aws_creds: bool,
+    quiet: bool,
+    runtime_environment: str,
+    targets: List[str],
+    tasks_file: str,
+) -> None:
+    """Run tasks from the tasks file and their dependencies in runtime containers.
+
+    Tasks whose action key matches their last successful run are skipped.
+
+    Args:
+        build_buildx (bool): Whether to use buildx
+        force (bool): Run all tasks even when they are up to date
+        max_parallel (int): Maximum number of tasks running at once
+        port_aws_creds (bool): Whether to port host aws creds to containers
+        quiet (bool): Build quiet flag
+        runtime_environment (str): Environment for tasks that don't declare one
+        targets (List[str]): Names of the tasks to run
+        tasks_file (str): Path to the tasks file
+    """
+    user_id, group_id = get_user_id_group_id()
+
+    env_vars = get_aws_creds() if port_aws_creds else {}
+
+    tasks = load_tasks(tasks_file, default_runtime_environment=runtime_environment)
+    targets = list(targets) or list(tasks)
+    order = topological_order(tasks, targets)
+
+    for task_runtime_environment in sorted({tasks[task_name].runtime_environment for task_name in order}):
+        build_user_env_docker_image(
+            buildx=build_buildx,
+            image=get_user_image(runtime_environment=task_runtime_environment),
+            quiet=quiet,
+            runtime_environment=task_runtime_environment,
+        )
+
+    results = run_tasks(
+        tasks=tasks,
+        targets=targets,
+        action_cache=ActionCache(),
+        env_vars=env_vars,
+        force=force,
+        max_parallel=max_parallel,
+        quiet=quiet,
+        user_gid=group_id,
+        user_id=user_id,
+    )
+
+    for result in results:
+        duration = f"{result.duration:.1f}s" if result.status == TASK_SUCCEEDED else ""
+        click.echo(f"{result.name:<30} {result.status:<10} {duration}")
+
+    if any(result.status not in (TASK_CACHED, TASK_SUCCEEDED) for result in results):
+        click.secho(
+            "One or more tasks failed",
+            bg="black",
+            fg="red",
+            err=True,
+            bold=True,
+        )
+        sys.exit(1)
+    click.secho("Tasks ran successfully", bg="blue", fg="green")
+
+
 def test_command(
     build_buildx: bool,
     gpus: bool,
     runtime_environment: str,
     quiet: bool,
     path: List[str],
+    order: str = "default",
+    shard_index: int = 0,
+    shard_count: int = 1,
+    no_history: bool = False,
+    keyword: Optional[str] = None,
+    no_collection_cache: bool = False,
+    memprofile: bool = False,
+    log_dir: Optional[str] = None,
 ) -> None:
     """
     Run tawa's tests.
@@ -276,23 +661,51 @@ def test_command(
         path: A list of one or more files or directories to run ``pytest``
             on. This corresponds to the ``[file_or_dir]`` variadic ``pytest``
             argument.
+        order: How to order tests by their recorded history, one of
+            ``default``, ``failed-first`` or ``fastest-first``.
+        shard_index: Index of the shard to run.
+        shard_count: Number of shards of balanced recorded duration.
+        no_history: Don't record or use the test history.
+        keyword: Only run tests matching this ``pytest -k`` expression.
+        no_collection_cache: Import every test module instead of skipping
+            unchanged modules without selected tests.
+        memprofile: Record the peak memory of every test into .eototo/memprofiles.
+        log_dir: Directory to archive the build and test output to.
     """
     user_id, group_id = get_user_id_group_id()
 
     entrypoint = ["tawa-inner-cli", "test"]
     for f_or_d in path:
         entrypoint.extend(["--path", f_or_d])
+    if order != "default":
+        entrypoint.extend(["--order", order])
+    if shard_count > 1:
+        entrypoint.extend(["--shard-count", str(shard_count), "--shard-index", str(shard_index)])
+    if no_history:
+        entrypoint.append("--no-history")
+    if keyword:
+        entrypoint.extend(["--keyword", keyword])
+    if no_collection_cache:
+        entrypoint.append("--no-collection-cache")
+    memprofile_dir = None
+    if memprofile:
+        memprofile_dir = get_memprofile_dir()
+        entrypoint.extend(["--memprofile-dir", get_container_path(memprofile_dir)])
 
     ret_code = run_generic_command(
         build_buildx=build_buildx,
         entrypoint_args=entrypoint,
         gpus=gpus,
+        log_dir=log_dir,
         quiet=quiet,
         runtime_environment=runtime_environment,
         user_gid=group_id,
         user_id=user_id,
     )
 
+    if memprofile_dir is not None:
+        click.secho(f"Memory profile written to {memprofile_dir}", fg="green")
+
     if ret_code.returncode != 0:
         click.secho(
             "One or more tests failed",
@@ -305,19 +718,55 @@ def test_command(
     click.secho("Tests ran successfully", bg="blue", fg="green", bold=True)
 
 
-def type_check_command(build_buildx: bool, runtime_environment: str, quiet: bool) -> None:
+def test_report_command(build_buildx: bool, runtime_environment: str, quiet: bool, top: int) -> None:
+    """Report the slowest and flakiest tests from the test history.
+
+    Args:
+        build_buildx (bool): Whether to use buildx for docker
+        runtime_environment (str): Runtime environment to run commands within
+        quiet (bool): Run in quiet mode without docker output
+        top (int): Number of tests to show in each section of the report
+    """
+    user_id, group_id = get_user_id_group_id()
+
+    ret_code = run_generic_command(
+        build_buildx=build_buildx,
+        entrypoint_args=["tawa-inner-cli", "test-report", "--top", str(top)],
+        quiet=quiet,
+        runtime_environment=runtime_environment,
+        user_gid=group_id,
+        user_id=user_id,
+    )
+
+    if ret_code.returncode != 0:
+        click.secho(
+            "Failed to report test history",
+            bg="black",
+            fg="red",
+            err=True,
+            bold=True,
+        )
+        sys.exit(1)
+
+
+def type_check_command(build_buildx: bool, runtime_environment: str, quiet: bool, no_cache: bool = False) -> None:
     """Run type checking through tawa inner cli.
 
     Args:
         build_buildx (bool): Whether to use buildx for docker
         runtime_environment (str): Runtime environment to run commands within
         quiet (bool): Run in quiet mode without docker output
+        no_cache (bool, optional): Type check even if it passed on an unchanged tree. Defaults to False.
     """
     user_id, group_id = get_user_id_group_id()
 
+    entrypoint_args = ["tawa-inner-cli", "type-check"]
+    if no_cache:
+        entrypoint_args.append("--no-cache")
+
     ret_code = run_generic_command(
         build_buildx=build_buildx,
-        entrypoint_args=["tawa-inner-cli", "type-check"],
+        entrypoint_args=entrypoint_args,
         quiet=quiet,
         runtime_environment=runtime_environment,
         user_gid=group_id,
@@ -335,3 +784,84 @@ def type_check_command(build_buildx: bool, runtime_environment: str, quiet: bool
         sys.exit(1)
     click.secho("Ran type checking successfully", bg="blue", fg="green", bold=True)
     sys.exit(0)
+
+
+def watch_command(
+    build_buildx: bool,
+    debounce: float,
+    gpus: bool,
+    lint: bool,
+    path: List[str],
+    quiet: bool,
+    runtime_environment: str,
+) -> None:
+    """Rerun lint and affected tests inside a persistent container whenever files change.
+
+    The container is started once and every rerun goes through docker exec,
+    so only the checks themselves are paid for on each save. Runs until
+    interrupted.
+
+    Args:
+        build_buildx (bool): Whether to use buildx for docker
+        debounce (float): Seconds without changes before a burst of changes triggers a rerun
+        gpus (bool): Whether to run the container with gpus enabled
+        lint (bool): Whether to lint the changed files on each rerun
+        path (List[str]): Test files or directories to select affected tests from
+        quiet (bool): Run in quiet mode without docker build output
+        runtime_environment (str): Runtime environment to run commands within
+    """
+    user_id, group_id = get_user_id_group_id()
+
+    image = get_user_image(runtime_environment=runtime_environment)
+    build_user_env_docker_image(
+        buildx=build_buildx,
+        image=image,
+        quiet=quiet,
+        runtime_environment=runtime_environment,
+    )
+
+    container = start_persistent_container(
+        image=image,
+        name=f"eototo-watch-{os.getpid()}",
+        gpus=gpus,
+        user_gid=group_id,
+        user_id=user_id,
+    )
+    watcher = get_file_watcher(os.getcwd(), debounce=debounce)
+    click.secho(f"Watching {os.getcwd()} for changes, press Ctrl+C to stop", fg="blue")
+
+    try:
+        while True:
+            changed_files = sorted(
+                changed_file for changed_file in watcher.wait_for_changes() if changed_file.endswith(".py")
+            )
+            if not changed_files:
+                continue
+            click.secho(f"Changed: {', '.join(changed_files)}", fg="blue")
+
+            if lint:
+                # lint everything that differs from HEAD, ruff is fast enough on a working diff
+                ret_code = exec_in_container(container, ["tawa-inner-cli", "lint", "--changed-since", "HEAD"])
+                if ret_code.returncode != 0:
+                    click.secho("Linting failed", fg="red", err=True, bold=True)
+                else:
+                    click.secho("Linting passed", fg="green")
+
+            test_files = get_affected_tests(changed_files, path)
+            if not test_files:
+                click.secho("No affected tests", fg="yellow")
+                continue
+
+            entrypoint = ["tawa-inner-cli", "test"]
+            for test_file in test_files:
+                entrypoint.extend(["--path", test_file])
+            ret_code = exec_in_container(container, entrypoint)
+            if ret_code.returncode != 0:
+                click.secho(f"Tests failed: {', '.join(test_files)}", fg="red", err=True, bold=True)
+            else:
+                click.secho(f"Tests passed: {', '.join(test_files)}", fg="green")
+    except KeyboardInterrupt:
+        click.secho("Stopping watch", fg="blue")
+    finally:
+        watcher.close()
+        stop_container(container)
@@ -0,0 +1,99 @@
+"""Selection of the checks to rerun in eototo watch for a set of changed files.
+
+Tests are mapped from the changed files by convention: a changed test module
+reruns itself, a changed conftest reruns the tests below it, and a changed
+source module ``foo.py`` reruns the test modules named ``test_foo.py`` or
+mentioning ``foo`` in their source.
+"""
+
+import os
+import re
+from typing import Iterable, List, Set
+
+PYTHON_SUFFIX = ".py"
+
+
+def is_test_file(path: str) -> bool:
+    """Whether a path is a pytest test module.
+
+    Args:
+        path (str): Path to check
+
+    Returns:
+        bool: True for test_*.py and *_test.py files
+    """
+    file_name = os.path.basename(path)
+    return file_name.endswith(PYTHON_SUFFIX) and (file_name.startswith("test_") or file_name.endswith("_test.py"))
+
+
+def list_test_files(test_paths: Iterable[str]) -> List[str]:
+    """List the test modules under the test paths.
+
+    Args:
+        test_paths (Iterable[str]): Test files or directories
+
+    Returns:
+        List[str]: Sorted test module paths
+    """
+    test_files = set()
+    for test_path in test_paths:
+        if os.path.isfile(test_path):
+            test_files.add(os.path.normpath(test_path))
+            continue
+        for root, _, file_names in os.walk(test_path):
+            test_files.update(
+                os.path.normpath(os.path.join(root, file_name)) for file_name in file_names if is_test_file(file_name)
+            )
+    return sorted(test_files)
+
+
+def _is_under(path: str, directory: str) -> bool:
+    return os.path.normpath(path).startswith(os.path.normpath(directory) + os.sep)
+
+
+def get_affected_tests(changed_files: Iterable[str], test_paths: Iterable[str]) -> List[str]:
+    """Get the test modules affected by changed files.
+
+    Args:
+        changed_files (Iterable[str]): Changed file paths, relative to the repo root
+        test_paths (Iterable[str]): Test files or directories to select from
+
+    Returns:
+        List[str]: Sorted affected test module paths
+    """
+    test_files = list_test_files(test_paths)
+    affected: Set[str] = set()
+
+    for changed_file in changed_files:
+        changed_file = os.path.normpath(changed_file)
+        if not changed_file.endswith(PYTHON_SUFFIX):
+            continue
+
+        if changed_file in test_files:
+            affected.add(changed_file)
+            continue
+
+        if os.path.basename(changed_file) == "conftest.py":
+            conftest_dir = os.path.dirname(changed_file)
+            affected.update(test_file for test_file in test_files if not conftest_dir or _is_under(test_file, conftest_dir))
+            continue
+
+        module_name = os.path.splitext(os.path.basename(changed_file))[0]
+        if module_name == "__init__":
+            module_name = os.path.basename(os.path.dirname(changed_file))
+        if not module_name:
+            continue
+        module_pattern = re.compile(rf"\b{re.escape(module_name)}\b")
+
+        for test_file in test_files:
+            if os.path.basename(test_file) in (f"test_{module_name}.py", f"{module_name}_test.py"):
+                affected.add(test_file)
+                continue
+            try:
+                with open(test_file, "r") as test_buffer:
+                    if module_pattern.search(test_buffer.read()):
+                        affected.add(test_file)
+            except (OSError, UnicodeDecodeError):
+                continue
+
+    return sorted(affected)
@@ -1,18 +1,26 @@
 import logging
 import os
 import subprocess
-import yaml
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, List, Optional
 
 from eototo.commands.git import get_repo_name
+from eototo.docker.environments import (
+    ENVIRONMENT_CONFIG_PATH,
+    get_runtime_environment,
+    load_environment_registry,
+)
 from eototo.utils.environment import get_artifactory_creds
+from eototo.utils.logs import run_with_log_capture
 
 logging.basicConfig(level=logging.INFO)
 
 
 # Standard location of where tawa runtime environments are defined
 DEFAULT_ENVIRONMENT_RUNTIME_ENV = "cuda12"
-ENVIRONMENT_WELLKNOWN_LOC = "runtime_environments"
+# slim runtime environment for commands that don't use gpus and hosts without gpus
+CPU_ENVIRONMENT_RUNTIME_ENV = "cpu"
+# one entry per gpu when the nvidia driver is loaded
+NVIDIA_DRIVER_GPUS_PATH = "/proc/driver/nvidia/gpus"
 WELLKNOWN_BASE_ENV_KEY = "base"
 WELLKNOWN_PROJECT_ENV_KEY = "project"
 
@@ -23,38 +31,43 @@ def build_base_env_docker_image(
     build_args: Optional[Dict[str, str]] = None,
     cache_from: Optional[str] = None,
     forward_artifactory_creds: bool = True,
+    log_dir: Optional[str] = None,
     quiet: bool = False,
     runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV,
 ):
     """Build a base docker image by passing the required files to a lower function.
 
     This is a wrapper on build_dockerfile_from_path that abstracts getting
-    the standard dockerfile location from provided runtime environment.
+    the standard dockerfile location, default build args and cache settings
+    from provided runtime environment.
 
     Args:
         image (str): The image name to build
         buildx (bool): Whether to use buildx or not
-        build_args (Optional[Dict[str, str]], optional): The general build args to provide.
-            Defaults to None.
+        build_args (Optional[Dict[str, str]], optional): The general build args to provide, merged over
+            the default build args of the runtime environment. Defaults to None.
         cache_from (Optional[str], optional): Location to load docker cache from.
-            Defaults to None.
+            Defaults to None (the cache location of the runtime environment).
         forward_artifactory_creds (bool, optional): To forward artifactory creds on user machine
+        log_dir (Optional[str], optional): Directory to archive the build output to. Defaults to None.
         quiet (bool, optional): Whether to display docker progress to console.
             Defaults to False.
         runtime_environment (str, optional): The runtime environment where dockerfile is loaded from.
             Defaults to "cuda12".
     """
     docker_file_path = pull_build_location_from_config(runtime_environment, WELLKNOWN_BASE_ENV_KEY)
+    environment = get_runtime_environment(runtime_environment)
 
     if not quiet:
         logging.info(f"Using {runtime_environment} runtime environment")
     build_dockerfile_from_path(
         buildx=buildx,
-        build_args=build_args,
-        cache_from=cache_from,
+        build_args=environment.get_build_args(build_args),
+        cache_from=cache_from or environment.cache_from,
         dockerfile_path=docker_file_path,
         image=image,
         forward_artifactory_creds=forward_artifactory_creds,
+        log_dir=log_dir,
         quiet=quiet,
     )
 
@@ -66,10 +79,14 @@ def build_dockerfile_from_path(
     build_args: Optional[Dict[str, str]] = None,
     cache_from: Optional[str] = None,
     forward_artifactory_creds: bool = True,
+    log_dir: Optional[str] = None,
     quiet: bool = False,
 ):
     """Build docker image from provided path and build parameters.
 
+    Quiet or archived builds stream their output through a bounded log
+    capture, quiet builds log the last lines of the output on failure.
+
     Args:
         image (str): What image should be named on output
         dockerfile_path (str): Path of docker file to build
@@ -79,6 +96,7 @@ def build_dockerfile_from_path(
         cache_from (Optional[str], optional): Optional location to load docker cache.
             Defaults to None.
         forward_artifactory_creds (bool, optional): To forward artifactory creds on user machine
+        log_dir (Optional[str], optional): Directory to archive the build output to. Defaults to None.
         quiet (bool, optional): Whether to display output to console. Defaults to False.
     """
     # general docker command before inputs
@@ -121,9 +139,6 @@ def build_dockerfile_from_path(
     # https://docs.docker.com/develop/develop-images/dockerfile_best-practices/#pipe-dockerfile-through-stdin
     command.extend(["-f ", dockerfile_path, "."])
 
-    # if quiet redirect the output to the DEVNULL process
-    stdout_redirect = subprocess.DEVNULL if quiet else None
-
     logging.info(f"Building image {image} from path {dockerfile_path}")
 
     str_command = " ".join(command)
@@ -131,7 +146,15 @@ def build_dockerfile_from_path(
     if not quiet:
         logging.info(f"Docker build command:\n{str_command}")
 
-    subprocess.run(str_command, stdout=stdout_redirect, check=True, shell=True)
+    if quiet or log_dir is not None:
+        ret = run_with_log_capture(str_command, echo=not quiet, log_dir=log_dir, log_name=f"build-{image}", shell=True)
+        if ret.returncode != 0:
+            if quiet:
+                logging.error(f"Building image {image} failed, last lines of the output:\n{ret.stdout}")
+            raise subprocess.CalledProcessError(ret.returncode, str_command)
+        return
+
+    subprocess.run(str_command, check=True, shell=True)
 
 
 def build_user_env_docker_image(
@@ -140,43 +163,52 @@ def build_user_env_docker_image(
     build_args: Optional[Dict[str, str]] = None,
     cache_from: Optional[str] = None,
     forward_artifactory_creds: bool = True,
+    log_dir: Optional[str] = None,
     quiet: bool = False,
     runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV,
 ):
     """Build a docker image by passing the required files to a lower function.
 
     This is a wrapper on build_dockerfile_from_path that abstracts getting
-    the standard dockerfile location from provided runtime environment.
+    the standard dockerfile location, default build args and cache settings
+    from provided runtime environment.
 
     Args:
         image (str): The image name to build
         buildx (bool): Whether to use buildx or not
-        build_args (Optional[Dict[str, str]], optional): The general build args to provide.
-            Defaults to None.
+        build_args (Optional[Dict[str, str]], optional): The general build args to provide, merged over
+            the default build args of the runtime environment. Defaults to None.
         cache_from (Optional[str], optional): Location to load docker cache from.
-            Defaults to None.
+            Defaults to None (the cache location of the runtime environment).
         forward_artifactory_creds (bool, optional): To forward artifactory creds on user machine
+        log_dir (Optional[str], optional): Directory to archive the build output to. Defaults to None.
         quiet (bool, optional): Whether to display docker progress to console.
             Defaults to False.
         runtime_environment (str, optional): The runtime environment where dockerfile is loaded from.
             Defaults to "cuda12".
     """
     docker_file_path = pull_build_location_from_config(runtime_environment, WELLKNOWN_PROJECT_ENV_KEY)
+    environment = get_runtime_environment(runtime_environment)
 
     if not quiet:
         logging.info(f"Using {runtime_environment} runtime environment")
     build_dockerfile_from_path(
         buildx=buildx,
-        build_args=build_args,
-        cache_from=cache_from,
+        build_args=environment.get_build_args(build_args),
+        cache_from=cache_from or environment.cache_from,
         dockerfile_path=docker_file_path,
         forward_artifactory_creds=forward_artifactory_creds,
         image=image,
+        log_dir=log_dir,
         quiet=quiet,
     )
 
 
-def get_base_image(image_version: str = "latest", runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV) -> str:
+def get_base_image(
+    image_version: str = "latest",
+    runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV,
+    repo_name: Optional[str] = None,
+) -> str:
     """Gets the base image name.
 
     Standarded naming for the tag on the built image.
@@ -185,15 +217,43 @@ def get_base_image(image_version: str = "latest", runtime_environment: str = DEF
         image_version (str, optional): Version of image. Defaults to "latest".
         runtime_environment (str, optional): Name of the runtime environment holding the image.
             Defaults to DEFAULT_ENVIRONMENT_RUNTIME_ENV.
+        repo_name (Optional[str], optional): Name of the repo, looked up through git if None.
+            Defaults to None.
 
     Returns:
         str: The standard fully formed string name of the docker image
     """
-    repo_name = get_repo_name()
+    if repo_name is None:
+        repo_name = get_repo_name()
     return f"{repo_name}-{runtime_environment}-base:{image_version}"
 
 
-def get_user_image(image_version: str = "latest", runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV) -> str:
+def get_image_id(image: str) -> Optional[str]:
+    """Get the content addressed id of a local image, used as its fingerprint.
+
+    Args:
+        image (str): Name of the image
+
+    Returns:
+        Optional[str]: The image id, None if the image does not exist locally
+    """
+    ret = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+        capture_output=True,
+        check=False,
+        text=True,
+    )
+    if ret.returncode != 0:
+        logging.warning(f"Could not inspect image {image}")
+        return None
+    return ret.stdout.strip()
+
+
+def get_user_image(
+    image_version: str = "latest",
+    runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV,
+    repo_name: Optional[str] = None,
+) -> str:
     """Gets the user image name.
 
     Standarded naming for the tag on the built image.
@@ -202,14 +262,50 @@ def get_user_image(image_version: str = "latest", runtime_environment: str = DEF
         image_version (str, optional): Version of image. Defaults to "latest".
         runtime_environment (str, optional): Name of the runtime environment holding the image.
             Defaults to DEFAULT_ENVIRONMENT_RUNTIME_ENV.
+        repo_name (Optional[str], optional): Name of the repo, looked up through git if None.
+            Defaults to None.
 
     Returns:
         str: The standard fully formed string name of the docker image
     """
-    repo_name = get_repo_name()
+    if repo_name is None:
+        repo_name = get_repo_name()
     return f"{repo_name}-{runtime_environment}:{image_version}"
 
 
+def host_has_gpus() -> bool:
+    """Check whether the host has nvidia gpus with a loaded driver, without starting nvidia-smi.
+
+    Returns:
+        bool: Whether there is at least one gpu
+    """
+    return os.path.isdir(NVIDIA_DRIVER_GPUS_PATH) and bool(os.listdir(NVIDIA_DRIVER_GPUS_PATH))
+
+
+def select_runtime_environment(runtime_environment: Optional[str] = None, uses_gpus: Optional[bool] = None) -> str:
+    """Select the runtime environment of a command when the user did not pick one.
+
+    Commands that don't use gpus, and any command on a host without gpus, run
+    in the slim cpu runtime environment when the runtime config defines it,
+    everything else runs in the default runtime environment.
+
+    Args:
+        runtime_environment (Optional[str], optional): Runtime environment picked by the user. Defaults to None.
+        uses_gpus (Optional[bool], optional): Whether the command uses gpus, None if it uses them
+            when the host has any. Defaults to None.
+
+    Returns:
+        str: Name of the runtime environment
+    """
+    if runtime_environment is not None:
+        return runtime_environment
+    if uses_gpus is None:
+        uses_gpus = host_has_gpus()
+    if not uses_gpus and CPU_ENVIRONMENT_RUNTIME_ENV in load_environment_registry():
+        return CPU_ENVIRONMENT_RUNTIME_ENV
+    return DEFAULT_ENVIRONMENT_RUNTIME_ENV
+
+
 def pull_build_location_from_config(runtime_environment: str, file_key: Optional[str] = None) -> str:
     """Pull build environment Dockerfile loc from runtime config
 
@@ -224,62 +320,150 @@ def pull_build_location_from_config(runtime_environment: str, file_key: Optional
         logging.info("Runtime env file key provided is none, assuming assuming key is project")
         file_key = WELLKNOWN_PROJECT_ENV_KEY
 
-    # load config from well known path
-    config_file_path = "runtime_environments/environments.yml"
-    with open(config_file_path, "r") as config_buffer:
-        config_object = yaml.safe_load(config_buffer)
-
-    # parse through to ensure key is there
-    environment_object = config_object["environments"]
-    if runtime_environment not in environment_object:
-        raise ValueError(f"No {runtime_environment} in {config_file_path}")
+    # registry of the config at the well known path, inheritance resolved
+    environment = get_runtime_environment(runtime_environment)
 
-    if file_key not in environment_object[runtime_environment]:
-        raise ValueError(f"No {file_key} in {runtime_environment} definition in config - {config_file_path}")
+    if file_key not in environment.dockerfiles:
+        raise ValueError(f"No {file_key} in {runtime_environment} definition in config - {ENVIRONMENT_CONFIG_PATH}")
 
-    build_file_name = environment_object[runtime_environment][file_key]
-    expected_path = f"runtime_environments/{runtime_environment}/{build_file_name}"
+    expected_path = environment.dockerfiles[file_key]
     if not os.path.exists(expected_path):
         raise FileExistsError(f"Expected runtime path: {expected_path} does not exist.")
 
     return expected_path
 
 
+def get_container_path(path: str) -> str:
+    """Get the path in the container of a path relative to the repo root on the host.
+
+    Args:
+        path (str): Path relative to the current working directory, the repo root
+
+    Returns:
+        str: Path under the project bind mount in the container
+    """
+    return os.path.join("/opt", os.path.split(os.getcwd())[1], path)
+
+
+def get_container_run_args(
+    cap_add: Optional[List[str]] = None,
+    cpus: Optional[float] = None,
+    env_vars: Optional[Dict[str, Any]] = None,
+    gpus: bool = False,
+    memory: Optional[str] = None,
+    read_write: bool = True,
+    root: bool = False,
+    user_gid: int = 1000,
+    user_id: int = 1000,
+) -> List[str]:
+    """Get the standard docker run args shared by every container eototo starts.
+
+    Args:
+        cap_add (Optional[List[str]], optional): Linux capabilities to add to the container, ex: SYS_PTRACE.
+            Defaults to None.
+        cpus (Optional[float], optional): Limit on the CPUs the container may use. Defaults to None (no limit).
+        env_vars (Optional[Dict[str, Any]], optional): Dict of str - Any env vars to pass to container. Defaults to None.
+        gpus (bool, optional): Flag to turn on or off gpus. Defaults to False (gpus off).
+        memory (Optional[str], optional): Limit on the container memory in docker format, ex: 4g.
+            Defaults to None (no limit).
+        read_write (bool, optional): Run command with read write mounting. Defaults to True.
+        root (bool, optional): Run with root user and group instead of current user. Defaults to False.
+        user_gid (int, optional): Group id to mount to container. Defaults to 1000.
+        user_id (int, optional): User id to mount to container. Defaults to 1000.
+
+    Returns:
+        List[str]: Mount, user, env, gpu, resource and capability args for docker run
+    """
+    # have to add read/write bindings to port changes back to users
+    # depends on the read/write enable now, not all commands need this privilege
+    entry_point_mounts = []
+    target_dir_name = os.path.split(os.getcwd())[1]
+    mount_config = f"type=bind,source={os.getcwd()},target=/opt/{target_dir_name}"
+    if not read_write:
+        mount_config = mount_config + ",readonly"
+    entry_point_mounts = [
+        "--mount",
+        mount_config,
+    ]
+
+    gpu_args = ["--gpus", "all"] if gpus else []
+
+    resource_args = []
+    if cpus is not None:
+        resource_args.extend(["--cpus", str(cpus)])
+    if memory is not None:
+        resource_args.extend(["--memory", memory])
+
+    cap_args = []
+    for capability in cap_add or []:
+        cap_args.extend(["--cap-add", capability])
+
+    # mount the current user to not break host machine read write
+    entry_point_user = [] if root else ["-u", f"{user_id}:{user_gid}"]
+
+    env_args = []
+    # parse the env vars to port
+    if env_vars is not None:
+        for key, value in env_vars.items():
+            env_args.extend(["-e", f"{key}={value}"])
+
+    return entry_point_mounts + entry_point_user + env_args + gpu_args + resource_args + cap_args
+
+
 def run_generic_command(
     build: bool = True,
     build_buildx: bool = False,
+    cap_add: Optional[List[str]] = None,
     check: bool = False,
+    cpus: Optional[float] = None,
     display_cmd: bool = True,
     entrypoint_args: Optional[List[str]] = None,
     env_vars: Optional[Dict[str, Any]] = None,
     gpus: bool = False,
-    image: str = get_user_image(),
+    image: Optional[str] = None,
     interactive: bool = False,
+    log_dir: Optional[str] = None,
+    memory: Optional[str] = None,
     quiet: bool = False,
     read_write: bool = True,
     root: bool = False,
-    runtime_environment: str = "default",
+    runtime_environment: str = DEFAULT_ENVIRONMENT_RUNTIME_ENV,
+    stdout: Optional[IO] = None,
     user_gid: int = 1000,
     user_id: int = 1000,
 ) -> subprocess.CompletedProcess:
     """Run a generic docker command in a standard way and build if user specified.
 
+    Unless interactive or redirected to a file, quiet or archived runs stream
+    their output through a bounded log capture, quiet runs only log the last
+    lines of the output on failure.
+
     Args:
         build (bool, optional): Flag to build image or not. Defaults to True.
         build_buildx (bool, optional): Flag to build with buildx. Defaults to False.
+        cap_add (Optional[List[str]], optional): Linux capabilities to add to the container, ex: SYS_PTRACE.
+            Defaults to None.
         check (bool, optional): Flag to ensure process success. Defaults to False.
+        cpus (Optional[float], optional): Limit on the CPUs the container may use.
+            Defaults to None (the limit of the runtime environment, if any).
         display_cmd (bool, optional): Flag to display user command. Defaults to True.
         entrypoint_args (List[str], optional): Entry point args for docker run.
             Defaults to None.
         env_vars (Optional[Dict[str, Any]], optional): Dict of str - Any env vars to pass to container. Defaults to None.
         gpus (bool, optional): Flag to turn on or off gpus. Defaults to False (gpus off).
         interactive (bool, optional): Bool to run command in interactive mode in container. Defaults to False.
-        image (str, optional): What image to run docker command on.
-            Defaults to get_user_image().
+        image (Optional[str], optional): What image to run docker command on.
+            Defaults to None (the project image of the runtime environment).
+        log_dir (Optional[str], optional): Directory to archive the build and run output to.
+            Defaults to None.
+        memory (Optional[str], optional): Limit on the container memory in docker format, ex: 4g.
+            Defaults to None (the limit of the runtime environment, if any).
         read_write (bool, optional): Run command with read write mounting. Defaults to False.
         root (bool, optional): Run with root user and group instead of current user. Defaults to False.
         runtime_environment (str, optional): What runtime environment location image file exists in.
-            Defaults to "default".
+            Defaults to DEFAULT_ENVIRONMENT_RUNTIME_ENV.
+        stdout (Optional[IO], optional): File to redirect container stdout and stderr to.
+            Defaults to None (inherit the terminal).
         user_gid (int, optional): User id to mount to container. Defaults to 1000.
         user_id (int, optional): Group id to mount to container. Defaults to 1000.
 
@@ -289,46 +473,41 @@ def run_generic_command(
     if entrypoint_args is None:
         entrypoint_args = []
 
+    if image is None:
+        image = get_user_image(runtime_environment=runtime_environment)
+
+    # the resource profile of the runtime environment applies to the limits the caller did not set
+    if (cpus is None or memory is None) and os.path.exists(ENVIRONMENT_CONFIG_PATH):
+        environment = load_environment_registry().get(runtime_environment)
+        if environment is not None:
+            cpus = environment.cpus if cpus is None else cpus
+            memory = environment.memory if memory is None else memory
+
     if build:
         build_user_env_docker_image(
             buildx=build_buildx,
-            image=get_user_image(),
+            image=get_user_image(runtime_environment=runtime_environment),
+            log_dir=log_dir,
             quiet=quiet,
             runtime_environment=runtime_environment,
         )
 
-    # have to add read/write bindings to port changes back to users
-    # depends on the read/write enable now, not all commands need this privilege
-    entry_point_mounts = []
-    target_dir_name = os.path.split(os.getcwd())[1]
-    mount_config = f"type=bind,source={os.getcwd()},target=/opt/{target_dir_name}"
-    if not read_write:
-        mount_config = mount_config + ",readonly"
-    entry_point_mounts = [
-        "--mount",
-        mount_config,
-    ]
-
     interactive_run_args = ["-it"] if interactive else []
 
-    gpu_args = ["--gpus", "all"] if gpus else []
-
-    # mount the current user to not break host machine read write
-    entry_point_user = [] if root else ["-u", f"{user_id}:{user_gid}"]
-
-    env_args = []
-    # parse the env vars to port
-    if env_vars is not None:
-        for key, value in env_vars.items():
-            env_args.extend(["-e", f"{key}={value}"])
-
     # docker command assembly
     docker_commands = (
         ["docker", "run", "--rm"]
-        + entry_point_mounts
-        + entry_point_user
-        + env_args
-        + gpu_args
+        + get_container_run_args(
+            cap_add=cap_add,
+            cpus=cpus,
+            env_vars=env_vars,
+            gpus=gpus,
+            memory=memory,
+            read_write=read_write,
+            root=root,
+            user_gid=user_gid,
+            user_id=user_id,
+        )
         + interactive_run_args
         + [image]
         + entrypoint_args
@@ -338,7 +517,93 @@ def run_generic_command(
     if display_cmd:
         logging.info('> Running docker command: "{}"'.format(" ".join(docker_commands)))
 
+    if stdout is None and not interactive and (quiet or log_dir is not None):
+        log_name = "-".join(os.path.basename(arg) for arg in entrypoint_args[:2]) or "run"
+        ret = run_with_log_capture(docker_commands, echo=not quiet, log_dir=log_dir, log_name=log_name)
+        if ret.returncode != 0 and quiet:
+            logging.error(f"Container command failed, last lines of the output:\n{ret.stdout}")
+        if check:
+            ret.check_returncode()
+        return ret
+
+    # only redirect when asked to, interactive and regular runs keep the terminal
+    redirect_args: Dict[str, Any] = {}
+    if stdout is not None:
+        redirect_args = {"stdout": stdout, "stderr": subprocess.STDOUT}
+
     return subprocess.run(
         docker_commands,
         check=check,
+        **redirect_args,
+    )
+
+
+def start_persistent_container(
+    image: str,
+    name: str,
+    env_vars: Optional[Dict[str, Any]] = None,
+    gpus: bool = False,
+    read_write: bool = True,
+    user_gid: int = 1000,
+    user_id: int = 1000,
+) -> str:
+    """Start a detached container that stays up for repeated docker exec calls.
+
+    The container has the same mounts and user as run_generic_command and is
+    removed when stopped.
+
+    Args:
+        image (str): Image to start the container from
+        name (str): Name of the container
+        env_vars (Optional[Dict[str, Any]], optional): Env vars to pass to container. Defaults to None.
+        gpus (bool, optional): Flag to turn on or off gpus. Defaults to False.
+        read_write (bool, optional): Run with read write mounting. Defaults to True.
+        user_gid (int, optional): Group id to mount to container. Defaults to 1000.
+        user_id (int, optional): User id to mount to container. Defaults to 1000.
+
+    Returns:
+        str: Name of the started container
+    """
+    docker_commands = (
+        ["docker", "run", "--rm", "-d", "--name", name]
+        + get_container_run_args(
+            env_vars=env_vars,
+            gpus=gpus,
+            read_write=read_write,
+            user_gid=user_gid,
+            user_id=user_id,
+        )
+        + [image, "sleep", "infinity"]
     )
+    logging.info('> Starting container: "{}"'.format(" ".join(docker_commands)))
+    subprocess.run(docker_commands, check=True, stdout=subprocess.DEVNULL)
+    return name
+
+
+def exec_in_container(
+    container: str, entrypoint_args: List[str], stdout: Optional[IO] = None
+) -> subprocess.CompletedProcess:
+    """Run a command in a running container.
+
+    Args:
+        container (str): Name of the container
+        entrypoint_args (List[str]): Command to run
+        stdout (Optional[IO], optional): File to redirect the command stdout and stderr to.
+            Defaults to None (inherit the terminal).
+
+    Returns:
+        subprocess.CompletedProcess: Completed process object
+    """
+    redirect_args: Dict[str, Any] = {}
+    if stdout is not None:
+        redirect_args = {"stdout": stdout, "stderr": subprocess.STDOUT}
+    return subprocess.run(["docker", "exec", container] + entrypoint_args, check=False, **redirect_args)
+
+
+def stop_container(container: str) -> None:
+    """Stop a container, it is removed if it was started with --rm.
+
+    Args:
+        container (str): Name of the container
+    """
+    subprocess.run(["docker", "stop", "-t", "1", container], check=False, stdout=subprocess.DEVNULL)
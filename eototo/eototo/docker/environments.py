@@ -0,0 +1,221 @@
+"""Registry of the runtime environments defined in ``runtime_environments/environments.yml``.
+
+Every environment lives in its own directory under ``runtime_environments``
+and is defined by::
+
+    environments:
+      cuda12:
+        base: Dockerfile.base          # Dockerfile of the base image
+        project: Dockerfile.project    # Dockerfile of the project image
+        build_args:                    # default docker build args, overridden by the user's
+          PYTHON_VERSION: "3.11"
+        resources:                     # default limits of the containers
+          cpus: 8
+          memory: 32g
+        cache:
+          from: registry.example.com/tawa-cuda12:latest  # default --cache-from of builds
+          inline: true                 # embed cache metadata so the image can be a cache source
+      cuda12-debug:
+        extends: cuda12                # inherit everything not set here
+        build_args:
+          DEBUG: "1"
+
+An environment that extends another one inherits its Dockerfiles from the
+directory of the environment that defines them, ``build_args``, ``resources``
+and ``cache`` are merged key by key. The config is parsed and validated once
+per process and only read again when the file changes.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+ENVIRONMENT_WELLKNOWN_LOC = "runtime_environments"
+ENVIRONMENT_CONFIG_PATH = f"{ENVIRONMENT_WELLKNOWN_LOC}/environments.yml"
+
+ENVIRONMENT_KEYS = {"extends", "base", "project", "build_args", "resources", "cache"}
+FILE_KEYS = ("base", "project")
+RESOURCE_KEYS = {"cpus": (int, float), "memory": (str,)}
+CACHE_KEYS = {"from": (str,), "inline": (bool,)}
+
+
+@dataclass
+class RuntimeEnvironment:
+    """A validated runtime environment with its inheritance resolved."""
+
+    name: str
+    # Dockerfile paths relative to the repo root by file key, ex: base, project
+    dockerfiles: Dict[str, str] = field(default_factory=dict)
+    build_args: Dict[str, str] = field(default_factory=dict)
+    cpus: Optional[float] = None
+    memory: Optional[str] = None
+    cache_from: Optional[str] = None
+    cache_inline: bool = False
+
+    def get_build_args(self, build_args: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Get the build args of a build, the defaults of the environment overridden by the given ones.
+
+        Args:
+            build_args (Optional[Dict[str, str]], optional): Build args of the user. Defaults to None.
+
+        Returns:
+            Dict[str, str]: Build args to pass to docker build
+        """
+        merged = dict(self.build_args)
+        if self.cache_inline:
+            merged["BUILDKIT_INLINE_CACHE"] = "1"
+        merged.update(build_args or {})
+        return merged
+
+
+# parsed registries by absolute config path, with the mtime and size they were parsed at
+_registry_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, RuntimeEnvironment]]] = {}
+
+
+def _check_mapping(value: Any, where: str, allowed_keys: Optional[set] = None) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError(f"{where} must be a mapping, got {type(value).__name__}")
+    if allowed_keys is not None:
+        unknown = sorted(set(value) - allowed_keys)
+        if unknown:
+            raise ValueError(f"{where} has unknown keys {unknown}, allowed are {sorted(allowed_keys)}")
+    return value
+
+
+def _check_typed_mapping(value: Any, where: str, types: Dict[str, tuple]) -> Dict[str, Any]:
+    _check_mapping(value, where, set(types))
+    for key, item in value.items():
+        # bool is an int, it is never a valid number of cpus
+        if not isinstance(item, types[key]) or (isinstance(item, bool) and bool not in types[key]):
+            expected = " or ".join(item_type.__name__ for item_type in types[key])
+            raise ValueError(f"{where}.{key} must be {expected}, got {type(item).__name__}")
+    return value
+
+
+def _validate_environment(definition: Any, where: str) -> Dict[str, Any]:
+    definition = _check_mapping(definition, where, ENVIRONMENT_KEYS)
+    for key in FILE_KEYS + ("extends",):
+        if key in definition and not isinstance(definition[key], str):
+            raise ValueError(f"{where}.{key} must be a string, got {type(definition[key]).__name__}")
+    build_args = _check_mapping(definition.get("build_args", {}), f"{where}.build_args")
+    for key, value in build_args.items():
+        if isinstance(value, (dict, list)) or value is None:
+            raise ValueError(f"{where}.build_args.{key} must be a scalar")
+    _check_typed_mapping(definition.get("resources", {}), f"{where}.resources", RESOURCE_KEYS)
+    _check_typed_mapping(definition.get("cache", {}), f"{where}.cache", CACHE_KEYS)
+    return definition
+
+
+def _resolve_environment(
+    name: str,
+    definitions: Dict[str, Dict[str, Any]],
+    resolved: Dict[str, RuntimeEnvironment],
+    config_path: str,
+    chain: List[str],
+) -> RuntimeEnvironment:
+    if name in resolved:
+        return resolved[name]
+    if name in chain:
+        raise ValueError(f"{config_path}: environments extend each other in a cycle: {' -> '.join(chain + [name])}")
+    definition = definitions[name]
+
+    parent = RuntimeEnvironment(name=name)
+    if "extends" in definition:
+        parent_name = definition["extends"]
+        if parent_name not in definitions:
+            raise ValueError(f"{config_path}: environments.{name} extends unknown environment {parent_name}")
+        parent = _resolve_environment(parent_name, definitions, resolved, config_path, chain + [name])
+
+    dockerfiles = dict(parent.dockerfiles)
+    for key in FILE_KEYS:
+        if key in definition:
+            dockerfiles[key] = f"{ENVIRONMENT_WELLKNOWN_LOC}/{name}/{definition[key]}"
+    resources = definition.get("resources", {})
+    cache = definition.get("cache", {})
+    environment = RuntimeEnvironment(
+        name=name,
+        dockerfiles=dockerfiles,
+        build_args={
+            **parent.build_args,
+            **{key: str(value) for key, value in definition.get("build_args", {}).items()},
+        },
+        cpus=float(resources["cpus"]) if "cpus" in resources else parent.cpus,
+        memory=resources.get("memory", parent.memory),
+        cache_from=cache.get("from", parent.cache_from),
+        cache_inline=cache.get("inline", parent.cache_inline),
+    )
+    resolved[name] = environment
+    return environment
+
+
+def parse_environment_registry(config_object: Any, config_path: str) -> Dict[str, RuntimeEnvironment]:
+    """Validate a runtime config and resolve the inheritance of its environments.
+
+    Args:
+        config_object (Any): Parsed runtime config
+        config_path (str): Path of the runtime config, for error messages
+
+    Returns:
+        Dict[str, RuntimeEnvironment]: Environments by name
+
+    Raises:
+        ValueError: If the config does not match the schema
+    """
+    config_object = _check_mapping(config_object, config_path, {"environments"})
+    if "environments" not in config_object:
+        raise ValueError(f"{config_path} has no environments")
+    definitions = _check_mapping(config_object["environments"], f"{config_path}: environments")
+    for name, definition in definitions.items():
+        _validate_environment(definition, f"{config_path}: environments.{name}")
+
+    resolved: Dict[str, RuntimeEnvironment] = {}
+    for name in definitions:
+        _resolve_environment(name, definitions, resolved, config_path, [])
+    return resolved
+
+
+def load_environment_registry(config_path: str = ENVIRONMENT_CONFIG_PATH) -> Dict[str, RuntimeEnvironment]:
+    """Load the runtime environments, parsed once and again only after the config changed.
+
+    Args:
+        config_path (str, optional): Path of the runtime config. Defaults to ENVIRONMENT_CONFIG_PATH.
+
+    Returns:
+        Dict[str, RuntimeEnvironment]: Environments by name, shared between calls and not to be modified
+
+    Raises:
+        ValueError: If the config does not match the schema
+    """
+    stat = os.stat(config_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(config_path)
+    cached = _registry_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with open(config_path, "r") as config_buffer:
+        config_object = yaml.safe_load(config_buffer)
+    registry = parse_environment_registry(config_object, config_path)
+    _registry_cache[key] = (version, registry)
+    return registry
+
+
+def get_runtime_environment(name: str, config_path: str = ENVIRONMENT_CONFIG_PATH) -> RuntimeEnvironment:
+    """Get a runtime environment by name.
+
+    Args:
+        name (str): Name of the runtime environment
+        config_path (str, optional): Path of the runtime config. Defaults to ENVIRONMENT_CONFIG_PATH.
+
+    Returns:
+        RuntimeEnvironment: The runtime environment
+
+    Raises:
+        ValueError: If the environment is not defined
+    """
+    registry = load_environment_registry(config_path)
+    if name not in registry:
+        raise ValueError(f"No {name} in {config_path}, defined are {sorted(registry)}")
+    return registry[name]
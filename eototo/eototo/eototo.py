@@ -10,24 +10,46 @@ following.
 4. Consistent usage across all containers and environments.
 """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import click
 import pkg_resources
 
 from eototo.commands.commands import (
+    batch_exec_command,
+    bench_command,
     build_base_command,
     build_command,
     docs_command,
     exec_command,
     format_command,
     lint_command,
+    run_command,
     test_command,
+    test_report_command,
     type_check_command,
+    watch_command,
 )
+from eototo.docker.docker_utils import host_has_gpus, select_runtime_environment
 from eototo.utils.cli_options import (
     option_additional_docker_build_arg,
+    option_batch,
+    option_batch_job_cpus,
+    option_batch_job_memory,
+    option_batch_log_dir,
+    option_batch_max_parallel,
+    option_batch_retries,
+    option_bench_compare,
+    option_bench_cpu,
+    option_bench_keyword,
+    option_bench_max_regression,
+    option_bench_no_pin,
+    option_bench_path,
+    option_bench_rounds,
+    option_bench_save_baseline,
+    option_bench_warmup,
     option_build_buildx,
+    option_changed_since,
     option_command,
     option_format_check,
     option_forward_artifactory_creds,
@@ -35,12 +57,30 @@ from eototo.utils.cli_options import (
     option_ignore_cache,
     option_interactive,
     option_lint_fix,
+    option_log_dir,
+    option_no_result_cache,
+    option_memprofile,
     option_port_aws_creds,
+    option_profile,
+    option_profile_rate,
     option_quiet,
     option_read_write,
     option_root,
     option_runtime_environment,
+    option_staged,
+    option_tasks_file,
+    option_tasks_force,
+    option_tasks_jobs,
+    option_test_keyword,
+    option_test_no_collection_cache,
+    option_test_no_history,
+    option_test_order,
     option_test_pytest_path,
+    option_test_report_top,
+    option_test_shard_count,
+    option_test_shard_index,
+    option_watch_debounce,
+    option_watch_lint,
 )
 
 
@@ -59,95 +99,246 @@ def eototo(ctx: click.Context):
     pass
 
 
+@click.command(name="bench", help="Run tawa benchmarks and compare them against stored results.")
+@option_bench_compare
+@option_bench_cpu
+@option_bench_keyword
+@option_bench_max_regression
+@option_bench_no_pin
+@option_bench_path
+@option_bench_rounds
+@option_bench_save_baseline
+@option_bench_warmup
+@option_build_buildx
+@option_runtime_environment
+@option_quiet
+def cmd_bench(
+    compare: Optional[str],
+    cpu: Optional[int],
+    keyword: Optional[str],
+    max_regression: float,
+    no_pin: bool,
+    path: List[str],
+    rounds: int,
+    save_baseline: Optional[str],
+    warmup: int,
+    build_buildx: bool,
+    runtime_environment: Optional[str],
+    quiet: bool,
+):
+    runtime_environment = select_runtime_environment(runtime_environment)
+    bench_command(
+        build_buildx,
+        compare,
+        cpu,
+        keyword,
+        max_regression,
+        no_pin,
+        list(path),
+        quiet,
+        rounds,
+        runtime_environment,
+        save_baseline,
+        warmup,
+    )
+
+
 @click.command(name="build", help="Build the runtime environment image.")
 @option_additional_docker_build_arg
 @option_build_buildx
 @option_runtime_environment
 @option_forward_artifactory_creds
+@option_log_dir
 @option_quiet
 def cmd_build(
     additional_docker_build_args: List[Tuple[str, str]],
     build_buildx: bool,
     forward_artifactory_creds: bool,
-    runtime_environment: str,
+    log_dir: Optional[str],
+    runtime_environment: Optional[str],
     quiet: bool,
 ):
-    build_command(additional_docker_build_args, build_buildx, forward_artifactory_creds, quiet, runtime_environment)
+    runtime_environment = select_runtime_environment(runtime_environment)
+    build_command(
+        additional_docker_build_args, build_buildx, forward_artifactory_creds, quiet, runtime_environment, log_dir
+    )
 
 
 @click.command(name="build-base", help="Build the base environment image.")
 @option_additional_docker_build_arg
 @option_build_buildx
 @option_forward_artifactory_creds
+@option_log_dir
 @option_runtime_environment
 @option_quiet
 def cmd_build_base(
     additional_docker_build_args: List[Tuple[str, str]],
     build_buildx: bool,
     forward_artifactory_creds: bool,
-    runtime_environment: str,
+    log_dir: Optional[str],
+    runtime_environment: Optional[str],
     quiet: bool,
 ):
+    runtime_environment = select_runtime_environment(runtime_environment)
     build_base_command(
-        additional_docker_build_args, build_buildx, forward_artifactory_creds, quiet, runtime_environment
+        additional_docker_build_args, build_buildx, forward_artifactory_creds, quiet, runtime_environment, log_dir
     )
 
 
 @click.command(name="exec", help="Execute command in environment container.")
+@option_batch
+@option_batch_job_cpus
+@option_batch_job_memory
+@option_batch_log_dir
+@option_batch_max_parallel
+@option_batch_retries
 @option_build_buildx
 @option_command
 @option_gpus
 @option_interactive
 @option_gpus
+@option_log_dir
+@option_memprofile
 @option_port_aws_creds
+@option_profile
+@option_profile_rate
 @option_read_write
 @option_root
 @option_runtime_environment
 @option_quiet
 def cmd_exec(
+    batch: Optional[str],
+    job_cpus: float,
+    job_memory: Optional[str],
+    batch_log_dir: Optional[str],
+    max_parallel: Optional[int],
+    retries: int,
     build_buildx: bool,
     command: str,
     gpus: bool,
     interactive: bool,
+    log_dir: Optional[str],
+    memprofile: bool,
     port_aws_creds: bool,
+    profile: bool,
+    profile_rate: int,
     read_write: bool,
     root: bool,
-    runtime_environment: str,
+    runtime_environment: Optional[str],
     quiet: bool,
 ):
-    exec_command(build_buildx, command, gpus, interactive, port_aws_creds, read_write, root, runtime_environment, quiet)
+    # gpus are on by default, a host without gpus runs the cpu runtime environment without them
+    gpus = gpus and host_has_gpus()
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=gpus)
+    if batch is not None:
+        if profile:
+            raise click.BadParameter("can not be combined with --batch", param_hint="--profile")
+        if memprofile:
+            raise click.BadParameter("can not be combined with --batch", param_hint="--memprofile")
+        batch_exec_command(
+            batch,
+            build_buildx,
+            gpus,
+            job_cpus,
+            job_memory,
+            batch_log_dir,
+            max_parallel,
+            port_aws_creds,
+            read_write,
+            retries,
+            root,
+            runtime_environment,
+            quiet,
+        )
+        return
+    exec_command(
+        build_buildx,
+        command,
+        gpus,
+        interactive,
+        port_aws_creds,
+        read_write,
+        root,
+        runtime_environment,
+        quiet,
+        profile,
+        profile_rate,
+        memprofile,
+        log_dir,
+    )
 
 
 @click.command(name="format", help="Format tawa-cli and tawa.")
 @option_build_buildx
+@option_changed_since
 @option_format_check
+@option_no_result_cache
 @option_quiet
 @option_read_write
 @option_runtime_environment
+@option_staged
 def cmd_format(
     build_buildx: bool,
+    changed_since: Optional[str],
     check: bool,
+    no_cache: bool,
     quiet: bool,
     read_write: bool,
-    runtime_environment: str,
+    runtime_environment: Optional[str],
+    staged: bool,
 ):
-    format_command(build_buildx, check, quiet, read_write, runtime_environment)
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=False)
+    format_command(build_buildx, check, quiet, read_write, runtime_environment, no_cache, changed_since, staged)
 
 
 @click.command(name="lint", help="Lint tawa-cli and tawa.")
 @option_build_buildx
+@option_changed_since
 @option_lint_fix
+@option_no_result_cache
 @option_read_write
 @option_runtime_environment
 @option_quiet
+@option_staged
 def cmd_lint(
     build_buildx: bool,
+    changed_since: Optional[str],
     fix: bool,
+    no_cache: bool,
     read_write: bool,
-    runtime_environment: str,
+    runtime_environment: Optional[str],
+    quiet: bool,
+    staged: bool,
+):
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=False)
+    lint_command(build_buildx, fix, read_write, runtime_environment, quiet, no_cache, changed_since, staged)
+
+
+@click.command(
+    name="run",
+    help="Run tasks from the tasks file along with their dependencies, skipping tasks that are up to date. "
+    "If no tasks are provided runs every task.",
+)
+@click.argument("targets", nargs=-1, type=str)
+@option_build_buildx
+@option_port_aws_creds
+@option_runtime_environment
+@option_quiet
+@option_tasks_file
+@option_tasks_force
+@option_tasks_jobs
+def cmd_run(
+    targets: Tuple[str, ...],
+    build_buildx: bool,
+    port_aws_creds: bool,
+    runtime_environment: Optional[str],
     quiet: bool,
+    tasks_file: str,
+    force: bool,
+    max_parallel: int,
 ):
-    lint_command(build_buildx, fix, read_write, runtime_environment, quiet)
+    runtime_environment = select_runtime_environment(runtime_environment)
+    run_command(build_buildx, force, max_parallel, port_aws_creds, quiet, runtime_environment, list(targets), tasks_file)
 
 
 @click.command(
@@ -158,23 +349,68 @@ def cmd_lint(
 @option_gpus
 @option_runtime_environment
 @option_quiet
+@option_log_dir
+@option_memprofile
+@option_test_keyword
+@option_test_no_collection_cache
+@option_test_no_history
+@option_test_order
 @option_test_pytest_path
+@option_test_shard_count
+@option_test_shard_index
 def cmd_test(
     build_buildx: bool,
     gpus: bool,
-    runtime_environment: str,
+    runtime_environment: Optional[str],
     quiet: bool,
+    log_dir: Optional[str],
+    memprofile: bool,
+    keyword: Optional[str],
+    no_collection_cache: bool,
+    no_history: bool,
+    order: str,
     path: List[str],
+    shard_count: int,
+    shard_index: int,
 ):
-    test_command(build_buildx, gpus, runtime_environment, quiet, path)
+    # gpus are on by default, a host without gpus runs the cpu runtime environment without them
+    gpus = gpus and host_has_gpus()
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=gpus)
+    test_command(
+        build_buildx,
+        gpus,
+        runtime_environment,
+        quiet,
+        path,
+        order,
+        shard_index,
+        shard_count,
+        no_history,
+        keyword,
+        no_collection_cache,
+        memprofile,
+        log_dir,
+    )
+
+
+@click.command(name="test-report", help="Report the slowest and flakiest tests from the test history.")
+@option_build_buildx
+@option_runtime_environment
+@option_quiet
+@option_test_report_top
+def cmd_test_report(build_buildx: bool, runtime_environment: Optional[str], quiet: bool, top: int):
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=False)
+    test_report_command(build_buildx, runtime_environment, quiet, top)
 
 
 @click.command(name="type-check", help="Type check tawa and tawa-cli.")
 @option_build_buildx
+@option_no_result_cache
 @option_runtime_environment
 @option_quiet
-def cmd_type_check(build_buildx: bool, runtime_environment: str, quiet: bool):
-    type_check_command(build_buildx, runtime_environment, quiet)
+def cmd_type_check(build_buildx: bool, no_cache: bool, runtime_environment: Optional[str], quiet: bool):
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=False)
+    type_check_command(build_buildx, runtime_environment, quiet, no_cache)
 
 
 @click.command(name="docs", help="Build tawa's docs.")
@@ -182,15 +418,46 @@ def cmd_type_check(build_buildx: bool, runtime_environment: str, quiet: bool):
 @option_read_write
 @option_runtime_environment
 @option_quiet
-def cmd_docs(ignore_cache: bool, read_write: bool, runtime_environment: str, quiet: bool):
+def cmd_docs(ignore_cache: bool, read_write: bool, runtime_environment: Optional[str], quiet: bool):
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=False)
     docs_command(ignore_cache, read_write, runtime_environment, quiet)
 
 
+@click.command(
+    name="watch",
+    help="Watch the project and rerun lint and affected tests in a persistent container on every change.",
+)
+@option_build_buildx
+@option_gpus
+@option_runtime_environment
+@option_quiet
+@option_test_pytest_path
+@option_watch_debounce
+@option_watch_lint
+def cmd_watch(
+    build_buildx: bool,
+    gpus: bool,
+    runtime_environment: Optional[str],
+    quiet: bool,
+    path: List[str],
+    debounce: float,
+    lint: bool,
+):
+    # gpus are on by default, a host without gpus runs the cpu runtime environment without them
+    gpus = gpus and host_has_gpus()
+    runtime_environment = select_runtime_environment(runtime_environment, uses_gpus=gpus)
+    watch_command(build_buildx, debounce, gpus, lint, list(path), quiet, runtime_environment)
+
+
+eototo.add_command(cmd_bench)
 eototo.add_command(cmd_build)
 eototo.add_command(cmd_build_base)
 eototo.add_command(cmd_docs)
 eototo.add_command(cmd_exec)
 eototo.add_command(cmd_lint)
 eototo.add_command(cmd_format)
+eototo.add_command(cmd_run)
 eototo.add_command(cmd_test)
+eototo.add_command(cmd_test_report)
 eototo.add_command(cmd_type_check)
+eototo.add_command(cmd_watch)
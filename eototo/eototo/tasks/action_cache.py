@@ -0,0 +1,139 @@
+"""Action cache for task pipeline runs.
+
+A task run is identified by an action key built from its command, runtime
+environment, the content of its declared inputs, the image it ran in and the
+action keys of the tasks it depends on. Successful runs are recorded under that
+key so an identical rerun can be skipped while its outputs still exist.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_ACTION_CACHE_PATH = ".eototo/cache/actions.json"
+
+# read files in chunks to keep hashing large inputs out of memory
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """Expand glob patterns and directories into a sorted list of files.
+
+    Args:
+        patterns (Iterable[str]): Files, directories or glob patterns, ``**`` is recursive
+
+    Returns:
+        List[str]: Sorted unique file paths matched by the patterns
+    """
+    files = set()
+    for pattern in patterns:
+        for match in glob.glob(pattern, recursive=True):
+            if os.path.isdir(match):
+                for root, _, file_names in os.walk(match):
+                    files.update(os.path.join(root, file_name) for file_name in file_names)
+            else:
+                files.add(match)
+    return sorted(files)
+
+
+def hash_files(paths: Iterable[str]) -> str:
+    """Hash the names and contents of files.
+
+    Args:
+        paths (Iterable[str]): Files to hash, order matters
+
+    Returns:
+        str: Hex digest over all file names and contents
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        digest.update(b"\0")
+        with open(path, "rb") as file_buffer:
+            for chunk in iter(lambda: file_buffer.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def compute_action_key(
+    command: str,
+    runtime_environment: str,
+    input_hash: str,
+    image_id: Optional[str],
+    dependency_keys: Iterable[str],
+) -> str:
+    """Compute the action key for a task run.
+
+    Args:
+        command (str): Command the task runs
+        runtime_environment (str): Runtime environment the task runs in
+        input_hash (str): Hash of the task input files
+        image_id (Optional[str]): Fingerprint of the image the task runs in
+        dependency_keys (Iterable[str]): Action keys of the task dependencies
+
+    Returns:
+        str: Hex digest identifying the task run
+    """
+    payload = {
+        "command": command,
+        "runtime_environment": runtime_environment,
+        "input_hash": input_hash,
+        "image_id": image_id,
+        "dependency_keys": sorted(dependency_keys),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ActionCache:
+    """Record of the last successful action key of each task, persisted as JSON."""
+
+    def __init__(self, path: str = DEFAULT_ACTION_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, object]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as cache_buffer:
+                self._records = json.load(cache_buffer)
+
+    def is_cached(self, task_name: str, action_key: str, outputs: Iterable[str]) -> bool:
+        """Check whether a task already ran successfully with the same action key.
+
+        Args:
+            task_name (str): Name of the task
+            action_key (str): Action key of the pending run
+            outputs (Iterable[str]): Outputs the task declares, all must still exist
+
+        Returns:
+            bool: True if the run can be skipped
+        """
+        with self._lock:
+            record = self._records.get(task_name)
+        if record is None or record.get("action_key") != action_key:
+            return False
+        return all(glob.glob(output, recursive=True) for output in outputs)
+
+    def record_success(self, task_name: str, action_key: str, image_id: Optional[str]) -> None:
+        """Record a successful task run and persist the cache.
+
+        Args:
+            task_name (str): Name of the task
+            action_key (str): Action key of the run
+            image_id (Optional[str]): Fingerprint of the image the task ran in
+        """
+        with self._lock:
+            self._records[task_name] = {
+                "action_key": action_key,
+                "image_id": image_id,
+                "finished": time.time(),
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # write then rename so an interrupted run never leaves a corrupt cache
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as cache_buffer:
+                json.dump(self._records, cache_buffer, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
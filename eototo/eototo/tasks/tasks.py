@@ -0,0 +1,321 @@
+"""Declarative task pipelines defined in a ``tasks.yml`` file.
+
+Each task declares the command to run, the runtime environment to run it in,
+the input and output paths it reads and writes and the tasks it depends on::
+
+    tasks:
+      preprocess:
+        command: python -m projects.examples.cifar10.convert --output data/cifar10
+        inputs: ["projects/examples/cifar10/**/*.py"]
+        outputs: ["data/cifar10"]
+      train:
+        command: python -m projects.examples.cifar10.train --data data/cifar10
+        runtime_environment: cuda12
+        gpus: true
+        deps: [preprocess]
+        inputs: ["data/cifar10/**", "projects/examples/cifar10/**/*.py"]
+        outputs: ["runs/cifar10"]
+
+Independent tasks run concurrently, each in its own container through
+run_generic_command, and a task is skipped when its action key matches the
+last recorded successful run.
+"""
+
+import logging
+import shlex
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+import yaml
+
+from eototo.docker.docker_utils import get_image_id, get_user_image, run_generic_command
+from eototo.tasks.action_cache import ActionCache, compute_action_key, expand_paths, hash_files
+
+DEFAULT_TASKS_FILE = "tasks.yml"
+
+TASK_KEYS = {"command", "deps", "gpus", "inputs", "outputs", "runtime_environment"}
+
+TASK_CACHED = "cached"
+TASK_FAILED = "failed"
+TASK_NOT_RUN = "not run"
+TASK_SUCCEEDED = "succeeded"
+
+
+@dataclass
+class Task:
+    """One step of a task pipeline."""
+
+    name: str
+    command: str
+    runtime_environment: str
+    deps: List[str] = field(default_factory=list)
+    gpus: bool = False
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TaskResult:
+    """Outcome of a task in a pipeline run."""
+
+    name: str
+    status: str
+    duration: float = 0.0
+    returncode: Optional[int] = None
+
+
+def _get_str_list(task_name: str, task_config: Dict, key: str, tasks_file: str) -> List[str]:
+    """Read an optional list of strings from a task definition.
+
+    Args:
+        task_name (str): Name of the task being parsed
+        task_config (Dict): Raw task definition
+        key (str): Key of the list in the task definition
+        tasks_file (str): Tasks file path for error messages
+
+    Raises:
+        ValueError: If the value is not a list of strings
+
+    Returns:
+        List[str]: The list, empty if not defined
+    """
+    value = task_config.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Task {task_name} in {tasks_file}: {key} must be a list of strings")
+    return value
+
+
+def load_tasks(tasks_file: str, default_runtime_environment: str) -> Dict[str, Task]:
+    """Load and validate the task definitions of a tasks file.
+
+    Args:
+        tasks_file (str): Path to the tasks file
+        default_runtime_environment (str): Runtime environment for tasks that don't declare one
+
+    Raises:
+        ValueError: If the file is malformed, references unknown tasks or has a dependency cycle
+
+    Returns:
+        Dict[str, Task]: Tasks by name
+    """
+    with open(tasks_file, "r") as tasks_buffer:
+        config_object = yaml.safe_load(tasks_buffer)
+
+    if not isinstance(config_object, dict) or not isinstance(config_object.get("tasks"), dict):
+        raise ValueError(f"No tasks mapping in {tasks_file}")
+
+    tasks = {}
+    for task_name, task_config in config_object["tasks"].items():
+        if not isinstance(task_config, dict):
+            raise ValueError(f"Task {task_name} in {tasks_file} must be a mapping")
+
+        unknown_keys = set(task_config) - TASK_KEYS
+        if unknown_keys:
+            raise ValueError(f"Task {task_name} in {tasks_file} has unknown keys: {sorted(unknown_keys)}")
+
+        command = task_config.get("command")
+        if not isinstance(command, str) or not command.strip():
+            raise ValueError(f"Task {task_name} in {tasks_file} needs a command")
+
+        tasks[task_name] = Task(
+            name=task_name,
+            command=command,
+            runtime_environment=task_config.get("runtime_environment", default_runtime_environment),
+            deps=_get_str_list(task_name, task_config, "deps", tasks_file),
+            gpus=bool(task_config.get("gpus", False)),
+            inputs=_get_str_list(task_name, task_config, "inputs", tasks_file),
+            outputs=_get_str_list(task_name, task_config, "outputs", tasks_file),
+        )
+
+    for task in tasks.values():
+        for dep in task.deps:
+            if dep not in tasks:
+                raise ValueError(f"Task {task.name} in {tasks_file} depends on unknown task {dep}")
+
+    topological_order(tasks, tasks.keys())
+    return tasks
+
+
+def topological_order(tasks: Dict[str, Task], targets: Iterable[str]) -> List[str]:
+    """Get the targets and all their dependencies in dependency order.
+
+    Args:
+        tasks (Dict[str, Task]): All tasks by name
+        targets (Iterable[str]): Names of the tasks to run
+
+    Raises:
+        ValueError: If a target is unknown or the dependencies have a cycle
+
+    Returns:
+        List[str]: Task names, every task after its dependencies
+    """
+    order: List[str] = []
+    visited: Set[str] = set()
+    in_progress: List[str] = []
+
+    def visit(task_name: str) -> None:
+        if task_name in visited:
+            return
+        if task_name in in_progress:
+            cycle = in_progress[in_progress.index(task_name) :] + [task_name]
+            raise ValueError(f"Dependency cycle in tasks: {' -> '.join(cycle)}")
+        if task_name not in tasks:
+            raise ValueError(f"Unknown task: {task_name}")
+        in_progress.append(task_name)
+        for dep in tasks[task_name].deps:
+            visit(dep)
+        in_progress.pop()
+        visited.add(task_name)
+        order.append(task_name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+def run_task(
+    task: Task,
+    action_key: str,
+    action_cache: ActionCache,
+    image_id: Optional[str],
+    env_vars: Dict[str, str],
+    quiet: bool,
+    user_gid: int,
+    user_id: int,
+) -> TaskResult:
+    """Run one task in its runtime container and record it on success.
+
+    Args:
+        task (Task): Task to run
+        action_key (str): Action key of this run
+        action_cache (ActionCache): Cache to record the run in
+        image_id (Optional[str]): Fingerprint of the task image
+        env_vars (Dict[str, str]): Env vars to pass to the container
+        quiet (bool): Run without docker output
+        user_gid (int): Group id to run the container as
+        user_id (int): User id to run the container as
+
+    Returns:
+        TaskResult: Outcome of the task
+    """
+    logging.info(f"Running task {task.name}: {task.command}")
+    start = time.monotonic()
+    ret = run_generic_command(
+        build=False,
+        entrypoint_args=shlex.split(task.command),
+        env_vars=env_vars,
+        gpus=task.gpus,
+        image=get_user_image(runtime_environment=task.runtime_environment),
+        quiet=quiet,
+        runtime_environment=task.runtime_environment,
+        user_gid=user_gid,
+        user_id=user_id,
+    )
+    duration = time.monotonic() - start
+
+    if ret.returncode != 0:
+        return TaskResult(name=task.name, status=TASK_FAILED, duration=duration, returncode=ret.returncode)
+
+    action_cache.record_success(task.name, action_key, image_id)
+    return TaskResult(name=task.name, status=TASK_SUCCEEDED, duration=duration, returncode=ret.returncode)
+
+
+def run_tasks(
+    tasks: Dict[str, Task],
+    targets: List[str],
+    action_cache: ActionCache,
+    env_vars: Dict[str, str],
+    force: bool,
+    max_parallel: int,
+    quiet: bool,
+    user_gid: int,
+    user_id: int,
+) -> List[TaskResult]:
+    """Run the target tasks and their dependencies, independent tasks concurrently.
+
+    A task is started once all of its dependencies succeeded or were cached.
+    Its action key is computed at that point so that inputs produced by the
+    dependencies are hashed as they are now. After a failure no new tasks are
+    started, tasks already running are waited on.
+
+    Args:
+        tasks (Dict[str, Task]): All tasks by name
+        targets (List[str]): Names of the tasks to run
+        action_cache (ActionCache): Cache of previous successful runs
+        env_vars (Dict[str, str]): Env vars to pass to the containers
+        force (bool): Run every task even if it is cached
+        max_parallel (int): Maximum number of tasks running at once
+        quiet (bool): Run without docker output
+        user_gid (int): Group id to run the containers as
+        user_id (int): User id to run the containers as
+
+    Returns:
+        List[TaskResult]: Outcome of every task in dependency order
+    """
+    order = topological_order(tasks, targets)
+
+    # images are built up front, so fingerprint each environment once
+    image_ids = {
+        runtime_environment: get_image_id(get_user_image(runtime_environment=runtime_environment))
+        for runtime_environment in {tasks[task_name].runtime_environment for task_name in order}
+    }
+
+    results: Dict[str, TaskResult] = {}
+    action_keys: Dict[str, str] = {}
+    pending = list(order)
+    running: Dict[Future, str] = {}
+    failed = False
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while pending or running:
+            if not failed:
+                for task_name in list(pending):
+                    task = tasks[task_name]
+                    if not all(dep in results and results[dep].status != TASK_FAILED for dep in task.deps):
+                        continue
+                    pending.remove(task_name)
+
+                    image_id = image_ids[task.runtime_environment]
+                    action_key = compute_action_key(
+                        command=task.command,
+                        runtime_environment=task.runtime_environment,
+                        input_hash=hash_files(expand_paths(task.inputs)),
+                        image_id=image_id,
+                        dependency_keys=[action_keys[dep] for dep in task.deps],
+                    )
+                    action_keys[task_name] = action_key
+
+                    if not force and action_cache.is_cached(task_name, action_key, task.outputs):
+                        logging.info(f"Task {task_name} is up to date, skipping")
+                        results[task_name] = TaskResult(name=task_name, status=TASK_CACHED)
+                        continue
+
+                    future = executor.submit(
+                        run_task,
+                        task=task,
+                        action_key=action_key,
+                        action_cache=action_cache,
+                        image_id=image_id,
+                        env_vars=env_vars,
+                        quiet=quiet,
+                        user_gid=user_gid,
+                        user_id=user_id,
+                    )
+                    running[future] = task_name
+
+            if not running:
+                # either everything left is blocked by a failure or cached tasks unblocked new ones
+                if failed or not pending:
+                    break
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_name = running.pop(future)
+                results[task_name] = future.result()
+                if results[task_name].status == TASK_FAILED:
+                    failed = True
+
+    return [results.get(task_name, TaskResult(name=task_name, status=TASK_NOT_RUN)) for task_name in order]
@@ -28,6 +28,71 @@ option_build_buildx = click.option(
 )
 
 
+option_batch = click.option(
+    "--batch",
+    "batch",
+    default=None,
+    type=click.Path(dir_okay=False, allow_dash=True),
+    help="File of commands to run, one per line, each in its own container. Use - to read from stdin.",
+)
+
+
+option_batch_job_cpus = click.option(
+    "--job-cpus",
+    "job_cpus",
+    default=1.0,
+    show_default=True,
+    type=float,
+    help="CPUs reserved for and limited on each batch job container.",
+)
+
+
+option_batch_job_memory = click.option(
+    "--job-memory",
+    "job_memory",
+    default=None,
+    type=str,
+    help="Memory reserved for and limited on each batch job container, ex: 4g.",
+)
+
+
+option_batch_log_dir = click.option(
+    "--batch-log-dir",
+    "batch_log_dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory for per job batch logs. Defaults to a timestamped directory under .eototo/batch.",
+)
+
+
+option_batch_max_parallel = click.option(
+    "--max-parallel",
+    "max_parallel",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Maximum number of batch job containers running at once. Defaults to the number of host CPUs.",
+)
+
+
+option_batch_retries = click.option(
+    "--retries",
+    "retries",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of times to retry a failed batch job.",
+)
+
+
+option_changed_since = click.option(
+    "--changed-since",
+    "changed_since",
+    default=None,
+    type=str,
+    help="Only run on Python files changed since this git ref. Runs on everything if ruff config changed.",
+)
+
+
 option_command = click.option(
     "--command",
     "-c",
@@ -59,6 +124,15 @@ option_interactive = click.option(
 )
 
 
+option_log_dir = click.option(
+    "--log-dir",
+    "log_dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Archive the build and container output into timestamped, rotating gzip logs in this directory.",
+)
+
+
 option_port_aws_creds = click.option(
     "--port-aws-creds",
     "-pac",
@@ -71,6 +145,33 @@ option_port_aws_creds = click.option(
 )
 
 
+option_memprofile = click.option(
+    "--memprofile",
+    "memprofile",
+    is_flag=True,
+    default=False,
+    help="Record peak RSS per process and allocation sites into .eototo/memprofiles, "
+    "per test for eototo test.",
+)
+
+option_profile = click.option(
+    "--profile",
+    "profile",
+    is_flag=True,
+    default=False,
+    help="Run the command under the py-spy sampling profiler, write a speedscope profile "
+    "to .eototo/profiles and print the hottest functions.",
+)
+
+option_profile_rate = click.option(
+    "--profile-rate",
+    "profile_rate",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Profiler samples per second.",
+)
+
 option_read_write = click.option(
     "--read-write",
     "-rw",
@@ -99,8 +200,9 @@ option_runtime_environment = click.option(
     "-env",
     "runtime_environment",
     type=str,
-    default="cuda12",
-    help="Environment to run command within",
+    default=None,
+    help="Environment to run command within. Defaults to cpu for commands that don't use gpus and on hosts "
+    "without gpus, cuda12 otherwise.",
 )
 
 option_forward_artifactory_creds = click.option(
@@ -131,6 +233,24 @@ option_lint_fix = click.option(
 )
 
 
+option_no_result_cache = click.option(
+    "--no-cache",
+    "no_cache",
+    is_flag=True,
+    default=False,
+    help="Always run the check, even if it already passed on an unchanged tree.",
+)
+
+
+option_staged = click.option(
+    "--staged",
+    "staged",
+    is_flag=True,
+    default=False,
+    help="Only run on Python files with staged changes. Runs on everything if ruff config changed.",
+)
+
+
 option_quiet = click.option(
     "--quiet",
     "-q",
@@ -148,6 +268,110 @@ option_ignore_cache = click.option(
     default=False,
 )
 
+option_tasks_file = click.option(
+    "--tasks-file",
+    "tasks_file",
+    default="tasks.yml",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="File defining the tasks to run.",
+)
+
+option_tasks_force = click.option(
+    "--force",
+    "force",
+    is_flag=True,
+    default=False,
+    help="Run tasks even when their inputs and image are unchanged since the last successful run.",
+)
+
+option_tasks_jobs = click.option(
+    "--jobs",
+    "-j",
+    "max_parallel",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of independent tasks running at once.",
+)
+
+option_bench_path = click.option(
+    "--path",
+    multiple=True,
+    default=["tawa/benchmarks"],
+    show_default=True,
+    type=str,
+    help="Benchmark files or directories. Can be specified multiple times.",
+)
+
+option_bench_keyword = click.option(
+    "-k",
+    "--keyword",
+    "keyword",
+    type=str,
+    default=None,
+    help="Only run benchmarks whose name contains this.",
+)
+
+option_bench_warmup = click.option(
+    "--warmup",
+    "warmup",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Number of untimed rounds before timing.",
+)
+
+option_bench_rounds = click.option(
+    "--rounds",
+    "rounds",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of timed rounds.",
+)
+
+option_bench_cpu = click.option(
+    "--cpu",
+    "cpu",
+    type=click.IntRange(min=0),
+    default=None,
+    help="CPU to pin the benchmarks to. Defaults to the highest allowed CPU.",
+)
+
+option_bench_no_pin = click.option(
+    "--no-pin",
+    "no_pin",
+    is_flag=True,
+    default=False,
+    help="Don't pin the benchmarks to a single CPU.",
+)
+
+option_bench_save_baseline = click.option(
+    "--save-baseline",
+    "save_baseline",
+    type=str,
+    default=None,
+    help="Also save the results as this named baseline.",
+)
+
+option_bench_compare = click.option(
+    "--compare",
+    "compare",
+    type=str,
+    default=None,
+    help="Baseline name or commit hash prefix to compare against, fails on regressions.",
+)
+
+option_bench_max_regression = click.option(
+    "--max-regression",
+    "max_regression",
+    type=click.FloatRange(min=0.0),
+    default=0.1,
+    show_default=True,
+    help="Allowed slowdown of the median relative to the compared results, 0.1 allows 10% slower.",
+)
+
 option_test_pytest_path = click.option(
     "--path",
     multiple=True,
@@ -156,3 +380,82 @@ option_test_pytest_path = click.option(
     type=str,
     help="Files or directories to pass to `pytest`; can be specified multiple times;",
 )
+
+
+option_watch_debounce = click.option(
+    "--debounce",
+    "debounce",
+    default=0.5,
+    show_default=True,
+    type=click.FloatRange(min=0.0),
+    help="Seconds without further changes before a burst of changes triggers a rerun.",
+)
+
+option_watch_lint = click.option(
+    "--lint/--no-lint",
+    "lint",
+    default=True,
+    show_default=True,
+    help="Lint changed files on every rerun.",
+)
+
+option_test_order = click.option(
+    "--order",
+    "order",
+    type=click.Choice(["default", "failed-first", "fastest-first"]),
+    default="default",
+    show_default=True,
+    help="Order tests by their recorded history.",
+)
+
+option_test_shard_count = click.option(
+    "--shard-count",
+    "shard_count",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Split the tests into this many shards of balanced recorded duration.",
+)
+
+option_test_shard_index = click.option(
+    "--shard-index",
+    "shard_index",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Index of the shard to run.",
+)
+
+option_test_no_history = click.option(
+    "--no-history",
+    "no_history",
+    is_flag=True,
+    default=False,
+    help="Don't record or use the test history.",
+)
+
+option_test_keyword = click.option(
+    "-k",
+    "--keyword",
+    "keyword",
+    type=str,
+    default=None,
+    help="Only run tests matching this `pytest -k` expression.",
+)
+
+option_test_no_collection_cache = click.option(
+    "--no-collection-cache",
+    "no_collection_cache",
+    is_flag=True,
+    default=False,
+    help="Import every test module instead of skipping unchanged modules without selected tests.",
+)
+
+option_test_report_top = click.option(
+    "--top",
+    "top",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of tests to show in each section of the report.",
+)
@@ -0,0 +1,198 @@
+"""Bounded capture and archival of the output of image builds and container runs.
+
+Output is streamed through a pipe in chunks: echoed to the terminal as it
+arrives, the last lines are kept in a fixed size ring buffer to show on
+failure and complete lines are optionally archived with a timestamp into gzip
+segments that rotate by size. Memory stays bounded no matter how much a
+command logs. Archived segments are searchable in place, ex:
+``zgrep -h loss logs/*-train.*.log.gz``.
+"""
+
+import collections
+import gzip
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import IO, Deque, List, Optional, Union
+
+DEFAULT_TAIL_LINES = 100
+# uncompressed bytes per archive segment, text logs compress around 10x
+DEFAULT_MAX_SEGMENT_BYTES = 256 * 1024 * 1024
+# longer lines, ex: progress bars that never print a newline, are split
+MAX_LINE_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class RotatingGzipLog:
+    """Timestamped lines written to numbered gzip segments of bounded size.
+
+    Segments are named ``<prefix>.0000.log.gz``, ``<prefix>.0001.log.gz``, ...
+    in write order. When ``max_segments`` is set the oldest segments are deleted.
+
+    Args:
+        prefix (str): Path prefix of the segments
+        max_segment_bytes (int, optional): Uncompressed bytes per segment. Defaults to DEFAULT_MAX_SEGMENT_BYTES.
+        max_segments (Optional[int], optional): Number of segments to keep, all if None. Defaults to None.
+    """
+
+    def __init__(
+        self, prefix: str, max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES, max_segments: Optional[int] = None
+    ):
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.paths: List[str] = []
+        self._segment: Optional[IO[bytes]] = None
+        self._segment_bytes = 0
+
+    def _open_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        path = f"{self.prefix}.{len(self.paths):04d}.log.gz"
+        self.paths.append(path)
+        # low compression level, archiving must keep up with chatty commands
+        self._segment = gzip.open(path, "wb", compresslevel=3)
+        self._segment_bytes = 0
+        if self.max_segments is not None:
+            for old_path in self.paths[: -self.max_segments]:
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+    def write_line(self, line: bytes) -> None:
+        """Write one line, prefixed with the current time.
+
+        Args:
+            line (bytes): Line without its line ending
+        """
+        record = datetime.now().isoformat(timespec="milliseconds").encode() + b" " + line + b"\n"
+        if self._segment is None or self._segment_bytes + len(record) > self.max_segment_bytes:
+            self._open_segment()
+        self._segment.write(record)
+        self._segment_bytes += len(record)
+
+    def close(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+
+class LogCapture:
+    """Consumer of a command's output keeping only its last lines in memory.
+
+    Args:
+        tail_lines (int, optional): Number of last lines to keep. Defaults to DEFAULT_TAIL_LINES.
+        archive (Optional[RotatingGzipLog], optional): Archive of every line. Defaults to None.
+        echo (bool, optional): Write the output through to stdout as it arrives. Defaults to True.
+    """
+
+    def __init__(
+        self, tail_lines: int = DEFAULT_TAIL_LINES, archive: Optional[RotatingGzipLog] = None, echo: bool = True
+    ):
+        self.tail: Deque[bytes] = collections.deque(maxlen=tail_lines)
+        self.archive = archive
+        self.echo = echo
+        self._partial = b""
+
+    def _add_line(self, line: bytes) -> None:
+        line = line.rstrip(b"\r")
+        # keep what a terminal would show of carriage return redrawn lines
+        line = line.rsplit(b"\r", 1)[-1]
+        self.tail.append(line)
+        if self.archive is not None:
+            self.archive.write_line(line)
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume a chunk of output.
+
+        Args:
+            chunk (bytes): Output as read from the command, not aligned to lines
+        """
+        if self.echo:
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line)
+        while len(self._partial) > MAX_LINE_BYTES:
+            self._add_line(self._partial[:MAX_LINE_BYTES])
+            self._partial = self._partial[MAX_LINE_BYTES:]
+
+    def consume(self, stream: IO[bytes]) -> None:
+        """Consume a stream until it is closed.
+
+        Args:
+            stream (IO[bytes]): Output of the command
+        """
+        while True:
+            chunk = stream.read1(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            self.feed(chunk)
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = b""
+
+    def format_tail(self) -> str:
+        """Format the kept last lines."""
+        return b"\n".join(self.tail).decode(errors="replace")
+
+
+def get_log_archive_prefix(log_dir: str, name: str) -> str:
+    """Get a timestamped archive prefix for a command's logs, creating the log dir if needed.
+
+    Args:
+        log_dir (str): Directory of the archives
+        name (str): Name of the command, reduced to characters safe in file names
+
+    Returns:
+        str: Prefix for a RotatingGzipLog
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "-", name).strip("-")[:80]
+    return os.path.join(log_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_name}")
+
+
+def run_with_log_capture(
+    command: Union[str, List[str]],
+    echo: bool = True,
+    log_dir: Optional[str] = None,
+    log_name: str = "command",
+    shell: bool = False,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+) -> subprocess.CompletedProcess:
+    """Run a command with its stdout and stderr streamed through a LogCapture.
+
+    Args:
+        command (Union[str, List[str]]): Command to run
+        echo (bool, optional): Write the output through to stdout. Defaults to True.
+        log_dir (Optional[str], optional): Directory to archive the output to, not archived if None.
+            Defaults to None.
+        log_name (str, optional): Name of the archive in the log dir. Defaults to "command".
+        shell (bool, optional): Run the command through the shell. Defaults to False.
+        tail_lines (int, optional): Number of last lines kept. Defaults to DEFAULT_TAIL_LINES.
+
+    Returns:
+        subprocess.CompletedProcess: Completed process, ``stdout`` holds the last lines of the output
+    """
+    archive = None
+    if log_dir is not None:
+        archive = RotatingGzipLog(get_log_archive_prefix(log_dir, log_name))
+    capture = LogCapture(tail_lines=tail_lines, archive=archive, echo=echo)
+
+    process = subprocess.Popen(command, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        capture.consume(process.stdout)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        if archive is not None:
+            archive.close()
+
+    if archive is not None:
+        logging.info(f"Output of {log_name} archived to {', '.join(archive.paths) or 'no output'}")
+    return subprocess.CompletedProcess(command, returncode, stdout=capture.format_tail())
@@ -0,0 +1,132 @@
+"""Summaries of sampling profiles recorded by ``eototo exec --profile``.
+
+Profiles are recorded by py-spy in the speedscope format, one sampled profile
+per thread of every profiled process. The full profile opens as a flamegraph
+in https://www.speedscope.app, the summary lists the hottest functions over
+all processes and threads.
+
+Memory profiles of ``--memprofile`` are summarized by tawa-inner-cli in the
+container, only their output directory is managed here.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+PROFILES_DIR = os.path.join(".eototo", "profiles")
+MEMPROFILES_DIR = os.path.join(".eototo", "memprofiles")
+
+
+@dataclass
+class FunctionSamples:
+    """Samples attributed to one function."""
+
+    name: str
+    file: str
+    self_samples: float
+    total_samples: float
+
+
+@dataclass
+class ProfileSummary:
+    """Samples of a profile aggregated per function."""
+
+    total: float
+    unit: str
+    functions: List[FunctionSamples]
+
+
+def get_profile_path(profiles_dir: str = PROFILES_DIR) -> str:
+    """Get a new timestamped profile path, creating the profiles dir if needed.
+
+    Args:
+        profiles_dir (str, optional): Directory of the profiles, relative to the repo root. Defaults to PROFILES_DIR.
+
+    Returns:
+        str: Relative path of the profile file
+    """
+    os.makedirs(profiles_dir, exist_ok=True)
+    return os.path.join(profiles_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.speedscope.json")
+
+
+def get_memprofile_dir(memprofiles_dir: str = MEMPROFILES_DIR) -> str:
+    """Get a new timestamped memory profile directory, creating it.
+
+    Args:
+        memprofiles_dir (str, optional): Directory of the memory profiles, relative to the repo root.
+            Defaults to MEMPROFILES_DIR.
+
+    Returns:
+        str: Relative path of the memory profile directory
+    """
+    memprofile_dir = os.path.join(memprofiles_dir, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(memprofile_dir, exist_ok=True)
+    return memprofile_dir
+
+
+def summarize_speedscope(path: str) -> ProfileSummary:
+    """Aggregate the samples of a speedscope profile per function.
+
+    Self samples count the function on top of the stack, total samples count
+    stacks containing the function at least once so recursion is not counted
+    twice. Samples are weighted, py-spy weights them by sampled seconds.
+
+    Args:
+        path (str): Path of the speedscope profile
+
+    Returns:
+        ProfileSummary: Total weight, its unit and per function samples, hottest self first
+    """
+    with open(path, "r") as profile_buffer:
+        profile_object = json.load(profile_buffer)
+
+    frames = profile_object["shared"]["frames"]
+    function_keys = [(frame["name"], frame.get("file", "")) for frame in frames]
+    functions: Dict[Tuple[str, str], FunctionSamples] = {}
+    total = 0.0
+    unit = "samples"
+
+    for profile in profile_object["profiles"]:
+        if profile.get("type") != "sampled":
+            continue
+        if profile.get("unit", "none") != "none":
+            unit = profile["unit"]
+        weights = profile.get("weights") or [1.0] * len(profile["samples"])
+        for stack, weight in zip(profile["samples"], weights):
+            total += weight
+            if not stack:
+                continue
+            for key in {function_keys[frame_index] for frame_index in stack}:
+                if key not in functions:
+                    functions[key] = FunctionSamples(name=key[0], file=key[1], self_samples=0.0, total_samples=0.0)
+                functions[key].total_samples += weight
+            functions[function_keys[stack[-1]]].self_samples += weight
+
+    ordered = sorted(functions.values(), key=lambda function: (-function.self_samples, -function.total_samples))
+    return ProfileSummary(total=total, unit=unit, functions=ordered)
+
+
+def format_profile_summary(summary: ProfileSummary, top: int = 20) -> str:
+    """Format the hottest functions of a profile.
+
+    Args:
+        summary (ProfileSummary): Per function samples of the profile
+        top (int, optional): Number of functions to show. Defaults to 20.
+
+    Returns:
+        str: The summary
+    """
+    if summary.total <= 0:
+        return "No samples recorded."
+    lines = [
+        f"Top {min(top, len(summary.functions))} functions by self time, out of {summary.total:g} {summary.unit}:",
+        "    self   total  function",
+    ]
+    lines.extend(
+        f"  {function.self_samples / summary.total:6.1%}  {function.total_samples / summary.total:6.1%}  "
+        f"{function.name} ({function.file})"
+        for function in summary.functions[:top]
+    )
+    return "\n".join(lines)
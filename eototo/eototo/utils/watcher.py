@@ -0,0 +1,212 @@
+"""File watching for eototo watch.
+
+Changes are picked up through inotify on Linux hosts, without any extra
+dependency, and through mtime polling everywhere else. Both watchers debounce
+bursts of events, such as an editor writing a temp file then renaming it over
+the original, into one set of changed paths.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterator, Set, Union
+
+# never worth watching, mostly written by the tools the watcher triggers
+IGNORED_DIRS = {
+    ".eototo",
+    ".git",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".tawa_cache",
+    "__pycache__",
+    "build",
+    "dist",
+}
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MODIFY
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+def iter_watched_dirs(root: str) -> Iterator[str]:
+    """Iterate over the directories under root that should be watched.
+
+    Args:
+        root (str): Root of the tree
+
+    Yields:
+        str: Watched directory paths
+    """
+    for dir_path, dirs, _ in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.endswith(".egg-info")]
+        yield dir_path
+
+
+class PollingWatcher:
+    """Watch a tree by polling file modification times."""
+
+    def __init__(self, root: str, debounce: float = 0.5, interval: float = 0.5):
+        self.root = root
+        self.debounce = debounce
+        self.interval = interval
+        self._mtimes = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, float]:
+        mtimes = {}
+        for dir_path in iter_watched_dirs(self.root):
+            for file_name in os.listdir(dir_path):
+                path = os.path.join(dir_path, file_name)
+                try:
+                    if os.path.isfile(path):
+                        mtimes[path] = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+        return mtimes
+
+    def _poll(self) -> Set[str]:
+        mtimes = self._snapshot()
+        changed = {path for path in mtimes.keys() | self._mtimes.keys() if mtimes.get(path) != self._mtimes.get(path)}
+        self._mtimes = mtimes
+        return changed
+
+    def wait_for_changes(self) -> Set[str]:
+        """Block until files change and the changes settle for the debounce period.
+
+        Returns:
+            Set[str]: Paths of the changed files, relative to the root
+        """
+        changed: Set[str] = set()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self._poll()
+
+        settle_until = time.monotonic() + self.debounce
+        while time.monotonic() < settle_until:
+            time.sleep(min(self.interval, self.debounce))
+            new_changes = self._poll()
+            if new_changes:
+                changed |= new_changes
+                settle_until = time.monotonic() + self.debounce
+
+        return {os.path.relpath(path, self.root) for path in changed}
+
+    def close(self) -> None:
+        """Release watcher resources, nothing to do for polling."""
+        pass
+
+
+class InotifyWatcher:
+    """Watch a tree recursively through the Linux inotify API."""
+
+    def __init__(self, root: str, debounce: float = 0.5):
+        self.root = root
+        self.debounce = debounce
+
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not supported on this platform")
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._watches: Dict[int, str] = {}
+        for dir_path in iter_watched_dirs(root):
+            self._add_watch(dir_path)
+
+    def _add_watch(self, dir_path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            # can hit fs.inotify.max_user_watches on very large trees
+            logging.warning(f"Could not watch {dir_path}: {os.strerror(ctypes.get_errno())}")
+            return
+        self._watches[wd] = dir_path
+
+    def _read_events(self) -> Set[str]:
+        changed = set()
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = buffer[offset : offset + name_length].rstrip(b"\0").decode(errors="replace")
+            offset += name_length
+
+            dir_path = self._watches.get(wd)
+            if dir_path is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self._watches[wd]
+                continue
+
+            path = os.path.join(dir_path, name)
+            if mask & IN_ISDIR:
+                # watch new directories, files created inside them before the watch is missed
+                if mask & (IN_CREATE | IN_MOVED_TO) and name not in IGNORED_DIRS:
+                    for new_dir in iter_watched_dirs(path):
+                        self._add_watch(new_dir)
+                continue
+            changed.add(path)
+        return changed
+
+    def wait_for_changes(self) -> Set[str]:
+        """Block until files change and the changes settle for the debounce period.
+
+        Returns:
+            Set[str]: Paths of the changed files, relative to the root
+        """
+        changed: Set[str] = set()
+        while not changed:
+            select.select([self._fd], [], [])
+            changed = self._read_events()
+
+        while True:
+            ready, _, _ = select.select([self._fd], [], [], self.debounce)
+            if not ready:
+                break
+            changed |= self._read_events()
+
+        return {os.path.relpath(path, self.root) for path in changed}
+
+    def close(self) -> None:
+        """Close the inotify file descriptor."""
+        os.close(self._fd)
+
+
+def get_file_watcher(root: str, debounce: float = 0.5) -> Union[InotifyWatcher, PollingWatcher]:
+    """Get the best available file watcher for the host.
+
+    Args:
+        root (str): Root of the tree to watch
+        debounce (float, optional): Seconds without changes before a burst is reported. Defaults to 0.5.
+
+    Returns:
+        Union[InotifyWatcher, PollingWatcher]: inotify watcher when supported, polling watcher otherwise
+    """
+    try:
+        return InotifyWatcher(root, debounce=debounce)
+    except OSError as error:
+        logging.info(f"inotify unavailable ({error}), falling back to polling")
+        return PollingWatcher(root, debounce=debounce)
@@ -0,0 +1,75 @@
+from subprocess import CompletedProcess
+from unittest.mock import patch
+from typing import List
+
+import pytest
+
+import eototo.commands.batch as batch
+
+
+@pytest.mark.parametrize(
+    "size, expected_bytes",
+    [
+        ("1024", 1024),
+        ("512m", 512 * 1024**2),
+        ("4G", 4 * 1024**3),
+        ("1.5k", 1536),
+    ],
+)
+def test_parse_memory_size(size: str, expected_bytes: int):
+    assert batch.parse_memory_size(size) == expected_bytes
+
+
+def test_parse_memory_size_invalid():
+    with pytest.raises(ValueError):
+        batch.parse_memory_size("lots")
+
+
+def test_read_batch_jobs(tmp_path):
+    batch_file = tmp_path / "jobs.txt"
+    batch_file.write_text("# sweep\npython train.py --lr 0.1\n\n  python train.py --lr 0.01  \n")
+    assert batch.read_batch_jobs(str(batch_file)) == ["python train.py --lr 0.1", "python train.py --lr 0.01"]
+
+
+def test_resource_pool_rejects_oversized_job():
+    pool = batch.ResourcePool(cpus=2.0, memory=1024)
+    with pytest.raises(ValueError):
+        pool.acquire(4.0, 0)
+    with pytest.raises(ValueError):
+        pool.acquire(1.0, 2048)
+
+
+@pytest.mark.parametrize(
+    "returncodes, retries, expected_returncode, expected_attempts",
+    [
+        ([0], 2, 0, 1),
+        ([1, 0], 2, 0, 2),
+        ([1, 1, 1], 2, 1, 3),
+    ],
+)
+def test_run_batch_retries(
+    tmp_path, returncodes: List[int], retries: int, expected_returncode: int, expected_attempts: int
+):
+    with patch("eototo.commands.batch.run_generic_command") as patched_run:
+        patched_run.side_effect = [CompletedProcess([], returncode=code) for code in returncodes]
+        results = batch.run_batch(
+            commands=["python -c 'print(1)'"],
+            env_vars={},
+            gpus=False,
+            job_cpus=1.0,
+            job_memory=None,
+            log_dir=str(tmp_path),
+            max_parallel=1,
+            read_write=False,
+            retries=retries,
+            root=False,
+            runtime_environment="cuda12",
+            user_gid=1000,
+            user_id=1000,
+        )
+
+    assert len(results) == 1
+    assert results[0].returncode == expected_returncode
+    assert results[0].attempts == expected_attempts
+    assert (tmp_path / "job-0000.log").exists()
+    assert "EXIT" in batch.format_batch_summary(results)
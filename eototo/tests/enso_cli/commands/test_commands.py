@@ -54,6 +54,7 @@ def test_build_command(
             buildx=build_buildx,
             forward_artifactory_creds=forward_artifactory_creds,
             image=expected_user_image,
+            log_dir=None,
             quiet=quiet,
             runtime_environment=runtime_environment,
         )
@@ -97,6 +98,7 @@ def test_build_base_command(
             buildx=build_buildx,
             forward_artifactory_creds=forward_artifactory_creds,
             image=expected_user_image,
+            log_dir=None,
             quiet=quiet,
             runtime_environment=runtime_environment,
         )
@@ -157,10 +159,12 @@ def test_exec_command(
             )
             patched_run.assert_called_with(
                 build_buildx=build_buildx,
+                cap_add=None,
                 entrypoint_args=shlex.split(command),
                 env_vars=expected_env_vars,
                 gpus=gpus,
                 interactive=interactive,
+                log_dir=None,
                 quiet=quiet,
                 read_write=read_write,
                 root=root,
@@ -214,8 +218,36 @@ def test_test_command(
                 build_buildx=build_buildx,
                 entrypoint_args=expected_entrypoint_args,
                 gpus=gpus,
+                log_dir=None,
                 quiet=quiet,
                 runtime_environment=runtime_environment,
                 user_gid=expected_gid,
                 user_id=expected_uid,
             )
+
+
+@pytest.mark.parametrize(
+    "fix, no_cache, changed_since, staged, expected_entrypoint_args",
+    [
+        (False, False, None, False, ["tawa-inner-cli", "lint"]),
+        (True, True, None, False, ["tawa-inner-cli", "lint", "--fix", "--no-cache"]),
+        (False, False, "origin/main", True, ["tawa-inner-cli", "lint", "--changed-since", "origin/main", "--staged"]),
+    ],
+)
+def test_lint_command(fix, no_cache, changed_since, staged, expected_entrypoint_args):
+    with patch("eototo.commands.commands.run_generic_command") as patched_run:
+        patched_run.return_value = CompletedProcess([], returncode=0)
+
+        with patch("eototo.commands.commands.get_user_id_group_id", _patched_out_auth_function):
+            with pytest.raises(SystemExit):
+                commands.lint_command(
+                    build_buildx=False,
+                    fix=fix,
+                    read_write=True,
+                    runtime_environment="cuda12",
+                    quiet=False,
+                    no_cache=no_cache,
+                    changed_since=changed_since,
+                    staged=staged,
+                )
+            assert patched_run.call_args.kwargs["entrypoint_args"] == expected_entrypoint_args
@@ -0,0 +1,42 @@
+import os
+from typing import List
+
+import pytest
+
+from eototo.commands.watch import get_affected_tests
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("pkg/tests/sub")
+    files = {
+        "pkg/models.py": "",
+        "pkg/data.py": "",
+        "pkg/tests/conftest.py": "",
+        "pkg/tests/test_models.py": "from pkg import models\n",
+        "pkg/tests/test_training.py": "from pkg.data import load\n",
+        "pkg/tests/sub/conftest.py": "",
+        "pkg/tests/sub/test_other.py": "",
+    }
+    for path, content in files.items():
+        with open(path, "w") as file_buffer:
+            file_buffer.write(content)
+
+
+@pytest.mark.parametrize(
+    "changed_files, expected_tests",
+    [
+        (["pkg/tests/test_models.py"], ["pkg/tests/test_models.py"]),
+        (["pkg/models.py"], ["pkg/tests/test_models.py"]),
+        (["pkg/data.py"], ["pkg/tests/test_training.py"]),
+        (["pkg/tests/sub/conftest.py"], ["pkg/tests/sub/test_other.py"]),
+        (
+            ["pkg/tests/conftest.py"],
+            ["pkg/tests/sub/test_other.py", "pkg/tests/test_models.py", "pkg/tests/test_training.py"],
+        ),
+        (["README.rst"], []),
+    ],
+)
+def test_get_affected_tests(repo, changed_files: List[str], expected_tests: List[str]):
+    assert get_affected_tests(changed_files, ["pkg/tests"]) == expected_tests
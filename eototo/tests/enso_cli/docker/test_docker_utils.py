@@ -4,7 +4,12 @@ from typing import Any, Dict, List, Optional
 
 import pytest
 
-from eototo.docker.docker_utils import build_dockerfile_from_path, get_repo_name, run_generic_command
+from eototo.docker.docker_utils import (
+    build_dockerfile_from_path,
+    get_repo_name,
+    run_generic_command,
+    select_runtime_environment,
+)
 
 
 @pytest.mark.parametrize(
@@ -26,7 +31,6 @@ def test_build_dockerfile_from_path(
     buildx, build_args, cache_from, dockerfile_path, forward_artifactory_creds, image, quiet, expected_command
 ):
     with patch("eototo.docker.docker_utils.subprocess.run") as mocked_subproc_run:
-        stdout_redirect = subprocess.DEVNULL if quiet else None
         build_dockerfile_from_path(
             buildx=buildx,
             build_args=build_args,
@@ -36,7 +40,21 @@ def test_build_dockerfile_from_path(
             image=image,
             quiet=quiet,
         )
-        mocked_subproc_run.assert_called_with(expected_command, stdout=stdout_redirect, check=True, shell=True)
+        mocked_subproc_run.assert_called_with(expected_command, check=True, shell=True)
+
+
+def test_build_dockerfile_from_path_quiet_failure():
+    with patch("eototo.docker.docker_utils.run_with_log_capture") as mocked_capture:
+        mocked_capture.return_value = subprocess.CompletedProcess([], returncode=1, stdout="no space left on device")
+        with pytest.raises(subprocess.CalledProcessError):
+            build_dockerfile_from_path(
+                dockerfile_path="test/path/to/Dockerfile",
+                forward_artifactory_creds=False,
+                image="test_image",
+                quiet=True,
+            )
+        assert mocked_capture.call_args.kwargs["echo"] is False
+        assert mocked_capture.call_args.kwargs["log_dir"] is None
 
 
 @pytest.mark.parametrize(
@@ -110,3 +128,26 @@ def test_run_generic_command(
 def test_get_repo_name(expected_repo_name: str):
     repo_name = get_repo_name()
     assert repo_name == expected_repo_name
+
+
+@pytest.mark.parametrize(
+    "runtime_environment, uses_gpus, host_gpus, environments, expected_runtime_environment",
+    [
+        ("cuda12", False, False, {"cuda12": {}, "cpu": {}}, "cuda12"),
+        (None, False, True, {"cuda12": {}, "cpu": {}}, "cpu"),
+        (None, True, False, {"cuda12": {}, "cpu": {}}, "cuda12"),
+        (None, None, False, {"cuda12": {}, "cpu": {}}, "cpu"),
+        (None, None, True, {"cuda12": {}, "cpu": {}}, "cuda12"),
+        (None, False, False, {"cuda12": {}}, "cuda12"),
+    ],
+)
+def test_select_runtime_environment(
+    runtime_environment: Optional[str],
+    uses_gpus: Optional[bool],
+    host_gpus: bool,
+    environments: Dict[str, Dict[str, str]],
+    expected_runtime_environment: str,
+):
+    with patch("eototo.docker.docker_utils.host_has_gpus", return_value=host_gpus):
+        with patch("eototo.docker.docker_utils.load_environment_registry", return_value=environments):
+            assert select_runtime_environment(runtime_environment, uses_gpus) == expected_runtime_environment
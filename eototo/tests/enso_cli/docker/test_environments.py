@@ -0,0 +1,75 @@
+import os
+
+import pytest
+import yaml
+
+from eototo.docker.environments import get_runtime_environment, load_environment_registry, parse_environment_registry
+
+CONFIG_OBJECT = {
+    "environments": {
+        "cuda12": {
+            "base": "Dockerfile.base",
+            "project": "Dockerfile.project",
+            "build_args": {"PYTHON_VERSION": 3.11},
+            "resources": {"cpus": 8, "memory": "32g"},
+            "cache": {"from": "registry/tawa-cuda12:latest"},
+        },
+        "cuda12-debug": {
+            "extends": "cuda12",
+            "project": "Dockerfile.debug",
+            "build_args": {"DEBUG": "1"},
+            "resources": {"memory": "64g"},
+            "cache": {"inline": True},
+        },
+    }
+}
+
+
+def test_parse_environment_registry_resolves_inheritance():
+    registry = parse_environment_registry(CONFIG_OBJECT, "environments.yml")
+
+    debug = registry["cuda12-debug"]
+    assert debug.dockerfiles == {
+        "base": "runtime_environments/cuda12/Dockerfile.base",
+        "project": "runtime_environments/cuda12-debug/Dockerfile.debug",
+    }
+    assert debug.cpus == 8.0
+    assert debug.memory == "64g"
+    assert debug.cache_from == "registry/tawa-cuda12:latest"
+    assert debug.get_build_args({"DEBUG": "0"}) == {
+        "PYTHON_VERSION": "3.11",
+        "DEBUG": "0",
+        "BUILDKIT_INLINE_CACHE": "1",
+    }
+    assert registry["cuda12"].get_build_args() == {"PYTHON_VERSION": "3.11"}
+
+
+@pytest.mark.parametrize(
+    "environments, expected_error",
+    [
+        ({"cpu": {"dockerfile": "Dockerfile"}}, r"environments\.cpu has unknown keys \['dockerfile'\]"),
+        ({"cpu": {"resources": {"cpus": "eight"}}}, r"environments\.cpu\.resources\.cpus must be int or float"),
+        ({"cpu": {"resources": {"cpus": True}}}, r"environments\.cpu\.resources\.cpus must be int or float"),
+        ({"cpu": {"extends": "gpu"}}, r"environments\.cpu extends unknown environment gpu"),
+        ({"a": {"extends": "b"}, "b": {"extends": "a"}}, r"cycle: a -> b -> a"),
+    ],
+)
+def test_parse_environment_registry_errors(environments, expected_error):
+    with pytest.raises(ValueError, match=expected_error):
+        parse_environment_registry({"environments": environments}, "environments.yml")
+
+
+def test_load_environment_registry_reloads_on_change(tmp_path):
+    config_path = tmp_path / "environments.yml"
+    config_path.write_text(yaml.safe_dump(CONFIG_OBJECT))
+
+    registry = load_environment_registry(str(config_path))
+    assert load_environment_registry(str(config_path)) is registry
+
+    config_path.write_text(yaml.safe_dump({"environments": {"cpu": {"project": "Dockerfile.project"}}}))
+    # both writes can land within the mtime resolution of the filesystem
+    os.utime(config_path, ns=(0, 0))
+    assert list(load_environment_registry(str(config_path))) == ["cpu"]
+
+    with pytest.raises(ValueError, match="No cuda12 in"):
+        get_runtime_environment("cuda12", str(config_path))
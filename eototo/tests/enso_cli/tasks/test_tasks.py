@@ -0,0 +1,92 @@
+from subprocess import CompletedProcess
+from unittest.mock import patch
+
+import pytest
+
+from eototo.tasks.action_cache import ActionCache
+from eototo.tasks.tasks import TASK_CACHED, TASK_FAILED, TASK_NOT_RUN, TASK_SUCCEEDED, load_tasks, run_tasks
+
+TASKS_YML = """
+tasks:
+  preprocess:
+    command: python preprocess.py
+    inputs: ["{root}/raw/*"]
+    outputs: ["{root}/processed"]
+  train:
+    command: python train.py
+    deps: [preprocess]
+    inputs: ["{root}/processed/**"]
+  docs:
+    command: tawa-inner-cli docs
+"""
+
+
+@pytest.fixture
+def tasks_file(tmp_path):
+    (tmp_path / "raw").mkdir()
+    (tmp_path / "raw" / "data.txt").write_text("raw data")
+    (tmp_path / "processed").mkdir()
+    (tmp_path / "processed" / "data.txt").write_text("processed data")
+    path = tmp_path / "tasks.yml"
+    path.write_text(TASKS_YML.format(root=tmp_path))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "tasks_yml, error",
+    [
+        ("tasks:\n  a:\n    command: x\n    deps: [b]\n", "unknown task b"),
+        ("tasks:\n  a:\n    command: x\n    deps: [b]\n  b:\n    command: y\n    deps: [a]\n", "cycle"),
+        ("tasks:\n  a:\n    cmd: x\n", "unknown keys"),
+        ("tasks:\n  a:\n    command: x\n    inputs: foo\n", "list of strings"),
+    ],
+)
+def test_load_tasks_invalid(tmp_path, tasks_yml: str, error: str):
+    path = tmp_path / "tasks.yml"
+    path.write_text(tasks_yml)
+    with pytest.raises(ValueError, match=error):
+        load_tasks(str(path), default_runtime_environment="cuda12")
+
+
+def _run(tasks_file: str, cache_path: str, returncode: int = 0):
+    tasks = load_tasks(tasks_file, default_runtime_environment="cuda12")
+    with patch("eototo.tasks.tasks.run_generic_command") as patched_run:
+        with patch("eototo.tasks.tasks.get_image_id", return_value="sha256:abc"):
+            with patch("eototo.tasks.tasks.get_user_image", return_value="tawa-cuda12:latest"):
+                patched_run.return_value = CompletedProcess([], returncode=returncode)
+                results = run_tasks(
+                    tasks=tasks,
+                    targets=["train"],
+                    action_cache=ActionCache(cache_path),
+                    env_vars={},
+                    force=False,
+                    max_parallel=2,
+                    quiet=True,
+                    user_gid=1000,
+                    user_id=1000,
+                )
+    return {result.name: result.status for result in results}, patched_run.call_count
+
+
+def test_run_tasks_skips_cached(tasks_file, tmp_path):
+    cache_path = str(tmp_path / "actions.json")
+
+    statuses, call_count = _run(tasks_file, cache_path)
+    assert statuses == {"preprocess": TASK_SUCCEEDED, "train": TASK_SUCCEEDED}
+    assert call_count == 2
+
+    statuses, call_count = _run(tasks_file, cache_path)
+    assert statuses == {"preprocess": TASK_CACHED, "train": TASK_CACHED}
+    assert call_count == 0
+
+    # changing an input of the first task invalidates the whole chain
+    (tmp_path / "raw" / "data.txt").write_text("new raw data")
+    statuses, call_count = _run(tasks_file, cache_path)
+    assert statuses == {"preprocess": TASK_SUCCEEDED, "train": TASK_SUCCEEDED}
+    assert call_count == 2
+
+
+def test_run_tasks_stops_after_failure(tasks_file, tmp_path):
+    statuses, call_count = _run(tasks_file, str(tmp_path / "actions.json"), returncode=1)
+    assert statuses == {"preprocess": TASK_FAILED, "train": TASK_NOT_RUN}
+    assert call_count == 1
@@ -0,0 +1,77 @@
+import subprocess
+from subprocess import CompletedProcess
+from unittest.mock import patch
+
+from eototo.api import Session
+from eototo.docker.environments import RuntimeEnvironment
+
+
+def _patch_session_lookups():
+    return (
+        patch("eototo.api.get_repo_name", return_value="tawa"),
+        patch("eototo.api.get_user_id_group_id", return_value=(1000, 1000)),
+        patch("eototo.api.pull_build_location_from_config", return_value="runtime_environments/cuda12/Dockerfile"),
+        patch("eototo.api.get_image_id", return_value="sha256:abc"),
+        patch(
+            "eototo.api.get_runtime_environment",
+            return_value=RuntimeEnvironment(name="cuda12", build_args={"PYTHON_VERSION": "3.11"}),
+        ),
+    )
+
+
+def test_session_builds_once_and_caches_lookups():
+    repo_patch, user_patch, config_patch, image_id_patch, environment_patch = _patch_session_lookups()
+    with repo_patch as patched_repo, user_patch, config_patch as patched_config, image_id_patch as patched_image_id:
+        with environment_patch, patch("eototo.api.build_dockerfile_from_path") as patched_build:
+            with patch("eototo.api.run_generic_command") as patched_run:
+                patched_run.return_value = CompletedProcess([], returncode=0)
+                session = Session(runtime_environment="cuda12")
+                first = session.run("echo one")
+                second = session.run(["echo", "two"])
+                rebuilt = session.build(force=True)
+
+    assert first.ok and second.ok
+    assert second.command == ["echo", "two"]
+    assert patched_build.call_count == 2
+    assert patched_build.call_args.kwargs["build_args"] == {"PYTHON_VERSION": "3.11"}
+    assert rebuilt.built and rebuilt.image == "tawa-cuda12:latest"
+    assert session.build().built is False
+    patched_repo.assert_called_once()
+    patched_config.assert_called_once()
+    # the fingerprint is looked up again after the forced rebuild
+    assert patched_image_id.call_count == 2
+    assert patched_run.call_args.kwargs["image"] == "tawa-cuda12:latest"
+    assert patched_run.call_args.kwargs["build"] is False
+
+
+def test_session_returns_failures_without_exiting():
+    repo_patch, user_patch, config_patch, image_id_patch, environment_patch = _patch_session_lookups()
+    with repo_patch, user_patch, config_patch, image_id_patch, environment_patch:
+        with patch("eototo.api.build_dockerfile_from_path") as patched_build:
+            patched_build.side_effect = subprocess.CalledProcessError(2, "docker build")
+            with patch("eototo.api.run_generic_command") as patched_run:
+                result = Session(runtime_environment="cuda12").run("false")
+
+    assert result.returncode == 2
+    patched_run.assert_not_called()
+
+
+def test_session_exec_reuses_container_and_captures_output():
+    def fake_exec(container, entrypoint_args, stdout=None):
+        stdout.write(b"hello\n")
+        return CompletedProcess([], returncode=3)
+
+    repo_patch, user_patch, config_patch, image_id_patch, environment_patch = _patch_session_lookups()
+    with repo_patch, user_patch, config_patch, image_id_patch, environment_patch:
+        with patch("eototo.api.build_dockerfile_from_path"):
+            with patch("eototo.api.start_persistent_container", side_effect=lambda **kwargs: kwargs["name"]) as started:
+                with patch("eototo.api.exec_in_container", side_effect=fake_exec):
+                    with patch("eototo.api.stop_container") as stopped:
+                        with Session(runtime_environment="cuda12") as session:
+                            session.exec("echo hello", capture_output=True)
+                            result = session.exec("echo hello", capture_output=True)
+
+    started.assert_called_once()
+    stopped.assert_called_once_with(started.call_args.kwargs["name"])
+    assert result.returncode == 3
+    assert result.output == "hello\n"
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from eototo.eototo import cmd_exec, cmd_test, cmd_watch
+
+
+@pytest.mark.parametrize(
+    "command, args, patched_name, gpus_index, runtime_environment_index",
+    [
+        (cmd_exec, ["--command", "nvidia-smi"], "exec_command", 2, 7),
+        (cmd_test, [], "test_command", 1, 2),
+        (cmd_watch, [], "watch_command", 2, 6),
+    ],
+)
+@pytest.mark.parametrize(
+    "gpus_flag, expected_gpus, expected_runtime_environment",
+    [
+        ("--gpus", True, "cuda12"),
+        ("--no-gpus", False, "cpu"),
+    ],
+)
+def test_no_gpus_selects_the_cpu_runtime_environment(
+    command,
+    args,
+    patched_name,
+    gpus_index,
+    runtime_environment_index,
+    gpus_flag,
+    expected_gpus,
+    expected_runtime_environment,
+):
+    with patch("eototo.eototo.host_has_gpus", return_value=True), patch(
+        "eototo.docker.docker_utils.load_environment_registry", return_value={"cpu": None, "cuda12": None}
+    ):
+        with patch(f"eototo.eototo.{patched_name}") as patched_command:
+            result = CliRunner().invoke(command, args + [gpus_flag])
+
+    assert result.exit_code == 0, result.output
+    assert patched_command.call_args.args[gpus_index] is expected_gpus
+    assert patched_command.call_args.args[runtime_environment_index] == expected_runtime_environment
@@ -0,0 +1,36 @@
+import gzip
+import sys
+
+from eototo.utils.logs import LogCapture, RotatingGzipLog, run_with_log_capture
+
+
+def test_log_capture_keeps_last_lines():
+    capture = LogCapture(tail_lines=2, echo=False)
+    capture.feed(b"one\ntw")
+    capture.feed(b"o\nprogress 10%\rprogress 100%\nthree")
+    assert capture.format_tail() == "two\nprogress 100%"
+
+
+def test_rotating_gzip_log_rotates_and_drops_old_segments(tmp_path):
+    archive = RotatingGzipLog(str(tmp_path / "run"), max_segment_bytes=64, max_segments=2)
+    for index in range(10):
+        archive.write_line(f"line {index}".encode())
+    archive.close()
+
+    assert len(archive.paths) == 5
+    kept = sorted(path.name for path in tmp_path.iterdir())
+    assert kept == ["run.0003.log.gz", "run.0004.log.gz"]
+    with gzip.open(archive.paths[-1], "rt") as segment_buffer:
+        lines = segment_buffer.read().splitlines()
+    # every line is timestamped
+    assert [line.split(" ", 1)[1] for line in lines] == ["line 8", "line 9"]
+
+
+def test_run_with_log_capture_archives_output(tmp_path):
+    command = [sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"]
+    ret = run_with_log_capture(command, echo=False, log_dir=str(tmp_path), log_name="fail")
+
+    assert ret.returncode == 3
+    assert sorted(ret.stdout.splitlines()) == ["err", "out"]
+    (segment,) = tmp_path.iterdir()
+    assert segment.name.endswith("-fail.0000.log.gz")
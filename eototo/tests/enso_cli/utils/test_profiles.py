@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from eototo.utils.profiles import ProfileSummary, format_profile_summary, summarize_speedscope
+
+
+@pytest.fixture
+def profile_path(tmp_path):
+    profile_object = {
+        "shared": {
+            "frames": [
+                {"name": "main", "file": "train.py", "line": 1},
+                {"name": "load", "file": "data.py", "line": 10},
+                {"name": "step", "file": "train.py", "line": 20},
+                {"name": "step", "file": "train.py", "line": 25},
+            ]
+        },
+        "profiles": [
+            # main thread, step recurses into itself on another line
+            {"type": "sampled", "samples": [[0, 2], [0, 2, 3], [0, 1]], "weights": [1, 1, 1]},
+            # subprocess without weights, each sample counts once
+            {"type": "sampled", "samples": [[0, 2], []]},
+        ],
+    }
+    path = tmp_path / "profile.speedscope.json"
+    path.write_text(json.dumps(profile_object))
+    return str(path)
+
+
+def test_summarize_speedscope(profile_path):
+    summary = summarize_speedscope(profile_path)
+
+    assert summary.total == 5
+    assert summary.unit == "samples"
+    samples = {function.name: (function.self_samples, function.total_samples) for function in summary.functions}
+    assert samples == {"step": (3, 3), "load": (1, 1), "main": (0, 4)}
+    assert [function.name for function in summary.functions] == ["step", "load", "main"]
+
+
+def test_format_profile_summary(profile_path):
+    summary = format_profile_summary(summarize_speedscope(profile_path), top=2)
+
+    assert "out of 5 samples" in summary
+    assert " 60.0%   60.0%  step (train.py)" in summary
+    assert "main" not in summary
+    assert format_profile_summary(ProfileSummary(total=0, unit="samples", functions=[])) == "No samples recorded."
@@ -0,0 +1,269 @@
+"""Training throughput benchmark of the cifar10 example.
+
+Trains the example network for a fixed number of steps for every combination
+of batch size and loader worker count, each in a fresh process so peak memory
+is measured per combination, and writes a JSON report with the throughput,
+the time per step split into waiting for data, forward and backward compute
+and the optimizer step, and the peak resident memory. Runs on CPU::
+
+    eototo exec -env cpu -c "python -m projects.examples.cifar10.benchmark --output cifar10-benchmark.json"
+    eototo exec -env cpu -c "python -m projects.examples.cifar10.benchmark --data-dir data/cifar10 \\
+        --batch-sizes 128,256 --workers 0,2,4 --steps 100"
+
+Without ``--data-dir`` the benchmark trains on synthetic data converted into
+a temporary directory.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import click
+import numpy as np
+import torch
+from torch import nn
+
+from projects.examples.cifar10.convert import convert_cifar10
+from projects.examples.cifar10.dataset import get_cifar10_loader
+from projects.examples.cifar10.model import build_model
+from tawa.data.pipeline import SharedMemoryLoader
+
+PHASES = ("data", "compute", "optimizer")
+DEFAULT_BATCH_SIZES = (64, 128, 256)
+DEFAULT_WORKERS = (0, 1, 2)
+MAX_SYNTHETIC_SAMPLES = 50000
+
+
+def parse_int_list(ctx: click.Context, param: click.Parameter, value: str) -> List[int]:
+    """Parse a comma separated list of non negative integers, a click callback."""
+    try:
+        values = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise click.BadParameter(f"expected comma separated integers, got {value}")
+    if not values or min(values) < 0:
+        raise click.BadParameter(f"expected comma separated non negative integers, got {value}")
+    return values
+
+
+def summarize_seconds(seconds: List[float]) -> Dict[str, float]:
+    """Summarize durations in seconds as milliseconds statistics and their total."""
+    values = np.asarray(seconds) * 1000
+    return {
+        "mean_ms": float(values.mean()),
+        "median_ms": float(np.median(values)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "max_ms": float(values.max()),
+        "total_s": float(values.sum() / 1000),
+    }
+
+
+def _get_peak_rss_bytes(who: int) -> int:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cycle(loader) -> Iterator[Dict[str, np.ndarray]]:
+    while True:
+        yield from loader
+
+
+def train_steps(
+    model: nn.Module, loader: SharedMemoryLoader, steps: int, warmup_steps: int
+) -> Tuple[Dict[str, List[float]], float, float]:
+    """Train for a fixed number of steps and time every phase of every step.
+
+    Args:
+        model (nn.Module): Model to train, ex: wrapped in DistributedDataParallel
+        loader (SharedMemoryLoader): Loader of the train split, cycled through as many epochs as needed
+        steps (int): Timed steps
+        warmup_steps (int): Untimed steps before, to start the workers and warm up the allocator
+
+    Returns:
+        Tuple[Dict[str, List[float]], float, float]: Seconds of every timed step and of each of its phases,
+            wall time of the timed steps, and the last loss
+    """
+    model.train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.05, momentum=0.9, nesterov=True, weight_decay=5e-4)
+    loss_function = nn.CrossEntropyLoss()
+    timings: Dict[str, List[float]] = {phase: [] for phase in PHASES + ("step",)}
+    batches = _cycle(loader)
+    for step in range(warmup_steps + steps):
+        if step == warmup_steps:
+            started = time.perf_counter()
+        step_started = time.perf_counter()
+        batch = next(batches)
+        images = torch.from_numpy(batch["image"]).permute(0, 3, 1, 2)
+        labels = torch.from_numpy(batch["label"])
+        data_done = time.perf_counter()
+
+        optimizer.zero_grad(set_to_none=True)
+        loss = loss_function(model(images), labels)
+        # with DistributedDataParallel the gradients are all-reduced during backward
+        loss.backward()
+        compute_done = time.perf_counter()
+
+        optimizer.step()
+        step_done = time.perf_counter()
+        if step >= warmup_steps:
+            timings["data"].append(data_done - step_started)
+            timings["compute"].append(compute_done - data_done)
+            timings["optimizer"].append(step_done - compute_done)
+            timings["step"].append(step_done - step_started)
+    return timings, time.perf_counter() - started, float(loss.item())
+
+
+def run_configuration(
+    data_dir: str,
+    batch_size: int,
+    num_workers: int,
+    steps: int,
+    warmup_steps: int,
+    threads: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Train a fresh model with one combination of batch size and worker count.
+
+    Args:
+        data_dir (str): Output directory of the cifar10 conversion
+        batch_size (int): Samples per step
+        num_workers (int): Loader worker processes
+        steps (int): Timed steps
+        warmup_steps (int): Untimed steps before, to start the workers and warm up the allocator
+        threads (Optional[int], optional): Torch intra op threads, torch's default if None. Defaults to None.
+        seed (int, optional): Seed of the weights, the shuffling and the augmentations. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: Result of the configuration
+    """
+    torch.manual_seed(seed)
+    if threads:
+        torch.set_num_threads(threads)
+    model = build_model()
+    with get_cifar10_loader(data_dir, "train", batch_size=batch_size, num_workers=num_workers, seed=seed) as loader:
+        timings, elapsed, loss = train_steps(model, loader, steps, warmup_steps)
+        loader_stats = asdict(loader.stats)
+
+    return {
+        "batch_size": batch_size,
+        "num_workers": num_workers,
+        "threads": torch.get_num_threads(),
+        "steps": steps,
+        "samples_per_second": steps * batch_size / elapsed,
+        "steps_per_second": steps / elapsed,
+        "step": summarize_seconds(timings["step"]),
+        "phases": {phase: summarize_seconds(timings[phase]) for phase in PHASES},
+        "data_wait_fraction": sum(timings["data"]) / elapsed,
+        "final_loss": loss,
+        "peak_rss_bytes": _get_peak_rss_bytes(resource.RUSAGE_SELF),
+        # the largest loader worker, they have all exited and been waited for by now
+        "peak_worker_rss_bytes": _get_peak_rss_bytes(resource.RUSAGE_CHILDREN),
+        "loader": loader_stats,
+    }
+
+
+def run_sweep(
+    data_dir: str,
+    batch_sizes: List[int],
+    workers: List[int],
+    steps: int,
+    warmup_steps: int,
+    threads: Optional[int] = None,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Run every combination of batch size and worker count, each in a fresh process.
+
+    Args:
+        data_dir (str): Output directory of the cifar10 conversion
+        batch_sizes (List[int]): Batch sizes to run
+        workers (List[int]): Loader worker counts to run
+        steps (int): Timed steps per combination
+        warmup_steps (int): Untimed steps per combination
+        threads (Optional[int], optional): Torch intra op threads. Defaults to None.
+        seed (int, optional): Seed of every combination. Defaults to 0.
+
+    Returns:
+        List[Dict[str, Any]]: Result per combination
+    """
+    results = []
+    for batch_size in batch_sizes:
+        for num_workers in workers:
+            # spawn so nothing allocated by earlier combinations counts towards the peak memory
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(
+                    run_configuration, data_dir, batch_size, num_workers, steps, warmup_steps, threads, seed
+                ).result()
+            click.echo(
+                f"batch size {batch_size:>4}  workers {num_workers:>2}: "
+                f"{result['samples_per_second']:>9.1f} samples/s  "
+                f"step {result['step']['median_ms']:.1f}ms  "
+                f"data {result['phases']['data']['median_ms']:.1f}ms  "
+                f"compute {result['phases']['compute']['median_ms']:.1f}ms  "
+                f"optimizer {result['phases']['optimizer']['median_ms']:.1f}ms  "
+                f"peak {result['peak_rss_bytes'] / 2**20:.0f}MiB",
+                err=True,
+            )
+            results.append(result)
+    return results
+
+
+@click.command(help="Benchmark the training throughput of the cifar10 example.")
+@click.option("--data-dir", default=None, type=click.Path(exists=True, file_okay=False), help="Converted CIFAR-10.")
+@click.option("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)), callback=parse_int_list)
+@click.option("--workers", default=",".join(map(str, DEFAULT_WORKERS)), callback=parse_int_list)
+@click.option("--steps", default=50, type=click.IntRange(min=1), help="Timed steps per combination.")
+@click.option("--warmup-steps", default=5, type=click.IntRange(min=0), help="Untimed steps per combination.")
+@click.option("--threads", default=None, type=click.IntRange(min=1), help="Torch intra op threads.")
+@click.option("--seed", default=0, type=int)
+@click.option("--output", default=None, type=click.Path(dir_okay=False), help="Report path, stdout if not given.")
+def main(
+    data_dir: Optional[str],
+    batch_sizes: List[int],
+    workers: List[int],
+    steps: int,
+    warmup_steps: int,
+    threads: Optional[int],
+    seed: int,
+    output: Optional[str],
+):
+    if 0 in batch_sizes:
+        raise click.BadParameter("batch sizes must be positive", param_hint="--batch-sizes")
+    with tempfile.TemporaryDirectory(prefix="cifar10-benchmark-") as synthetic_dir:
+        if data_dir is None:
+            train_samples = min(max(batch_sizes) * (steps + warmup_steps), MAX_SYNTHETIC_SAMPLES)
+            convert_cifar10(synthetic_dir, synthetic_samples={"train": train_samples, "test": 0}, seed=seed)
+        results = run_sweep(data_dir or synthetic_dir, batch_sizes, workers, steps, warmup_steps, threads, seed)
+
+    report = {
+        "created": time.time(),
+        "data": "synthetic" if data_dir is None else os.path.abspath(data_dir),
+        "steps": steps,
+        "warmup_steps": warmup_steps,
+        "host": {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+        },
+        "results": results,
+    }
+    report_json = json.dumps(report, indent=2)
+    if output is None:
+        click.echo(report_json)
+    else:
+        with open(output, "w") as report_buffer:
+            report_buffer.write(report_json + "\n")
+        click.secho(f"Wrote the benchmark report to {output}", fg="green", err=True)
+
+
+if __name__ == "__main__":
+    main()
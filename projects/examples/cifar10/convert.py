@@ -0,0 +1,161 @@
+"""Convert CIFAR-10 into memory mapped shards.
+
+Reads the python version of CIFAR-10, either the extracted
+``cifar-10-batches-py`` directory or the ``cifar-10-python.tar.gz`` archive
+from https://www.cs.toronto.edu/~kriz/cifar.html, or generates a synthetic
+dataset of the same shapes when no source is given. Each split is written to
+``<output-dir>/<split>`` in the format of ``tawa.data.shards``::
+
+    python -m projects.examples.cifar10.convert --output-dir data/cifar10 --source cifar-10-python.tar.gz
+    python -m projects.examples.cifar10.convert --output-dir data/cifar10-synthetic
+"""
+
+import os
+import pickle
+import tarfile
+from typing import Dict, Iterator, Optional, Tuple
+
+import click
+import numpy as np
+
+from tawa.data.shards import DEFAULT_SHARD_SIZE, ShardWriter
+
+CIFAR10_CLASSES = (
+    "airplane",
+    "automobile",
+    "bird",
+    "cat",
+    "deer",
+    "dog",
+    "frog",
+    "horse",
+    "ship",
+    "truck",
+)
+IMAGE_SHAPE = (32, 32, 3)
+SPLIT_BATCHES = {
+    "train": tuple(f"data_batch_{index}" for index in range(1, 6)),
+    "test": ("test_batch",),
+}
+SYNTHETIC_SAMPLES = {"train": 50000, "test": 10000}
+SYNTHETIC_BATCH_SIZE = 5000
+
+
+def _load_batch(source: str, batch_name: str) -> Dict[bytes, object]:
+    if os.path.isdir(source):
+        with open(os.path.join(source, batch_name), "rb") as batch_buffer:
+            return pickle.load(batch_buffer, encoding="bytes")
+    with tarfile.open(source, "r:gz") as archive:
+        member = archive.getmember(f"cifar-10-batches-py/{batch_name}")
+        return pickle.load(archive.extractfile(member), encoding="bytes")
+
+
+def read_cifar10_batches(source: str, split: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Read the batches of a CIFAR-10 split one at a time.
+
+    Args:
+        source (str): ``cifar-10-batches-py`` directory or ``cifar-10-python.tar.gz`` archive
+        split (str): ``train`` or ``test``
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: uint8 images in NHWC layout and int64 labels
+    """
+    for batch_name in SPLIT_BATCHES[split]:
+        batch = _load_batch(source, batch_name)
+        # rows are the red, green and blue planes of an image one after the other
+        images = np.asarray(batch[b"data"], dtype=np.uint8).reshape(-1, 3, 32, 32).transpose(0, 2, 3, 1)
+        yield images, np.asarray(batch[b"labels"], dtype=np.int64)
+
+
+def generate_synthetic_cifar10(num_samples: int, seed: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Generate a learnable stand in for CIFAR-10 without any download.
+
+    Each class has its own mean color and horizontal gradient, images are
+    that pattern plus noise.
+
+    Args:
+        num_samples (int): Number of samples
+        seed (int, optional): Seed of the generator. Defaults to 0.
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: uint8 images in NHWC layout and int64 labels
+    """
+    rng = np.random.default_rng(seed)
+    class_colors = rng.uniform(40, 215, size=(len(CIFAR10_CLASSES), 1, 1, 3))
+    class_gradients = rng.uniform(-40, 40, size=(len(CIFAR10_CLASSES), 1, 1, 3))
+    ramp = np.linspace(-1, 1, IMAGE_SHAPE[1]).reshape(1, 1, -1, 1)
+    for start in range(0, num_samples, SYNTHETIC_BATCH_SIZE):
+        count = min(SYNTHETIC_BATCH_SIZE, num_samples - start)
+        labels = rng.integers(0, len(CIFAR10_CLASSES), size=count)
+        noise = rng.normal(0, 25, size=(count,) + IMAGE_SHAPE)
+        images = class_colors[labels] + class_gradients[labels] * ramp + noise
+        yield np.clip(images, 0, 255).astype(np.uint8), labels.astype(np.int64)
+
+
+def convert_cifar10(
+    output_dir: str,
+    source: Optional[str] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    synthetic_samples: Optional[Dict[str, int]] = None,
+    seed: int = 0,
+) -> None:
+    """Write the train and test splits of CIFAR-10 as sharded datasets.
+
+    Args:
+        output_dir (str): Directory to write ``train`` and ``test`` into
+        source (Optional[str], optional): CIFAR-10 directory or archive, synthetic data if None.
+            Defaults to None.
+        shard_size (int, optional): Samples per shard. Defaults to DEFAULT_SHARD_SIZE.
+        synthetic_samples (Optional[Dict[str, int]], optional): Samples per split of synthetic data.
+            Defaults to None (the sizes of CIFAR-10).
+        seed (int, optional): Seed of the synthetic data. Defaults to 0.
+    """
+    synthetic_samples = {**SYNTHETIC_SAMPLES, **(synthetic_samples or {})}
+    for split_index, split in enumerate(SPLIT_BATCHES):
+        if source is not None:
+            batches = read_cifar10_batches(source, split)
+        else:
+            batches = generate_synthetic_cifar10(synthetic_samples[split], seed=seed + split_index)
+        metadata = {"classes": list(CIFAR10_CLASSES), "source": "synthetic" if source is None else "cifar10"}
+        with ShardWriter(
+            os.path.join(output_dir, split),
+            fields={"image": (IMAGE_SHAPE, np.uint8), "label": ((), np.int64)},
+            shard_size=shard_size,
+            metadata=metadata,
+        ) as writer:
+            for images, labels in batches:
+                writer.write(image=images, label=labels)
+
+
+@click.command(help="Convert CIFAR-10, or a synthetic equivalent, into memory mapped shards.")
+@click.option("--output-dir", required=True, type=click.Path(file_okay=False), help="Directory for the splits.")
+@click.option(
+    "--source",
+    default=None,
+    type=click.Path(exists=True),
+    help="cifar-10-batches-py directory or cifar-10-python.tar.gz archive. Synthetic data if not given.",
+)
+@click.option("--shard-size", default=DEFAULT_SHARD_SIZE, type=click.IntRange(min=1), help="Samples per shard.")
+@click.option("--synthetic-train-samples", default=SYNTHETIC_SAMPLES["train"], type=click.IntRange(min=0))
+@click.option("--synthetic-test-samples", default=SYNTHETIC_SAMPLES["test"], type=click.IntRange(min=0))
+@click.option("--seed", default=0, type=int, help="Seed of the synthetic data.")
+def main(
+    output_dir: str,
+    source: Optional[str],
+    shard_size: int,
+    synthetic_train_samples: int,
+    synthetic_test_samples: int,
+    seed: int,
+):
+    convert_cifar10(
+        output_dir,
+        source=source,
+        shard_size=shard_size,
+        synthetic_samples={"train": synthetic_train_samples, "test": synthetic_test_samples},
+        seed=seed,
+    )
+    click.secho(f"Wrote CIFAR-10 shards to {output_dir}", fg="green")
+
+
+if __name__ == "__main__":
+    main()
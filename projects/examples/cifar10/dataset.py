@@ -0,0 +1,103 @@
+"""CIFAR-10 served from the memory mapped shards written by ``convert``.
+
+Samples are dicts with a ``32x32x3`` uint8 ``image`` in NHWC layout and an
+int64 ``label``. Batches of consecutive samples are views of the shards::
+
+    dataset = load_cifar10("data/cifar10", "train")
+    for batch in dataset.iter_batches(500):
+        images, labels = batch["image"], batch["label"]
+
+Training reads through worker processes with ``get_cifar10_loader``, which
+augments the train split and normalizes both splits in the workers.
+"""
+
+import os
+from typing import List, Optional
+
+import numpy as np
+from tawa.data.augment import Compose, Cutout, Normalize, RandomCrop, RandomFlip
+from tawa.data.cache import CachedDataset, FeatureCache
+from tawa.data.pipeline import DEFAULT_PREFETCH, SharedMemoryLoader
+from tawa.data.shards import ShardedDataset
+
+# per channel statistics of the train split, scaled to [0, 1]
+CIFAR10_MEAN = (0.4914, 0.4822, 0.4465)
+CIFAR10_STD = (0.2470, 0.2435, 0.2616)
+
+
+def load_cifar10(root: str, split: str = "train") -> ShardedDataset:
+    """Open a split of a converted CIFAR-10 dataset.
+
+    Args:
+        root (str): Output directory of the conversion
+        split (str, optional): ``train`` or ``test``. Defaults to "train".
+
+    Returns:
+        ShardedDataset: The split
+    """
+    return ShardedDataset(os.path.join(root, split))
+
+
+def get_class_names(dataset: ShardedDataset) -> List[str]:
+    """Get the class name of every label of a converted split."""
+    return list(dataset.metadata["classes"])
+
+
+def get_cifar10_loader(
+    root: str,
+    split: str = "train",
+    batch_size: int = 256,
+    num_workers: int = 2,
+    prefetch: int = DEFAULT_PREFETCH,
+    augment: bool = True,
+    seed: int = 0,
+    num_replicas: int = 1,
+    rank: int = 0,
+    cache: Optional[FeatureCache] = None,
+) -> SharedMemoryLoader:
+    """Load a converted split with worker processes, shuffled for training.
+
+    Batches have normalized float32 images. The train split is augmented with
+    random crops, flips and cutout unless ``augment`` is False.
+
+    With a cache the split is normalized once and stored, every later epoch
+    and run reads normalized images and the workers only augment them. The
+    padding of crops and cutout is then the mean image instead of black.
+
+    Args:
+        root (str): Output directory of the conversion
+        split (str, optional): ``train`` or ``test``. Defaults to "train".
+        batch_size (int, optional): Samples per batch. Defaults to 256.
+        num_workers (int, optional): Worker processes. Defaults to 2.
+        prefetch (int, optional): Batches produced ahead of training. Defaults to DEFAULT_PREFETCH.
+        augment (bool, optional): Augment the train split. Defaults to True.
+        seed (int, optional): Seed of the shuffling and of the augmentations. Defaults to 0.
+        num_replicas (int, optional): Data parallel processes sharing the split. Defaults to 1.
+        rank (int, optional): Which of the processes loads. Defaults to 0.
+        cache (Optional[FeatureCache], optional): Cache of the normalized split. Defaults to None.
+
+    Returns:
+        SharedMemoryLoader: Loader to close after training
+    """
+    training = split == "train"
+    augmentations = [RandomCrop(padding=4), RandomFlip(), Cutout(size=8)] if training and augment else []
+    normalize = Normalize(CIFAR10_MEAN, CIFAR10_STD)
+    dataset = load_cifar10(root, split)
+    if cache is not None:
+        dataset = CachedDataset(dataset, Compose([normalize]), cache)
+        transform = Compose(augmentations) if augmentations else None
+    else:
+        transform = Compose(augmentations + [normalize])
+    return SharedMemoryLoader(
+        dataset,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        prefetch=prefetch,
+        transform=transform,
+        output_fields={"image": (dataset.fields["image"].shape, np.float32), "label": ((), np.int64)},
+        shuffle=training,
+        drop_last=training,
+        seed=seed,
+        num_replicas=num_replicas,
+        rank=rank,
+    )
@@ -0,0 +1,169 @@
+"""Data parallel training of the cifar10 example over the cores of one host.
+
+Every process is pinned to its own group of cores, loads its share of each
+epoch and trains a replica of the network wrapped in
+``DistributedDataParallel``, which all-reduces the gradients over gloo. The
+run is repeated for every process count and the report gives the throughput
+and the weak scaling efficiency relative to the smallest count::
+
+    eototo exec -env cpu -c "python -m projects.examples.cifar10.distributed --processes 1,2,4 --steps 100"
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import click
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+from projects.examples.cifar10.benchmark import (
+    PHASES,
+    MAX_SYNTHETIC_SAMPLES,
+    parse_int_list,
+    summarize_seconds,
+    train_steps,
+)
+from projects.examples.cifar10.convert import convert_cifar10
+from projects.examples.cifar10.dataset import get_cifar10_loader
+from projects.examples.cifar10.model import build_model
+from tawa.distributed.launcher import DistributedContext, get_scaling_efficiency, launch
+from tawa.distributed.topology import get_allowed_cpus
+
+
+def train_replica(
+    context: DistributedContext,
+    data_dir: str,
+    batch_size: int,
+    num_loader_workers: int,
+    steps: int,
+    warmup_steps: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """Train one replica, run by ``launch`` in every process.
+
+    Args:
+        context (DistributedContext): Rank of the process
+        data_dir (str): Output directory of the cifar10 conversion
+        batch_size (int): Samples per step of this replica
+        num_loader_workers (int): Loader worker processes of this replica
+        steps (int): Timed steps
+        warmup_steps (int): Untimed steps
+        seed (int): Seed of the weights, the shuffling and the augmentations
+
+    Returns:
+        Dict[str, Any]: Timings of this replica
+    """
+    # the same initial weights everywhere, DistributedDataParallel also broadcasts rank 0's
+    torch.manual_seed(seed)
+    model = DistributedDataParallel(build_model())
+    with get_cifar10_loader(
+        data_dir,
+        "train",
+        batch_size=batch_size,
+        num_workers=num_loader_workers,
+        seed=seed,
+        num_replicas=context.world_size,
+        rank=context.rank,
+    ) as loader:
+        timings, elapsed, loss = train_steps(model, loader, steps, warmup_steps)
+    return {
+        "rank": context.rank,
+        "cpus": context.cpus,
+        "elapsed_s": elapsed,
+        "step": summarize_seconds(timings["step"]),
+        "phases": {phase: summarize_seconds(timings[phase]) for phase in PHASES},
+        "final_loss": loss,
+    }
+
+
+def run_scaling(
+    data_dir: str,
+    processes: List[int],
+    batch_size: int,
+    num_loader_workers: int,
+    steps: int,
+    warmup_steps: int,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Train with every process count and compute the scaling efficiency.
+
+    Args:
+        data_dir (str): Output directory of the cifar10 conversion
+        processes (List[int]): Process counts to run
+        batch_size (int): Samples per step of each process
+        num_loader_workers (int): Loader worker processes of each process
+        steps (int): Timed steps
+        warmup_steps (int): Untimed steps
+        seed (int, optional): Seed of every run. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: Results by process count with their throughput and efficiency
+    """
+    runs = {}
+    for world_size in processes:
+        replicas = launch(
+            train_replica,
+            world_size,
+            args=(data_dir, batch_size, num_loader_workers, steps, warmup_steps, seed),
+        )
+        # the step is synchronous, the slowest replica sets the pace
+        elapsed = max(replica["elapsed_s"] for replica in replicas)
+        runs[world_size] = {
+            "processes": world_size,
+            "samples_per_second": world_size * batch_size * steps / elapsed,
+            "replicas": replicas,
+        }
+    efficiency = get_scaling_efficiency({count: run["samples_per_second"] for count, run in runs.items()})
+    for count, run in runs.items():
+        run["scaling_efficiency"] = efficiency[count]
+        click.echo(
+            f"processes {count:>3}: {run['samples_per_second']:>9.1f} samples/s  "
+            f"efficiency {run['scaling_efficiency']:.0%}",
+            err=True,
+        )
+    return {"batch_size_per_process": batch_size, "steps": steps, "runs": list(runs.values())}
+
+
+@click.command(help="Train the cifar10 example data parallel and report the scaling efficiency.")
+@click.option("--data-dir", default=None, type=click.Path(exists=True, file_okay=False), help="Converted CIFAR-10.")
+@click.option("--processes", default="1,2", callback=parse_int_list, help="Process counts, comma separated.")
+@click.option("--batch-size", default=128, type=click.IntRange(min=1), help="Samples per step of each process.")
+@click.option("--loader-workers", default=1, type=click.IntRange(min=0), help="Loader workers of each process.")
+@click.option("--steps", default=50, type=click.IntRange(min=1))
+@click.option("--warmup-steps", default=5, type=click.IntRange(min=0))
+@click.option("--seed", default=0, type=int)
+@click.option("--output", default=None, type=click.Path(dir_okay=False), help="Report path, stdout if not given.")
+def main(
+    data_dir: Optional[str],
+    processes: List[int],
+    batch_size: int,
+    loader_workers: int,
+    steps: int,
+    warmup_steps: int,
+    seed: int,
+    output: Optional[str],
+):
+    if 0 in processes or max(processes) > len(get_allowed_cpus()):
+        raise click.BadParameter(f"process counts must be in [1, {len(get_allowed_cpus())}]", param_hint="--processes")
+    with tempfile.TemporaryDirectory(prefix="cifar10-distributed-") as synthetic_dir:
+        if data_dir is None:
+            train_samples = min(max(processes) * batch_size * (steps + warmup_steps), MAX_SYNTHETIC_SAMPLES)
+            convert_cifar10(synthetic_dir, synthetic_samples={"train": train_samples, "test": 0}, seed=seed)
+        report = run_scaling(
+            data_dir or synthetic_dir, processes, batch_size, loader_workers, steps, warmup_steps, seed
+        )
+    report["data"] = "synthetic" if data_dir is None else os.path.abspath(data_dir)
+
+    report_json = json.dumps(report, indent=2)
+    if output is None:
+        click.echo(report_json)
+    else:
+        with open(output, "w") as report_buffer:
+            report_buffer.write(report_json + "\n")
+        click.secho(f"Wrote the scaling report to {output}", fg="green", err=True)
+
+
+if __name__ == "__main__":
+    main()
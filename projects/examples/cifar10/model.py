@@ -0,0 +1,41 @@
+"""Small convolutional network for CIFAR-10."""
+
+import torch
+from torch import nn
+
+
+def _conv_block(in_channels: int, out_channels: int, pool: bool) -> nn.Sequential:
+    layers = [
+        nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+    ]
+    if pool:
+        layers.append(nn.MaxPool2d(2))
+    return nn.Sequential(*layers)
+
+
+def build_model(num_classes: int = 10, width: int = 32) -> nn.Module:
+    """Build a four block convolutional network in channels last memory format.
+
+    Channels last matches the NHWC batches of the loader, so
+    ``torch.from_numpy(images).permute(0, 3, 1, 2)`` feeds the network without
+    a copy.
+
+    Args:
+        num_classes (int, optional): Number of classes. Defaults to 10.
+        width (int, optional): Channels of the first block, doubled by every following block. Defaults to 32.
+
+    Returns:
+        nn.Module: The network, taking NCHW float images and returning logits
+    """
+    model = nn.Sequential(
+        _conv_block(3, width, pool=False),
+        _conv_block(width, 2 * width, pool=True),
+        _conv_block(2 * width, 4 * width, pool=True),
+        _conv_block(4 * width, 8 * width, pool=True),
+        nn.AdaptiveMaxPool2d(1),
+        nn.Flatten(),
+        nn.Linear(8 * width, num_classes),
+    )
+    return model.to(memory_format=torch.channels_last)
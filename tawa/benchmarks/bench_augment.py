@@ -0,0 +1,39 @@
+"""Batch augmentations of ``tawa.data.augment`` against the same augmentations applied sample by sample.
+
+Both sides augment a CIFAR-10 sized batch of 256 ``32x32x3`` uint8 images with
+a random crop, a random flip, cutout and normalization.
+"""
+
+import numpy as np
+
+from tawa.data.augment import Compose, Cutout, Normalize, RandomCrop, RandomFlip
+
+BATCH_SIZE = 256
+IMAGE_SHAPE = (32, 32, 3)
+MEAN = (0.4914, 0.4822, 0.4465)
+STD = (0.2470, 0.2435, 0.2616)
+
+_images = np.random.default_rng(0).integers(0, 256, size=(BATCH_SIZE,) + IMAGE_SHAPE, dtype=np.uint8)
+_transform = Compose([RandomCrop(padding=4), RandomFlip(), Cutout(size=8), Normalize(MEAN, STD)])
+
+
+def _augment_sample(image: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    height, width, _ = image.shape
+    padded = np.pad(image, ((4, 4), (4, 4), (0, 0)))
+    row, col = rng.integers(0, 9, size=2)
+    image = padded[row : row + height, col : col + width]
+    if rng.random() < 0.5:
+        image = image[:, ::-1]
+    image = image.copy()
+    center_row, center_col = rng.integers(0, height), rng.integers(0, width)
+    image[max(center_row - 4, 0) : center_row + 4, max(center_col - 4, 0) : center_col + 4] = 0
+    return (image / 255 - np.asarray(MEAN)) / np.asarray(STD)
+
+
+def bench_augment_batch():
+    _transform({"image": _images.copy()}, np.random.default_rng(0))
+
+
+def bench_augment_per_sample():
+    rng = np.random.default_rng(0)
+    np.stack([_augment_sample(image, rng) for image in _images]).astype(np.float32)
@@ -0,0 +1,39 @@
+"""Cost of ``MetricsWriter.log`` in a training loop and of aggregating metrics across runs.
+
+The log benchmark opens a writer, queues the metrics of 1000 steps and closes
+it, so the timing includes the one write of the queued records at close. The
+aggregation benchmark reduces a metric of 1000 runs of 100 steps each.
+"""
+
+import functools
+import tempfile
+
+from tawa.datastore.metrics import MetricsStore, MetricsWriter
+
+NUM_STEPS = 1000
+NUM_RUNS = 1000
+
+# removed when the interpreter exits
+_runs_dir = tempfile.TemporaryDirectory(prefix="bench-metrics-")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_store() -> MetricsStore:
+    # built on the first, untimed, call so that benchmarks filtered out cost nothing
+    for run in range(NUM_RUNS):
+        with MetricsWriter(_runs_dir.name, run_id=f"run-{run:04d}") as metrics:
+            for step in range(100):
+                metrics.log_dict({"train/loss": 1 / (step + 1), "val/accuracy": run + step / 100}, step)
+    return MetricsStore(_runs_dir.name)
+
+
+def bench_metrics_log_1000_steps():
+    with tempfile.TemporaryDirectory(prefix="bench-metrics-log-") as root:
+        with MetricsWriter(root, run_id="log", flush_interval=3600) as metrics:
+            for step in range(NUM_STEPS):
+                metrics.log("train/loss", 0.5, step)
+                metrics.log("train/lr", 0.1, step)
+
+
+def bench_metrics_aggregate_1000_runs():
+    _get_store().aggregate("val/accuracy", "max")
@@ -0,0 +1,145 @@
+"""Checkpoints written in a background thread while training goes on.
+
+``save`` copies every array and tensor of the state into a preallocated
+buffer, the snapshot, and returns: the file is written, fsynced and renamed
+into place by a background thread, then the checkpoints beyond the last
+``keep_last`` are removed. The buffer is reused by the next save, which
+waits for the previous write only if checkpoints are taken faster than they
+are written::
+
+    with AsyncCheckpointer("checkpoints", keep_last=3) as checkpointer:
+        for step in range(steps):
+            ...
+            if step % 1000 == 0:
+                checkpointer.save({"model": model.state_dict(), "optimizer": optimizer.state_dict()}, step)
+
+    state = load_checkpoint(get_latest_checkpoint("checkpoints"))
+"""
+
+import os
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tawa.checkpoint.flat_file import CheckpointLayout, write_checkpoint_file
+
+CHECKPOINT_SUFFIX = ".ckpt"
+DEFAULT_PREFIX = "checkpoint"
+DEFAULT_KEEP_LAST = 3
+
+
+def get_checkpoint_name(step: int, prefix: str = DEFAULT_PREFIX) -> str:
+    return f"{prefix}-{step:09d}{CHECKPOINT_SUFFIX}"
+
+
+def list_checkpoints(directory: str, prefix: str = DEFAULT_PREFIX) -> List[str]:
+    """Get the paths of the checkpoints in a directory, sorted by step.
+
+    Args:
+        directory (str): Directory of the checkpoints
+        prefix (str, optional): Prefix of their names. Defaults to DEFAULT_PREFIX.
+
+    Returns:
+        List[str]: Paths of the checkpoints, the last one has the highest step
+    """
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(rf"{re.escape(prefix)}-(\d+){re.escape(CHECKPOINT_SUFFIX)}")
+    steps = {}
+    for file_name in os.listdir(directory):
+        match = pattern.fullmatch(file_name)
+        if match:
+            steps[file_name] = int(match.group(1))
+    return [os.path.join(directory, file_name) for file_name in sorted(steps, key=steps.get)]
+
+
+def get_latest_checkpoint(directory: str, prefix: str = DEFAULT_PREFIX) -> Optional[str]:
+    """Get the path of the checkpoint with the highest step, None if there is none."""
+    checkpoints = list_checkpoints(directory, prefix)
+    return checkpoints[-1] if checkpoints else None
+
+
+class AsyncCheckpointer:
+    """Snapshots states into a reused buffer and writes them in a background thread.
+
+    Args:
+        directory (str): Directory of the checkpoints, created if needed
+        keep_last (int, optional): Checkpoints kept, the older ones are removed after every write. Defaults to
+            DEFAULT_KEEP_LAST.
+        prefix (str, optional): Prefix of the checkpoint names. Defaults to DEFAULT_PREFIX.
+    """
+
+    def __init__(self, directory: str, keep_last: int = DEFAULT_KEEP_LAST, prefix: str = DEFAULT_PREFIX):
+        if keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        self.directory = directory
+        self.keep_last = keep_last
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self._buffer = np.empty(0, dtype=np.uint8)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._pending: Optional[Future] = None
+        # seconds the last save blocked the caller: waiting for the previous write, then copying the state
+        self.last_wait_seconds = 0.0
+        self.last_snapshot_seconds = 0.0
+
+    def __enter__(self) -> "AsyncCheckpointer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def wait(self) -> None:
+        """Wait for the checkpoint being written, raising its error if the write failed."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+    def save(self, state: Any, step: int, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Snapshot a state and write it in the background.
+
+        The state may change as soon as this returns.
+
+        Args:
+            state (Any): Nested dicts, lists and tuples of arrays, tensors and JSON values, ex: state dicts
+            step (int): Step of the checkpoint, in its name
+            metadata (Optional[Dict[str, Any]], optional): JSON serializable metadata, the step is added.
+                Defaults to None.
+
+        Returns:
+            str: Path the checkpoint is written to
+        """
+        layout = CheckpointLayout(state, {**(metadata or {}), "step": step})
+        started = time.perf_counter()
+        # the buffer is still being written
+        self.wait()
+        snapshot_started = time.perf_counter()
+        if len(self._buffer) < layout.nbytes:
+            self._buffer = np.empty(layout.nbytes, dtype=np.uint8)
+        layout.write_prefix(memoryview(self._buffer))
+        layout.copy_arrays(self._buffer)
+        done = time.perf_counter()
+        self.last_wait_seconds = snapshot_started - started
+        self.last_snapshot_seconds = done - snapshot_started
+
+        path = os.path.join(self.directory, get_checkpoint_name(step, self.prefix))
+        self._pending = self._executor.submit(self._write, path, layout.nbytes)
+        return path
+
+    def _write(self, path: str, nbytes: int) -> None:
+        write_checkpoint_file(path, self._buffer, nbytes)
+        for old_path in list_checkpoints(self.directory, self.prefix)[: -self.keep_last]:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Wait for the last checkpoint and stop the background thread."""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
@@ -0,0 +1,261 @@
+"""Flat checkpoint files: a JSON header followed by the raw bytes of every array.
+
+A file starts with the magic ``TAWACKPT``, the length of the header as a
+little endian uint64 and the UTF-8 JSON header, then the data of every array
+or tensor at a 64 byte aligned offset. The header holds the nested state with
+every array replaced by a reference to its dtype, shape and offset, so
+loading parses no data and unpickles nothing: arrays are views of a memory
+map of the file, only the pages read are loaded::
+
+    write_checkpoint("checkpoints/step-1000.ckpt", {"model": model.state_dict(), "step": 1000})
+    state = load_checkpoint("checkpoints/step-1000.ckpt")
+    model.load_state_dict(state["model"])
+
+State is any nesting of dicts, lists and tuples of numpy arrays, torch
+tensors and JSON values. Tensors are loaded back as CPU torch tensors when
+torch is installed, as numpy arrays otherwise.
+"""
+
+import json
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"TAWACKPT"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# magic then the header length
+PREFIX = struct.Struct("<8sQ")
+# keys of the JSON objects standing in for values JSON has no equivalent of
+ARRAY_KEY = "__array__"
+TUPLE_KEY = "__tuple__"
+ITEMS_KEY = "__items__"
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _is_torch_tensor(value: Any) -> bool:
+    # torch is only imported by the caller, a state without tensors works without it
+    torch = sys.modules.get("torch")
+    return torch is not None and isinstance(value, torch.Tensor)
+
+
+@dataclass
+class ArraySpec:
+    """Location of an array in the data of a checkpoint."""
+
+    dtype: str
+    shape: Tuple[int, ...]
+    offset: int
+    nbytes: int
+    # the torch dtype, ex: "bfloat16", None for a numpy array
+    torch_dtype: Optional[str] = None
+
+
+def _get_array_spec(value: Any, offset: int) -> ArraySpec:
+    if _is_torch_tensor(value):
+        torch_dtype = str(value.dtype).removeprefix("torch.")
+        nbytes = value.numel() * value.element_size()
+        try:
+            dtype = np.dtype(torch_dtype).str
+        except TypeError:
+            # ex: numpy has no bfloat16, the elements are raw bytes without torch
+            dtype = f"|V{value.element_size()}"
+        return ArraySpec(dtype, tuple(value.shape), offset, nbytes, torch_dtype)
+    return ArraySpec(value.dtype.str, value.shape, offset, value.nbytes)
+
+
+class CheckpointLayout:
+    """The header and the data layout of a state, computed without copying any array.
+
+    Args:
+        state (Any): Nested dicts, lists and tuples of arrays, tensors and JSON values
+        metadata (Optional[Dict[str, Any]], optional): JSON serializable metadata stored in the header, ex: the
+            step. Defaults to None.
+    """
+
+    def __init__(self, state: Any, metadata: Optional[Dict[str, Any]] = None):
+        self.arrays: List[Any] = []
+        self.specs: List[ArraySpec] = []
+        self._data_bytes = 0
+        encoded_state = self._encode(state)
+        header = {
+            "version": FORMAT_VERSION,
+            "arrays": [
+                {
+                    "dtype": spec.dtype,
+                    "shape": list(spec.shape),
+                    "offset": spec.offset,
+                    "nbytes": spec.nbytes,
+                    "torch_dtype": spec.torch_dtype,
+                }
+                for spec in self.specs
+            ],
+            "state": encoded_state,
+            "metadata": metadata or {},
+        }
+        self.header = json.dumps(header, allow_nan=True).encode()
+        self.data_offset = _align(PREFIX.size + len(self.header))
+        self.nbytes = self.data_offset + self._data_bytes
+
+    def _encode(self, value: Any) -> Any:
+        if isinstance(value, np.ndarray) or _is_torch_tensor(value):
+            spec = _get_array_spec(value, _align(self._data_bytes))
+            self._data_bytes = spec.offset + spec.nbytes
+            self.arrays.append(value)
+            self.specs.append(spec)
+            return {ARRAY_KEY: len(self.specs) - 1}
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, dict):
+            if all(isinstance(key, str) for key in value) and not {ARRAY_KEY, TUPLE_KEY, ITEMS_KEY} & set(value):
+                return {key: self._encode(item) for key, item in value.items()}
+            # ex: the int keys of the state of an optimizer
+            return {ITEMS_KEY: [[self._encode(key), self._encode(item)] for key, item in value.items()]}
+        if isinstance(value, tuple):
+            return {TUPLE_KEY: [self._encode(item) for item in value]}
+        if isinstance(value, list):
+            return [self._encode(item) for item in value]
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        raise ValueError(f"Can not store a {type(value).__name__} in a checkpoint, expected arrays or JSON values")
+
+    def write_prefix(self, buffer: memoryview) -> None:
+        """Write the magic, the header and the padding to the start of a buffer of at least ``nbytes``."""
+        PREFIX.pack_into(buffer, 0, MAGIC, len(self.header))
+        buffer[PREFIX.size : PREFIX.size + len(self.header)] = self.header
+        buffer[PREFIX.size + len(self.header) : self.data_offset] = bytes(
+            self.data_offset - PREFIX.size - len(self.header)
+        )
+
+    def copy_arrays(self, buffer: np.ndarray) -> None:
+        """Copy every array to its offset in a uint8 buffer of at least ``nbytes``, the snapshot of the state."""
+        for value, spec in zip(self.arrays, self.specs):
+            target = buffer[self.data_offset + spec.offset : self.data_offset + spec.offset + spec.nbytes]
+            if spec.torch_dtype is not None:
+                torch = sys.modules["torch"]
+                # copies from any device, a GPU tensor is copied to the buffer without a temporary
+                torch.from_numpy(target).view(value.dtype).view(value.shape).copy_(value)
+            else:
+                np.copyto(target.view(spec.dtype).reshape(spec.shape), value)
+
+
+def write_checkpoint_file(path: str, buffer: np.ndarray, nbytes: int) -> None:
+    """Write the first bytes of a buffer to a checkpoint file atomically.
+
+    The bytes are written and fsynced to a temporary file renamed into place,
+    a reader never sees a partial checkpoint and a crash leaves the previous
+    file intact.
+
+    Args:
+        path (str): Path of the checkpoint
+        buffer (np.ndarray): uint8 buffer with the prefix and the arrays of a CheckpointLayout
+        nbytes (int): Bytes of the checkpoint, the ``nbytes`` of its layout
+    """
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as checkpoint_file:
+            checkpoint_file.write(memoryview(buffer)[:nbytes])
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    # the rename itself is durable once the directory is synced
+    directory_descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
+
+
+def write_checkpoint(path: str, state: Any, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """Write a state to a checkpoint file, blocking until it is on disk.
+
+    Args:
+        path (str): Path of the checkpoint
+        state (Any): Nested dicts, lists and tuples of arrays, tensors and JSON values
+        metadata (Optional[Dict[str, Any]], optional): JSON serializable metadata. Defaults to None.
+    """
+    layout = CheckpointLayout(state, metadata)
+    buffer = np.empty(layout.nbytes, dtype=np.uint8)
+    layout.write_prefix(memoryview(buffer))
+    layout.copy_arrays(buffer)
+    write_checkpoint_file(path, buffer, layout.nbytes)
+
+
+def read_checkpoint_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """Read the header of a checkpoint file.
+
+    Args:
+        path (str): Path of the checkpoint
+
+    Returns:
+        Tuple[Dict[str, Any], int]: Header and the offset of the data in the file
+    """
+    with open(path, "rb") as checkpoint_file:
+        magic, header_bytes = PREFIX.unpack(checkpoint_file.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a tawa checkpoint")
+        header = json.loads(checkpoint_file.read(header_bytes))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {header.get('version')} of {path}")
+    return header, _align(PREFIX.size + header_bytes)
+
+
+def _decode(value: Any, arrays: List[Any]) -> Any:
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if ARRAY_KEY in value:
+        return arrays[value[ARRAY_KEY]]
+    if TUPLE_KEY in value:
+        return tuple(_decode(item, arrays) for item in value[TUPLE_KEY])
+    if ITEMS_KEY in value:
+        return {_decode(key, arrays): _decode(item, arrays) for key, item in value[ITEMS_KEY]}
+    return {key: _decode(item, arrays) for key, item in value.items()}
+
+
+def load_checkpoint(path: str, mmap: bool = True) -> Any:
+    """Load the state of a checkpoint file.
+
+    Args:
+        path (str): Path of the checkpoint
+        mmap (bool, optional): Arrays are copy on write views of a memory map of the file, read lazily, instead of
+            read into memory at once. Defaults to True.
+
+    Returns:
+        Any: The state, with CPU torch tensors for the tensors when torch is installed
+    """
+    header, data_offset = read_checkpoint_header(path)
+    if mmap:
+        # copy on write, the arrays are writable and writing them leaves the file unchanged
+        data = np.memmap(path, dtype=np.uint8, mode="c")
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    arrays = []
+    for array_object in header["arrays"]:
+        start = data_offset + array_object["offset"]
+        raw = np.asarray(data[start : start + array_object["nbytes"]])
+        torch_dtype = array_object["torch_dtype"]
+        if torch_dtype is None:
+            arrays.append(raw.view(array_object["dtype"]).reshape(array_object["shape"]))
+            continue
+        try:
+            import torch
+        except ImportError:
+            torch = None
+        if torch is None or not hasattr(torch, torch_dtype):
+            arrays.append(raw.view(array_object["dtype"]).reshape(array_object["shape"]))
+        else:
+            arrays.append(torch.from_numpy(raw).view(getattr(torch, torch_dtype)).view(array_object["shape"]))
+    return _decode(header["state"], arrays)
@@ -0,0 +1,155 @@
+"""Image augmentations applied to whole batches with numpy.
+
+Every augmentation takes a ``(N, H, W, C)`` batch and a generator and draws
+one set of random parameters per sample at once, then applies them with a
+handful of vectorized operations instead of a python loop over samples.
+Augmentations that keep the dtype modify the batch in place and return it.
+The same generator seed always gives the same output.
+
+``Compose`` chains augmentations into a transform of ``tawa.data.pipeline``::
+
+    transform = Compose([RandomCrop(padding=4), RandomFlip(), Cutout(size=8), Normalize(mean, std)])
+    loader = SharedMemoryLoader(
+        dataset,
+        batch_size=256,
+        transform=transform,
+        output_fields={"image": ((32, 32, 3), np.float32), "label": ((), np.int64)},
+    )
+
+Augmentations are plain classes so they pickle to worker processes with any
+start method.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class RandomCrop:
+    """Crop every image at a random offset of the image padded on each side.
+
+    Args:
+        padding (int, optional): Pixels added on each side before cropping. Defaults to 4.
+        fill (float, optional): Value of the padding. Defaults to 0.
+    """
+
+    def __init__(self, padding: int = 4, fill: float = 0):
+        if padding < 0:
+            raise ValueError(f"padding can not be negative, got {padding}")
+        self.padding = padding
+        self.fill = fill
+
+    def __call__(self, images: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        num_images, height, width, _ = images.shape
+        offset_rows = rng.integers(0, 2 * self.padding + 1, size=num_images)
+        offset_cols = rng.integers(0, 2 * self.padding + 1, size=num_images)
+        if not self.padding or not num_images:
+            return images
+        pad = ((0, 0), (self.padding, self.padding), (self.padding, self.padding), (0, 0))
+        padded = np.pad(images, pad, constant_values=self.fill)
+        # at most (2 * padding + 1) ** 2 distinct offsets, each copied as a block of whole images,
+        # much faster than indexing every pixel separately
+        offset_keys = offset_rows * (2 * self.padding + 1) + offset_cols
+        order = np.argsort(offset_keys, kind="stable")
+        boundaries = np.flatnonzero(np.diff(offset_keys[order])) + 1
+        for group in np.split(order, boundaries):
+            row, col = offset_rows[group[0]], offset_cols[group[0]]
+            images[group] = padded[group, row : row + height, col : col + width]
+        return images
+
+
+class RandomFlip:
+    """Mirror images left to right.
+
+    Args:
+        p (float, optional): Probability of mirroring an image. Defaults to 0.5.
+    """
+
+    def __init__(self, p: float = 0.5):
+        self.p = p
+
+    def __call__(self, images: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        flip = rng.random(len(images)) < self.p
+        images[flip] = images[flip, :, ::-1]
+        return images
+
+
+class Cutout:
+    """Fill a square at a random center of every image, the square is clipped at the borders.
+
+    Args:
+        size (int, optional): Side of the square in pixels. Defaults to 8.
+        p (float, optional): Probability of cutting out a square of an image. Defaults to 1.0.
+        fill (float, optional): Value of the square. Defaults to 0.
+    """
+
+    def __init__(self, size: int = 8, p: float = 1.0, fill: float = 0):
+        if size <= 0:
+            raise ValueError(f"size must be positive, got {size}")
+        self.size = size
+        self.p = p
+        self.fill = fill
+
+    def __call__(self, images: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        num_images, height, width, _ = images.shape
+        center_rows = rng.integers(0, height, size=num_images)
+        center_cols = rng.integers(0, width, size=num_images)
+        apply = rng.random(num_images) < self.p
+        first_rows = center_rows - self.size // 2
+        first_cols = center_cols - self.size // 2
+        rows = np.arange(height) - first_rows[:, None]
+        cols = np.arange(width) - first_cols[:, None]
+        in_rows = (rows >= 0) & (rows < self.size) & apply[:, None]
+        in_cols = (cols >= 0) & (cols < self.size)
+        images[in_rows[:, :, None] & in_cols[:, None, :]] = self.fill
+        return images
+
+
+class Normalize:
+    """Scale images to floats and standardize every channel, returns a new array.
+
+    Computed as ``images * (scale / std) - mean / std`` in two passes over the
+    batch.
+
+    Args:
+        mean (Sequence[float]): Mean per channel, after scaling
+        std (Sequence[float]): Standard deviation per channel, after scaling
+        scale (float, optional): Applied before standardizing, ex: 1 / 255 for uint8 images. Defaults to 1 / 255.
+        dtype (np.dtype, optional): Output dtype. Defaults to np.float32.
+    """
+
+    def __init__(self, mean: Sequence[float], std: Sequence[float], scale: float = 1 / 255, dtype=np.float32):
+        if len(mean) != len(std):
+            raise ValueError(f"mean and std need a value per channel, got {len(mean)} and {len(std)}")
+        self.dtype = np.dtype(dtype)
+        self.multiplier = (scale / np.asarray(std, dtype=np.float64)).astype(self.dtype)
+        self.offset = (np.asarray(mean, dtype=np.float64) / np.asarray(std, dtype=np.float64)).astype(self.dtype)
+
+    def __call__(self, images: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        normalized = np.multiply(images, self.multiplier, dtype=self.dtype)
+        normalized -= self.offset
+        return normalized
+
+
+class Compose:
+    """Apply augmentations in order to one field of a batch, a transform of ``tawa.data.pipeline``.
+
+    Without a generator it is a deterministic transform for ``tawa.data.cache``,
+    ex: ``Compose([Normalize(mean, std)])``.
+
+    Args:
+        augmentations (List): Augmentations called with the images and the generator
+        field (str, optional): Field of the images in the batch. Defaults to "image".
+    """
+
+    def __init__(self, augmentations: List, field: str = "image"):
+        self.augmentations = list(augmentations)
+        self.field = field
+
+    def __call__(
+        self, batch: Dict[str, np.ndarray], rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, np.ndarray]:
+        images = batch[self.field]
+        for augmentation in self.augmentations:
+            images = augmentation(images, rng)
+        return {**batch, self.field: images}
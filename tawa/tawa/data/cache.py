@@ -0,0 +1,414 @@
+"""On disk cache of deterministic preprocessing, shard by shard.
+
+The output of a deterministic transform, ex: decoding or normalization, on a
+source shard is computed once and stored as ``.npy`` files in the cache dir.
+Every later epoch and run memory maps the stored arrays instead of computing
+them again. Entries are keyed by a fingerprint of the transform and of the
+source shard, its path, size and modification time, so changing either one
+computes a new entry. The fingerprint of a transform covers its parameters and
+its code: the methods of its class and base classes, and the functions and
+classes its code references through module globals, followed through the
+project's modules. Code of installed packages, ex: numpy, and anything reached
+another way, ex: through ``getattr`` or data files, is not covered: bump a
+``cache_version`` class attribute of the transform when such a change alters
+its output::
+
+    class Tokenize:
+        # the vocabulary file changed
+        cache_version = 2
+
+The cache is capped in size, the least recently used entries are evicted
+first. Entries are written to a temporary directory and renamed into place,
+processes sharing a cache dir never read a partial entry::
+
+    cache = FeatureCache(max_bytes=8 * 2**30)
+    dataset = CachedDataset(ShardedDataset("data/cifar10/train"), Compose([Normalize(mean, std)]), cache)
+    loader = SharedMemoryLoader(dataset, batch_size=256, transform=Compose([RandomCrop(), RandomFlip()]))
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import site
+import sys
+import sysconfig
+import tempfile
+import types
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from tawa.data.shards import FieldSpec, ShardedDataset, get_shard_file_name
+
+# same cache dir as tawa-inner-cli, it survives between containers through the project bind mount
+TAWA_CACHE_DIR_ENV_VAR = "TAWA_CACHE_DIR"
+DEFAULT_TAWA_CACHE_DIR = ".tawa_cache"
+FEATURE_CACHE_SUB_DIR = "features"
+DEFAULT_MAX_BYTES = 16 * 2**30
+# bump when the layout of entries changes so old entries are never read
+CACHE_FORMAT_VERSION = 1
+ENTRY_META_FILE_NAME = "meta.json"
+
+# Deterministic transform of a batch, ex: Compose([Normalize(mean, std)])
+DeterministicTransform = Callable[[Dict[str, np.ndarray]], Dict[str, np.ndarray]]
+
+
+def get_feature_cache_dir() -> str:
+    """Get the default feature cache dir under the tawa cache dir."""
+    return os.path.join(os.environ.get(TAWA_CACHE_DIR_ENV_VAR, DEFAULT_TAWA_CACHE_DIR), FEATURE_CACHE_SUB_DIR)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_library_dirs() -> Tuple[str, ...]:
+    paths = [sysconfig.get_path(name) for name in ("stdlib", "platstdlib", "purelib", "platlib")]
+    paths.extend(site.getsitepackages() + [site.getusersitepackages()])
+    return tuple(sorted({os.path.join(os.path.realpath(path), "") for path in paths if path}))
+
+
+@functools.lru_cache(maxsize=None)
+def _is_project_file(path: str) -> bool:
+    return not os.path.realpath(path).startswith(_get_library_dirs())
+
+
+def _is_project_module(module_name: Optional[str]) -> bool:
+    module = sys.modules.get(module_name or "")
+    if module is None:
+        return False
+    path = getattr(module, "__file__", None)
+    if path is None:
+        # ex: a notebook, builtin modules are not project code
+        return module_name == "__main__"
+    return _is_project_file(path)
+
+
+def _iter_code_names(code: types.CodeType) -> Iterator[str]:
+    yield from code.co_names
+    for constant in code.co_consts:
+        # nested functions, lambdas and comprehensions
+        if isinstance(constant, types.CodeType):
+            yield from _iter_code_names(constant)
+
+
+def _get_referenced_globals(function: types.FunctionType) -> Dict[str, Any]:
+    """Get the project functions and classes a function references through its globals."""
+    names = set(_iter_code_names(function.__code__))
+    referenced = {}
+    for name in names:
+        value = function.__globals__.get(name)
+        if isinstance(value, types.ModuleType) and _is_project_module(value.__name__):
+            # ex: helpers.scale(image), the attribute name is among the names of the code
+            for attribute_name in names:
+                attribute = vars(value).get(attribute_name)
+                if isinstance(attribute, (types.FunctionType, type)) and _is_project_module(attribute.__module__):
+                    referenced[f"{name}.{attribute_name}"] = attribute
+        elif isinstance(value, (types.FunctionType, type)) and _is_project_module(value.__module__):
+            referenced[name] = value
+    return referenced
+
+
+def _get_class_members(cls: type) -> Dict[str, Any]:
+    """Get the methods and the constants of a class, ex: its cache_version."""
+    members = {}
+    for name, member in vars(cls).items():
+        if isinstance(member, (staticmethod, classmethod)):
+            member = member.__func__
+        if isinstance(member, property):
+            member = (member.fget, member.fset, member.fdel)
+        if isinstance(member, (types.FunctionType, tuple)):
+            members[name] = member
+        elif not name.startswith("__") and (member is None or isinstance(member, (bool, int, float, str, bytes))):
+            members[name] = member
+    return members
+
+
+def _update_fingerprint(digest: Any, value: Any, seen: Optional[Set[int]] = None) -> None:
+    # functions and classes already hashed, they may reference each other
+    seen = set() if seen is None else seen
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"ndarray:{value.dtype.str}:{value.shape};".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.generic):
+        _update_fingerprint(digest, value.item(), seen)
+    elif isinstance(value, np.dtype):
+        digest.update(f"dtype:{value.str};".encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}[".encode())
+        for item in value:
+            _update_fingerprint(digest, item, seen)
+        digest.update(b"]")
+    elif isinstance(value, dict):
+        digest.update(f"dict:{len(value)}{{".encode())
+        for key in sorted(value, key=repr):
+            _update_fingerprint(digest, key, seen)
+            _update_fingerprint(digest, value[key], seen)
+        digest.update(b"}")
+    elif isinstance(value, types.CodeType):
+        digest.update(value.co_code)
+        _update_fingerprint(digest, value.co_consts, seen)
+        _update_fingerprint(digest, value.co_names, seen)
+    elif isinstance(value, types.FunctionType):
+        digest.update(f"function:{value.__module__}.{value.__qualname__};".encode())
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _update_fingerprint(digest, value.__code__, seen)
+        _update_fingerprint(digest, value.__defaults__, seen)
+        _update_fingerprint(digest, value.__kwdefaults__, seen)
+        _update_fingerprint(digest, [cell.cell_contents for cell in value.__closure__ or ()], seen)
+        # the helpers it calls change what it computes too
+        _update_fingerprint(digest, _get_referenced_globals(value), seen)
+    elif isinstance(value, types.MethodType):
+        _update_fingerprint(digest, value.__func__, seen)
+        _update_fingerprint(digest, value.__self__, seen)
+    elif isinstance(value, type):
+        digest.update(f"type:{value.__module__}.{value.__qualname__};".encode())
+        if id(value) in seen or not _is_project_module(value.__module__):
+            return
+        seen.add(id(value))
+        _update_fingerprint(digest, _get_class_members(value), seen)
+    elif hasattr(value, "__dict__"):
+        digest.update(f"object:{type(value).__module__}.{type(value).__qualname__};".encode())
+        # ex: __call__ and the methods it calls, inherited ones included
+        _update_fingerprint(digest, type(value).__mro__, seen)
+        _update_fingerprint(digest, vars(value), seen)
+    else:
+        raise ValueError(f"Can not fingerprint {type(value).__name__}, the transform must be deterministic")
+
+
+def fingerprint(*values: Any) -> str:
+    """Fingerprint transforms and their parameters, stable across processes and runs.
+
+    Objects are fingerprinted by their attributes and the methods and
+    constants of their classes, functions by their bytecode, constants,
+    defaults and the functions and classes they reference through their
+    globals, arrays by their bytes. Code is only followed in project modules,
+    the ones outside of the standard library and installed packages.
+
+    Args:
+        *values (Any): Values to fingerprint
+
+    Returns:
+        str: Hex digest
+
+    Raises:
+        ValueError: If a value can not be fingerprinted
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_fingerprint(digest, (CACHE_FORMAT_VERSION,) + values)
+    return digest.hexdigest()
+
+
+def get_source_shard_fingerprint(dataset: ShardedDataset, shard_index: int) -> str:
+    """Fingerprint a shard of a dataset by the path, size and modification time of its files."""
+    files = []
+    for name, spec in dataset.fields.items():
+        path = os.path.abspath(os.path.join(dataset.root, get_shard_file_name(name, shard_index)))
+        stat = os.stat(path)
+        files.append((name, spec.dtype, spec.shape, path, stat.st_size, stat.st_mtime_ns))
+    return fingerprint(dataset.shard_lengths[shard_index], files)
+
+
+class FeatureCache:
+    """Size capped, least recently used cache of arrays in a directory.
+
+    Args:
+        cache_dir (Optional[str], optional): Directory of the cache. Defaults to None (get_feature_cache_dir()).
+        max_bytes (int, optional): Size the cache is evicted down to after every insert. Defaults to DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir if cache_dir is not None else get_feature_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _get_entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _open(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        entry_dir = self._get_entry_dir(key)
+        meta_path = os.path.join(entry_dir, ENTRY_META_FILE_NAME)
+        try:
+            with open(meta_path, "r") as meta_buffer:
+                meta = json.load(meta_buffer)
+            arrays = {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+            # the modification time of the meta file orders the entries for eviction
+            os.utime(meta_path)
+        except FileNotFoundError:
+            # not cached, or evicted by another process while opening
+            return None
+        return arrays
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Get the read only memory mapped arrays of an entry and mark it as used.
+
+        Args:
+            key (str): Key of the entry
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: Arrays by name, None if the entry is not cached
+        """
+        arrays = self._open(key)
+        if arrays is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Store arrays as an entry, then evict the least recently used entries above the size cap.
+
+        Args:
+            key (str): Key of the entry
+            arrays (Dict[str, np.ndarray]): Arrays by name
+
+        Returns:
+            Dict[str, np.ndarray]: The stored arrays, memory mapped
+        """
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=self.cache_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            entry_bytes = sum(os.path.getsize(os.path.join(tmp_dir, file_name)) for file_name in os.listdir(tmp_dir))
+            with open(os.path.join(tmp_dir, ENTRY_META_FILE_NAME), "w") as meta_buffer:
+                json.dump({"arrays": list(arrays), "bytes": entry_bytes}, meta_buffer)
+            os.rename(tmp_dir, self._get_entry_dir(key))
+        except OSError:
+            # another process stored the same entry first
+            if not os.path.exists(os.path.join(self._get_entry_dir(key), ENTRY_META_FILE_NAME)):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict(keep=key)
+        stored = self._open(key)
+        return stored if stored is not None else arrays
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """Get an entry, computing and storing it when it is not cached.
+
+        Args:
+            key (str): Key of the entry
+            compute (Callable[[], Dict[str, np.ndarray]]): Computes the arrays of the entry
+
+        Returns:
+            Dict[str, np.ndarray]: Arrays by name, memory mapped
+        """
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = self.put(key, compute())
+        return arrays
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self._get_entry_dir(key), ENTRY_META_FILE_NAME)
+            try:
+                with open(meta_path, "r") as meta_buffer:
+                    entry_bytes = json.load(meta_buffer)["bytes"]
+                entries.append((os.stat(meta_path).st_mtime, entry_bytes, key))
+            except (FileNotFoundError, NotADirectoryError):
+                # a temporary directory being written or an entry being evicted
+                continue
+        return entries
+
+    def get_size(self) -> int:
+        """Get the bytes of all entries."""
+        return sum(entry_bytes for _, entry_bytes, _ in self._list_entries())
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Evict the least recently used entries until the cache fits its size cap.
+
+        Memory maps of evicted entries stay valid, the files are only freed
+        once they are closed.
+
+        Args:
+            keep (Optional[str], optional): Entry never evicted, ex: the one just stored. Defaults to None.
+
+        Returns:
+            List[str]: Keys of the evicted entries
+        """
+        entries = sorted(self._list_entries())
+        total = sum(entry_bytes for _, entry_bytes, _ in entries)
+        evicted = []
+        for _, entry_bytes, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._get_entry_dir(key), ignore_errors=True)
+            total -= entry_bytes
+            evicted.append(key)
+        return evicted
+
+
+class CachedDataset(ShardedDataset):
+    """A sharded dataset seen through a deterministic transform whose output is cached per shard.
+
+    Shards are transformed and stored on first access, then memory mapped from
+    the cache. The first shard is transformed when the dataset is created to
+    learn the fields of the output.
+
+    Args:
+        source (ShardedDataset): Dataset to transform
+        transform (DeterministicTransform): Deterministic transform of a batch of samples, keeping their number
+        cache (Optional[FeatureCache], optional): Cache of the transformed shards. Defaults to None (a FeatureCache
+            in the default cache dir).
+    """
+
+    def __init__(
+        self,
+        source: ShardedDataset,
+        transform: DeterministicTransform,
+        cache: Optional[FeatureCache] = None,
+    ):
+        self.source = source
+        self.transform = transform
+        self.cache = cache if cache is not None else FeatureCache()
+        self.transform_fingerprint = fingerprint(transform)
+        self.root = source.root
+        self.shard_size = source.shard_size
+        self.shard_lengths = source.shard_lengths
+        self.metadata = source.metadata
+        self._length = len(source)
+        self._shards = {}
+        self.fields = dict(source.fields)
+        if self.shard_lengths:
+            self.fields = {
+                name: FieldSpec(dtype=array.dtype.str, shape=tuple(array.shape[1:]))
+                for name, array in self.get_shard(0).items()
+            }
+
+    def get_shard_key(self, shard_index: int) -> str:
+        """Get the cache key of a transformed shard."""
+        return fingerprint(self.transform_fingerprint, get_source_shard_fingerprint(self.source, shard_index))
+
+    def _transform_shard(self, shard_index: int) -> Dict[str, np.ndarray]:
+        shard = self.source.get_shard(shard_index)
+        output = self.transform(dict(shard))
+        length = self.shard_lengths[shard_index]
+        for name, array in output.items():
+            if len(array) != length:
+                raise ValueError(f"The transform returned {len(array)} samples of {name}, expected {length}")
+        return output
+
+    def get_shard(self, shard_index: int) -> Dict[str, np.ndarray]:
+        """Get the transformed arrays of a shard, computed and cached on first access.
+
+        Args:
+            shard_index (int): Index of the shard
+
+        Returns:
+            Dict[str, np.ndarray]: Memory mapped arrays per field with the samples on the first axis
+        """
+        shard = self._shards.get(shard_index)
+        if shard is None:
+            shard = self.cache.get_or_compute(
+                self.get_shard_key(shard_index), lambda: self._transform_shard(shard_index)
+            )
+            self._shards[shard_index] = shard
+        return shard
@@ -0,0 +1,382 @@
+"""Multiprocess batch loading through a shared memory ring buffer.
+
+Worker processes gather, decode and augment batches straight into
+preallocated slots of one shared memory segment, only the slot index and a
+few counters travel through the queues. The training loop receives each batch
+as numpy views of its slot, nothing is pickled or copied on the way::
+
+    dataset = ShardedDataset("data/cifar10/train")
+    with SharedMemoryLoader(dataset, batch_size=256, num_workers=4, shuffle=True) as loader:
+        for epoch in range(epochs):
+            for batch in loader:
+                train_step(batch["image"], batch["label"])
+        print(loader.stats.samples_per_second)
+
+A batch stays valid until the next one is requested, its slot is then handed
+back to the workers. Copy the arrays to keep them longer.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import traceback
+import weakref
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tawa.data.shards import FieldSpec, ShardedDataset
+
+DEFAULT_PREFETCH = 4
+# field blocks start on cache line boundaries so workers never share a line
+SLOT_ALIGNMENT = 64
+WORKER_POLL_SECONDS = 1.0
+WORKER_JOIN_SECONDS = 5.0
+
+# Augments a batch given a generator seeded for that batch, ex: random crops.
+# May modify the batch in place and return it, or return new arrays.
+Transform = Callable[[Dict[str, np.ndarray], np.random.Generator], Dict[str, np.ndarray]]
+
+
+def _align(size: int) -> int:
+    return -(-size // SLOT_ALIGNMENT) * SLOT_ALIGNMENT
+
+
+class BatchRingBuffer:
+    """Fixed number of batch slots in one shared memory segment.
+
+    Pickling sends the name of the segment only, the receiving process
+    attaches to the same memory.
+
+    Args:
+        fields (Dict[str, FieldSpec]): Shape and dtype of one sample per field
+        batch_size (int): Samples per slot
+        num_slots (int): Number of slots
+        name (Optional[str], optional): Segment to attach to, a new one is created if None. Defaults to None.
+    """
+
+    def __init__(self, fields: Dict[str, FieldSpec], batch_size: int, num_slots: int, name: Optional[str] = None):
+        self.fields = fields
+        self.batch_size = batch_size
+        self.num_slots = num_slots
+        field_offsets = {}
+        slot_bytes = 0
+        for field_name, spec in fields.items():
+            field_offsets[field_name] = slot_bytes
+            slot_bytes += _align(batch_size * spec.sample_bytes)
+        self.slot_bytes = slot_bytes
+        # only the creating process frees the segment, not forked children inheriting the buffer
+        self._owner_pid = os.getpid() if name is None else None
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(slot_bytes * num_slots, 1))
+        self._slots: List[Dict[str, np.ndarray]] = [
+            {
+                field_name: np.ndarray(
+                    (batch_size,) + spec.shape,
+                    dtype=spec.dtype,
+                    buffer=self._shm.buf,
+                    offset=slot_index * slot_bytes + field_offsets[field_name],
+                )
+                for field_name, spec in fields.items()
+            }
+            for slot_index in range(num_slots)
+        ]
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (BatchRingBuffer, (self.fields, self.batch_size, self.num_slots, self.name))
+
+    def get_slot(self, slot_index: int) -> Dict[str, np.ndarray]:
+        """Get the arrays of a slot, views of the shared memory with ``batch_size`` samples."""
+        return self._slots[slot_index]
+
+    def close(self) -> None:
+        """Detach from the segment, the creating process also frees it."""
+        if self._shm is None:
+            return
+        self._slots = []
+        try:
+            self._shm.close()
+        except BufferError:
+            # a caller still holds views of a slot, the mapping goes away with them
+            pass
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+
+
+@dataclass
+class PipelineStats:
+    """Throughput counters of a loader, accumulated over all epochs."""
+
+    batches: int = 0
+    samples: int = 0
+    # time the training loop spent blocked on the next batch
+    wait_seconds: float = 0.0
+    # time the workers spent producing batches, summed over workers
+    worker_seconds: float = 0.0
+    # wall time of the epochs, including the training loop's steps on the batches
+    elapsed_seconds: float = 0.0
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def wait_fraction(self) -> float:
+        return self.wait_seconds / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _fill_slot(
+    dataset: ShardedDataset,
+    ring: BatchRingBuffer,
+    transform: Optional[Transform],
+    slot_index: int,
+    indices: np.ndarray,
+    seed: Sequence[int],
+) -> None:
+    slot = {name: array[: len(indices)] for name, array in ring.get_slot(slot_index).items()}
+    in_place = ring.fields == dataset.fields
+    # gather straight into the slot when the samples keep their layout
+    batch = dataset.get_batch(indices, out=slot if in_place else None)
+    if transform is None:
+        return
+    batch = transform(batch, np.random.default_rng(seed))
+    for name, target in slot.items():
+        output = batch[name]
+        if output is target:
+            continue
+        if output.shape != target.shape:
+            raise ValueError(f"The transform returned {name} with shape {output.shape}, expected {target.shape}")
+        np.copyto(target, output, casting="same_kind")
+
+
+def _worker_loop(
+    dataset: ShardedDataset,
+    ring: BatchRingBuffer,
+    transform: Optional[Transform],
+    task_queue: Any,
+    result_queue: Any,
+) -> None:
+    # interrupts are handled by the training loop, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                return
+            batch_index, slot_index, indices, seed = task
+            started = time.perf_counter()
+            try:
+                _fill_slot(dataset, ring, transform, slot_index, indices, seed)
+                error = None
+            except Exception:
+                error = traceback.format_exc()
+            result_queue.put((batch_index, slot_index, len(indices), time.perf_counter() - started, error))
+    finally:
+        ring.close()
+
+
+def _shutdown(workers: List[Any], task_queue: Any, ring: BatchRingBuffer) -> None:
+    for _ in workers:
+        task_queue.put(None)
+    for worker in workers:
+        worker.join(WORKER_JOIN_SECONDS)
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
+    ring.close()
+
+
+class SharedMemoryLoader:
+    """Iterates over batches of a sharded dataset produced by worker processes.
+
+    Up to ``prefetch`` batches are produced ahead of the training loop, each
+    into its own slot of a shared memory ring buffer. Batches are yielded in
+    order, views of their slot, and the slot is reused once the next batch is
+    requested. The workers live as long as the loader, close it or use it as
+    a context manager.
+
+    Args:
+        dataset (ShardedDataset): Dataset to load
+        batch_size (int): Samples per batch
+        num_workers (int, optional): Worker processes, 0 loads in the calling process. Defaults to 2.
+        prefetch (int, optional): Batches produced ahead of the training loop. Defaults to DEFAULT_PREFETCH.
+        transform (Optional[Transform], optional): Applied to every batch in the workers. Defaults to None.
+        output_fields (Optional[Dict[str, Tuple[Sequence[int], Any]]], optional): Shape and dtype of one sample
+            per field after the transform, ex: float images after normalization. Defaults to None (the dataset's).
+        shuffle (bool, optional): Visit the samples in a new random order every epoch. Defaults to False.
+        drop_last (bool, optional): Skip a last batch smaller than batch_size. Defaults to False.
+        seed (int, optional): Seed of the shuffling and of the transform. Defaults to 0.
+        num_replicas (int, optional): Data parallel processes splitting every epoch between them, every one
+            gets the same number of batches. Defaults to 1.
+        rank (int, optional): Which of the replicas loads, with the same seed in every replica. Defaults to 0.
+        start_method (Optional[str], optional): multiprocessing start method. Defaults to None (the platform's).
+    """
+
+    def __init__(
+        self,
+        dataset: ShardedDataset,
+        batch_size: int,
+        num_workers: int = 2,
+        prefetch: int = DEFAULT_PREFETCH,
+        transform: Optional[Transform] = None,
+        output_fields: Optional[Dict[str, Tuple[Sequence[int], Any]]] = None,
+        shuffle: bool = False,
+        drop_last: bool = False,
+        seed: int = 0,
+        num_replicas: int = 1,
+        rank: int = 0,
+        start_method: Optional[str] = None,
+    ):
+        if batch_size <= 0:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        if num_workers < 0:
+            raise ValueError(f"num_workers can not be negative, got {num_workers}")
+        if prefetch <= 0:
+            raise ValueError(f"prefetch must be positive, got {prefetch}")
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f"rank must be in [0, {num_replicas}), got {rank}")
+        if output_fields is None:
+            fields = dict(dataset.fields)
+        else:
+            fields = {
+                name: FieldSpec(dtype=np.dtype(dtype).str, shape=tuple(int(dim) for dim in shape))
+                for name, (shape, dtype) in output_fields.items()
+            }
+        if transform is None and fields != dataset.fields:
+            raise ValueError("output_fields can only differ from the fields of the dataset with a transform")
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = prefetch if num_workers else 1
+        self.transform = transform
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.stats = PipelineStats()
+        self._epoch = 0
+        self._outstanding = 0
+        # one slot more than the batches in flight, for the batch the training loop holds
+        self.ring = BatchRingBuffer(fields, batch_size, self.prefetch + 1)
+
+        context = multiprocessing.get_context(start_method)
+        self._task_queue = context.Queue()
+        self._result_queue = context.Queue()
+        self._workers = []
+        for worker_index in range(num_workers):
+            worker = context.Process(
+                target=_worker_loop,
+                args=(dataset, self.ring, transform, self._task_queue, self._result_queue),
+                name=f"tawa-loader-{worker_index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers, self._task_queue, self.ring)
+
+    @property
+    def num_samples(self) -> int:
+        """Samples this replica loads per epoch."""
+        return len(self.dataset) // self.num_replicas
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return self.num_samples // self.batch_size
+        return -(-self.num_samples // self.batch_size)
+
+    def __enter__(self) -> "SharedMemoryLoader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._finalizer()
+
+    def _get_batch_indices(self, epoch: int) -> List[np.ndarray]:
+        if self.shuffle:
+            order = np.random.default_rng([self.seed, epoch]).permutation(len(self.dataset))
+        else:
+            order = np.arange(len(self.dataset))
+        # replicas take interleaved samples, the remainder is left out so they all take as many steps
+        order = order[self.rank :: self.num_replicas][: self.num_samples]
+        return [order[start : start + self.batch_size] for start in range(0, len(order), self.batch_size)][: len(self)]
+
+    def _receive(self) -> Tuple[int, int, int, Optional[str]]:
+        while True:
+            try:
+                result = self._result_queue.get(timeout=WORKER_POLL_SECONDS)
+                break
+            except queue.Empty:
+                dead = [worker for worker in self._workers if not worker.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Loader worker {dead[0].name} exited with code {dead[0].exitcode}")
+        batch_index, slot_index, count, worker_seconds, error = result
+        self._outstanding -= 1
+        self.stats.worker_seconds += worker_seconds
+        return batch_index, slot_index, count, error
+
+    def _drain(self) -> None:
+        # results of an epoch the training loop stopped early, their errors no longer matter
+        while self._outstanding:
+            self._receive()
+
+    def __iter__(self) -> Iterator[Dict[str, np.ndarray]]:
+        if not self._finalizer.alive:
+            raise ValueError("The loader is closed")
+        self._drain()
+        epoch = self._epoch
+        self._epoch += 1
+        batch_indices = self._get_batch_indices(epoch)
+        free_slots = list(range(self.ring.num_slots))
+        ready: Dict[int, Tuple[int, int]] = {}
+        next_to_submit = 0
+        last_time = time.perf_counter()
+
+        for batch_index in range(len(batch_indices)):
+            if not self._workers:
+                slot_index = free_slots[0]
+                started = time.perf_counter()
+                seed = (self.seed, epoch, batch_index)
+                _fill_slot(self.dataset, self.ring, self.transform, slot_index, batch_indices[batch_index], seed)
+                self.stats.worker_seconds += time.perf_counter() - started
+                self.stats.wait_seconds += time.perf_counter() - started
+                ready[batch_index] = (slot_index, len(batch_indices[batch_index]))
+            else:
+                while (
+                    free_slots and next_to_submit < len(batch_indices) and next_to_submit - batch_index < self.prefetch
+                ):
+                    seed = (self.seed, epoch, next_to_submit)
+                    self._task_queue.put((next_to_submit, free_slots.pop(), batch_indices[next_to_submit], seed))
+                    self._outstanding += 1
+                    next_to_submit += 1
+                wait_started = time.perf_counter()
+                while batch_index not in ready:
+                    received_index, slot_index, count, error = self._receive()
+                    if error is not None:
+                        raise RuntimeError(f"Loader worker failed on batch {received_index}:\n{error}")
+                    ready[received_index] = (slot_index, count)
+                self.stats.wait_seconds += time.perf_counter() - wait_started
+
+            slot_index, count = ready.pop(batch_index)
+            self.stats.batches += 1
+            self.stats.samples += count
+            # since the previous batch was handed out, so the consumer's step between batches is included
+            now = time.perf_counter()
+            self.stats.elapsed_seconds += now - last_time
+            last_time = now
+            yield {name: array[:count] for name, array in self.ring.get_slot(slot_index).items()}
+            if self._workers:
+                free_slots.append(slot_index)
+        # the step on the last batch, an epoch stopped early ends at its last batch
+        self.stats.elapsed_seconds += time.perf_counter() - last_time
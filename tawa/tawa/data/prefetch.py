@@ -0,0 +1,396 @@
+"""Concurrent prefetching of dataset shards from an object store to local disk.
+
+Objects are downloaded with ranged reads of ``part_size`` bytes, at most
+``max_concurrency`` requests in flight, into a content addressed cache:
+every file is stored once under the sha256 of its content, and a reference
+from the bucket, key, ETag and size of an object to that digest lets later
+runs skip the download. The cache is capped in size, the least recently used
+files are evicted first.
+
+Files are handed out as soon as each one lands, in completion order, so the
+data pipeline starts on the first shards while the others download::
+
+    for shard_index in download_sharded_dataset("s3://my-bucket/cifar10/train", "data/cifar10/train"):
+        ...
+
+    dataset = ShardedDataset("data/cifar10/train")
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import tempfile
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from tawa.data.cache import DEFAULT_MAX_BYTES, DEFAULT_TAWA_CACHE_DIR, TAWA_CACHE_DIR_ENV_VAR, fingerprint
+from tawa.data.remote import S3Client, parse_s3_url
+from tawa.data.shards import INDEX_FILE_NAME, get_shard_file_name
+
+OBJECT_CACHE_SUB_DIR = "objects"
+BLOBS_DIR_NAME = "blobs"
+REFS_DIR_NAME = "refs"
+TMP_DIR_NAME = "tmp"
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_PART_SIZE = 8 * 2**20
+HASH_CHUNK_SIZE = 2**20
+
+_DONE = object()
+
+
+def get_object_cache_dir() -> str:
+    """Get the default object cache dir under the tawa cache dir."""
+    return os.path.join(os.environ.get(TAWA_CACHE_DIR_ENV_VAR, DEFAULT_TAWA_CACHE_DIR), OBJECT_CACHE_SUB_DIR)
+
+
+def _get_file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_buffer:
+        while chunk := file_buffer.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link(source: str, destination: str) -> None:
+    # a hard link keeps the file alive when the cache evicts it
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        os.symlink(os.path.abspath(source), destination)
+
+
+class ObjectCache:
+    """Size capped, least recently used, content addressed cache of downloaded objects.
+
+    Args:
+        cache_dir (Optional[str], optional): Directory of the cache. Defaults to None (get_object_cache_dir()).
+        max_bytes (int, optional): Size the cache is evicted down to after every insert. Defaults to DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir if cache_dir is not None else get_object_cache_dir()
+        self.max_bytes = max_bytes
+        for dir_name in (BLOBS_DIR_NAME, REFS_DIR_NAME, TMP_DIR_NAME):
+            os.makedirs(os.path.join(self.cache_dir, dir_name), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def get_blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, BLOBS_DIR_NAME, digest)
+
+    def _get_ref_path(self, ref_key: str) -> str:
+        return os.path.join(self.cache_dir, REFS_DIR_NAME, ref_key)
+
+    @staticmethod
+    def get_ref_key(bucket: str, key: str, etag: str, size: int) -> str:
+        """Get the reference key of a version of an object, a new ETag or size is a new reference."""
+        return fingerprint(bucket, key, etag, size)
+
+    def get(self, ref_key: str) -> Optional[str]:
+        """Get the path of a referenced object and mark it as used.
+
+        Args:
+            ref_key (str): Reference key of the object, from get_ref_key
+
+        Returns:
+            Optional[str]: Path of the cached file, None if it is not cached
+        """
+        try:
+            with open(self._get_ref_path(ref_key), "r") as ref_buffer:
+                blob_path = self.get_blob_path(ref_buffer.read().strip())
+            # the modification time of the blob orders the files for eviction
+            os.utime(blob_path)
+        except FileNotFoundError:
+            # not cached, or the blob was evicted
+            self.misses += 1
+            return None
+        self.hits += 1
+        return blob_path
+
+    def create_temp_file(self) -> str:
+        """Create an empty file in the cache dir, to be filled then stored with put."""
+        file_descriptor, path = tempfile.mkstemp(dir=os.path.join(self.cache_dir, TMP_DIR_NAME))
+        os.close(file_descriptor)
+        return path
+
+    def put(self, ref_key: str, temp_path: str) -> str:
+        """Move a downloaded file into the cache, then evict the least recently used files above the size cap.
+
+        Args:
+            ref_key (str): Reference key of the object, from get_ref_key
+            temp_path (str): File from create_temp_file, moved or removed
+
+        Returns:
+            str: Path of the cached file
+        """
+        digest = _get_file_sha256(temp_path)
+        blob_path = self.get_blob_path(digest)
+        if os.path.exists(blob_path):
+            # the same content under another key or version
+            os.remove(temp_path)
+            os.utime(blob_path)
+        else:
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, blob_path)
+        ref_path = self._get_ref_path(ref_key)
+        with open(ref_path + ".tmp", "w") as ref_buffer:
+            ref_buffer.write(digest)
+        os.replace(ref_path + ".tmp", ref_path)
+        self.evict(keep=digest)
+        return blob_path
+
+    def _list_blobs(self) -> List[Tuple[float, int, str]]:
+        blobs = []
+        with os.scandir(os.path.join(self.cache_dir, BLOBS_DIR_NAME)) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another process
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, entry.name))
+        return blobs
+
+    def get_size(self) -> int:
+        """Get the bytes of all cached files."""
+        return sum(blob_bytes for _, blob_bytes, _ in self._list_blobs())
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Evict the least recently used files until the cache fits its size cap.
+
+        References to evicted files are left behind, they are misses when read.
+
+        Args:
+            keep (Optional[str], optional): Digest never evicted, ex: the file just stored. Defaults to None.
+
+        Returns:
+            List[str]: Digests of the evicted files
+        """
+        blobs = sorted(self._list_blobs())
+        total = sum(blob_bytes for _, blob_bytes, _ in blobs)
+        evicted = []
+        for _, blob_bytes, digest in blobs:
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.remove(self.get_blob_path(digest))
+            except FileNotFoundError:
+                pass
+            total -= blob_bytes
+            evicted.append(digest)
+        return evicted
+
+
+class ShardPrefetcher:
+    """Downloads objects concurrently with ranged reads into an ObjectCache.
+
+    Args:
+        client (Optional[S3Client], optional): Client of the store. Defaults to None (S3Client.from_env()).
+        cache (Optional[ObjectCache], optional): Cache of the downloads. Defaults to None (an ObjectCache in the
+            default cache dir).
+        max_concurrency (int, optional): Requests and objects in flight at most. Defaults to DEFAULT_MAX_CONCURRENCY.
+        part_size (int, optional): Bytes per ranged read. Defaults to DEFAULT_PART_SIZE.
+    """
+
+    def __init__(
+        self,
+        client: Optional[S3Client] = None,
+        cache: Optional[ObjectCache] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        part_size: int = DEFAULT_PART_SIZE,
+    ):
+        if max_concurrency < 1 or part_size < 1:
+            raise ValueError(f"max_concurrency and part_size must be positive, got {max_concurrency} and {part_size}")
+        self.client = client if client is not None else S3Client.from_env()
+        self.cache = cache if cache is not None else ObjectCache()
+        self.max_concurrency = max_concurrency
+        self.part_size = part_size
+        self.downloaded_bytes = 0
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores = {loop: asyncio.Semaphore(self.max_concurrency)}
+        return self._semaphores[loop]
+
+    async def _download_part(self, bucket: str, key: str, file_descriptor: int, start: int, stop: int) -> None:
+        async with self._get_semaphore():
+            data = await self.client.get_range(bucket, key, start, stop)
+        if len(data) != stop - start:
+            raise ValueError(f"Expected {stop - start} bytes at {start} of s3://{bucket}/{key}, got {len(data)}")
+        os.pwrite(file_descriptor, data, start)
+        self.downloaded_bytes += len(data)
+
+    async def fetch(self, url: str) -> str:
+        """Download an object unless it is cached.
+
+        Args:
+            url (str): Url of the object, ex: s3://bucket/key
+
+        Returns:
+            str: Path of the file in the cache
+        """
+        bucket, key = parse_s3_url(url)
+        async with self._get_semaphore():
+            info = await self.client.head_object(bucket, key)
+        ref_key = self.cache.get_ref_key(bucket, key, info.etag, info.size)
+        cached_path = self.cache.get(ref_key)
+        if cached_path is not None:
+            return cached_path
+
+        temp_path = self.cache.create_temp_file()
+        try:
+            file_descriptor = os.open(temp_path, os.O_WRONLY)
+            try:
+                os.ftruncate(file_descriptor, info.size)
+                parts = [
+                    asyncio.ensure_future(
+                        self._download_part(bucket, key, file_descriptor, start, min(start + self.part_size, info.size))
+                    )
+                    for start in range(0, info.size, self.part_size)
+                ]
+                try:
+                    await asyncio.gather(*parts)
+                except BaseException:
+                    for part in parts:
+                        part.cancel()
+                    await asyncio.gather(*parts, return_exceptions=True)
+                    raise
+            finally:
+                os.close(file_descriptor)
+            # hashing reads the whole file, off the event loop
+            return await asyncio.get_running_loop().run_in_executor(None, self.cache.put, ref_key, temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    async def _fetch_with_url(self, url: str) -> Tuple[str, str]:
+        return url, await self.fetch(url)
+
+    async def prefetch(self, urls: List[str]) -> AsyncIterator[Tuple[str, str]]:
+        """Download objects concurrently, started in order, and yield each one as soon as it lands.
+
+        Args:
+            urls (List[str]): Urls of the objects
+
+        Yields:
+            Tuple[str, str]: Url of an object and the path of its file in the cache, in completion order
+        """
+        pending_urls = iter(urls)
+        in_flight: Set[asyncio.Future] = set()
+        try:
+            while True:
+                # a window of objects so the first ones land first instead of sharing the bandwidth with all
+                for url in pending_urls:
+                    in_flight.add(asyncio.ensure_future(self._fetch_with_url(url)))
+                    if len(in_flight) >= self.max_concurrency:
+                        break
+                if not in_flight:
+                    return
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    def iter_prefetched(self, urls: List[str]) -> Iterator[Tuple[str, str]]:
+        """Download objects on an event loop in a background thread, for synchronous code.
+
+        Args:
+            urls (List[str]): Urls of the objects
+
+        Yields:
+            Tuple[str, str]: Url of an object and the path of its file in the cache, in completion order
+        """
+        results: queue.Queue = queue.Queue()
+
+        async def run() -> None:
+            try:
+                async for result in self.prefetch(urls):
+                    results.put(result)
+            finally:
+                await self.client.close()
+
+        loop = asyncio.new_event_loop()
+        main = loop.create_task(run())
+
+        def run_loop() -> None:
+            try:
+                loop.run_until_complete(main)
+                results.put(_DONE)
+            except BaseException as error:
+                results.put(error)
+            finally:
+                loop.close()
+
+        thread = threading.Thread(target=run_loop, name="shard-prefetcher", daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is _DONE:
+                    return
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            if thread.is_alive():
+                try:
+                    loop.call_soon_threadsafe(main.cancel)
+                except RuntimeError:
+                    # the loop closed in between
+                    pass
+            thread.join()
+
+
+def download_sharded_dataset(url: str, root: str, prefetcher: Optional[ShardPrefetcher] = None) -> Iterator[int]:
+    """Download a sharded dataset from an object store, shard by shard.
+
+    The index is downloaded first, so ``ShardedDataset(root)`` can be opened
+    after the first shard landed and read the shards yielded so far.
+
+    Args:
+        url (str): Url of the dataset directory, ex: s3://bucket/cifar10/train
+        root (str): Local directory of the dataset, its files are links into the cache
+        prefetcher (Optional[ShardPrefetcher], optional): Prefetcher of the files. Defaults to None (a
+            ShardPrefetcher from the environment).
+
+    Yields:
+        int: Index of every shard once all its fields landed, in completion order
+    """
+    prefetcher = prefetcher if prefetcher is not None else ShardPrefetcher()
+    bucket, prefix = parse_s3_url(url)
+    prefix = prefix.rstrip("/")
+
+    def get_url(file_name: str) -> str:
+        return f"s3://{bucket}/{prefix}/{file_name}" if prefix else f"s3://{bucket}/{file_name}"
+
+    ((_, index_path),) = prefetcher.iter_prefetched([get_url(INDEX_FILE_NAME)])
+    with open(index_path, "r") as index_buffer:
+        index_object = json.load(index_buffer)
+    os.makedirs(root, exist_ok=True)
+    _link(index_path, os.path.join(root, INDEX_FILE_NAME))
+
+    field_names = list(index_object["fields"])
+    shard_by_url = {
+        get_url(get_shard_file_name(name, shard_index)): shard_index
+        for shard_index in range(len(index_object["shard_lengths"]))
+        for name in field_names
+    }
+    missing_fields = {shard_index: len(field_names) for shard_index in set(shard_by_url.values())}
+    for file_url, path in prefetcher.iter_prefetched(list(shard_by_url)):
+        _link(path, os.path.join(root, file_url.rsplit("/", 1)[-1]))
+        shard_index = shard_by_url[file_url]
+        missing_fields[shard_index] -= 1
+        if missing_fields[shard_index] == 0:
+            yield shard_index
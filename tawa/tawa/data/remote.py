@@ -0,0 +1,326 @@
+"""Minimal asyncio client of the S3 API for reading dataset shards.
+
+Only what reading datasets needs: listing a prefix, the size and ETag of an
+object and ranged reads, over HTTP/1.1 keep-alive connections and signed with
+AWS signature version 4. Credentials come from the environment variables
+eototo passes into containers with ``--port-aws-creds``, requests are
+anonymous without them. Buckets are addressed by path, which every S3
+compatible store supports::
+
+    client = S3Client.from_env()
+    info = await client.head_object("my-bucket", "cifar10/train/index.json")
+    first_kib = await client.get_range("my-bucket", "cifar10/train/image-00000.bin", 0, 1024)
+
+``AWS_ENDPOINT_URL`` points the client to another S3 compatible store.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import hmac
+import os
+import ssl
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b"").hexdigest()
+DEFAULT_REGION = "us-east-1"
+MAX_RETRIES = 4
+RETRY_BASE_SECONDS = 0.2
+RETRY_STATUSES = {500, 502, 503, 504}
+
+
+class S3Error(RuntimeError):
+    """An S3 request failed."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"S3 request failed with status {status}: {message}")
+        self.status = status
+
+
+@dataclass
+class S3Credentials:
+    access_key_id: str
+    secret_access_key: str
+    session_token: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["S3Credentials"]:
+        """Get the credentials from the standard AWS environment variables, None if they are not set."""
+        access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
+        secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+        if not access_key_id or not secret_access_key:
+            return None
+        return cls(access_key_id, secret_access_key, os.environ.get("AWS_SESSION_TOKEN") or None)
+
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str
+
+
+def parse_s3_url(url: str) -> Tuple[str, str]:
+    """Split an ``s3://bucket/key`` url into its bucket and key."""
+    parts = urlsplit(url)
+    if parts.scheme != "s3" or not parts.netloc:
+        raise ValueError(f"Expected an s3://bucket/key url, got {url}")
+    return parts.netloc, parts.path.lstrip("/")
+
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def sign_request(
+    method: str,
+    path: str,
+    query: Dict[str, str],
+    headers: Dict[str, str],
+    credentials: S3Credentials,
+    region: str,
+    timestamp: datetime.datetime,
+    payload_sha256: str = EMPTY_PAYLOAD_SHA256,
+) -> str:
+    """Compute the Authorization header of a request with AWS signature version 4.
+
+    Args:
+        method (str): HTTP method
+        path (str): Already quoted path
+        query (Dict[str, str]): Query parameters, unquoted
+        headers (Dict[str, str]): Headers to sign, including host and x-amz-date
+        credentials (S3Credentials): Credentials
+        region (str): Region of the bucket
+        timestamp (datetime.datetime): Time of the request in UTC, the same as in x-amz-date
+        payload_sha256 (str, optional): Hex digest of the body. Defaults to EMPTY_PAYLOAD_SHA256.
+
+    Returns:
+        str: Value of the Authorization header
+    """
+    amz_date = timestamp.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    canonical_query = "&".join(f"{_quote(key)}={_quote(value)}" for key, value in sorted(query.items()))
+    canonical_headers = {name.lower(): " ".join(value.strip().split()) for name, value in headers.items()}
+    signed_headers = ";".join(sorted(canonical_headers))
+    canonical_request = "\n".join(
+        [
+            method,
+            path,
+            canonical_query,
+            "".join(f"{name}:{canonical_headers[name]}\n" for name in sorted(canonical_headers)),
+            signed_headers,
+            payload_sha256,
+        ]
+    )
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()]
+    )
+    signing_key = _hmac(
+        _hmac(_hmac(_hmac(f"AWS4{credentials.secret_access_key}".encode(), date), region), "s3"), "aws4_request"
+    )
+    signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return (
+        f"AWS4-HMAC-SHA256 Credential={credentials.access_key_id}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+@dataclass
+class _Response:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class S3Client:
+    """Reads objects of an S3 compatible store over pooled keep-alive connections.
+
+    Connections belong to the event loop they were opened in, use a client
+    from one event loop at a time and close it in that loop.
+
+    Args:
+        endpoint_url (Optional[str], optional): Url of the store. Defaults to None (AWS S3 of the region).
+        credentials (Optional[S3Credentials], optional): Credentials, anonymous requests if None. Defaults to None.
+        region (str, optional): Region used for signing. Defaults to DEFAULT_REGION.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: Optional[str] = None,
+        credentials: Optional[S3Credentials] = None,
+        region: str = DEFAULT_REGION,
+    ):
+        self.endpoint_url = endpoint_url or f"https://s3.{region}.amazonaws.com"
+        endpoint = urlsplit(self.endpoint_url)
+        if endpoint.scheme not in ("http", "https") or not endpoint.hostname:
+            raise ValueError(f"Expected an http or https endpoint url, got {self.endpoint_url}")
+        self._host = endpoint.hostname
+        self._port = endpoint.port or (443 if endpoint.scheme == "https" else 80)
+        self._ssl = ssl.create_default_context() if endpoint.scheme == "https" else None
+        self._host_header = endpoint.netloc
+        self.credentials = credentials
+        self.region = region
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "S3Client":
+        """Create a client from the AWS environment variables, ex: passed by ``eototo exec --port-aws-creds``."""
+        return cls(
+            endpoint_url=os.environ.get("AWS_ENDPOINT_URL") or None,
+            credentials=S3Credentials.from_env(),
+            region=os.environ.get("AWS_DEFAULT_REGION") or os.environ.get("AWS_REGION") or DEFAULT_REGION,
+        )
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # connections of another event loop can not be used in this one
+            self._idle = []
+            self._loop = loop
+        if self._idle:
+            reader, writer = self._idle.pop()
+            return reader, writer, True
+        reader, writer = await asyncio.open_connection(self._host, self._port, ssl=self._ssl)
+        return reader, writer, False
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # trailers end with an empty line
+                    while (await reader.readline()) not in (b"\r\n", b""):
+                        pass
+                    return b"".join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"])), True
+        return await reader.read(), False
+
+    async def _send(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str]) -> _Response:
+        reader, writer, reused = await self._connect()
+        try:
+            target = path + (
+                "?" + "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(query.items())) if query else ""
+            )
+            request = f"{method} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+            writer.write(request.encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("The connection was closed before a response")
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            if method == "HEAD" or status in (204, 304):
+                body, reusable = b"", True
+            else:
+                body, reusable = await self._read_body(reader, response_headers)
+        except BaseException:
+            writer.close()
+            raise
+        if reusable and response_headers.get("connection", "").lower() != "close":
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return _Response(status, response_headers, body)
+
+    async def _request(
+        self,
+        method: str,
+        bucket: str,
+        key: str = "",
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> _Response:
+        path = "/" + _quote(bucket) + ("/" + _quote(key, safe="-_.~/") if key else "")
+        query = query or {}
+        for attempt in range(MAX_RETRIES + 1):
+            timestamp = datetime.datetime.now(datetime.timezone.utc)
+            request_headers = {
+                "host": self._host_header,
+                "x-amz-date": timestamp.strftime("%Y%m%dT%H%M%SZ"),
+                "x-amz-content-sha256": EMPTY_PAYLOAD_SHA256,
+                **(headers or {}),
+            }
+            if self.credentials is not None:
+                if self.credentials.session_token:
+                    request_headers["x-amz-security-token"] = self.credentials.session_token
+                request_headers["authorization"] = sign_request(
+                    method, path, query, request_headers, self.credentials, self.region, timestamp
+                )
+            try:
+                response = await self._send(method, path, query, request_headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # a pooled connection closed by the server, or a dropped one
+                if attempt == MAX_RETRIES:
+                    raise
+                continue
+            if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            await asyncio.sleep(RETRY_BASE_SECONDS * 2**attempt)
+        if response.status >= 300:
+            message = response.body.decode(errors="replace").strip() or f"{method} {path}"
+            raise S3Error(response.status, message)
+        return response
+
+    async def head_object(self, bucket: str, key: str) -> ObjectInfo:
+        """Get the size and ETag of an object."""
+        response = await self._request("HEAD", bucket, key)
+        return ObjectInfo(key=key, size=int(response.headers["content-length"]), etag=response.headers.get("etag", ""))
+
+    async def get_range(self, bucket: str, key: str, start: int, stop: int) -> bytes:
+        """Read the bytes ``[start, stop)`` of an object."""
+        if stop <= start:
+            return b""
+        response = await self._request("GET", bucket, key, headers={"range": f"bytes={start}-{stop - 1}"})
+        if response.status != 206 and not (start == 0 and len(response.body) == stop):
+            # a store ignoring the range sent the whole object
+            return response.body[start:stop]
+        return response.body
+
+    async def list_objects(self, bucket: str, prefix: str = "") -> List[ObjectInfo]:
+        """List the objects under a prefix, following continuation tokens."""
+        objects = []
+        query = {"list-type": "2", "prefix": prefix}
+        while True:
+            root = ElementTree.fromstring((await self._request("GET", bucket, query=query)).body)
+            for contents in root.iterfind("{*}Contents"):
+                objects.append(
+                    ObjectInfo(
+                        key=contents.findtext("{*}Key", ""),
+                        size=int(contents.findtext("{*}Size", "0")),
+                        etag=contents.findtext("{*}ETag", ""),
+                    )
+                )
+            token = root.findtext("{*}NextContinuationToken")
+            if root.findtext("{*}IsTruncated", "false") != "true" or not token:
+                return objects
+            query = {**query, "continuation-token": token}
+
+    async def close(self) -> None:
+        """Close the pooled connections."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
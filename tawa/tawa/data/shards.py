@@ -0,0 +1,297 @@
+"""Fixed size binary shards of samples read through ``numpy.memmap``.
+
+A sharded dataset is a directory with an ``index.json`` and one raw binary
+file per shard and field, ex: ``image-00000.bin`` and ``label-00000.bin``.
+Every sample of a field has the same shape and dtype and every shard but the
+last holds exactly ``shard_size`` samples, so a sample is located by
+arithmetic alone. Shards are memory mapped on first access, the page cache
+holds what is read instead of the process heap, and consecutive samples of a
+shard are served as views of the memory map without a copy. Datasets larger
+than RAM only cost the pages actually touched.
+
+The index is written last and atomically, a dataset whose conversion did not
+finish has no index and can not be opened.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+INDEX_FILE_NAME = "index.json"
+FORMAT_VERSION = 1
+DEFAULT_SHARD_SIZE = 10000
+
+
+@dataclass
+class FieldSpec:
+    """Shape and dtype of one sample of a field."""
+
+    dtype: str
+    shape: Tuple[int, ...]
+
+    @property
+    def sample_bytes(self) -> int:
+        return int(np.dtype(self.dtype).itemsize * np.prod(self.shape, dtype=np.int64))
+
+
+def get_shard_file_name(field_name: str, shard_index: int) -> str:
+    return f"{field_name}-{shard_index:05d}.bin"
+
+
+class ShardWriter:
+    """Writes batches of samples into fixed size shards.
+
+    Args:
+        root (str): Directory of the dataset, created if needed
+        fields (Dict[str, Tuple[Sequence[int], Any]]): Shape and dtype of one sample per field
+        shard_size (int, optional): Samples per shard. Defaults to DEFAULT_SHARD_SIZE.
+        metadata (Optional[Dict[str, Any]], optional): JSON serializable metadata stored in the index,
+            ex: class names. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        fields: Dict[str, Tuple[Sequence[int], Any]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        if shard_size <= 0:
+            raise ValueError(f"shard_size must be positive, got {shard_size}")
+        if not fields:
+            raise ValueError("A dataset needs at least one field")
+        self.root = root
+        self.fields = {
+            name: FieldSpec(dtype=np.dtype(dtype).str, shape=tuple(int(dim) for dim in shape))
+            for name, (shape, dtype) in fields.items()
+        }
+        self.shard_size = shard_size
+        self.metadata = metadata or {}
+        self.shard_lengths: List[int] = []
+        self._files: Dict[str, Any] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_shard()
+
+    def _close_shard(self) -> None:
+        for shard_file in self._files.values():
+            shard_file.close()
+        self._files = {}
+
+    def _open_shard(self) -> None:
+        self._close_shard()
+        shard_index = len(self.shard_lengths)
+        self._files = {
+            name: open(os.path.join(self.root, get_shard_file_name(name, shard_index)), "wb") for name in self.fields
+        }
+        self.shard_lengths.append(0)
+
+    def write(self, **arrays: np.ndarray) -> None:
+        """Write a batch of samples, the first axis of every array is the sample axis.
+
+        Args:
+            **arrays (np.ndarray): One array per field, all with the same number of samples
+        """
+        if set(arrays) != set(self.fields):
+            raise ValueError(f"Expected arrays for the fields {sorted(self.fields)}, got {sorted(arrays)}")
+        batch_size = None
+        for name, array in arrays.items():
+            spec = self.fields[name]
+            if tuple(array.shape[1:]) != spec.shape:
+                raise ValueError(f"Samples of {name} must have shape {spec.shape}, got {tuple(array.shape[1:])}")
+            if batch_size is not None and len(array) != batch_size:
+                raise ValueError("Every field needs the same number of samples")
+            batch_size = len(array)
+
+        start = 0
+        while start < batch_size:
+            if not self.shard_lengths or self.shard_lengths[-1] == self.shard_size:
+                self._open_shard()
+            stop = min(batch_size, start + self.shard_size - self.shard_lengths[-1])
+            for name, array in arrays.items():
+                np.ascontiguousarray(array[start:stop], dtype=self.fields[name].dtype).tofile(self._files[name])
+            self.shard_lengths[-1] += stop - start
+            start = stop
+
+    def close(self) -> None:
+        """Close the last shard and write the index."""
+        self._close_shard()
+        index_object = {
+            "version": FORMAT_VERSION,
+            "shard_size": self.shard_size,
+            "shard_lengths": self.shard_lengths,
+            "fields": {name: {"dtype": spec.dtype, "shape": list(spec.shape)} for name, spec in self.fields.items()},
+            "metadata": self.metadata,
+        }
+        index_path = os.path.join(self.root, INDEX_FILE_NAME)
+        with open(index_path + ".tmp", "w") as index_buffer:
+            json.dump(index_object, index_buffer, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+
+
+class ShardedDataset:
+    """Random access to the samples of a sharded dataset.
+
+    Samples are dicts of field name to array. Pickling drops the open memory
+    maps, so the dataset can be sent to worker processes that map the shards
+    themselves.
+
+    Args:
+        root (str): Directory of the dataset
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        index_path = os.path.join(root, INDEX_FILE_NAME)
+        if not os.path.exists(index_path):
+            raise ValueError(f"No sharded dataset at {root}, {INDEX_FILE_NAME} is missing")
+        with open(index_path, "r") as index_buffer:
+            index_object = json.load(index_buffer)
+        if index_object.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sharded dataset version {index_object.get('version')} at {root}")
+        self.shard_size: int = index_object["shard_size"]
+        self.shard_lengths: List[int] = index_object["shard_lengths"]
+        self.fields = {
+            name: FieldSpec(dtype=field_object["dtype"], shape=tuple(field_object["shape"]))
+            for name, field_object in index_object["fields"].items()
+        }
+        self.metadata: Dict[str, Any] = index_object["metadata"]
+        self._length = sum(self.shard_lengths)
+        self._shards: Dict[int, Dict[str, np.memmap]] = {}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["_shards"] = {}
+        return state
+
+    def get_shard(self, shard_index: int) -> Dict[str, np.memmap]:
+        """Get the read only memory maps of a shard, mapped on first access.
+
+        Args:
+            shard_index (int): Index of the shard
+
+        Returns:
+            Dict[str, np.memmap]: Memory map per field with the samples on the first axis
+        """
+        shard = self._shards.get(shard_index)
+        if shard is None:
+            shard = {}
+            length = self.shard_lengths[shard_index]
+            for name, spec in self.fields.items():
+                path = os.path.join(self.root, get_shard_file_name(name, shard_index))
+                expected_bytes = length * spec.sample_bytes
+                if os.path.getsize(path) != expected_bytes:
+                    raise ValueError(f"{path} has {os.path.getsize(path)} bytes, the index expects {expected_bytes}")
+                shard[name] = np.memmap(path, dtype=spec.dtype, mode="r", shape=(length,) + spec.shape)
+            self._shards[shard_index] = shard
+        return shard
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"Sample {index} out of range for {self._length} samples")
+        return divmod(index, self.shard_size)
+
+    def __getitem__(self, index: int) -> Dict[str, np.ndarray]:
+        shard_index, offset = self._locate(index)
+        return {name: array[offset] for name, array in self.get_shard(shard_index).items()}
+
+    def get_slice(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """Get consecutive samples, views of the memory map when they are in one shard.
+
+        Args:
+            start (int): First sample
+            stop (int): Sample after the last one
+
+        Returns:
+            Dict[str, np.ndarray]: Samples per field, a copy only when the slice spans shards
+        """
+        start, stop, _ = slice(start, stop).indices(self._length)
+        if start >= stop:
+            return {name: np.empty((0,) + spec.shape, dtype=spec.dtype) for name, spec in self.fields.items()}
+        first_shard, first_offset = divmod(start, self.shard_size)
+        if first_offset + (stop - start) <= self.shard_lengths[first_shard]:
+            return {
+                name: array[first_offset : first_offset + stop - start]
+                for name, array in self.get_shard(first_shard).items()
+            }
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in self.fields}
+        position = start
+        while position < stop:
+            shard_index, offset = divmod(position, self.shard_size)
+            count = min(stop - position, self.shard_lengths[shard_index] - offset)
+            for name, array in self.get_shard(shard_index).items():
+                parts[name].append(array[offset : offset + count])
+            position += count
+        return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+    def get_batch(self, indices: Sequence[int], out: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """Gather samples in any order, ex: a shuffled batch.
+
+        Reads are grouped by shard and sorted within it, so the memory maps
+        are read front to back no matter the order of the indices.
+
+        Args:
+            indices (Sequence[int]): Samples to gather
+            out (Optional[Dict[str, np.ndarray]], optional): Arrays to gather into, ex: preallocated
+                shared memory, with at least ``len(indices)`` samples. Defaults to None.
+
+        Returns:
+            Dict[str, np.ndarray]: Samples per field in the order of the indices
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < -self._length or indices.max() >= self._length):
+            raise IndexError(f"Sample indices out of range for {self._length} samples")
+        indices = np.where(indices < 0, indices + self._length, indices)
+        if out is None:
+            batch = {
+                name: np.empty((len(indices),) + spec.shape, dtype=spec.dtype) for name, spec in self.fields.items()
+            }
+        else:
+            batch = {name: out[name][: len(indices)] for name in self.fields}
+        order = np.argsort(indices, kind="stable")
+        sorted_indices = indices[order]
+        shard_ids = sorted_indices // self.shard_size
+        boundaries = np.flatnonzero(np.diff(shard_ids)) + 1
+        for group in np.split(np.arange(len(indices)), boundaries):
+            if not len(group):
+                continue
+            shard = self.get_shard(int(shard_ids[group[0]]))
+            offsets = sorted_indices[group] % self.shard_size
+            for name, array in shard.items():
+                batch[name][order[group]] = array[offsets]
+        return batch
+
+    def iter_batches(self, batch_size: int, drop_last: bool = False) -> Iterator[Dict[str, np.ndarray]]:
+        """Iterate over consecutive batches in dataset order.
+
+        Batches are views of the memory map when ``batch_size`` divides the
+        shard size, otherwise the batches crossing a shard boundary are copies.
+
+        Args:
+            batch_size (int): Samples per batch
+            drop_last (bool, optional): Skip a last batch smaller than batch_size. Defaults to False.
+
+        Yields:
+            Dict[str, np.ndarray]: Samples per field
+        """
+        for start in range(0, self._length, batch_size):
+            stop = min(start + batch_size, self._length)
+            if drop_last and stop - start < batch_size:
+                return
+            yield self.get_slice(start, stop)
@@ -0,0 +1,427 @@
+"""Append only columnar tables of experiment data read through ``numpy.memmap``.
+
+A table is a directory with a ``schema.json``, a ``manifest.jsonl`` and one
+raw binary file per chunk and column, ex: ``score-000000.bin``. Rows are
+buffered by the writer and flushed in chunks of ``chunk_size`` rows. Every
+chunk records the number of its rows and the minimum and maximum of its
+scalar columns, one JSON line per chunk in the manifest, appended once the
+column files are on disk: readers only see complete chunks and a table is
+never rewritten::
+
+    with ColumnarWriter("runs/predictions", {"sample_id": ((), "<U32"), "label": ((), np.int64),
+                                             "score": ((), np.float32), "logits": ((10,), np.float32)}) as writer:
+        writer.append(sample_id=ids, label=labels, score=scores, logits=logits)
+
+    table = ColumnarTable("runs/predictions")
+    confident_cats = table.read(["sample_id", "score"], where=[("label", "==", 3), ("score", ">", 0.9)])
+
+Queries read only the requested columns and the columns of the predicate,
+and skip every chunk whose statistics rule out a match without opening its
+files.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tawa.data.shards import FieldSpec
+
+SCHEMA_FILE_NAME = "schema.json"
+MANIFEST_FILE_NAME = "manifest.jsonl"
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 65536
+# dtype kinds with statistics: bool, signed and unsigned integers, floats and unicode strings
+SUPPORTED_DTYPE_KINDS = "biufU"
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in")
+
+# A condition on a column, ex: ("score", ">", 0.9) or ("label", "in", [3, 5])
+Condition = Tuple[str, str, Any]
+
+
+def get_chunk_file_name(column_name: str, chunk_index: int) -> str:
+    return f"{column_name}-{chunk_index:06d}.bin"
+
+
+def _to_json_value(value: np.generic) -> Any:
+    value = value.item()
+    # NaN and infinities are not JSON
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def get_column_stats(array: np.ndarray) -> Optional[Dict[str, Any]]:
+    """Get the minimum and maximum of a chunk of a scalar column, None if they are unknown.
+
+    Args:
+        array (np.ndarray): Values of the chunk
+
+    Returns:
+        Optional[Dict[str, Any]]: ``min`` and ``max`` ignoring NaN, and ``has_nan`` when there are NaN, None for
+            non scalar columns or only NaN
+    """
+    if array.ndim != 1 or not len(array):
+        return None
+    if array.dtype.kind == "U":
+        ordered = np.sort(array)
+        return {"min": ordered[0].item(), "max": ordered[-1].item()}
+    has_nan = False
+    if array.dtype.kind == "f":
+        is_nan = np.isnan(array)
+        has_nan = bool(is_nan.any())
+        if has_nan:
+            array = array[~is_nan]
+        if not len(array):
+            return None
+    minimum, maximum = _to_json_value(array.min()), _to_json_value(array.max())
+    if minimum is None or maximum is None:
+        # an infinite bound rules nothing out
+        return None
+    stats = {"min": minimum, "max": maximum}
+    if has_nan:
+        stats["has_nan"] = True
+    return stats
+
+
+def may_match(stats: Optional[Dict[str, Any]], operator: str, value: Any) -> bool:
+    """Whether a chunk with these statistics may hold a row matching a condition.
+
+    Args:
+        stats (Optional[Dict[str, Any]]): Statistics of the column in the chunk, from get_column_stats
+        operator (str): One of OPERATORS
+        value (Any): Value of the condition, a sequence for ``in``
+
+    Returns:
+        bool: False only when no row can match
+    """
+    if stats is None:
+        return True
+    minimum, maximum = stats["min"], stats["max"]
+    if operator == "==":
+        return minimum <= value <= maximum
+    if operator == "!=":
+        # NaN differs from every value
+        return stats.get("has_nan", False) or not minimum == maximum == value
+    if operator == "<":
+        return minimum < value
+    if operator == "<=":
+        return minimum <= value
+    if operator == ">":
+        return maximum > value
+    if operator == ">=":
+        return maximum >= value
+    return any(minimum <= item <= maximum for item in value)
+
+
+def _evaluate(array: np.ndarray, operator: str, value: Any) -> np.ndarray:
+    if operator == "==":
+        return array == value
+    if operator == "!=":
+        return array != value
+    if operator == "<":
+        return array < value
+    if operator == "<=":
+        return array <= value
+    if operator == ">":
+        return array > value
+    if operator == ">=":
+        return array >= value
+    return np.isin(array, np.asarray(list(value)))
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r") as json_buffer:
+        return json.load(json_buffer)
+
+
+class ColumnarWriter:
+    """Appends rows to a columnar table in chunks, creating the table or continuing an existing one.
+
+    Only one writer may append to a table at a time, any number of readers
+    may read it meanwhile.
+
+    Args:
+        root (str): Directory of the table, created if needed
+        columns (Optional[Dict[str, Tuple[Sequence[int], Any]]], optional): Shape and dtype of one value per
+            column, the schema of the table if None. Defaults to None.
+        chunk_size (int, optional): Rows per chunk. Defaults to DEFAULT_CHUNK_SIZE.
+        metadata (Optional[Dict[str, Any]], optional): JSON serializable metadata stored in the schema of a new
+            table, ex: the run id. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        columns: Optional[Dict[str, Tuple[Sequence[int], Any]]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        self.root = root
+        self.chunk_size = chunk_size
+        schema_path = os.path.join(root, SCHEMA_FILE_NAME)
+        schema_columns = None
+        if os.path.exists(schema_path):
+            manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+            if os.path.exists(manifest_path):
+                # drop the partial line of a writer that died while committing a chunk
+                with open(manifest_path, "rb+") as manifest_file:
+                    manifest_file.truncate(manifest_file.read().rfind(b"\n") + 1)
+            table = ColumnarTable(root)
+            schema_columns = table.columns
+            self.metadata = table.metadata
+            self.num_chunks = table.num_chunks
+        if columns is not None:
+            self.columns = {
+                name: FieldSpec(dtype=np.dtype(dtype).str, shape=tuple(int(dim) for dim in shape))
+                for name, (shape, dtype) in columns.items()
+            }
+            if schema_columns is not None and self.columns != schema_columns:
+                raise ValueError(f"The columns do not match the schema of the table at {root}")
+        elif schema_columns is None:
+            raise ValueError(f"No table at {root}, the columns are needed to create one")
+        else:
+            self.columns = schema_columns
+        if not self.columns:
+            raise ValueError("A table needs at least one column")
+        for name, spec in self.columns.items():
+            if np.dtype(spec.dtype).kind not in SUPPORTED_DTYPE_KINDS:
+                raise ValueError(f"Unsupported dtype {spec.dtype} of {name}, expected bool, numbers or unicode")
+
+        if schema_columns is None:
+            self.metadata = metadata or {}
+            self.num_chunks = 0
+            os.makedirs(root, exist_ok=True)
+            schema_object = {
+                "version": FORMAT_VERSION,
+                "columns": {
+                    name: {"dtype": spec.dtype, "shape": list(spec.shape)} for name, spec in self.columns.items()
+                },
+                "metadata": self.metadata,
+            }
+            with open(schema_path + ".tmp", "w") as schema_buffer:
+                json.dump(schema_object, schema_buffer, indent=2)
+            os.replace(schema_path + ".tmp", schema_path)
+        self._buffers: Dict[str, List[np.ndarray]] = {name: [] for name in self.columns}
+        self._buffered_rows = 0
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        # rows buffered when an error interrupted the writing are dropped
+        if exc_type is None:
+            self.close()
+
+    def append(self, **arrays: np.ndarray) -> None:
+        """Append rows, the first axis of every array is the row axis.
+
+        Args:
+            **arrays (np.ndarray): One array per column, all with the same number of rows
+        """
+        if set(arrays) != set(self.columns):
+            raise ValueError(f"Expected arrays for the columns {sorted(self.columns)}, got {sorted(arrays)}")
+        num_rows = None
+        converted = {}
+        for name, array in arrays.items():
+            spec = self.columns[name]
+            array = np.asarray(array)
+            if tuple(array.shape[1:]) != spec.shape:
+                raise ValueError(f"Values of {name} must have shape {spec.shape}, got {tuple(array.shape[1:])}")
+            if num_rows is not None and len(array) != num_rows:
+                raise ValueError("Every column needs the same number of rows")
+            num_rows = len(array)
+            converted[name] = np.ascontiguousarray(array, dtype=spec.dtype)
+        for name, array in converted.items():
+            self._buffers[name].append(array)
+        self._buffered_rows += num_rows
+        while self._buffered_rows >= self.chunk_size:
+            self._flush_chunk(self.chunk_size)
+
+    def _flush_chunk(self, num_rows: int) -> None:
+        chunk = {}
+        for name, arrays in self._buffers.items():
+            buffered = np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+            chunk[name] = buffered[:num_rows]
+            self._buffers[name] = [buffered[num_rows:]] if len(buffered) > num_rows else []
+        self._buffered_rows -= num_rows
+
+        for name, array in chunk.items():
+            with open(os.path.join(self.root, get_chunk_file_name(name, self.num_chunks)), "wb") as chunk_file:
+                array.tofile(chunk_file)
+                chunk_file.flush()
+                os.fsync(chunk_file.fileno())
+        # the manifest line commits the chunk, only once its files are durable
+        chunk_object = {
+            "chunk": self.num_chunks,
+            "rows": num_rows,
+            "stats": {name: get_column_stats(array) for name, array in chunk.items()},
+        }
+        with open(os.path.join(self.root, MANIFEST_FILE_NAME), "a") as manifest_file:
+            manifest_file.write(json.dumps(chunk_object) + "\n")
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        self.num_chunks += 1
+
+    def flush(self) -> None:
+        """Write the buffered rows as a chunk, even if it is not full."""
+        if self._buffered_rows:
+            self._flush_chunk(self._buffered_rows)
+
+    def close(self) -> None:
+        """Write the buffered rows."""
+        self.flush()
+
+
+class ColumnarTable:
+    """Reads a columnar table written by ColumnarWriter.
+
+    The table is a snapshot of the chunks committed when it was opened,
+    ``refresh`` sees the chunks appended since.
+
+    Args:
+        root (str): Directory of the table
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        schema_path = os.path.join(root, SCHEMA_FILE_NAME)
+        if not os.path.exists(schema_path):
+            raise ValueError(f"No columnar table at {root}, {SCHEMA_FILE_NAME} is missing")
+        schema_object = _read_json(schema_path)
+        if schema_object.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar table version {schema_object.get('version')} at {root}")
+        self.columns = {
+            name: FieldSpec(dtype=column_object["dtype"], shape=tuple(column_object["shape"]))
+            for name, column_object in schema_object["columns"].items()
+        }
+        self.metadata: Dict[str, Any] = schema_object["metadata"]
+        self.chunk_rows: List[int] = []
+        self.chunk_stats: List[Dict[str, Optional[Dict[str, Any]]]] = []
+        self._chunks: Dict[Tuple[int, str], np.memmap] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Read the chunks appended to the manifest since the table was opened."""
+        manifest_path = os.path.join(self.root, MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, "r") as manifest_buffer:
+            lines = manifest_buffer.read().split("\n")
+        # the last line is empty, or a chunk being committed
+        for line in lines[len(self.chunk_rows) : -1]:
+            chunk_object = json.loads(line)
+            self.chunk_rows.append(chunk_object["rows"])
+            self.chunk_stats.append(chunk_object["stats"])
+
+    @property
+    def num_chunks(self) -> int:
+        return len(self.chunk_rows)
+
+    def __len__(self) -> int:
+        return sum(self.chunk_rows)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["_chunks"] = {}
+        return state
+
+    def _check_columns(self, columns: Optional[Sequence[str]]) -> List[str]:
+        if columns is None:
+            return list(self.columns)
+        unknown = set(columns) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns {sorted(unknown)}, the table has {sorted(self.columns)}")
+        return list(columns)
+
+    def get_column_chunk(self, name: str, chunk_index: int) -> np.memmap:
+        """Get the read only memory map of a column in a chunk, mapped on first access.
+
+        Args:
+            name (str): Name of the column
+            chunk_index (int): Index of the chunk
+
+        Returns:
+            np.memmap: Values of the column with the rows on the first axis
+        """
+        array = self._chunks.get((chunk_index, name))
+        if array is None:
+            spec = self.columns[name]
+            path = os.path.join(self.root, get_chunk_file_name(name, chunk_index))
+            array = np.memmap(path, dtype=spec.dtype, mode="r", shape=(self.chunk_rows[chunk_index],) + spec.shape)
+            self._chunks[chunk_index, name] = array
+        return array
+
+    def get_chunks(self, where: Sequence[Condition] = ()) -> List[int]:
+        """Get the chunks whose statistics do not rule out every condition, without reading them.
+
+        Args:
+            where (Sequence[Condition], optional): Conditions on scalar columns all rows must match. Defaults to ().
+
+        Returns:
+            List[int]: Indices of the chunks that may hold matching rows
+        """
+        for name, operator, _ in where:
+            self._check_columns([name])
+            if operator not in OPERATORS:
+                raise ValueError(f"Unknown operator {operator}, expected one of {OPERATORS}")
+            if self.columns[name].shape != ():
+                # the mask of the rows would have the shape of the values
+                raise ValueError(
+                    f"Conditions need a scalar column, {name} has values of shape {self.columns[name].shape}"
+                )
+        return [
+            chunk_index
+            for chunk_index, stats in enumerate(self.chunk_stats)
+            if all(may_match(stats.get(name), operator, value) for name, operator, value in where)
+        ]
+
+    def iter_chunks(
+        self, columns: Optional[Sequence[str]] = None, where: Sequence[Condition] = ()
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Iterate over the matching rows chunk by chunk, to stream through tables larger than memory.
+
+        Args:
+            columns (Optional[Sequence[str]], optional): Columns to read, all if None. Defaults to None.
+            where (Sequence[Condition], optional): Conditions on scalar columns all rows must match. Defaults to ().
+
+        Yields:
+            Dict[str, np.ndarray]: Matching rows of a chunk per column, views of the memory map without conditions
+        """
+        columns = self._check_columns(columns)
+        for chunk_index in self.get_chunks(where):
+            mask = None
+            for name, operator, value in where:
+                matches = _evaluate(self.get_column_chunk(name, chunk_index), operator, value)
+                mask = matches if mask is None else mask & matches
+            if mask is None:
+                yield {name: self.get_column_chunk(name, chunk_index) for name in columns}
+            elif mask.any():
+                rows = np.flatnonzero(mask)
+                yield {name: self.get_column_chunk(name, chunk_index)[rows] for name in columns}
+
+    def read(self, columns: Optional[Sequence[str]] = None, where: Sequence[Condition] = ()) -> Dict[str, np.ndarray]:
+        """Read the matching rows of some columns.
+
+        Args:
+            columns (Optional[Sequence[str]], optional): Columns to read, all if None. Defaults to None.
+            where (Sequence[Condition], optional): Conditions all rows must match, ex:
+                ``[("label", "==", 3), ("score", ">", 0.9)]``. Defaults to ().
+
+        Returns:
+            Dict[str, np.ndarray]: Matching rows per column, in the order they were appended
+        """
+        columns = self._check_columns(columns)
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in columns}
+        for chunk in self.iter_chunks(columns, where):
+            for name, array in chunk.items():
+                parts[name].append(array)
+        return {
+            name: np.concatenate(arrays)
+            if arrays
+            else np.empty((0,) + self.columns[name].shape, dtype=self.columns[name].dtype)
+            for name, arrays in parts.items()
+        }
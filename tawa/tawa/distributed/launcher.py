@@ -0,0 +1,201 @@
+"""Launch data parallel training over the cores of one host.
+
+``launch`` starts one process per group of cores, pins it to its cores, and
+joins the processes into a ``torch.distributed`` process group with the gloo
+backend and a rendezvous on localhost. The training function receives a
+``DistributedContext`` and typically wraps its model in
+``torch.nn.parallel.DistributedDataParallel``, which all-reduces the gradients
+during the backward pass::
+
+    def train(context: DistributedContext, steps: int) -> float:
+        model = DistributedDataParallel(build_model())
+        ...
+        return samples_per_second
+
+    throughputs = launch(train, num_workers=4, args=(100,))
+
+Results are returned by rank. The training function and its arguments are
+sent to spawned processes, they must be importable and picklable.
+"""
+
+import multiprocessing
+import os
+import queue
+import socket
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from tawa.distributed.topology import get_core_groups
+
+DEFAULT_BACKEND = "gloo"
+RENDEZVOUS_HOST = "127.0.0.1"
+WORKER_POLL_SECONDS = 1.0
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+@dataclass
+class DistributedContext:
+    """Where a training process runs within the launched group."""
+
+    rank: int
+    world_size: int
+    # cpus the process is pinned to, empty when not pinned
+    cpus: List[int] = field(default_factory=list)
+
+    @property
+    def is_main(self) -> bool:
+        return self.rank == 0
+
+
+def find_free_port(host: str = RENDEZVOUS_HOST) -> int:
+    """Find a free TCP port for the rendezvous."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind((host, 0))
+        return probe.getsockname()[1]
+
+
+def _run_worker(
+    function: Callable[..., Any],
+    args: Sequence[Any],
+    context: DistributedContext,
+    backend: Optional[str],
+    port: int,
+    result_queue: Any,
+) -> None:
+    os.environ.update(
+        {
+            "RANK": str(context.rank),
+            "LOCAL_RANK": str(context.rank),
+            "WORLD_SIZE": str(context.world_size),
+            "MASTER_ADDR": RENDEZVOUS_HOST,
+            "MASTER_PORT": str(port),
+        }
+    )
+    try:
+        if context.cpus:
+            os.sched_setaffinity(0, context.cpus)
+            for env_var in THREAD_ENV_VARS:
+                os.environ[env_var] = str(len(context.cpus))
+        if backend is None:
+            result = function(context, *args)
+        else:
+            # torch is only needed once a process group is requested
+            import torch
+            import torch.distributed as dist
+
+            if context.cpus:
+                torch.set_num_threads(len(context.cpus))
+            dist.init_process_group(
+                backend,
+                init_method=f"tcp://{RENDEZVOUS_HOST}:{port}",
+                rank=context.rank,
+                world_size=context.world_size,
+            )
+            try:
+                result = function(context, *args)
+            finally:
+                dist.destroy_process_group()
+        result_queue.put((context.rank, None, result))
+    except BaseException:
+        result_queue.put((context.rank, traceback.format_exc(), None))
+
+
+def _stop(processes: List[Any]) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+def launch(
+    function: Callable[..., Any],
+    num_workers: int,
+    args: Sequence[Any] = (),
+    backend: Optional[str] = DEFAULT_BACKEND,
+    pin: bool = True,
+    cpus: Optional[Sequence[int]] = None,
+) -> List[Any]:
+    """Run a training function in one process per group of cores and wait for all of them.
+
+    Args:
+        function (Callable[..., Any]): Called as ``function(context, *args)`` in every process
+        num_workers (int): Number of processes
+        args (Sequence[Any], optional): Further arguments of the function. Defaults to ().
+        backend (Optional[str], optional): torch.distributed backend, no process group if None.
+            Defaults to DEFAULT_BACKEND.
+        pin (bool, optional): Pin every process to its own group of cores. Defaults to True.
+        cpus (Optional[Sequence[int]], optional): Cpus to split between the processes. Defaults to None
+            (the allowed cpus).
+
+    Returns:
+        List[Any]: Return value of the function by rank
+
+    Raises:
+        RuntimeError: If a process fails, the others are stopped
+    """
+    if num_workers <= 0:
+        raise ValueError(f"num_workers must be positive, got {num_workers}")
+    if pin and hasattr(os, "sched_setaffinity"):
+        core_groups = get_core_groups(num_workers, cpus)
+    else:
+        core_groups = [[] for _ in range(num_workers)]
+    port = find_free_port()
+
+    # spawn, a forked process would inherit the threads and state of the launching process
+    spawn_context = multiprocessing.get_context("spawn")
+    result_queue = spawn_context.Queue()
+    processes = []
+    for rank in range(num_workers):
+        process = spawn_context.Process(
+            target=_run_worker,
+            args=(
+                function,
+                tuple(args),
+                DistributedContext(rank, num_workers, core_groups[rank]),
+                backend,
+                port,
+                result_queue,
+            ),
+            name=f"tawa-rank-{rank}",
+        )
+        process.start()
+        processes.append(process)
+
+    results: Dict[int, Any] = {}
+    try:
+        while len(results) < num_workers:
+            try:
+                rank, error, result = result_queue.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                dead = [process for process in processes if process.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Process {dead[0].name} exited with code {dead[0].exitcode}")
+                continue
+            if error is not None:
+                raise RuntimeError(f"Rank {rank} failed:\n{error}")
+            results[rank] = result
+    except BaseException:
+        _stop(processes)
+        raise
+    for process in processes:
+        process.join()
+    return [results[rank] for rank in range(num_workers)]
+
+
+def get_scaling_efficiency(throughputs: Dict[int, float]) -> Dict[int, float]:
+    """Get the weak scaling efficiency of every process count relative to the smallest one.
+
+    An efficiency of 1.0 means the throughput grew in proportion to the number
+    of processes.
+
+    Args:
+        throughputs (Dict[int, float]): Throughput, ex: samples per second, by number of processes
+
+    Returns:
+        Dict[int, float]: Efficiency by number of processes
+    """
+    base_workers = min(throughputs)
+    base_per_worker = throughputs[base_workers] / base_workers
+    return {workers: throughput / workers / base_per_worker for workers, throughput in sorted(throughputs.items())}
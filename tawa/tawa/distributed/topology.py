@@ -0,0 +1,106 @@
+"""CPU topology of the host, for pinning one training process per group of cores."""
+
+import glob
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Set
+
+NUMA_NODE_GLOB = "/sys/devices/system/node/node[0-9]*"
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """Parse a Linux cpu list, ex: ``0-3,8-11``.
+
+    Args:
+        cpu_list (str): The cpu list
+
+    Returns:
+        List[int]: The cpus in ascending order
+    """
+    cpus: Set[int] = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def get_allowed_cpus() -> List[int]:
+    """Get the cpus this process may run on, all of them where affinity is not supported."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_numa_nodes(node_glob: str = NUMA_NODE_GLOB) -> Dict[int, List[int]]:
+    """Get the cpus of every NUMA node, one node with every cpu where the topology is not exposed.
+
+    Args:
+        node_glob (str, optional): Glob of the node directories in sysfs. Defaults to NUMA_NODE_GLOB.
+
+    Returns:
+        Dict[int, List[int]]: Cpus by node id
+    """
+    nodes = {}
+    for node_dir in sorted(glob.glob(node_glob)):
+        match = re.search(r"node(\d+)$", node_dir)
+        cpu_list_path = os.path.join(node_dir, "cpulist")
+        if match is None or not os.path.exists(cpu_list_path):
+            continue
+        with open(cpu_list_path, "r") as cpu_list_buffer:
+            cpus = parse_cpu_list(cpu_list_buffer.read())
+        if cpus:
+            nodes[int(match.group(1))] = cpus
+    return nodes or {0: get_allowed_cpus()}
+
+
+def _split(cpus: Sequence[int], num_groups: int) -> List[List[int]]:
+    size, remainder = divmod(len(cpus), num_groups)
+    groups = []
+    start = 0
+    for group_index in range(num_groups):
+        stop = start + size + (group_index < remainder)
+        groups.append(list(cpus[start:stop]))
+        start = stop
+    return groups
+
+
+def get_core_groups(
+    num_groups: int,
+    cpus: Optional[Sequence[int]] = None,
+    numa_nodes: Optional[Dict[int, List[int]]] = None,
+) -> List[List[int]]:
+    """Split the cpus into groups of neighbouring cores, one per training process.
+
+    When the number of groups is a multiple of the number of NUMA nodes every
+    node gets the same number of groups and no group spans nodes, so each
+    process keeps its memory local. Otherwise the cpus are split in order.
+
+    Args:
+        num_groups (int): Number of groups
+        cpus (Optional[Sequence[int]], optional): Cpus to split. Defaults to None (the allowed cpus).
+        numa_nodes (Optional[Dict[int, List[int]]], optional): Cpus by NUMA node. Defaults to None (the host's).
+
+    Returns:
+        List[List[int]]: Cpus of every group
+
+    Raises:
+        ValueError: If there are fewer cpus than groups
+    """
+    allowed = sorted(set(cpus if cpus is not None else get_allowed_cpus()))
+    if num_groups <= 0:
+        raise ValueError(f"num_groups must be positive, got {num_groups}")
+    if num_groups > len(allowed):
+        raise ValueError(f"Can not split {len(allowed)} cpus into {num_groups} groups")
+
+    nodes = numa_nodes if numa_nodes is not None else get_numa_nodes()
+    node_cpus = [[cpu for cpu in node if cpu in set(allowed)] for _, node in sorted(nodes.items())]
+    node_cpus = [node for node in node_cpus if node]
+    groups_per_node, remainder = divmod(num_groups, len(node_cpus)) if node_cpus else (0, 1)
+    if not remainder and all(len(node) >= groups_per_node for node in node_cpus):
+        return [group for node in node_cpus for group in _split(node, groups_per_node)]
+    return _split(allowed, num_groups)
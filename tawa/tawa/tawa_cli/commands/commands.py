@@ -2,11 +2,94 @@ import logging
 import shlex
 import subprocess
 import sys
+import time
 from typing import Optional, Tuple
 
+from tawa.tawa_inner_cli.commands.utils.benchmark import (
+    BenchmarkStore,
+    discover_benchmarks,
+    find_regressions,
+    format_benchmark_report,
+    get_commit,
+    get_runtime_environment,
+    pin_to_cpu,
+    run_benchmark,
+)
+from tawa.tawa_inner_cli.commands.utils.cache import get_cache_dir
+from tawa.tawa_inner_cli.commands.utils.changed_files import get_changed_python_files
+from tawa.tawa_inner_cli.commands.utils.importtime import write_importtime_profiles
+from tawa.tawa_inner_cli.commands.utils.memprofile import format_memprofile_report, run_with_memprofile
+from tawa.tawa_inner_cli.commands.utils.pytest_history import ORDER_DEFAULT, TestHistory, format_history_report
+from tawa.tawa_inner_cli.commands.utils.result_cache import compute_result_key, has_cached_success, record_success
+
 logging.basicConfig(level=logging.INFO)
 
 
+def bench(
+    path: list[str],
+    keyword: Optional[str] = None,
+    warmup: int = 1,
+    rounds: int = 10,
+    cpu: Optional[int] = None,
+    pin: bool = True,
+    save_baseline: Optional[str] = None,
+    compare: Optional[str] = None,
+    max_regression: float = 0.1,
+):
+    """
+    Run tawa's benchmarks. Every ``bench_*`` function in ``bench_*.py`` modules
+    under the paths is warmed up then timed over several rounds, pinned to a
+    single CPU. Results are stored per commit and runtime environment, and
+    exit with an error when a benchmark is slower than the compared results by
+    more than the allowed regression.
+
+    Args:
+        path: A list of zero or more benchmark files or directories.
+        keyword: Only run benchmarks whose name contains this.
+        warmup: Number of untimed rounds before timing.
+        rounds: Number of timed rounds.
+        cpu: CPU to pin the benchmarks to, the highest allowed CPU if ``None``.
+        pin: Whether to pin the benchmarks to a single CPU.
+        save_baseline: Also save the results as this named baseline.
+        compare: Baseline name or commit hash prefix to compare the results against.
+        max_regression: Allowed slowdown relative to the compared results, ex: 0.1 for 10%.
+    """
+    benchmarks = discover_benchmarks(path, keyword=keyword)
+    if not benchmarks:
+        logging.info("No benchmarks found")
+        return
+
+    store = BenchmarkStore(get_runtime_environment())
+    reference = None
+    if compare is not None:
+        try:
+            reference = store.load(compare)
+        except ValueError as error:
+            logging.error(error)
+            sys.exit(1)
+
+    if pin:
+        pinned_cpu = pin_to_cpu(cpu)
+        if pinned_cpu is None:
+            logging.warning("CPU pinning is not supported on this platform")
+        else:
+            logging.info(f"Pinned benchmarks to CPU {pinned_cpu}")
+
+    results = {}
+    for name, function in benchmarks:
+        results[name] = run_benchmark(name, function, warmup=warmup, rounds=rounds)
+
+    store.save(results, get_commit(), baseline=save_baseline)
+    print(format_benchmark_report(results, reference))
+
+    if reference is not None:
+        regressions = find_regressions(results, reference, max_regression)
+        if regressions:
+            for name, change in regressions.items():
+                logging.error(f"{name} regressed by {change:.1%}, more than the allowed {max_regression:.1%}")
+            sys.exit(1)
+
+
 def docs(ignore_cache: bool):
     """
     Build tawa's documentation.
@@ -27,34 +110,142 @@ def docs(ignore_cache: bool):
     run_subproc_command(command)
 
 
-def format_package(check: bool = False):
-    """Run formatting through ruff with settings in top level pyproject."""
+def format_package(
+    check: bool = False,
+    use_cache: bool = True,
+    changed_since: Optional[str] = None,
+    staged: bool = False,
+):
+    """Run formatting through ruff with settings in top level pyproject.
+
+    Args:
+        check (bool, optional): Check formatting without fixing the files. Defaults to False.
+        use_cache (bool, optional): Skip the check if it already passed on the same tree,
+            only applies with check as formatting modifies files. Defaults to True.
+        changed_since (Optional[str], optional): Only format Python files changed since this git ref.
+            Defaults to None.
+        staged (bool, optional): Only format Python files with staged changes. Defaults to False.
+    """
+    target = get_ruff_target(changed_since=changed_since, staged=staged)
+    if target is None:
+        logging.info("No changed Python files to format")
+        sys.exit(0)
+
     command = "ruff format"
     if check:
         command = command + " --check"
-    command = command + " ."
+    command = command + " " + target
+    if check and target == ".":
+        run_cached_check(command, tool="ruff", use_cache=use_cache)
     run_subproc_command(command)
 
 
-def lint(fix: bool = False):
-    """Run linting through ruff with settings in top level pyproject."""
+def import_time(modules: list[str], output_dir: Optional[str] = None, top: int = 15):
+    """Profile the cold import time of modules, each in a fresh interpreter.
+
+    The raw ``-X importtime`` output of every module and a report of the
+    slowest imports are written to the output directory, a module failing to
+    import is reported and does not fail the command.
+
+    Args:
+        modules: Modules to profile.
+        output_dir: Directory to write the profiles and report to, the tawa
+            cache dir if ``None``.
+        top: Number of slowest imports to report per module.
+    """
+    if output_dir is None:
+        output_dir = get_cache_dir("importtime")
+    print(write_importtime_profiles(modules, output_dir, top=top))
+
+
+def lint(
+    fix: bool = False,
+    use_cache: bool = True,
+    changed_since: Optional[str] = None,
+    staged: bool = False,
+):
+    """Run linting through ruff with settings in top level pyproject.
+
+    Args:
+        fix (bool, optional): Fix linting errors. Defaults to False.
+        use_cache (bool, optional): Skip linting if it already passed on the same tree,
+            does not apply with fix as fixing modifies files. Defaults to True.
+        changed_since (Optional[str], optional): Only lint Python files changed since this git ref.
+            Defaults to None.
+        staged (bool, optional): Only lint Python files with staged changes. Defaults to False.
+    """
+    target = get_ruff_target(changed_since=changed_since, staged=staged)
+    if target is None:
+        logging.info("No changed Python files to lint")
+        sys.exit(0)
+
     command = "ruff check"
     if fix:
         command = command + " --fix"
-    command = command + " ."
+    command = command + " " + target
+    if not fix and target == ".":
+        run_cached_check(command, tool="ruff", use_cache=use_cache)
     run_subproc_command(command)
 
 
-def test(path: list[str]):
+def get_ruff_target(changed_since: Optional[str] = None, staged: bool = False) -> Optional[str]:
+    """Get the paths argument for ruff, the whole tree or only the changed files.
+
+    Args:
+        changed_since (Optional[str], optional): Target Python files changed since this git ref.
+            Defaults to None.
+        staged (bool, optional): Target Python files with staged changes. Defaults to False.
+
+    Returns:
+        Optional[str]: Paths argument for ruff, None if no Python files changed
+    """
+    if changed_since is None and not staged:
+        return "."
+
+    changed_files = get_changed_python_files(changed_since=changed_since, staged=staged)
+    if changed_files is None:
+        return "."
+    if not changed_files:
+        return None
+
+    logging.info(f"Running on {len(changed_files)} changed files")
+    # ruff only applies the configured excludes to explicitly passed files with --force-exclude
+    return "--force-exclude " + shlex.join(changed_files)
+
+
+def test(
+    path: list[str],
+    order: str = ORDER_DEFAULT,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    history: bool = True,
+    keyword: Optional[str] = None,
+    collection_cache: bool = True,
+    memprofile_dir: Optional[str] = None,
+):
     """
     Run tawa's tests. This uses pytest, runs each test in its own subprocess
     via the ``forked`` plugin, and controls the random seed and the order tests
-    are run in via the ``randomly`` plugin.
+    are run in via the ``randomly`` plugin. Durations and outcomes are recorded
+    in the test history, which can reorder the tests and split them into shards.
+    Collected tests are cached per module so unchanged modules without any test
+    in the shard or matching the keyword expression are not imported.
 
     Args:
         path: A list of zero or more files or directories to run ``pytest``
             on. This corresponds to the ``[file_or_dir]`` variadic ``pytest``
             argument.
+        order: How to order tests by their history, ``default`` keeps the
+            fixed order, ``failed-first`` runs previously failed tests first
+            and ``fastest-first`` runs the fastest tests first.
+        shard_index: Index of the shard to run, in ``[0, shard_count)``.
+        shard_count: Number of shards of balanced duration to split the tests into.
+        history: Whether to record and use the test history.
+        keyword: Only run tests matching this ``pytest -k`` expression.
+        collection_cache: Whether to skip importing unchanged test modules
+            without selected tests, needs the test history.
+        memprofile_dir: Record the peak RSS and traced allocation peak of
+            every test into this directory and report the largest tests.
     """
     command_parts = ["pytest"]
 
@@ -64,15 +255,93 @@ def test(path: list[str]):
     # Fix the random seed and always run tests in the same order.
     command_parts.extend([f"--randomly-seed={0xa455}", "--randomly-dont-reorganize"])
 
+    if history:
+        command_parts.extend(["-p", "tawa.tawa_inner_cli.commands.utils.pytest_history"])
+        command_parts.extend([f"--tawa-order={order}"])
+        command_parts.extend([f"--tawa-shard-count={shard_count}", f"--tawa-shard-index={shard_index}"])
+        if not collection_cache:
+            command_parts.append("--tawa-no-collection-cache")
+    elif order != ORDER_DEFAULT or shard_count > 1:
+        logging.warning("Ordering and sharding need the test history, ignoring them")
+
+    if keyword:
+        command_parts.extend(["-k", keyword])
+
+    if memprofile_dir is not None:
+        command_parts.extend(["-p", "tawa.tawa_inner_cli.commands.utils.pytest_memprofile"])
+        command_parts.extend([f"--tawa-memprofile-dir={memprofile_dir}"])
+
     command_parts.extend(path)
 
-    run_subproc_command(" ".join(command_parts))
+    run_subproc_command(shlex.join(command_parts))
 
 
-def type_check():
-    """Run type checking with mypy and settings in mypy.ini"""
+def memprofile(command: list[str], output_dir: Optional[str] = None, top: int = 10):
+    """Run a command while recording the memory of all of its processes.
+
+    The peak RSS of every process in the command's tree is polled from
+    ``/proc`` and Python processes report their allocation sites through
+    tracemalloc. Exits with the return code of the command.
+
+    Args:
+        command: The command to run.
+        output_dir: Directory to write the memory reports to, timestamped
+            under the tawa cache dir if ``None``.
+        top: Number of processes and allocation sites to report.
+    """
+    if output_dir is None:
+        output_dir = get_cache_dir("memprofile", time.strftime("%Y%m%d-%H%M%S"))
+    returncode = run_with_memprofile(command, output_dir)
+    print(format_memprofile_report(output_dir, top=top))
+    print(f"Memory profile written to {output_dir}")
+    sys.exit(returncode)
+
+
+def test_report(top: int = 10):
+    """Print the slowest and flakiest tests from the test history.
+
+    Args:
+        top: Number of tests to show in each section of the report.
+    """
+    test_history = TestHistory()
+    try:
+        print(format_history_report(test_history.get_stats(), top=top))
+    finally:
+        test_history.close()
+
+
+def type_check(use_cache: bool = True):
+    """Run type checking with mypy and settings in mypy.ini
+
+    Args:
+        use_cache (bool, optional): Skip type checking if it already passed on the same tree.
+            Defaults to True.
+    """
     command = "mypy ."
-    run_subproc_command(command)
+    run_cached_check(command, tool="mypy", use_cache=use_cache)
+
+
+def run_cached_check(command_str: str, tool: str, use_cache: bool = True):
+    """Run a read only check command, skipping it if it already passed on the same tree.
+
+    The result is keyed by the command, tool version, tool config and the
+    content of the Python sources. Always exits the python process.
+
+    Args:
+        command_str (str): The check command to run
+        tool (str): Name of the tool the command runs, ex: ruff or mypy
+        use_cache (bool, optional): Whether to use the result cache. Defaults to True.
+    """
+    key = compute_result_key(command_str, tool) if use_cache else None
+    if key is not None and has_cached_success(key):
+        logging.info(f"No changes since last successful run of '{command_str}', skipping")
+        sys.exit(0)
+
+    # exits the process on failure, only passing results are recorded
+    run_subproc_command(command_str, exit_on_success=False)
+    if key is not None:
+        record_success(key, command_str)
+    sys.exit(0)
 
 
 def run_subproc_command(
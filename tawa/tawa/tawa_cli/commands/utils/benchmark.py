@@ -0,0 +1,311 @@
+"""Discovery, timing and storage of benchmarks for ``tawa-inner-cli bench``.
+
+Benchmarks are functions named ``bench_*`` without arguments, defined in
+``bench_*.py`` modules. Each benchmark is calibrated to a number of calls per
+round long enough to time reliably, warmed up, then timed over several rounds
+with garbage collection disabled, optionally pinned to a single CPU.
+
+Results are stored under the tawa cache dir per runtime environment, keyed by
+git commit, and can be saved as named baselines to compare later runs against.
+"""
+
+import gc
+import importlib.util
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tawa.tawa_inner_cli.commands.utils.cache import get_cache_dir, run_git_command
+
+BENCHMARK_PREFIX = "bench_"
+
+# a round shorter than this is dominated by timer resolution and call overhead
+MIN_ROUND_TIME = 0.02
+
+# set by eototo so results of different runtime environments are never compared
+RUNTIME_ENVIRONMENT_ENV_VAR = "TAWA_RUNTIME_ENVIRONMENT"
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing statistics of one benchmark, in seconds per call."""
+
+    name: str
+    rounds: int
+    iterations: int
+    min: float
+    median: float
+    mean: float
+    stddev: float
+
+
+def discover_benchmarks(paths: List[str], keyword: Optional[str] = None) -> List[Tuple[str, Callable[[], object]]]:
+    """Import benchmark modules and collect their benchmark functions.
+
+    Args:
+        paths (List[str]): Benchmark files or directories to search
+        keyword (Optional[str], optional): Only keep benchmarks whose name contains this. Defaults to None.
+
+    Returns:
+        List[Tuple[str, Callable[[], object]]]: Benchmark name, ``<module>::<function>``, and function
+    """
+    module_paths = []
+    for path in paths:
+        if os.path.isfile(path):
+            module_paths.append(path)
+            continue
+        for root, _, file_names in os.walk(path):
+            module_paths.extend(
+                os.path.join(root, file_name)
+                for file_name in file_names
+                if file_name.startswith(BENCHMARK_PREFIX) and file_name.endswith(".py")
+            )
+
+    benchmarks = []
+    for module_path in sorted(module_paths):
+        module_name = os.path.splitext(os.path.basename(module_path))[0]
+        spec = importlib.util.spec_from_file_location(module_name, module_path)
+        if spec is None or spec.loader is None:
+            raise ValueError(f"Can not import benchmark module {module_path}")
+        module = importlib.util.module_from_spec(spec)
+        # registered so dataclasses and pickling inside the benchmark module resolve it
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+
+        for attribute_name, attribute in vars(module).items():
+            if not attribute_name.startswith(BENCHMARK_PREFIX) or not callable(attribute):
+                continue
+            if getattr(attribute, "__module__", None) != module_name:
+                continue
+            name = f"{os.path.normpath(module_path)}::{attribute_name}"
+            if keyword is None or keyword in name:
+                benchmarks.append((name, attribute))
+    return benchmarks
+
+
+def pin_to_cpu(cpu: Optional[int] = None) -> Optional[int]:
+    """Pin the current process to a single CPU.
+
+    Args:
+        cpu (Optional[int], optional): CPU to pin to, the highest allowed CPU if None. Defaults to None.
+
+    Returns:
+        Optional[int]: The pinned CPU, None if pinning is not supported on this platform
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    if cpu is None:
+        # cpu 0 usually handles the most interrupts
+        cpu = max(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cpu})
+    return cpu
+
+
+def _time_calls(function: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - start
+
+
+def run_benchmark(name: str, function: Callable[[], object], warmup: int = 1, rounds: int = 10) -> BenchmarkResult:
+    """Time a benchmark function.
+
+    Args:
+        name (str): Name of the benchmark
+        function (Callable[[], object]): Benchmark function
+        warmup (int, optional): Untimed rounds before timing. Defaults to 1.
+        rounds (int, optional): Timed rounds. Defaults to 10.
+
+    Returns:
+        BenchmarkResult: Per call timing statistics
+    """
+    # the first call pays for imports and cold caches, calibrate on the second
+    function()
+    single_call = max(_time_calls(function, 1), 1e-9)
+    iterations = max(1, math.ceil(MIN_ROUND_TIME / single_call))
+
+    for _ in range(warmup):
+        _time_calls(function, iterations)
+
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        timings = [_time_calls(function, iterations) / iterations for _ in range(rounds)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return BenchmarkResult(
+        name=name,
+        rounds=rounds,
+        iterations=iterations,
+        min=min(timings),
+        median=statistics.median(timings),
+        mean=statistics.fmean(timings),
+        stddev=statistics.stdev(timings) if rounds > 1 else 0.0,
+    )
+
+
+def get_commit() -> str:
+    """Get the current git commit, suffixed with ``-dirty`` for uncommitted changes.
+
+    Returns:
+        str: Commit hash, ``unknown`` outside of a git repository
+    """
+    commit = run_git_command(["rev-parse", "HEAD"])
+    if commit is None:
+        return "unknown"
+    status = run_git_command(["status", "--porcelain", "--untracked-files=no"])
+    return commit.strip() + ("-dirty" if status else "")
+
+
+def get_runtime_environment() -> str:
+    """Get the runtime environment the benchmarks run in."""
+    return os.environ.get(RUNTIME_ENVIRONMENT_ENV_VAR, platform.machine())
+
+
+class BenchmarkStore:
+    """Benchmark results of one runtime environment, per commit and per named baseline."""
+
+    def __init__(self, runtime_environment: str):
+        self.runtime_environment = runtime_environment
+        self.commits_dir = get_cache_dir("benchmarks", runtime_environment, "commits")
+        self.baselines_dir = get_cache_dir("benchmarks", runtime_environment, "baselines")
+
+    @staticmethod
+    def _write(path: str, results: Dict[str, BenchmarkResult], commit: str) -> None:
+        results_object = {
+            "commit": commit,
+            "created": time.time(),
+            "benchmarks": {name: asdict(result) for name, result in results.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as results_buffer:
+            json.dump(results_object, results_buffer, indent=2)
+        os.replace(tmp_path, path)
+
+    def save(
+        self,
+        results: Dict[str, BenchmarkResult],
+        commit: str,
+        baseline: Optional[str] = None,
+    ) -> None:
+        """Store results under their commit, merged with earlier results of the same commit.
+
+        Args:
+            results (Dict[str, BenchmarkResult]): Results by benchmark name
+            commit (str): Commit the results were measured on
+            baseline (Optional[str], optional): Also save the results as this named baseline. Defaults to None.
+        """
+        commit_results = self._read(os.path.join(self.commits_dir, f"{commit}.json")) or {}
+        commit_results.update(results)
+        self._write(os.path.join(self.commits_dir, f"{commit}.json"), commit_results, commit)
+        if baseline is not None:
+            baseline_results = self._read(os.path.join(self.baselines_dir, f"{baseline}.json")) or {}
+            baseline_results.update(results)
+            self._write(
+                os.path.join(self.baselines_dir, f"{baseline}.json"),
+                baseline_results,
+                commit,
+            )
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, BenchmarkResult]]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as results_buffer:
+            results_object = json.load(results_buffer)
+        return {name: BenchmarkResult(**result) for name, result in results_object["benchmarks"].items()}
+
+    def load(self, reference: str) -> Dict[str, BenchmarkResult]:
+        """Load stored results by baseline name or commit hash prefix.
+
+        Args:
+            reference (str): Baseline name or commit hash prefix
+
+        Raises:
+            ValueError: If no results or several commits match the reference
+
+        Returns:
+            Dict[str, BenchmarkResult]: Results by benchmark name
+        """
+        baseline_results = self._read(os.path.join(self.baselines_dir, f"{reference}.json"))
+        if baseline_results is not None:
+            return baseline_results
+
+        matches = [file_name for file_name in os.listdir(self.commits_dir) if file_name.startswith(reference)]
+        if len(matches) > 1:
+            raise ValueError(f"Benchmark reference {reference} matches several commits: {', '.join(sorted(matches))}")
+        if not matches:
+            raise ValueError(
+                f"No stored benchmark results for {reference} in runtime environment {self.runtime_environment}"
+            )
+        return self._read(os.path.join(self.commits_dir, matches[0])) or {}
+
+
+def find_regressions(
+    results: Dict[str, BenchmarkResult],
+    reference: Dict[str, BenchmarkResult],
+    max_regression: float,
+) -> Dict[str, float]:
+    """Find benchmarks slower than the reference by more than the allowed fraction.
+
+    Medians are compared, they are less sensitive than means to a few rounds
+    disturbed by other processes.
+
+    Args:
+        results (Dict[str, BenchmarkResult]): Current results by benchmark name
+        reference (Dict[str, BenchmarkResult]): Reference results by benchmark name
+        max_regression (float): Allowed slowdown, ex: 0.1 allows 10% slower
+
+    Returns:
+        Dict[str, float]: Regressed benchmark name to its relative slowdown
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name not in reference:
+            continue
+        change = result.median / reference[name].median - 1.0
+        if change > max_regression:
+            regressions[name] = change
+    return regressions
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.1f}ns"
+
+
+def format_benchmark_report(
+    results: Dict[str, BenchmarkResult],
+    reference: Optional[Dict[str, BenchmarkResult]] = None,
+) -> str:
+    """Format benchmark results, with the change relative to the reference when given.
+
+    Args:
+        results (Dict[str, BenchmarkResult]): Results by benchmark name
+        reference (Optional[Dict[str, BenchmarkResult]], optional): Reference results. Defaults to None.
+
+    Returns:
+        str: The report
+    """
+    lines = []
+    for name, result in results.items():
+        line = (
+            f"{name}: median {_format_time(result.median)}  min {_format_time(result.min)}  "
+            f"stddev {_format_time(result.stddev)}  ({result.rounds} rounds x {result.iterations} calls)"
+        )
+        if reference is not None and name in reference:
+            line += f"  {result.median / reference[name].median - 1.0:+.1%} vs reference"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,43 @@
+import logging
+import os
+import subprocess
+from typing import List, Optional
+
+# Cache directory of tawa-inner-cli, relative to the repo root so that it
+# survives between containers through the project bind mount.
+TAWA_CACHE_DIR_ENV_VAR = "TAWA_CACHE_DIR"
+DEFAULT_TAWA_CACHE_DIR = ".tawa_cache"
+
+
+def get_cache_dir(*sub_dirs: str) -> str:
+    """Get a directory under the tawa cache dir, creating it if needed.
+
+    Args:
+        sub_dirs (str): Path components of the directory under the cache dir
+
+    Returns:
+        str: Path to the cache directory
+    """
+    cache_dir = os.path.join(os.environ.get(TAWA_CACHE_DIR_ENV_VAR, DEFAULT_TAWA_CACHE_DIR), *sub_dirs)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def run_git_command(args: List[str]) -> Optional[str]:
+    """Run a git command and return its output.
+
+    Args:
+        args (List[str]): Arguments to pass to git
+
+    Returns:
+        Optional[str]: Output of the command, None if git is unavailable or the command failed
+    """
+    try:
+        ret = subprocess.run(["git"] + args, capture_output=True, check=False, text=True)
+    except FileNotFoundError:
+        logging.warning("git is not installed")
+        return None
+    if ret.returncode != 0:
+        logging.warning(f"git {' '.join(args)} failed: {ret.stderr.strip()}")
+        return None
+    return ret.stdout
@@ -0,0 +1,43 @@
+import logging
+import os
+from typing import List, Optional
+
+from tawa.tawa_inner_cli.commands.utils.cache import run_git_command
+
+# a change to any of these can change the verdict on files that did not change
+RUFF_CONFIG_FILES = ("pyproject.toml", "ruff.toml", ".ruff.toml")
+
+PYTHON_SUFFIXES = (".py", ".pyi")
+
+
+def get_changed_python_files(changed_since: Optional[str] = None, staged: bool = False) -> Optional[List[str]]:
+    """Get the Python files changed in the working tree, used to target ruff at a diff.
+
+    Args:
+        changed_since (Optional[str], optional): Git ref to diff the working tree against,
+            untracked files count as changed. Defaults to None.
+        staged (bool, optional): Include changes staged in the index. Defaults to False.
+
+    Returns:
+        Optional[List[str]]: Sorted changed Python files that still exist, None if the whole
+            tree has to be checked, either because ruff config changed or git failed
+    """
+    outputs = []
+    if changed_since is not None:
+        outputs.append(run_git_command(["diff", "--name-only", changed_since, "--"]))
+        outputs.append(run_git_command(["ls-files", "--others", "--exclude-standard"]))
+    if staged:
+        outputs.append(run_git_command(["diff", "--name-only", "--cached", "--"]))
+
+    if any(output is None for output in outputs):
+        logging.warning("Could not determine changed files, falling back to a full run")
+        return None
+
+    changed = {path for output in outputs if output is not None for path in output.splitlines() if path}
+
+    changed_config = sorted(path for path in changed if os.path.basename(path) in RUFF_CONFIG_FILES)
+    if changed_config:
+        logging.info(f"Config files changed ({', '.join(changed_config)}), falling back to a full run")
+        return None
+
+    return sorted(path for path in changed if path.endswith(PYTHON_SUFFIXES) and os.path.isfile(path))
@@ -0,0 +1,138 @@
+"""Import time profiles of Python modules from ``python -X importtime``.
+
+Each module is imported in a fresh interpreter so the profile covers its full
+cold import, including everything it pulls in transitively.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+IMPORTTIME_PREFIX = "import time:"
+
+
+@dataclass
+class ImportRecord:
+    """Import time of one module, in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse the stderr of ``python -X importtime``.
+
+    Args:
+        output (str): stderr of the interpreter
+
+    Returns:
+        List[ImportRecord]: Imported modules in the order they finished importing
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        fields = line[len(IMPORTTIME_PREFIX) :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header line
+            continue
+        module_field = fields[2].rstrip()
+        name = module_field.lstrip()
+        # nested imports are indented by two spaces per level after the column separator space
+        depth = (len(module_field) - len(name) - 1) // 2
+        records.append(ImportRecord(module=name, self_us=int(fields[0]), cumulative_us=int(fields[1]), depth=depth))
+    return records
+
+
+def profile_import(module: str) -> subprocess.CompletedProcess:
+    """Import a module in a fresh interpreter with import time profiling.
+
+    Args:
+        module (str): Module to import
+
+    Returns:
+        subprocess.CompletedProcess: The finished interpreter, the profile is in stderr
+    """
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=False,
+        text=True,
+    )
+
+
+def format_importtime_report(profiles: Dict[str, List[ImportRecord]], top: int = 15) -> str:
+    """Format the total import time of each module and the slowest modules it imports.
+
+    Args:
+        profiles (Dict[str, List[ImportRecord]]): Import records per profiled module
+        top (int, optional): Number of slowest modules to show per profiled module. Defaults to 15.
+
+    Returns:
+        str: The report
+    """
+    lines = []
+    for module, records in profiles.items():
+        if not records:
+            lines.append(f"{module}: import failed")
+            lines.append("")
+            continue
+        # records are in the order imports finish, the module's subtree directly precedes it
+        module_index = max(
+            (index for index, record in enumerate(records) if record.depth == 0 and record.module == module),
+            default=len(records) - 1,
+        )
+        subtree_start = module_index
+        while subtree_start > 0 and records[subtree_start - 1].depth > 0:
+            subtree_start -= 1
+        subtree = records[subtree_start : module_index + 1]
+        # everything else at the top level is interpreter startup: site, .pth files, sitecustomize
+        startup_us = sum(record.cumulative_us for record in records[:subtree_start] if record.depth == 0)
+        lines.append(
+            f"{module}: {records[module_index].cumulative_us / 1e6:.3f}s import of {len(subtree)} modules "
+            f"after {startup_us / 1e6:.3f}s interpreter startup, slowest by self time:"
+        )
+        for record in sorted(subtree, key=lambda record: -record.self_us)[:top]:
+            lines.append(
+                f"  {record.self_us / 1e3:9.1f}ms self  {record.cumulative_us / 1e3:9.1f}ms cumulative  {record.module}"
+            )
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def write_importtime_profiles(modules: List[str], output_dir: str, top: int = 15) -> str:
+    """Profile the imports of modules and write the raw profiles and a report.
+
+    A module that fails to import is reported as failed, the profile is a
+    diagnostic and never fails the caller.
+
+    Args:
+        modules (List[str]): Modules to profile
+        output_dir (str): Directory for ``<module>.importtime.txt``, ``report.json`` and ``report.txt``
+        top (int, optional): Number of slowest modules to show per profiled module. Defaults to 15.
+
+    Returns:
+        str: The report
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiles = {}
+    for module in modules:
+        ret = profile_import(module)
+        with open(os.path.join(output_dir, f"{module}.importtime.txt"), "w") as profile_buffer:
+            profile_buffer.write(ret.stderr)
+        profiles[module] = parse_importtime(ret.stderr) if ret.returncode == 0 else []
+
+    with open(os.path.join(output_dir, "report.json"), "w") as report_buffer:
+        json.dump(
+            {module: [asdict(record) for record in records] for module, records in profiles.items()},
+            report_buffer,
+        )
+    report = format_importtime_report(profiles, top=top)
+    with open(os.path.join(output_dir, "report.txt"), "w") as report_buffer:
+        report_buffer.write(report + "\n")
+    return report
@@ -0,0 +1,202 @@
+"""Memory profiling of a command and all of its subprocesses.
+
+``tawa-inner-cli memprofile`` runs a command while polling ``/proc`` for the
+peak resident set size (``VmHWM``) of every process in the command's tree, so
+non Python processes are covered too. Python processes additionally trace
+their allocations with tracemalloc, started through ``PYTHONTRACEMALLOC``, and
+write their top allocation sites at exit through the ``sitecustomize`` module
+of ``memprofile_site`` put in front of ``PYTHONPATH``.
+
+Everything is written as JSON into one output directory: ``processes.json``
+from the poller and one ``allocations-<pid>.json`` per Python process.
+"""
+
+import glob
+import json
+import os
+import resource
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+MEMPROFILE_DIR_ENV_VAR = "TAWA_MEMPROFILE_DIR"
+MEMPROFILE_SITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memprofile_site")
+
+# one frame per allocation keeps tracemalloc overhead low and is enough to attribute by line
+TRACEMALLOC_FRAMES = 1
+POLL_INTERVAL = 0.1
+
+
+def format_bytes(size: float) -> str:
+    """Format a size in bytes with a binary unit."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size:.0f}B"
+        size /= 1024
+    return f"{size:.1f}GiB"
+
+
+def read_peak_rss(pid: int) -> Optional[int]:
+    """Read the peak resident set size of a process from ``/proc``.
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        Optional[int]: Peak RSS in bytes, None if the process is gone or /proc is unavailable
+    """
+    try:
+        with open(f"/proc/{pid}/status", "r") as status_buffer:
+            for line in status_buffer:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def _read_cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline_buffer:
+            return cmdline_buffer.read().replace(b"\0", b" ").decode(errors="replace").strip()
+    except OSError:
+        return ""
+
+
+def _list_children(pid: int) -> List[int]:
+    children = []
+    for children_path in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(children_path, "r") as children_buffer:
+                children.extend(int(child) for child in children_buffer.read().split())
+        except (OSError, ValueError):
+            continue
+    return children
+
+
+class ProcessTreePoller(threading.Thread):
+    """Background thread polling the peak RSS of a process and all of its descendants."""
+
+    def __init__(self, root_pid: int, interval: float = POLL_INTERVAL):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.processes: Dict[int, Dict] = {}
+        self._stopped = threading.Event()
+
+    def poll(self) -> None:
+        """Record the current peak RSS of every process in the tree."""
+        pending = [self.root_pid]
+        while pending:
+            pid = pending.pop()
+            peak_rss = read_peak_rss(pid)
+            if peak_rss is None:
+                continue
+            process = self.processes.get(pid)
+            if process is None:
+                process = self.processes[pid] = {"pid": pid, "cmdline": _read_cmdline(pid), "peak_rss": 0}
+            # the cmdline changes after exec, keep the last one seen
+            process["cmdline"] = _read_cmdline(pid) or process["cmdline"]
+            process["peak_rss"] = max(process["peak_rss"], peak_rss)
+            pending.extend(_list_children(pid))
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self) -> None:
+        """Stop polling after a last poll."""
+        self._stopped.set()
+        self.join()
+
+
+def get_memprofile_env(output_dir: str) -> Dict[str, str]:
+    """Get the environment that turns on allocation tracing in Python subprocesses.
+
+    Args:
+        output_dir (str): Directory the allocation reports are written to
+
+    Returns:
+        Dict[str, str]: Copy of the current environment with memory profiling enabled
+    """
+    env = dict(os.environ)
+    env[MEMPROFILE_DIR_ENV_VAR] = os.path.abspath(output_dir)
+    env["PYTHONTRACEMALLOC"] = str(TRACEMALLOC_FRAMES)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [MEMPROFILE_SITE_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def run_with_memprofile(command: List[str], output_dir: str) -> int:
+    """Run a command and record the memory of its process tree.
+
+    Args:
+        command (List[str]): Command to run
+        output_dir (str): Directory to write the memory reports to
+
+    Returns:
+        int: Return code of the command
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    process = subprocess.Popen(command, env=get_memprofile_env(output_dir))
+    poller = ProcessTreePoller(process.pid)
+    poller.start()
+    try:
+        returncode = process.wait()
+    finally:
+        poller.stop()
+
+    processes = sorted(poller.processes.values(), key=lambda process_object: -process_object["peak_rss"])
+    with open(os.path.join(output_dir, "processes.json"), "w") as processes_buffer:
+        json.dump(
+            {
+                "command": command,
+                "returncode": returncode,
+                # largest waited for descendant, covers processes too short lived to be polled
+                "children_max_rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+                "processes": processes,
+            },
+            processes_buffer,
+            indent=2,
+        )
+    return returncode
+
+
+def format_memprofile_report(output_dir: str, top: int = 10) -> str:
+    """Format the peak RSS per process and the top allocation sites over all Python processes.
+
+    Args:
+        output_dir (str): Directory the memory reports were written to
+        top (int, optional): Number of processes and allocation sites to show. Defaults to 10.
+
+    Returns:
+        str: The report
+    """
+    lines = []
+    processes_path = os.path.join(output_dir, "processes.json")
+    if os.path.exists(processes_path):
+        with open(processes_path, "r") as processes_buffer:
+            processes_object = json.load(processes_buffer)
+        processes = processes_object["processes"]
+        lines.append(f"Peak RSS of the {min(top, len(processes))} largest of {len(processes)} processes:")
+        lines.extend(
+            f"  {format_bytes(process['peak_rss']):>10}  {process['pid']:>7}  {process['cmdline'][:100]}"
+            for process in processes[:top]
+        )
+        lines.append(f"Largest waited for subprocess peak RSS: {format_bytes(processes_object['children_max_rss'])}")
+
+    sites: Dict[str, List[int]] = {}
+    traced_peak = 0
+    for allocations_path in glob.glob(os.path.join(output_dir, "allocations-*.json")):
+        with open(allocations_path, "r") as allocations_buffer:
+            allocations_object = json.load(allocations_buffer)
+        traced_peak = max(traced_peak, allocations_object["traced_peak"])
+        for site in allocations_object["sites"]:
+            size_count = sites.setdefault(site["site"], [0, 0])
+            size_count[0] += site["size"]
+            size_count[1] += site["count"]
+    if sites:
+        lines.append("")
+        lines.append(f"Top allocation sites near the traced peak, largest traced peak {format_bytes(traced_peak)}:")
+        for site, (size, count) in sorted(sites.items(), key=lambda item: -item[1][0])[:top]:
+            lines.append(f"  {format_bytes(size):>10}  {count:>9} blocks  {site}")
+    return "\n".join(lines)
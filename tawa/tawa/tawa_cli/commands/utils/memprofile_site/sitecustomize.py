@@ -0,0 +1,105 @@
+"""Allocation report of every Python process started under ``tawa-inner-cli memprofile``.
+
+Imported at startup because its directory is put in front of ``PYTHONPATH``.
+tracemalloc is already tracing through ``PYTHONTRACEMALLOC``, a daemon thread
+snapshots the allocation sites whenever traced memory grows 10% past the last
+snapshot so the report reflects the peak, and the report is written at exit.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# duplicated from memprofile, importing tawa here would slow down every profiled interpreter
+MEMPROFILE_DIR_ENV_VAR = "TAWA_MEMPROFILE_DIR"
+TOP_ALLOCATION_SITES = 25
+SNAPSHOT_GROWTH = 1.1
+SNAPSHOT_INTERVAL = 0.1
+
+
+class _AllocationRecorder:
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.written = False
+        self.lock = threading.Lock()
+
+    def maybe_snapshot(self) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        if current <= self.snapshot_size * SNAPSHOT_GROWTH:
+            return
+        with self.lock:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+
+    def watch(self) -> None:
+        while tracemalloc.is_tracing():
+            self.maybe_snapshot()
+            time.sleep(SNAPSHOT_INTERVAL)
+
+    def write(self) -> None:
+        if self.written or not tracemalloc.is_tracing():
+            return
+        self.written = True
+        self.maybe_snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        sites = []
+        if self.snapshot is not None:
+            for statistic in self.snapshot.statistics("lineno")[:TOP_ALLOCATION_SITES]:
+                frame = statistic.traceback[0]
+                sites.append(
+                    {"site": f"{frame.filename}:{frame.lineno}", "size": statistic.size, "count": statistic.count}
+                )
+        report = {
+            "pid": os.getpid(),
+            "argv": sys.argv,
+            "traced_peak": traced_peak,
+            "snapshot_size": self.snapshot_size,
+            "sites": sites,
+        }
+        try:
+            with open(os.path.join(self.output_dir, f"allocations-{os.getpid()}.json"), "w") as report_buffer:
+                json.dump(report, report_buffer, indent=2)
+        except OSError:
+            pass
+
+
+_recorder = None
+
+
+def _start_recorder(output_dir: str) -> None:
+    global _recorder
+    if _recorder is not None:
+        atexit.unregister(_recorder.write)
+    _recorder = _AllocationRecorder(output_dir)
+    atexit.register(_recorder.write)
+    threading.Thread(target=_recorder.watch, daemon=True, name="tawa-memprofile").start()
+
+
+def _restart_in_child() -> None:
+    # a forked child has its own peak and report, threads do not survive fork
+    tracemalloc.reset_peak()
+    _start_recorder(_recorder.output_dir)
+
+    # multiprocessing fork workers leave through os._exit and skip atexit, but run their finalizers
+    multiprocessing_util = sys.modules.get("multiprocessing.util")
+    if multiprocessing_util is not None:
+        multiprocessing_util.register_after_fork(
+            _recorder, lambda recorder: multiprocessing_util.Finalize(recorder, recorder.write, exitpriority=0)
+        )
+
+
+def _start() -> None:
+    output_dir = os.environ.get(MEMPROFILE_DIR_ENV_VAR)
+    if not output_dir or not tracemalloc.is_tracing():
+        return
+    _start_recorder(output_dir)
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+
+_start()
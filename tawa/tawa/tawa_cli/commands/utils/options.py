@@ -18,6 +18,107 @@ option_lint_fix = click.option(
     help="Fix linting failures.",
 )
 
+option_bench_path = click.option(
+    "--path",
+    multiple=True,
+    default=["tawa/benchmarks"],
+    show_default=True,
+    type=str,
+    help="Benchmark files or directories. Can be specified multiple times.",
+)
+
+option_bench_keyword = click.option(
+    "-k",
+    "--keyword",
+    "keyword",
+    type=str,
+    default=None,
+    help="Only run benchmarks whose name contains this.",
+)
+
+option_bench_warmup = click.option(
+    "--warmup",
+    "warmup",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Number of untimed rounds before timing.",
+)
+
+option_bench_rounds = click.option(
+    "--rounds",
+    "rounds",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of timed rounds.",
+)
+
+option_bench_cpu = click.option(
+    "--cpu",
+    "cpu",
+    type=click.IntRange(min=0),
+    default=None,
+    help="CPU to pin the benchmarks to. Defaults to the highest allowed CPU.",
+)
+
+option_bench_no_pin = click.option(
+    "--no-pin",
+    "no_pin",
+    is_flag=True,
+    default=False,
+    help="Don't pin the benchmarks to a single CPU.",
+)
+
+option_bench_save_baseline = click.option(
+    "--save-baseline",
+    "save_baseline",
+    type=str,
+    default=None,
+    help="Also save the results as this named baseline.",
+)
+
+option_bench_compare = click.option(
+    "--compare",
+    "compare",
+    type=str,
+    default=None,
+    help="Baseline name or commit hash prefix to compare against, fails on regressions.",
+)
+
+option_bench_max_regression = click.option(
+    "--max-regression",
+    "max_regression",
+    type=click.FloatRange(min=0.0),
+    default=0.1,
+    show_default=True,
+    help="Allowed slowdown of the median relative to the compared results, 0.1 allows 10% slower.",
+)
+
+option_changed_since = click.option(
+    "--changed-since",
+    "changed_since",
+    default=None,
+    type=str,
+    help="Only run on Python files changed since this git ref. Runs on everything if ruff config changed.",
+)
+
+option_staged = click.option(
+    "--staged",
+    "staged",
+    is_flag=True,
+    default=False,
+    help="Only run on Python files with staged changes. Runs on everything if ruff config changed.",
+)
+
+option_no_result_cache = click.option(
+    "--no-cache",
+    "no_cache",
+    is_flag=True,
+    default=False,
+    help="Always run the check, even if it already passed on an unchanged tree.",
+)
+
 option_docs_ignore_cache = click.option(
     "--ignore-cache",
     is_flag=True,
@@ -32,3 +133,106 @@ option_test_pytest_path = click.option(
     type=str,
     help="Files or directories to pass to `pytest`. Can be specified multiple times.",
 )
+
+option_test_order = click.option(
+    "--order",
+    "order",
+    type=click.Choice(["default", "failed-first", "fastest-first"]),
+    default="default",
+    show_default=True,
+    help="Order tests by their recorded history.",
+)
+
+option_test_shard_count = click.option(
+    "--shard-count",
+    "shard_count",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Split the tests into this many shards of balanced recorded duration.",
+)
+
+option_test_shard_index = click.option(
+    "--shard-index",
+    "shard_index",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Index of the shard to run.",
+)
+
+option_test_no_history = click.option(
+    "--no-history",
+    "no_history",
+    is_flag=True,
+    default=False,
+    help="Don't record or use the test history.",
+)
+
+option_test_keyword = click.option(
+    "-k",
+    "--keyword",
+    "keyword",
+    type=str,
+    default=None,
+    help="Only run tests matching this `pytest -k` expression.",
+)
+
+option_test_no_collection_cache = click.option(
+    "--no-collection-cache",
+    "no_collection_cache",
+    is_flag=True,
+    default=False,
+    help="Import every test module instead of skipping unchanged modules without selected tests.",
+)
+
+option_test_memprofile_dir = click.option(
+    "--memprofile-dir",
+    "memprofile_dir",
+    type=str,
+    default=None,
+    help="Record the peak memory of every test into this directory and report the largest tests.",
+)
+
+option_import_time_output_dir = click.option(
+    "--output-dir",
+    "output_dir",
+    type=str,
+    default=None,
+    help="Directory to write the import time profiles and report to. Defaults to the tawa cache.",
+)
+
+option_import_time_top = click.option(
+    "--top",
+    "top",
+    type=click.IntRange(min=1),
+    default=15,
+    show_default=True,
+    help="Number of slowest imports to report per module.",
+)
+
+option_memprofile_output_dir = click.option(
+    "--output-dir",
+    "output_dir",
+    type=str,
+    default=None,
+    help="Directory to write the memory reports to. Defaults to a timestamped dir in the tawa cache.",
+)
+
+option_memprofile_top = click.option(
+    "--top",
+    "top",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of processes and allocation sites to report.",
+)
+
+option_test_report_top = click.option(
+    "--top",
+    "top",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of tests to show in each section of the report.",
+)
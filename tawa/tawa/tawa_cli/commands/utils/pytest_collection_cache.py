@@ -0,0 +1,261 @@
+"""Cache of collected pytest items per test module.
+
+For every collected test module the cache keeps the module hash and, for each
+of its items, the node id and the names ``-k`` expressions are matched
+against. The module hash covers the module source, every ``conftest.py``
+between it and the rootdir, the modules under the rootdir it imports,
+transitively, and the size and modification time of the other files in its
+directory tree, ex: data files its parametrization reads. The whole cache is
+tied to the pytest version and config file. While a module is unchanged its
+cached items can be used for selection without importing it.
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import sys
+from typing import Dict, List, Optional, Set
+
+import pytest
+
+from tawa.tawa_inner_cli.commands.utils.cache import get_cache_dir
+
+COLLECTION_CACHE_NAME = "collection_cache.json"
+
+
+def get_item_names(item: pytest.Item) -> List[str]:
+    """Get the names a ``-k`` expression is matched against for an item.
+
+    Mirrors pytest's keyword matching: the names of the item and its parents,
+    extra keyword matches, function attributes and marker names.
+
+    Args:
+        item (pytest.Item): Collected item
+
+    Returns:
+        List[str]: Sorted names of the item
+    """
+    names = set()
+    for node in item.listchain():
+        if not isinstance(node, pytest.Session):
+            names.add(node.name)
+        names.update(node.extra_keyword_matches)
+    function = getattr(item, "function", None)
+    if function is not None:
+        names.update(function.__dict__)
+    names.update(marker.name for marker in item.iter_markers())
+    return sorted(names)
+
+
+class CollectionCache:
+    """Collected items per test module, persisted as JSON under the tawa cache dir."""
+
+    def __init__(self, config: pytest.Config, path: Optional[str] = None):
+        self.rootdir = Path(config.rootpath)
+        self.path = path or os.path.join(get_cache_dir(), COLLECTION_CACHE_NAME)
+        self.salt = self._get_salt(config)
+        self._conftest_hashes: Dict[Path, str] = {}
+        self._file_hashes: Dict[Path, str] = {}
+        self._imports: Dict[Path, Set[Path]] = {}
+        self._data_file_hashes: Dict[Path, str] = {}
+        # where absolute imports of test modules resolve under the rootdir
+        self._import_roots = [self.rootdir] + [
+            Path(path).resolve()
+            for path in sys.path
+            if path and Path(path).resolve().is_relative_to(self.rootdir.resolve())
+        ]
+        self._module_hashes: Dict[Path, str] = {}
+        self._collected: Dict[str, Dict[str, List[str]]] = {}
+
+        self.modules: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as cache_buffer:
+                    cache_object = json.load(cache_buffer)
+                if cache_object.get("salt") == self.salt:
+                    self.modules = cache_object.get("modules", {})
+            except (OSError, ValueError) as error:
+                logging.warning(f"Ignoring unreadable collection cache: {error}")
+
+    @staticmethod
+    def _get_salt(config: pytest.Config) -> str:
+        digest = hashlib.sha256(pytest.__version__.encode())
+        if config.inipath is not None and config.inipath.exists():
+            digest.update(config.inipath.read_bytes())
+        return digest.hexdigest()
+
+    def _get_conftest_hash(self, directory: Path) -> str:
+        if directory not in self._conftest_hashes:
+            conftest = directory / "conftest.py"
+            self._conftest_hashes[directory] = (
+                hashlib.sha256(conftest.read_bytes()).hexdigest() if conftest.exists() else ""
+            )
+        return self._conftest_hashes[directory]
+
+    def _get_file_hash(self, path: Path) -> str:
+        if path not in self._file_hashes:
+            self._file_hashes[path] = hashlib.sha256(path.read_bytes()).hexdigest()
+        return self._file_hashes[path]
+
+    def _find_module(self, bases: List[Path], parts: List[str]) -> List[Path]:
+        for base in bases:
+            candidate = base.joinpath(*parts)
+            for path in (candidate.with_suffix(".py"), candidate / "__init__.py"):
+                if parts and path.is_file():
+                    return [path]
+        return []
+
+    def get_local_imports(self, module_path: Path) -> Set[Path]:
+        """Get the files under the rootdir a module imports directly.
+
+        Imports are found without running the module, imports built at run
+        time, ex: with importlib, are missed.
+
+        Args:
+            module_path (Path): Path of the module
+
+        Returns:
+            Set[Path]: Paths of the imported modules and packages under the rootdir
+        """
+        if module_path in self._imports:
+            return self._imports[module_path]
+        try:
+            tree = ast.parse(module_path.read_bytes(), filename=str(module_path))
+        except (SyntaxError, ValueError):
+            # collected as usual, pytest reports the error
+            tree = ast.Module(body=[], type_ignores=[])
+        # rootdir relative imports: the first directory up without an __init__.py is on sys.path
+        package_root = module_path.parent
+        while (package_root / "__init__.py").exists() and package_root != package_root.parent:
+            package_root = package_root.parent
+        absolute_bases = [package_root] + self._import_roots
+
+        imports: Set[Path] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.update(self._find_module(absolute_bases, alias.name.split(".")))
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = module_path.parent
+                    for _ in range(node.level - 1):
+                        base = base.parent
+                    bases = [base]
+                else:
+                    bases = absolute_bases
+                parts = node.module.split(".") if node.module else []
+                imports.update(self._find_module(bases, parts))
+                # ex: from helpers import cases, cases may be a module itself
+                for alias in node.names:
+                    imports.update(self._find_module(bases, parts + [alias.name]))
+        self._imports[module_path] = {
+            path.resolve() for path in imports if path.resolve().is_relative_to(self.rootdir.resolve())
+        } - {module_path.resolve()}
+        return self._imports[module_path]
+
+    def _get_data_file_hash(self, directory: Path) -> str:
+        if directory not in self._data_file_hashes:
+            digest = hashlib.sha256()
+            for parent, dir_names, file_names in sorted(os.walk(directory)):
+                dir_names[:] = sorted(name for name in dir_names if name != "__pycache__" and not name.startswith("."))
+                for file_name in sorted(file_names):
+                    if file_name.endswith((".py", ".pyc")):
+                        continue
+                    stat = os.stat(os.path.join(parent, file_name))
+                    relative_path = os.path.relpath(os.path.join(parent, file_name), directory)
+                    digest.update(f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            self._data_file_hashes[directory] = digest.hexdigest()
+        return self._data_file_hashes[directory]
+
+    def get_module_hash(self, module_path: Path) -> str:
+        """Hash a test module together with everything its collection depends on.
+
+        Covers the module, the conftest files that apply to it, the modules
+        under the rootdir it imports, transitively, and the other files in its
+        directory tree.
+
+        Args:
+            module_path (Path): Path of the test module
+
+        Returns:
+            str: Hex digest of the module
+        """
+        if module_path not in self._module_hashes:
+            digest = hashlib.sha256(module_path.read_bytes())
+            dependencies: Set[Path] = set()
+            pending = [module_path]
+            while pending:
+                for imported_path in self.get_local_imports(pending.pop()):
+                    if imported_path not in dependencies:
+                        dependencies.add(imported_path)
+                        pending.append(imported_path)
+            for imported_path in sorted(dependencies):
+                relative_path = os.path.relpath(imported_path, self.rootdir)
+                digest.update(f"{relative_path}:{self._get_file_hash(imported_path)};".encode())
+            digest.update(self._get_data_file_hash(module_path.parent).encode())
+            directory = module_path.parent
+            while True:
+                digest.update(self._get_conftest_hash(directory).encode())
+                if directory == self.rootdir or directory == directory.parent:
+                    break
+                directory = directory.parent
+            self._module_hashes[module_path] = digest.hexdigest()
+        return self._module_hashes[module_path]
+
+    def _get_key(self, module_path: Path) -> str:
+        return os.path.relpath(module_path, self.rootdir)
+
+    def get_unchanged_items(self, module_path: Path) -> Optional[Dict[str, List[str]]]:
+        """Get the cached items of a module if the module did not change.
+
+        Args:
+            module_path (Path): Path of the test module
+
+        Returns:
+            Optional[Dict[str, List[str]]]: Node id to keyword names, None if not cached or changed
+        """
+        entry = self.modules.get(self._get_key(module_path))
+        if entry is None or entry["hash"] != self.get_module_hash(module_path):
+            return None
+        return entry["items"]
+
+    def get_all_nodeids(self) -> List[str]:
+        """Get the cached node ids of every module that still exists.
+
+        Returns:
+            List[str]: Sorted node ids
+        """
+        return sorted(
+            nodeid
+            for key, entry in self.modules.items()
+            if (self.rootdir / key).exists()
+            for nodeid in entry["items"]
+        )
+
+    def record_item(self, item: pytest.Item) -> None:
+        """Record a collected item under its module.
+
+        Args:
+            item (pytest.Item): Collected item
+        """
+        module_path = Path(item.path)
+        if module_path.suffix != ".py":
+            return
+        self._collected.setdefault(self._get_key(module_path), {})[item.nodeid] = get_item_names(item)
+
+    def save(self) -> None:
+        """Persist the modules collected in this session over the previous entries."""
+        for key, items in self._collected.items():
+            self.modules[key] = {"hash": self.get_module_hash(self.rootdir / key), "items": items}
+        self.modules = {key: entry for key, entry in self.modules.items() if (self.rootdir / key).exists()}
+
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as cache_buffer:
+                json.dump({"salt": self.salt, "modules": self.modules}, cache_buffer)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            logging.warning(f"Could not write collection cache: {error}")
@@ -0,0 +1,461 @@
+"""pytest plugin recording per test durations and outcomes across runs.
+
+The history is kept in a small sqlite database under the tawa cache dir and
+is used to order the next runs (previously failed first or fastest first),
+to split a run into shards of balanced duration and to report the slowest and
+flakiest tests. Loaded by ``tawa-inner-cli test`` through ``-p``.
+
+With the collection cache enabled, unchanged test modules that have no test
+selected by the shard or ``-k`` expression are not imported at all.
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytest
+
+from tawa.tawa_inner_cli.commands.utils.cache import get_cache_dir
+from tawa.tawa_inner_cli.commands.utils.pytest_collection_cache import CollectionCache
+
+HISTORY_DB_NAME = "test_history.sqlite3"
+SHARD_PLANS_DIR_NAME = "shard_plans"
+# plans of older test sets are removed, each sharded run of a new set adds one
+MAX_SHARD_PLANS = 20
+
+# only the most recent runs are kept, older ones stop being representative
+MAX_HISTORY_RUNS = 50
+
+ORDER_DEFAULT = "default"
+ORDER_FAILED_FIRST = "failed-first"
+ORDER_FASTEST_FIRST = "fastest-first"
+ORDER_CHOICES = [ORDER_DEFAULT, ORDER_FAILED_FIRST, ORDER_FASTEST_FIRST]
+
+OUTCOME_FAILED = "failed"
+OUTCOME_PASSED = "passed"
+OUTCOME_SKIPPED = "skipped"
+
+
+@dataclass
+class TestStats:
+    """Aggregated history of one test."""
+
+    __test__ = False  # not a test class, keep pytest from collecting it
+
+    nodeid: str
+    runs: int
+    failures: int
+    mean_duration: float
+    last_outcome: str
+    flips: int
+
+    @property
+    def flakiness(self) -> float:
+        """Fraction of consecutive runs where the outcome flipped between passed and failed."""
+        if self.runs < 2:
+            return 0.0
+        return self.flips / (self.runs - 1)
+
+
+def get_history_path() -> str:
+    """Get the path of the test history database in the tawa cache dir."""
+    return os.path.join(get_cache_dir(), HISTORY_DB_NAME)
+
+
+class TestHistory:
+    """sqlite backed store of test outcomes and durations."""
+
+    __test__ = False  # not a test class, keep pytest from collecting it
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_history_path()
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS results (
+                run_id INTEGER NOT NULL,
+                nodeid TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                duration REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_nodeid ON results (nodeid, run_id);
+            """
+        )
+
+    def record_run(self, results: Dict[str, Tuple[str, float]]) -> None:
+        """Record the results of one run in a single transaction and prune old runs.
+
+        Args:
+            results (Dict[str, Tuple[str, float]]): Test node id to outcome and duration in seconds
+        """
+        if not results:
+            return
+        with self._connection:
+            run_id = self._connection.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),)).lastrowid
+            self._connection.executemany(
+                "INSERT INTO results (run_id, nodeid, outcome, duration) VALUES (?, ?, ?, ?)",
+                [(run_id, nodeid, outcome, duration) for nodeid, (outcome, duration) in results.items()],
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE run_id <= (SELECT COALESCE(MAX(id), 0) FROM runs) - ?",
+                (MAX_HISTORY_RUNS,),
+            )
+            self._connection.execute(
+                "DELETE FROM runs WHERE id <= (SELECT COALESCE(MAX(id), 0) FROM runs) - ?",
+                (MAX_HISTORY_RUNS,),
+            )
+
+    def get_stats(self) -> Dict[str, TestStats]:
+        """Aggregate the recorded history per test, skipped results are ignored.
+
+        Returns:
+            Dict[str, TestStats]: Test node id to its aggregated history
+        """
+        rows = self._connection.execute(
+            "SELECT nodeid, outcome, duration FROM results WHERE outcome != ? ORDER BY nodeid, run_id",
+            (OUTCOME_SKIPPED,),
+        )
+        stats: Dict[str, TestStats] = {}
+        for nodeid, outcome, duration in rows:
+            test_stats = stats.get(nodeid)
+            if test_stats is None:
+                stats[nodeid] = TestStats(
+                    nodeid=nodeid,
+                    runs=1,
+                    failures=int(outcome == OUTCOME_FAILED),
+                    mean_duration=duration,
+                    last_outcome=outcome,
+                    flips=0,
+                )
+                continue
+            test_stats.mean_duration += (duration - test_stats.mean_duration) / (test_stats.runs + 1)
+            test_stats.runs += 1
+            test_stats.failures += int(outcome == OUTCOME_FAILED)
+            test_stats.flips += int(outcome != test_stats.last_outcome)
+            test_stats.last_outcome = outcome
+        return stats
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+
+def order_nodeids(nodeids: List[str], stats: Dict[str, TestStats], order: str) -> List[str]:
+    """Order test node ids by their history.
+
+    Args:
+        nodeids (List[str]): Node ids in collection order
+        stats (Dict[str, TestStats]): History per node id
+        order (str): One of ORDER_CHOICES
+
+    Returns:
+        List[str]: Reordered node ids, ties keep collection order
+    """
+    if order == ORDER_FAILED_FIRST:
+        return sorted(nodeids, key=lambda nodeid: nodeid not in stats or stats[nodeid].last_outcome != OUTCOME_FAILED)
+    if order == ORDER_FASTEST_FIRST:
+        # tests without history are new or renamed, most likely what is being worked on
+        return sorted(nodeids, key=lambda nodeid: stats[nodeid].mean_duration if nodeid in stats else 0.0)
+    return list(nodeids)
+
+
+def assign_shards(nodeids: List[str], stats: Dict[str, TestStats], shard_count: int) -> Dict[str, int]:
+    """Split tests into shards of balanced total duration.
+
+    Longest tests are placed first, each on the currently shortest shard.
+    Tests without history get the median known duration. The assignment is
+    deterministic for the same tests and history, see load_or_assign_shards
+    for keeping it across shards run one after another.
+
+    Args:
+        nodeids (List[str]): Node ids to split
+        stats (Dict[str, TestStats]): History per node id
+        shard_count (int): Number of shards
+
+    Returns:
+        Dict[str, int]: Node id to shard index
+    """
+    known_durations = sorted(stats[nodeid].mean_duration for nodeid in nodeids if nodeid in stats)
+    default_duration = known_durations[len(known_durations) // 2] if known_durations else 1.0
+
+    def get_duration(nodeid: str) -> float:
+        return stats[nodeid].mean_duration if nodeid in stats else default_duration
+
+    shard_totals = [0.0] * shard_count
+    assignment = {}
+    for nodeid in sorted(nodeids, key=lambda nodeid: (-get_duration(nodeid), nodeid)):
+        shard_index = min(range(shard_count), key=lambda index: (shard_totals[index], index))
+        assignment[nodeid] = shard_index
+        shard_totals[shard_index] += get_duration(nodeid)
+    return assignment
+
+
+def get_shard_plan_key(nodeids: List[str], shard_count: int) -> str:
+    """Hash the tests and the shard count a shard plan is computed for."""
+    digest = hashlib.sha256(f"{shard_count}\n".encode())
+    digest.update("\n".join(sorted(nodeids)).encode())
+    return digest.hexdigest()
+
+
+def load_or_assign_shards(
+    nodeids: List[str], stats: Dict[str, TestStats], shard_count: int, plan_dir: str
+) -> Dict[str, int]:
+    """Get the shard plan of a test set, assigning and persisting it on first use.
+
+    Every shard run writes its durations to the history before the next shard
+    starts, so shards run one after another would each balance a different
+    history. The first shard persists its plan and the others reuse it, every
+    test then runs in exactly one shard.
+
+    Args:
+        nodeids (List[str]): Node ids to split
+        stats (Dict[str, TestStats]): History per node id, only used to assign a new plan
+        shard_count (int): Number of shards
+        plan_dir (str): Directory of the persisted plans
+
+    Returns:
+        Dict[str, int]: Node id to shard index
+    """
+    plan_path = os.path.join(plan_dir, f"{get_shard_plan_key(nodeids, shard_count)}.json")
+    try:
+        with open(plan_path, "r") as plan_buffer:
+            return json.load(plan_buffer)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as error:
+        logging.warning(f"Ignoring unreadable shard plan: {error}")
+
+    assignment = assign_shards(nodeids, stats, shard_count)
+    try:
+        os.makedirs(plan_dir, exist_ok=True)
+        tmp_path = f"{plan_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as plan_buffer:
+            json.dump(assignment, plan_buffer)
+        # shards started in parallel compute the same plan from the same history, the last rename wins
+        os.replace(tmp_path, plan_path)
+        plan_paths = sorted(
+            (os.path.join(plan_dir, name) for name in os.listdir(plan_dir) if name.endswith(".json")),
+            key=os.path.getmtime,
+        )
+        for old_plan_path in plan_paths[:-MAX_SHARD_PLANS]:
+            os.remove(old_plan_path)
+    except OSError as error:
+        logging.warning(f"Could not persist the shard plan: {error}")
+    return assignment
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("tawa-history", "tawa test history")
+    group.addoption(
+        "--tawa-history-path",
+        default=None,
+        help="Path of the test history database. Defaults to the tawa cache dir.",
+    )
+    group.addoption(
+        "--tawa-order",
+        default=ORDER_DEFAULT,
+        choices=ORDER_CHOICES,
+        help="Order tests by their history.",
+    )
+    group.addoption("--tawa-shard-count", type=int, default=1, help="Number of duration balanced shards.")
+    group.addoption("--tawa-shard-index", type=int, default=0, help="Index of the shard to run.")
+    group.addoption(
+        "--tawa-no-collection-cache",
+        action="store_true",
+        default=False,
+        help="Import every test module instead of skipping unchanged modules without selected tests.",
+    )
+
+
+def get_keyword_matcher(keyword_expression: str) -> Optional[Callable[[List[str]], bool]]:
+    """Compile a ``-k`` expression into a matcher over cached keyword names.
+
+    Args:
+        keyword_expression (str): The -k expression
+
+    Returns:
+        Optional[Callable[[List[str]], bool]]: Matcher, None when the expression can not be evaluated
+    """
+    try:
+        from _pytest.mark.expression import Expression
+
+        expression = Expression.compile(keyword_expression)
+    except Exception:
+        # private pytest api, without it every module is collected as usual
+        return None
+
+    def matches(names: List[str]) -> bool:
+        lowered_names = [name.lower() for name in names]
+        return expression.evaluate(lambda subname: any(subname.lower() in name for name in lowered_names))
+
+    return matches
+
+
+class TestHistoryPlugin:
+    """Records results into the history and applies history based ordering and sharding."""
+
+    __test__ = False  # not a test class, keep pytest from collecting it
+
+    def __init__(self, config: pytest.Config):
+        self.config = config
+        self.history = TestHistory(config.getoption("tawa_history_path"))
+        self.stats = self.history.get_stats()
+        self.shard_plan_dir = os.path.join(os.path.dirname(os.path.abspath(self.history.path)), SHARD_PLANS_DIR_NAME)
+        self.results: Dict[str, Tuple[str, float]] = {}
+
+        self.shard_count = config.getoption("tawa_shard_count")
+        self.shard_index = config.getoption("tawa_shard_index")
+        if self.shard_count > 1 and not 0 <= self.shard_index < self.shard_count:
+            raise pytest.UsageError(f"--tawa-shard-index must be in [0, {self.shard_count})")
+
+        self.collection_cache: Optional[CollectionCache] = None
+        if not config.getoption("tawa_no_collection_cache"):
+            self.collection_cache = CollectionCache(config)
+        self.keyword_matcher = get_keyword_matcher(config.getoption("keyword")) if config.getoption("keyword") else None
+        self.python_files = config.getini("python_files")
+
+        # shards are assigned over the cached node ids, known before any module is imported,
+        # so skipping a module never moves tests between shards; new node ids are hashed
+        self.shard_assignment: Optional[Dict[str, int]] = None
+        if self.shard_count > 1 and self.collection_cache is not None:
+            cached_nodeids = self.collection_cache.get_all_nodeids()
+            if cached_nodeids:
+                self.shard_assignment = load_or_assign_shards(
+                    cached_nodeids, self.stats, self.shard_count, self.shard_plan_dir
+                )
+
+    def get_shard(self, nodeid: str) -> int:
+        """Get the shard of a test, by duration balancing when known and by hash otherwise.
+
+        Args:
+            nodeid (str): Node id of the test
+
+        Returns:
+            int: Shard index
+        """
+        if self.shard_assignment is not None and nodeid in self.shard_assignment:
+            return self.shard_assignment[nodeid]
+        return zlib.crc32(nodeid.encode()) % self.shard_count
+
+    def is_selected(self, nodeid: str, names: List[str]) -> bool:
+        """Whether a cached test would be selected by the shard and -k expression.
+
+        Args:
+            nodeid (str): Node id of the test
+            names (List[str]): Keyword names of the test
+
+        Returns:
+            bool: False only if the test is certainly not selected
+        """
+        if self.shard_count > 1 and self.get_shard(nodeid) != self.shard_index:
+            return False
+        if self.keyword_matcher is not None and not self.keyword_matcher(names):
+            return False
+        return True
+
+    def pytest_ignore_collect(self, collection_path: Path, config: pytest.Config) -> Optional[bool]:
+        if self.collection_cache is None or (self.shard_assignment is None and self.keyword_matcher is None):
+            return None
+        if collection_path.suffix != ".py" or not collection_path.is_file():
+            return None
+        if not any(fnmatch.fnmatch(collection_path.name, pattern) for pattern in self.python_files):
+            return None
+
+        cached_items = self.collection_cache.get_unchanged_items(collection_path)
+        if cached_items is None:
+            return None
+        if any(self.is_selected(nodeid, names) for nodeid, names in cached_items.items()):
+            return None
+        return True
+
+    def pytest_itemcollected(self, item: pytest.Item) -> None:
+        if self.collection_cache is not None:
+            self.collection_cache.record_item(item)
+
+    def pytest_collection_finish(self) -> None:
+        if self.collection_cache is not None:
+            self.collection_cache.save()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: List[pytest.Item]) -> None:
+        if self.shard_count > 1:
+            if self.shard_assignment is None:
+                self.shard_assignment = load_or_assign_shards(
+                    [item.nodeid for item in items], self.stats, self.shard_count, self.shard_plan_dir
+                )
+            selected = [item for item in items if self.get_shard(item.nodeid) == self.shard_index]
+            deselected = [item for item in items if self.get_shard(item.nodeid) != self.shard_index]
+            if deselected:
+                config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+        order = config.getoption("tawa_order")
+        if order != ORDER_DEFAULT:
+            items_by_nodeid = {item.nodeid: item for item in items}
+            items[:] = [items_by_nodeid[nodeid] for nodeid in order_nodeids(list(items_by_nodeid), self.stats, order)]
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        outcome, duration = self.results.get(report.nodeid, (OUTCOME_PASSED, 0.0))
+        duration += report.duration
+        if report.failed:
+            outcome = OUTCOME_FAILED
+        elif report.skipped and outcome != OUTCOME_FAILED:
+            outcome = OUTCOME_SKIPPED
+        self.results[report.nodeid] = (outcome, duration)
+
+    def pytest_sessionfinish(self) -> None:
+        try:
+            self.history.record_run(self.results)
+        except sqlite3.Error as error:
+            logging.warning(f"Could not record test history: {error}")
+        finally:
+            self.history.close()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    try:
+        plugin = TestHistoryPlugin(config)
+    except (OSError, sqlite3.Error) as error:
+        # ex: read only mount, tests still run just without history
+        logging.warning(f"Test history unavailable: {error}")
+        return
+    config.pluginmanager.register(plugin, "tawa-test-history")
+
+
+def format_history_report(stats: Dict[str, TestStats], top: int = 10) -> str:
+    """Format a report of the slowest and flakiest tests.
+
+    Args:
+        stats (Dict[str, TestStats]): History per node id
+        top (int, optional): Number of tests in each section. Defaults to 10.
+
+    Returns:
+        str: The report
+    """
+    slowest = sorted(stats.values(), key=lambda test_stats: -test_stats.mean_duration)[:top]
+    flakiest = sorted(
+        (test_stats for test_stats in stats.values() if test_stats.flips > 0),
+        key=lambda test_stats: (-test_stats.flakiness, -test_stats.failures),
+    )[:top]
+
+    lines = [f"Slowest {len(slowest)} tests (mean duration over recorded runs):"]
+    lines.extend(f"  {test_stats.mean_duration:8.2f}s  {test_stats.runs:3d} runs  {test_stats.nodeid}" for test_stats in slowest)
+    lines.append("")
+    if flakiest:
+        lines.append(f"Flakiest {len(flakiest)} tests (outcome flips between consecutive runs):")
+        lines.extend(
+            f"  {test_stats.flakiness:7.0%}  {test_stats.failures:3d}/{test_stats.runs:<3d} failed  {test_stats.nodeid}"
+            for test_stats in flakiest
+        )
+    else:
+        lines.append("No flaky tests recorded.")
+    return "\n".join(lines)
@@ -0,0 +1,103 @@
+"""pytest plugin recording the peak memory of every test.
+
+For each test call the peak resident set size of the process is reset through
+``/proc/self/clear_refs`` and read back from ``VmHWM`` afterwards, and the peak
+of the Python allocations is traced with tracemalloc. The peaks travel in the
+report ``user_properties`` so they also reach the main process with
+``--forked``. The largest tests are shown in the terminal summary and all of
+them are written to ``tests.json`` in the output directory. Loaded by
+``tawa-inner-cli test --memprofile-dir`` through ``-p``.
+"""
+
+import json
+import os
+import tracemalloc
+from typing import Dict
+
+import pytest
+
+from tawa.tawa_inner_cli.commands.utils.memprofile import TRACEMALLOC_FRAMES, format_bytes, read_peak_rss
+
+PEAK_RSS_PROPERTY = "tawa_peak_rss"
+TRACED_PEAK_PROPERTY = "tawa_traced_peak"
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS of the current process, Linux only.
+
+    Returns:
+        bool: Whether the peak was reset, if not it covers the whole process lifetime
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs_buffer:
+            clear_refs_buffer.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("tawa-memprofile", "tawa memory profile")
+    group.addoption("--tawa-memprofile-dir", default=None, help="Record the peak memory of every test into this dir.")
+    group.addoption("--tawa-memprofile-top", type=int, default=10, help="Number of tests in the memory summary.")
+
+
+class MemoryProfilePlugin:
+    """Records the peak RSS and traced allocation peak of every test call."""
+
+    def __init__(self, output_dir: str, top: int):
+        self.output_dir = output_dir
+        self.top = top
+        self.results: Dict[str, Dict[str, int]] = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item):
+        reset_peak_rss()
+        tracemalloc.reset_peak()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        yield
+        _, traced_peak = tracemalloc.get_traced_memory()
+        peak_rss = read_peak_rss(os.getpid())
+        if peak_rss is not None:
+            item.user_properties.append((PEAK_RSS_PROPERTY, peak_rss))
+        item.user_properties.append((TRACED_PEAK_PROPERTY, traced_peak - traced_before))
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if report.when != "call":
+            return
+        properties = dict(report.user_properties)
+        if TRACED_PEAK_PROPERTY in properties:
+            self.results[report.nodeid] = {
+                "peak_rss": properties.get(PEAK_RSS_PROPERTY, 0),
+                "traced_peak": properties[TRACED_PEAK_PROPERTY],
+            }
+
+    def pytest_terminal_summary(self, terminalreporter) -> None:
+        if not self.results:
+            return
+        terminalreporter.section("tawa memory profile")
+        largest = sorted(self.results.items(), key=lambda item: -item[1]["peak_rss"])[: self.top]
+        terminalreporter.write_line("   peak RSS  traced peak  test")
+        for nodeid, result in largest:
+            terminalreporter.write_line(
+                f"{format_bytes(result['peak_rss']):>11}  {format_bytes(result['traced_peak']):>11}  {nodeid}"
+            )
+        terminalreporter.write_line(
+            f"Memory profile of all tests written to {os.path.join(self.output_dir, 'tests.json')}"
+        )
+
+    def pytest_sessionfinish(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "tests.json"), "w") as tests_buffer:
+            json.dump(self.results, tests_buffer, indent=2)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    output_dir = config.getoption("tawa_memprofile_dir")
+    if output_dir is None:
+        return
+    config.pluginmanager.register(
+        MemoryProfilePlugin(output_dir, config.getoption("tawa_memprofile_top")), "tawa-memprofile"
+    )
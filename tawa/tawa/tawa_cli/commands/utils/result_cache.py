@@ -0,0 +1,211 @@
+"""Result cache for the read only checks of tawa-inner-cli (lint, format check, type check).
+
+A check result is keyed by the command, the version of the tool running it, the
+tool configuration and the content of every Python source file in the tree.
+ruff reads the config closest to each file, so every ruff config in the
+directories of the sources counts, ex: ``tawa/pyproject.toml``. mypy only reads
+the config of the directory it runs in, so only the root config counts for it.
+When a check passed for a key, running it again on the same key is a no op.
+Only passing results are recorded, failures always rerun so their diagnostics
+are shown again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+from tawa.tawa_inner_cli.commands.utils.cache import get_cache_dir, run_git_command
+
+try:
+    import tomllib
+except ImportError:  # python 3.10
+    tomllib = None  # type: ignore[assignment]
+
+SOURCE_SUFFIXES = (".py", ".pyi")
+
+# config files each tool reads, the pyproject section is hashed on its own so
+# unrelated pyproject changes (ex: version bumps) keep the cache valid
+TOOL_CONFIG_FILES = {
+    "ruff": ["ruff.toml", ".ruff.toml"],
+    "mypy": ["mypy.ini", ".mypy.ini", "setup.cfg"],
+}
+
+# tools whose config is looked up from the directory of every file, not only the root
+HIERARCHICAL_CONFIG_TOOLS = {"ruff"}
+
+# skipped when walking the tree without git
+IGNORED_DIRS = {".git", ".mypy_cache", ".ruff_cache", ".pytest_cache", "__pycache__", "build", "dist"}
+
+
+def list_source_files() -> List[str]:
+    """List the Python source files in the tree.
+
+    Uses git to list tracked and untracked, not ignored files and falls back
+    to walking the tree when git is not available.
+
+    Returns:
+        List[str]: Sorted paths of the Python source files
+    """
+    output = run_git_command(["ls-files", "--cached", "--others", "--exclude-standard"])
+    if output is not None:
+        files = [path for path in output.splitlines() if path.endswith(SOURCE_SUFFIXES) and os.path.isfile(path)]
+        return sorted(set(files))
+
+    files = []
+    for root, dirs, file_names in os.walk("."):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith(".")]
+        files.extend(
+            os.path.normpath(os.path.join(root, file_name))
+            for file_name in file_names
+            if file_name.endswith(SOURCE_SUFFIXES)
+        )
+    return sorted(files)
+
+
+def hash_source_files(paths: List[str]) -> str:
+    """Hash the names and contents of source files.
+
+    Args:
+        paths (List[str]): Files to hash
+
+    Returns:
+        str: Hex digest over the file names and contents
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        digest.update(b"\0")
+        with open(path, "rb") as source_buffer:
+            digest.update(hashlib.sha256(source_buffer.read()).digest())
+    return digest.hexdigest()
+
+
+def get_config_dirs(tool: str, source_files: List[str]) -> List[str]:
+    """Get the directories a tool may read its config from when checking the sources.
+
+    Args:
+        tool (str): Name of the tool, ex: ruff or mypy
+        source_files (List[str]): Paths of the checked source files, relative to the repo root
+
+    Returns:
+        List[str]: Sorted directories, the repo root only for tools reading a single config
+    """
+    if tool not in HIERARCHICAL_CONFIG_TOOLS:
+        return ["."]
+    config_dirs = {"."}
+    for path in source_files:
+        directory = os.path.dirname(os.path.normpath(path))
+        while directory and directory not in config_dirs:
+            config_dirs.add(directory)
+            directory = os.path.dirname(directory)
+    return sorted(config_dirs)
+
+
+def get_tool_config(tool: str, config_dirs: Optional[List[str]] = None) -> Dict[str, str]:
+    """Collect the configuration of a tool.
+
+    Args:
+        tool (str): Name of the tool, ex: ruff or mypy
+        config_dirs (Optional[List[str]], optional): Directories to read the config files of. Defaults to None
+            (the repo root).
+
+    Returns:
+        Dict[str, str]: Config file path to the config content relevant for the tool
+    """
+    config: Dict[str, str] = {}
+    for config_dir in config_dirs or ["."]:
+        for config_file in TOOL_CONFIG_FILES.get(tool, []):
+            config_path = os.path.normpath(os.path.join(config_dir, config_file))
+            if os.path.exists(config_path):
+                with open(config_path, "r") as config_buffer:
+                    config[config_path] = config_buffer.read()
+
+        pyproject_path = os.path.normpath(os.path.join(config_dir, "pyproject.toml"))
+        if os.path.exists(pyproject_path):
+            with open(pyproject_path, "rb") as pyproject_buffer:
+                raw_pyproject = pyproject_buffer.read()
+            if tomllib is None:
+                config[pyproject_path] = raw_pyproject.decode()
+            else:
+                section = tomllib.loads(raw_pyproject.decode()).get("tool", {}).get(tool, {})
+                config[pyproject_path] = json.dumps(section, sort_keys=True)
+    return config
+
+
+def get_tool_version(tool: str) -> Optional[str]:
+    """Get the version string of a tool.
+
+    Args:
+        tool (str): Name of the tool executable
+
+    Returns:
+        Optional[str]: Version output of the tool, None if it can't be run
+    """
+    try:
+        ret = subprocess.run([tool, "--version"], capture_output=True, check=False, text=True)
+    except FileNotFoundError:
+        return None
+    if ret.returncode != 0:
+        return None
+    return ret.stdout.strip()
+
+
+def compute_result_key(command: str, tool: str) -> Optional[str]:
+    """Compute the cache key of a check command on the current tree.
+
+    Args:
+        command (str): Full check command
+        tool (str): Name of the tool the command runs
+
+    Returns:
+        Optional[str]: Hex digest key, None if the tool version can't be determined
+    """
+    tool_version = get_tool_version(tool)
+    if tool_version is None:
+        return None
+
+    source_files = list_source_files()
+    payload = {
+        "command": command,
+        "tool_version": tool_version,
+        "tool_config": get_tool_config(tool, get_config_dirs(tool, source_files)),
+        "sources": hash_source_files(source_files),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _get_result_path(key: str) -> str:
+    return os.path.join(get_cache_dir("results"), f"{key}.json")
+
+
+def has_cached_success(key: str) -> bool:
+    """Check whether a passing result is recorded for the key.
+
+    Args:
+        key (str): Result key of the check
+
+    Returns:
+        bool: True if the check already passed on this key
+    """
+    try:
+        return os.path.exists(_get_result_path(key))
+    except OSError:
+        return False
+
+
+def record_success(key: str, command: str) -> None:
+    """Record a passing check result, failures to write the cache are only logged.
+
+    Args:
+        key (str): Result key of the check
+        command (str): The check command, stored for debugging
+    """
+    try:
+        with open(_get_result_path(key), "w") as result_buffer:
+            json.dump({"command": command, "verdict": "passed", "time": time.time()}, result_buffer)
+    except OSError as error:
+        logging.warning(f"Could not write result cache: {error}")
@@ -4,15 +4,51 @@ for this tooling. This represents a pathway for users to interact with tawa and
 their own workflows.
 """
 
+from typing import Optional
+
 import click
 
 from tawa import __version__ as __version__
-from tawa.tawa_inner_cli.commands.commands import docs, format_package, lint, test, type_check
+from tawa.tawa_inner_cli.commands.commands import (
+    bench,
+    docs,
+    format_package,
+    import_time,
+    lint,
+    memprofile,
+    test,
+    test_report,
+    type_check,
+)
 from tawa.tawa_inner_cli.commands.utils.options import (
+    option_bench_compare,
+    option_bench_cpu,
+    option_bench_keyword,
+    option_bench_max_regression,
+    option_bench_no_pin,
+    option_bench_path,
+    option_bench_rounds,
+    option_bench_save_baseline,
+    option_bench_warmup,
+    option_changed_since,
     option_docs_ignore_cache,
     option_format_check,
+    option_import_time_output_dir,
+    option_import_time_top,
     option_lint_fix,
+    option_memprofile_output_dir,
+    option_memprofile_top,
+    option_no_result_cache,
+    option_staged,
+    option_test_keyword,
+    option_test_memprofile_dir,
+    option_test_no_collection_cache,
+    option_test_no_history,
+    option_test_order,
     option_test_pytest_path,
+    option_test_report_top,
+    option_test_shard_count,
+    option_test_shard_index,
 )
 
 
@@ -31,6 +67,55 @@ def tawa_cli(ctx: click.Context):
     pass
 
 
+@click.command(name="bench", help="Run tawa's benchmarks")
+@option_bench_compare
+@option_bench_cpu
+@option_bench_keyword
+@option_bench_max_regression
+@option_bench_no_pin
+@option_bench_path
+@option_bench_rounds
+@option_bench_save_baseline
+@option_bench_warmup
+def cmd_bench(
+    compare: Optional[str],
+    cpu: Optional[int],
+    keyword: Optional[str],
+    max_regression: float,
+    no_pin: bool,
+    path: list[str],
+    rounds: int,
+    save_baseline: Optional[str],
+    warmup: int,
+):
+    """
+    Run tawa's benchmarks.
+
+    Args:
+        compare: Baseline name or commit hash prefix to compare against,
+            exits with an error on regressions.
+        cpu: CPU to pin the benchmarks to, the highest allowed CPU if ``None``.
+        keyword: Only run benchmarks whose name contains this.
+        max_regression: Allowed slowdown relative to the compared results.
+        no_pin: Don't pin the benchmarks to a single CPU.
+        path: A list of zero or more benchmark files or directories.
+        rounds: Number of timed rounds.
+        save_baseline: Also save the results as this named baseline.
+        warmup: Number of untimed rounds before timing.
+    """
+    bench(
+        list(path),
+        keyword=keyword,
+        warmup=warmup,
+        rounds=rounds,
+        cpu=cpu,
+        pin=not no_pin,
+        save_baseline=save_baseline,
+        compare=compare,
+        max_regression=max_regression,
+    )
+
+
 @click.command(name="docs", help="Build tawa's docs")
 @option_docs_ignore_cache
 def cmd_docs(ignore_cache: bool):
@@ -47,30 +132,99 @@ def cmd_docs(ignore_cache: bool):
 
 
 @click.command(name="format", help="Run formatting")
+@option_changed_since
 @option_format_check
-def cmd_format(check: bool = False) -> None:
+@option_no_result_cache
+@option_staged
+def cmd_format(
+    changed_since: Optional[str] = None,
+    check: bool = False,
+    no_cache: bool = False,
+    staged: bool = False,
+) -> None:
     """Run tawa-inner-cli format.
 
     Args:
+        changed_since (Optional[str], optional): Only format files changed since this git ref. Defaults to None.
         check (bool, optional): Check formatting without fixing the files. Defaults to False.
+        no_cache (bool, optional): Run the check even if it passed on an unchanged tree. Defaults to False.
+        staged (bool, optional): Only format files with staged changes. Defaults to False.
     """
-    format_package(check=check)
+    format_package(check=check, use_cache=not no_cache, changed_since=changed_since, staged=staged)
+
+
+@click.command(name="import-time", help="Profile the cold import time of modules")
+@option_import_time_output_dir
+@option_import_time_top
+@click.argument("modules", nargs=-1, required=True)
+def cmd_import_time(output_dir: Optional[str], top: int, modules: tuple[str, ...]):
+    """
+    Profile the cold import time of modules.
+
+    Args:
+        output_dir: Directory to write the profiles and report to.
+        top: Number of slowest imports to report per module.
+        modules: Modules to profile, each in a fresh interpreter.
+    """
+    import_time(list(modules), output_dir=output_dir, top=top)
 
 
 @click.command(name="lint", help="Run linters")
+@option_changed_since
 @option_lint_fix
-def cmd_lint(fix: bool = False):
+@option_no_result_cache
+@option_staged
+def cmd_lint(changed_since: Optional[str] = None, fix: bool = False, no_cache: bool = False, staged: bool = False):
     """Run tawa-inner-cli lint.
 
     Args:
+        changed_since (Optional[str]): Only lint files changed since this git ref. Defaults to None
         fix (bool): whether to fix linting errors or not. Defaults to False
+        no_cache (bool): Run linting even if it passed on an unchanged tree. Defaults to False
+        staged (bool): Only lint files with staged changes. Defaults to False
+    """
+    lint(fix=fix, use_cache=not no_cache, changed_since=changed_since, staged=staged)
+
+
+@click.command(
+    name="memprofile",
+    help="Run a command and record the peak memory and allocation sites of all of its processes.",
+    context_settings={"ignore_unknown_options": True},
+)
+@option_memprofile_output_dir
+@option_memprofile_top
+@click.argument("command", nargs=-1, required=True, type=click.UNPROCESSED)
+def cmd_memprofile(output_dir: Optional[str], top: int, command: tuple[str, ...]):
+    """
+    Run a command and record the memory of all of its processes.
+
+    Args:
+        output_dir: Directory to write the memory reports to.
+        top: Number of processes and allocation sites to report.
+        command: The command to run, after ``--``.
     """
-    lint(fix=fix)
+    memprofile(list(command), output_dir=output_dir, top=top)
 
 
 @click.command(name="test", help="Run tawa's tests.")
+@option_test_keyword
+@option_test_memprofile_dir
+@option_test_no_collection_cache
+@option_test_no_history
+@option_test_order
 @option_test_pytest_path
-def cmd_test(path: list[str]):
+@option_test_shard_count
+@option_test_shard_index
+def cmd_test(
+    path: list[str],
+    order: str,
+    shard_count: int,
+    shard_index: int,
+    no_history: bool,
+    keyword: Optional[str],
+    no_collection_cache: bool,
+    memprofile_dir: Optional[str],
+):
     """
     Run tawa's tests.
 
@@ -78,18 +232,58 @@ def cmd_test(path: list[str]):
         path: A list of zero or more files or directories to run ``pytest``
             on. This corresponds to the ``[file_or_dir]`` variadic ``pytest``
             argument.
+        order: How to order tests by their recorded history.
+        shard_count: Number of shards of balanced duration to split the tests into.
+        shard_index: Index of the shard to run.
+        no_history: Don't record or use the test history.
+        keyword: Only run tests matching this ``pytest -k`` expression.
+        no_collection_cache: Import every test module instead of skipping
+            unchanged modules without selected tests.
+        memprofile_dir: Record the peak memory of every test into this directory.
     """
-    test(path)
+    if shard_index >= shard_count:
+        raise click.BadParameter(f"must be less than --shard-count ({shard_count})", param_hint="--shard-index")
+    test(
+        path,
+        order=order,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        history=not no_history,
+        keyword=keyword,
+        collection_cache=not no_collection_cache,
+        memprofile_dir=memprofile_dir,
+    )
+
+
+@click.command(name="test-report", help="Report the slowest and flakiest tests from the test history.")
+@option_test_report_top
+def cmd_test_report(top: int):
+    """
+    Report the slowest and flakiest tests from the test history.
+
+    Args:
+        top: Number of tests to show in each section of the report.
+    """
+    test_report(top=top)
 
 
 @click.command(name="type-check", help="Run type checking")
-def cmd_type_check():
-    """Run tawa-inner-cli type checking."""
-    type_check()
+@option_no_result_cache
+def cmd_type_check(no_cache: bool = False):
+    """Run tawa-inner-cli type checking.
+
+    Args:
+        no_cache (bool): Run type checking even if it passed on an unchanged tree. Defaults to False
+    """
+    type_check(use_cache=not no_cache)
 
 
+tawa_cli.add_command(cmd_bench)
 tawa_cli.add_command(cmd_docs)
 tawa_cli.add_command(cmd_format)
+tawa_cli.add_command(cmd_import_time)
 tawa_cli.add_command(cmd_lint)
+tawa_cli.add_command(cmd_memprofile)
 tawa_cli.add_command(cmd_test)
+tawa_cli.add_command(cmd_test_report)
 tawa_cli.add_command(cmd_type_check)
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+from tawa.checkpoint.async_checkpointer import AsyncCheckpointer, get_latest_checkpoint, list_checkpoints
+from tawa.checkpoint.flat_file import ALIGNMENT, load_checkpoint, read_checkpoint_header, write_checkpoint
+
+
+def _get_state(scale=1.0):
+    return {
+        "model": {
+            "conv.weight": np.arange(24, dtype=np.float32).reshape(2, 3, 4) * scale,
+            "bn.num_batches": np.array(7, dtype=np.int64),
+        },
+        # the int keys and tuples of an optimizer state
+        "optimizer": {"state": {0: {"momentum": np.ones(3, dtype=np.float16)}}, "betas": (0.9, 0.999)},
+        "strided": np.arange(10, dtype=np.int32)[::2],
+        "epoch": np.int64(3),
+        "names": ["a", None, True],
+    }
+
+
+def _assert_state_equal(loaded, state):
+    np.testing.assert_array_equal(loaded["model"]["conv.weight"], state["model"]["conv.weight"])
+    assert loaded["model"]["bn.num_batches"].shape == () and loaded["model"]["bn.num_batches"] == 7
+    momentum = loaded["optimizer"]["state"][0]["momentum"]
+    assert momentum.dtype == np.float16 and momentum.tolist() == [1, 1, 1]
+    assert loaded["optimizer"]["betas"] == (0.9, 0.999)
+    np.testing.assert_array_equal(loaded["strided"], [0, 2, 4, 6, 8])
+    assert loaded["epoch"] == 3 and loaded["names"] == ["a", None, True]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_states_round_trip(tmp_path, mmap):
+    path = str(tmp_path / "state.ckpt")
+    state = _get_state()
+    write_checkpoint(path, state, metadata={"run": "r1"})
+
+    loaded = load_checkpoint(path, mmap=mmap)
+    _assert_state_equal(loaded, state)
+    header, data_offset = read_checkpoint_header(path)
+    assert header["metadata"] == {"run": "r1"} and data_offset % ALIGNMENT == 0
+    assert all(array_object["offset"] % ALIGNMENT == 0 for array_object in header["arrays"])
+    if mmap:
+        # copy on write, the file is unchanged
+        loaded["model"]["conv.weight"][:] = 0
+        np.testing.assert_array_equal(load_checkpoint(path)["model"]["conv.weight"], state["model"]["conv.weight"])
+
+
+def test_unsupported_values_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Can not store a set"):
+        write_checkpoint(str(tmp_path / "state.ckpt"), {"tags": {"a"}})
+    with open(tmp_path / "other.ckpt", "wb") as other_file:
+        other_file.write(b"\x80\x04not a checkpoint")
+    with pytest.raises(ValueError, match="not a tawa checkpoint"):
+        load_checkpoint(str(tmp_path / "other.ckpt"))
+
+
+def test_checkpoints_are_snapshots_and_the_last_ones_are_kept(tmp_path):
+    state = _get_state()
+    with AsyncCheckpointer(str(tmp_path), keep_last=2) as checkpointer:
+        for step in range(0, 50, 10):
+            checkpointer.save(state, step)
+            # changed while the previous snapshot is being written
+            state["model"]["conv.weight"] += 1
+
+    paths = list_checkpoints(str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ["checkpoint-000000030.ckpt", "checkpoint-000000040.ckpt"]
+    assert get_latest_checkpoint(str(tmp_path)) == paths[-1]
+    assert not [file_name for file_name in os.listdir(tmp_path) if file_name.endswith(".tmp")]
+    loaded = load_checkpoint(paths[-1])
+    _assert_state_equal(loaded, {**_get_state(), "model": {"conv.weight": _get_state()["model"]["conv.weight"] + 4}})
+    assert read_checkpoint_header(paths[-1])[0]["metadata"] == {"step": 40}
+
+
+def test_write_errors_are_raised(tmp_path):
+    checkpointer = AsyncCheckpointer(str(tmp_path / "checkpoints"))
+    os.rmdir(tmp_path / "checkpoints")
+    checkpointer.save(_get_state(), 1)
+
+    with pytest.raises(FileNotFoundError):
+        checkpointer.close()
+    assert get_latest_checkpoint(str(tmp_path / "missing")) is None
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from tawa.data.augment import Compose, Cutout, Normalize, RandomCrop, RandomFlip
+
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(1).integers(1, 256, size=(16, 6, 5, 3), dtype=np.uint8)
+
+
+def test_random_crop_matches_per_sample_crops(images):
+    cropped = RandomCrop(padding=2)(images.copy(), np.random.default_rng(7))
+
+    rng = np.random.default_rng(7)
+    rows, cols = rng.integers(0, 5, size=16), rng.integers(0, 5, size=16)
+    for image, augmented, row, col in zip(images, cropped, rows, cols):
+        padded = np.pad(image, ((2, 2), (2, 2), (0, 0)))
+        np.testing.assert_array_equal(augmented, padded[row : row + 6, col : col + 5])
+
+
+def test_random_flip_is_in_place(images):
+    flipped = images.copy()
+    result = RandomFlip(p=0.5)(flipped, np.random.default_rng(3))
+
+    assert result is flipped
+    mirrored = [np.array_equal(augmented, image[:, ::-1]) for augmented, image in zip(flipped, images)]
+    unchanged = [np.array_equal(augmented, image) for augmented, image in zip(flipped, images)]
+    assert all(m or u for m, u in zip(mirrored, unchanged))
+    assert any(mirrored) and any(unchanged)
+
+
+def test_cutout_fills_a_clipped_square(images):
+    cut = Cutout(size=4, fill=0)(images.copy(), np.random.default_rng(5))
+
+    zeroed = (cut == 0).all(axis=-1)
+    for mask in zeroed:
+        rows, cols = np.nonzero(mask)
+        assert 1 <= len(rows) <= 16
+        assert rows.max() - rows.min() < 4 and cols.max() - cols.min() < 4
+    np.testing.assert_array_equal(cut[~zeroed], images[~zeroed])
+
+
+def test_compose_is_deterministic_under_a_seed(images):
+    transform = Compose([RandomCrop(), RandomFlip(), Cutout(size=3), Normalize((0.5, 0.5, 0.5), (0.25, 0.25, 0.25))])
+    labels = np.arange(16)
+
+    first = transform({"image": images.copy(), "label": labels}, np.random.default_rng(11))
+    second = transform({"image": images.copy(), "label": labels}, np.random.default_rng(11))
+    other = transform({"image": images.copy(), "label": labels}, np.random.default_rng(12))
+
+    assert first["image"].dtype == np.float32
+    assert first["label"] is labels
+    np.testing.assert_array_equal(first["image"], second["image"])
+    assert not np.array_equal(first["image"], other["image"])
+
+
+def test_normalize():
+    images = np.full((1, 1, 1, 2), 255, dtype=np.uint8)
+    normalized = Normalize(mean=(0.5, 1.0), std=(0.5, 2.0))(images, np.random.default_rng())
+
+    np.testing.assert_allclose(normalized.reshape(-1), [1.0, 0.0])
@@ -0,0 +1,123 @@
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from tawa.data.augment import Compose, Normalize
+from tawa.data.cache import CachedDataset, FeatureCache, fingerprint
+from tawa.data.shards import ShardedDataset, ShardWriter
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = str(tmp_path / "source")
+    with ShardWriter(root, fields={"image": ((2, 2, 1), np.uint8), "label": ((), np.int64)}, shard_size=4) as writer:
+        writer.write(image=np.arange(40, dtype=np.uint8).reshape(10, 2, 2, 1), label=np.arange(10, dtype=np.int64))
+    return ShardedDataset(root)
+
+
+def _scale_by(factor):
+    return lambda batch: {**batch, "image": batch["image"] * np.float32(factor)}
+
+
+def test_fingerprint_follows_parameters_and_code():
+    assert fingerprint(Normalize((0.5,), (0.2,))) == fingerprint(Normalize((0.5,), (0.2,)))
+    assert fingerprint(Normalize((0.5,), (0.2,))) != fingerprint(Normalize((0.5,), (0.3,)))
+    assert fingerprint(_scale_by(2)) != fingerprint(_scale_by(3))
+    assert fingerprint(lambda batch: batch) != fingerprint(lambda batch: dict(batch))
+    with pytest.raises(ValueError):
+        fingerprint(iter([]))
+
+
+TRANSFORMS_SOURCE = """
+import numpy as np
+
+
+def scale(image):
+    return image * {factor}
+
+
+class Shift:
+    cache_version = {version}
+
+    def __init__(self, offset):
+        self.offset = offset
+
+    def __call__(self, batch):
+        return {{**batch, "image": {call}}}
+
+
+class ScaledShift(Shift):
+    pass
+
+
+def scale_batch(batch):
+    return {{**batch, "image": scale(batch["image"])}}
+"""
+
+
+def _get_fingerprints(tmp_path, monkeypatch, factor=2, call="batch['image'] + self.offset", version=1):
+    path = tmp_path / "cache_transforms.py"
+    path.write_text(TRANSFORMS_SOURCE.format(factor=factor, call=call, version=version))
+    spec = importlib.util.spec_from_file_location("cache_transforms", path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, "cache_transforms", module)
+    spec.loader.exec_module(module)
+    return fingerprint(module.scale_batch), fingerprint(module.Shift(1)), fingerprint(module.ScaledShift(1))
+
+
+def test_fingerprint_follows_methods_and_helpers(tmp_path, monkeypatch):
+    scale_batch, shift, scaled_shift = _get_fingerprints(tmp_path, monkeypatch)
+    assert _get_fingerprints(tmp_path, monkeypatch) == (scale_batch, shift, scaled_shift)
+
+    # a helper the function calls through its globals
+    changed = _get_fingerprints(tmp_path, monkeypatch, factor=3)
+    assert changed[0] != scale_batch and changed[1:] == (shift, scaled_shift)
+
+    # __call__, also inherited
+    changed = _get_fingerprints(tmp_path, monkeypatch, call="batch['image'] - self.offset")
+    assert changed[0] == scale_batch and changed[1] != shift and changed[2] != scaled_shift
+
+    # the cache_version of a change the fingerprint can not see
+    changed = _get_fingerprints(tmp_path, monkeypatch, version=2)
+    assert changed[0] == scale_batch and changed[1] != shift and changed[2] != scaled_shift
+
+
+def test_cached_dataset_computes_each_shard_once(dataset, tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache"))
+    transform = Compose([Normalize((0.0,), (1.0,), scale=0.5)])
+
+    cached = CachedDataset(dataset, transform, cache)
+    batch = cached.get_batch([9, 0, 5])
+    assert cached.fields["image"].dtype == np.dtype(np.float32).str
+    np.testing.assert_allclose(batch["image"], dataset.get_batch([9, 0, 5])["image"] * 0.5)
+    np.testing.assert_array_equal(batch["label"], [9, 0, 5])
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # a second run reads the stored shards
+    rerun = CachedDataset(dataset, transform, cache)
+    np.testing.assert_array_equal(rerun.get_slice(0, 10)["image"], cached.get_slice(0, 10)["image"])
+    assert cache.hits == 3
+    assert isinstance(rerun.get_shard(1)["image"], np.memmap)
+
+    # another transform gets its own entries, its first shard is computed to learn the fields
+    CachedDataset(dataset, Compose([Normalize((0.0,), (1.0,), scale=0.25)]), cache).get_shard(2)
+    assert len(os.listdir(cache.cache_dir)) == 5
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry = {"values": np.zeros(1000, dtype=np.uint8)}
+    cache = FeatureCache(str(tmp_path), max_bytes=2500)
+    cache.put("a", entry)
+    cache.put("b", entry)
+    os.utime(os.path.join(str(tmp_path), "a", "meta.json"), (0, 0))
+    os.utime(os.path.join(str(tmp_path), "b", "meta.json"), (1, 1))
+    cache.get("a")
+
+    cache.put("c", entry)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.get_size() <= 2500
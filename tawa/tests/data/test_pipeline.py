@@ -0,0 +1,112 @@
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from tawa.data.pipeline import BatchRingBuffer, SharedMemoryLoader
+from tawa.data.shards import ShardedDataset, ShardWriter
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    images = np.arange(30 * 2 * 2, dtype=np.uint8).reshape(30, 2, 2)
+    with ShardWriter(
+        str(tmp_path), fields={"image": ((2, 2), np.uint8), "label": ((), np.int64)}, shard_size=8
+    ) as writer:
+        writer.write(image=images, label=np.arange(30, dtype=np.int64))
+    return ShardedDataset(str(tmp_path))
+
+
+def _scale(batch, rng):
+    return {"image": batch["image"].astype(np.float32) / 255, "label": batch["label"]}
+
+
+def _fail_on_label_7(batch, rng):
+    if 7 in batch["label"]:
+        raise KeyError("bad sample")
+    return batch
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_batches_arrive_in_order(dataset, num_workers):
+    with SharedMemoryLoader(dataset, batch_size=4, num_workers=num_workers, prefetch=3) as loader:
+        labels = [batch["label"].copy() for batch in loader]
+        # a second epoch after stopping the first one early
+        for batch in loader:
+            break
+        second_epoch = [batch["label"].copy() for batch in loader]
+
+    assert len(labels) == len(loader) == 8
+    np.testing.assert_array_equal(np.concatenate(labels), np.arange(30))
+    np.testing.assert_array_equal(np.concatenate(second_epoch), np.arange(30))
+    assert loader.stats.batches == 17
+    assert loader.stats.samples == 30 + 4 + 30
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_elapsed_time_includes_the_training_step(dataset, num_workers):
+    step_seconds = 0.02
+    with SharedMemoryLoader(dataset, batch_size=4, num_workers=num_workers, prefetch=3) as loader:
+        for _ in loader:
+            time.sleep(step_seconds)
+
+    assert loader.stats.elapsed_seconds >= step_seconds * len(loader)
+    assert loader.stats.samples_per_second <= 30 / (step_seconds * len(loader))
+    # the workers prepare the next batches during the steps
+    if num_workers:
+        assert loader.stats.wait_fraction < 0.5
+
+
+def test_shuffled_epochs_are_seeded_and_transformed(dataset):
+    def load(num_workers):
+        with SharedMemoryLoader(
+            dataset,
+            batch_size=5,
+            num_workers=num_workers,
+            transform=_scale,
+            output_fields={"image": ((2, 2), np.float32), "label": ((), np.int64)},
+            shuffle=True,
+            drop_last=True,
+            seed=3,
+        ) as loader:
+            return [{name: array.copy() for name, array in batch.items()} for _ in range(2) for batch in loader]
+
+    batches = load(num_workers=2)
+    assert [batch["label"].tolist() for batch in batches] == [batch["label"].tolist() for batch in load(0)]
+    first_epoch = np.concatenate([batch["label"] for batch in batches[:6]])
+    assert sorted(first_epoch) == list(range(30)) and list(first_epoch) != list(range(30))
+    second_epoch = np.concatenate([batch["label"] for batch in batches[6:]])
+    assert list(first_epoch) != list(second_epoch)
+    batch = batches[0]
+    assert batch["image"].dtype == np.float32
+    np.testing.assert_allclose(batch["image"], dataset.get_batch(batch["label"])["image"] / 255, rtol=1e-6)
+
+
+def test_replicas_split_every_epoch(dataset):
+    labels = []
+    for rank in range(3):
+        with SharedMemoryLoader(
+            dataset, batch_size=4, num_workers=0, shuffle=True, seed=1, num_replicas=3, rank=rank
+        ) as loader:
+            labels.append(np.concatenate([batch["label"].copy() for batch in loader]))
+            assert len(loader) == 3
+
+    assert sum(len(replica_labels) for replica_labels in labels) == 30
+    assert len(set(np.concatenate(labels))) == 30
+
+
+def test_worker_errors_are_raised(dataset):
+    with SharedMemoryLoader(dataset, batch_size=4, num_workers=1, transform=_fail_on_label_7) as loader:
+        with pytest.raises(RuntimeError, match="bad sample"):
+            list(loader)
+
+
+def test_ring_buffer_pickles_by_name(dataset):
+    ring = BatchRingBuffer(dataset.fields, batch_size=3, num_slots=2)
+    attached = pickle.loads(pickle.dumps(ring))
+    ring.get_slot(1)["label"][:] = [4, 5, 6]
+
+    np.testing.assert_array_equal(attached.get_slot(1)["label"], [4, 5, 6])
+    attached.close()
+    ring.close()
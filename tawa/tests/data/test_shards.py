@@ -0,0 +1,78 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from tawa.data.shards import INDEX_FILE_NAME, ShardedDataset, ShardWriter
+
+
+def _write_dataset(root, num_samples=25, shard_size=10, batch_size=7):
+    images = np.arange(num_samples * 4 * 3, dtype=np.uint8).reshape(num_samples, 4, 3)
+    labels = np.arange(num_samples, dtype=np.int64)
+    with ShardWriter(
+        str(root),
+        fields={"image": ((4, 3), np.uint8), "label": ((), np.int64)},
+        shard_size=shard_size,
+        metadata={"classes": ["a", "b"]},
+    ) as writer:
+        for start in range(0, num_samples, batch_size):
+            writer.write(image=images[start : start + batch_size], label=labels[start : start + batch_size])
+    return images, labels
+
+
+def test_round_trip_across_shards(tmp_path):
+    images, labels = _write_dataset(tmp_path)
+    dataset = ShardedDataset(str(tmp_path))
+
+    assert len(dataset) == 25
+    assert dataset.shard_lengths == [10, 10, 5]
+    assert dataset.metadata == {"classes": ["a", "b"]}
+    np.testing.assert_array_equal(dataset[13]["image"], images[13])
+    assert dataset[-1]["label"] == 24
+    np.testing.assert_array_equal(dataset.get_slice(8, 23)["label"], labels[8:23])
+    batches = list(dataset.iter_batches(10))
+    np.testing.assert_array_equal(np.concatenate([batch["image"] for batch in batches]), images)
+    with pytest.raises(IndexError):
+        dataset[25]
+
+
+def test_slices_within_a_shard_are_views(tmp_path):
+    _write_dataset(tmp_path)
+    dataset = ShardedDataset(str(tmp_path))
+
+    batch = dataset.get_slice(10, 15)
+    assert np.shares_memory(batch["image"], dataset.get_shard(1)["image"])
+    assert not batch["image"].flags.writeable
+
+
+def test_gather_keeps_the_order_of_the_indices(tmp_path):
+    images, labels = _write_dataset(tmp_path)
+    dataset = ShardedDataset(str(tmp_path))
+
+    indices = [21, 3, 12, 3, -1, 0]
+    batch = dataset.get_batch(indices)
+    np.testing.assert_array_equal(batch["label"], labels[indices])
+    np.testing.assert_array_equal(batch["image"], images[indices])
+
+
+def test_pickling_drops_memory_maps(tmp_path):
+    _write_dataset(tmp_path)
+    dataset = ShardedDataset(str(tmp_path))
+    dataset.get_shard(0)
+
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored._shards == {}
+    assert restored[4]["label"] == 4
+
+
+def test_unfinished_or_truncated_datasets_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedDataset(str(tmp_path))
+
+    _write_dataset(tmp_path)
+    with open(tmp_path / "label-00001.bin", "r+b") as shard_file:
+        shard_file.truncate(8)
+    dataset = ShardedDataset(str(tmp_path))
+    assert (tmp_path / INDEX_FILE_NAME).exists()
+    with pytest.raises(ValueError):
+        dataset[10]
@@ -0,0 +1,113 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from tawa.datastore.columnar import (
+    MANIFEST_FILE_NAME,
+    ColumnarTable,
+    ColumnarWriter,
+    get_chunk_file_name,
+    get_column_stats,
+    may_match,
+)
+
+COLUMNS = {
+    "sample_id": ((), "<U8"),
+    "label": ((), np.int64),
+    "score": ((), np.float32),
+    "logits": ((3,), np.float32),
+}
+
+
+def _get_rows(start, stop):
+    indices = np.arange(start, stop)
+    return {
+        "sample_id": np.array([f"s{index:05d}" for index in indices]),
+        "label": indices % 10,
+        "score": (indices / 100).astype(np.float32),
+        "logits": np.stack([indices, -indices, indices * 2], axis=1).astype(np.float32),
+    }
+
+
+@pytest.fixture
+def table_dir(tmp_path):
+    with ColumnarWriter(str(tmp_path), COLUMNS, chunk_size=16, metadata={"run": "r1"}) as writer:
+        # appends smaller and larger than a chunk
+        for start, stop in [(0, 5), (5, 40), (40, 41), (41, 70)]:
+            writer.append(**_get_rows(start, stop))
+    return str(tmp_path)
+
+
+def test_rows_are_written_in_chunks_and_read_back(table_dir):
+    table = ColumnarTable(table_dir)
+
+    assert len(table) == 70 and table.chunk_rows == [16, 16, 16, 16, 6]
+    assert table.metadata == {"run": "r1"}
+    rows = table.read()
+    expected = _get_rows(0, 70)
+    for name in COLUMNS:
+        np.testing.assert_array_equal(rows[name], expected[name])
+    assert table.chunk_stats[1]["sample_id"] == {"min": "s00016", "max": "s00031"}
+    assert table.chunk_stats[1]["logits"] is None
+    assert isinstance(table.get_column_chunk("score", 0), np.memmap)
+
+
+def test_only_requested_columns_and_matching_chunks_are_read(table_dir):
+    table = ColumnarTable(table_dir)
+    os.remove(os.path.join(table_dir, get_chunk_file_name("logits", 0)))
+    # chunks ruled out by their statistics are never opened
+    for chunk_index in range(3):
+        os.remove(os.path.join(table_dir, get_chunk_file_name("score", chunk_index)))
+
+    assert table.get_chunks([("score", ">=", 0.5)]) == [3, 4]
+    rows = table.read(["sample_id"], where=[("score", ">=", 0.5), ("label", "in", [1, 2])])
+    assert rows["sample_id"].tolist() == ["s00051", "s00052", "s00061", "s00062"]
+    assert table.read(["label"], where=[("score", "<", 0.0)])["label"].shape == (0,)
+    with pytest.raises(ValueError, match="Unknown columns"):
+        table.read(["missing"])
+    with pytest.raises(ValueError, match="need a scalar column, logits"):
+        table.read(["label"], where=[("logits", ">", 10)])
+
+
+def test_appends_are_seen_after_refresh(table_dir):
+    table = ColumnarTable(table_dir)
+    writer = ColumnarWriter(table_dir, chunk_size=8)
+    writer.append(**_get_rows(70, 75))
+    assert len(ColumnarTable(table_dir)) == 70
+    writer.close()
+
+    assert len(table) == 70
+    table.refresh()
+    assert len(table) == 75
+    np.testing.assert_array_equal(table.read(["label"], where=[("sample_id", "==", "s00073")])["label"], [3])
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(table)).read(["label"])["label"], np.arange(75) % 10)
+    with pytest.raises(ValueError, match="do not match"):
+        ColumnarWriter(table_dir, {"label": ((), np.int32)})
+
+
+def test_partial_manifest_lines_are_ignored(table_dir):
+    with open(os.path.join(table_dir, MANIFEST_FILE_NAME), "a") as manifest_file:
+        manifest_file.write('{"chunk": 5, "ro')
+    assert len(ColumnarTable(table_dir)) == 70
+
+    with ColumnarWriter(table_dir) as writer:
+        writer.append(**_get_rows(70, 72))
+    assert len(ColumnarTable(table_dir)) == 72
+
+
+def test_statistics_rule_out_chunks():
+    stats = get_column_stats(np.array([1.0, np.nan, 3.0]))
+    assert stats == {"min": 1.0, "max": 3.0, "has_nan": True}
+    assert get_column_stats(np.array([np.nan])) is None
+    assert get_column_stats(np.array([1.0, np.inf])) is None
+
+    assert not may_match({"min": 1, "max": 3}, "==", 4)
+    assert not may_match({"min": 1, "max": 3}, "<", 1)
+    assert may_match({"min": 1, "max": 3}, "<=", 1)
+    assert not may_match({"min": 1, "max": 3}, ">", 3)
+    assert not may_match({"min": 2, "max": 2}, "!=", 2)
+    assert may_match(stats, "!=", 2)
+    assert not may_match({"min": 1, "max": 3}, "in", [0, 7])
+    assert may_match(None, "==", 4)
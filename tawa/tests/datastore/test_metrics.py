@@ -0,0 +1,76 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from tawa.datastore.metrics import KEYS_FILE_NAME, RECORDS_FILE_NAME, MetricsStore, MetricsWriter, read_run
+
+
+class _Scalar:
+    """Converted with float() like a tensor."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __float__(self):
+        return float(self.value)
+
+
+def test_records_are_written_and_continued(tmp_path):
+    with MetricsWriter(str(tmp_path), run_id="run") as metrics:
+        for step in range(3):
+            metrics.log_dict({"loss": _Scalar(1 / (step + 1)), "lr": 0.1}, step)
+    with open(tmp_path / "run" / RECORDS_FILE_NAME, "ab") as records_file:
+        records_file.write(b"partial")
+    with open(tmp_path / "run" / KEYS_FILE_NAME, "a") as keys_file:
+        keys_file.write("parti")
+
+    with MetricsWriter(str(tmp_path), run_id="run") as metrics:
+        metrics.log("accuracy", 0.5, 3)
+        metrics.log("loss", 0.2, 3)
+
+    keys, records = read_run(str(tmp_path / "run"))
+    assert keys == ["loss", "lr", "accuracy"]
+    assert records["key"].tolist() == [0, 1, 0, 1, 0, 1, 2, 0]
+    assert records["step"].tolist() == [0, 0, 1, 1, 2, 2, 3, 3]
+    np.testing.assert_allclose(records["value"][records["key"] == 0], [1, 1 / 2, 1 / 3, 0.2])
+
+
+def test_records_are_flushed_in_the_background(tmp_path):
+    metrics = MetricsWriter(str(tmp_path), run_id="run", flush_interval=0.01)
+    metrics.log("loss", 1.0, 0)
+    deadline = time.monotonic() + 5
+    while os.path.getsize(tmp_path / "run" / RECORDS_FILE_NAME) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(read_run(str(tmp_path / "run"))[1]) == 1
+    metrics.close()
+    metrics.close()
+
+
+def test_metrics_are_aggregated_across_runs(tmp_path):
+    for run in range(4):
+        with MetricsWriter(str(tmp_path), run_id=f"run-{run}") as metrics:
+            # logged out of order, the last value is by step
+            for step in (2, 0, 1):
+                metrics.log("accuracy", run + step / 10, step)
+            if run != 2:
+                metrics.log("loss", run, 0)
+    store = MetricsStore(str(tmp_path))
+
+    run_ids, last = store.aggregate("accuracy")
+    assert run_ids == ["run-0", "run-1", "run-2", "run-3"]
+    np.testing.assert_allclose(last, [0.2, 1.2, 2.2, 3.2])
+    np.testing.assert_allclose(store.aggregate("accuracy", "first")[1], [0, 1, 2, 3])
+    np.testing.assert_allclose(store.aggregate("accuracy", "mean")[1], [0.1, 1.1, 2.1, 3.1])
+    np.testing.assert_allclose(store.aggregate("accuracy", "count", run_ids=["run-3"])[1], [3])
+    assert store.aggregate("loss", "max") == (["run-0", "run-1", "run-3"], pytest.approx([0, 1, 3]))
+    assert store.aggregate("missing") == ([], pytest.approx([]))
+    with pytest.raises(ValueError, match="Unknown reduction"):
+        store.aggregate("loss", "median")
+
+    steps, means, stds, counts = store.get_mean_curve("accuracy")
+    assert steps.tolist() == [0, 1, 2] and counts.tolist() == [4, 4, 4]
+    np.testing.assert_allclose(means, [1.5, 1.6, 1.7])
+    np.testing.assert_allclose(stds, np.std([0, 1, 2, 3]))
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from tawa.distributed.launcher import DistributedContext, get_scaling_efficiency, launch
+
+
+def _report(context: DistributedContext, offset: int):
+    return context.rank + offset, context.world_size, os.environ["RANK"], context.cpus
+
+
+def _fail_on_rank_1(context: DistributedContext):
+    if context.rank == 1:
+        raise ValueError("rank 1 is broken")
+    return context.rank
+
+
+def test_launch_returns_results_by_rank():
+    results = launch(_report, 2, args=(10,), backend=None, pin=False)
+
+    assert results == [(10, 2, "0", []), (11, 2, "1", [])]
+
+
+def test_launch_raises_worker_errors():
+    with pytest.raises(RuntimeError, match="rank 1 is broken"):
+        launch(_fail_on_rank_1, 2, backend=None, pin=False)
+
+
+def test_get_scaling_efficiency():
+    efficiency = get_scaling_efficiency({1: 100.0, 2: 180.0, 4: 400.0})
+
+    assert efficiency == pytest.approx({1: 1.0, 2: 0.9, 4: 1.0})
@@ -0,0 +1,37 @@
+import pytest
+
+from tawa.distributed.topology import get_core_groups, get_numa_nodes, parse_cpu_list
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("") == []
+
+
+def test_get_numa_nodes_reads_sysfs(tmp_path):
+    for node, cpu_list in (("node0", "0-1"), ("node1", "2-3"), ("node2", "")):
+        (tmp_path / node).mkdir()
+        (tmp_path / node / "cpulist").write_text(cpu_list)
+
+    assert get_numa_nodes(str(tmp_path / "node[0-9]*")) == {0: [0, 1], 1: [2, 3]}
+
+
+@pytest.mark.parametrize(
+    "num_groups, cpus, expected",
+    [
+        # groups never span nodes when every node gets as many of them
+        (2, range(8), [[0, 1, 2, 3], [4, 5, 6, 7]]),
+        (4, range(8), [[0, 1], [2, 3], [4, 5], [6, 7]]),
+        # otherwise the cpus are split in order
+        (3, range(8), [[0, 1, 2], [3, 4, 5], [6, 7]]),
+        # only allowed cpus are used
+        (2, [1, 2, 5, 6, 7], [[1, 2], [5, 6, 7]]),
+    ],
+)
+def test_get_core_groups(num_groups, cpus, expected):
+    assert get_core_groups(num_groups, cpus, numa_nodes={0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}) == expected
+
+
+def test_get_core_groups_needs_a_cpu_per_group():
+    with pytest.raises(ValueError):
+        get_core_groups(3, [0, 1], numa_nodes={0: [0, 1]})
@@ -0,0 +1,79 @@
+import pytest
+
+from tawa.tawa_inner_cli.commands.commands import bench
+from tawa.tawa_inner_cli.commands.utils.benchmark import BenchmarkResult, BenchmarkStore, find_regressions
+
+RUNTIME_ENVIRONMENT = "test"
+
+
+def _get_result(name, median):
+    return BenchmarkResult(name=name, rounds=3, iterations=1, min=median, median=median, mean=median, stddev=0.0)
+
+
+@pytest.fixture
+def bench_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("TAWA_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("TAWA_RUNTIME_ENVIRONMENT", RUNTIME_ENVIRONMENT)
+    # outside of a git repository, results are stored under the unknown commit
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "bench_sum.py"
+    path.write_text("def bench_sum():\n    sum(range(100))\n")
+    return str(path)
+
+
+def test_regressions_beyond_the_threshold_are_found():
+    reference = {name: _get_result(name, 1.0) for name in ("slower", "within", "faster", "removed")}
+    results = {
+        "slower": _get_result("slower", 1.25),
+        "within": _get_result("within", 1.1),
+        "faster": _get_result("faster", 0.5),
+        # not in the reference, nothing to compare against
+        "added": _get_result("added", 100.0),
+    }
+
+    assert find_regressions(results, reference, max_regression=0.2) == {"slower": pytest.approx(0.25)}
+    assert find_regressions(results, reference, max_regression=0.05) == {
+        "slower": pytest.approx(0.25),
+        "within": pytest.approx(0.1),
+    }
+    assert find_regressions(results, reference, max_regression=0.3) == {}
+
+
+def test_baselines_are_saved_and_loaded(tmp_path, monkeypatch):
+    monkeypatch.setenv("TAWA_CACHE_DIR", str(tmp_path))
+    store = BenchmarkStore(RUNTIME_ENVIRONMENT)
+    store.save({"a": _get_result("a", 1.0)}, "abc123", baseline="main")
+    store.save({"b": _get_result("b", 2.0)}, "abc456", baseline="main")
+
+    assert store.load("main") == {"a": _get_result("a", 1.0), "b": _get_result("b", 2.0)}
+    assert store.load("abc1") == {"a": _get_result("a", 1.0)}
+    with pytest.raises(ValueError, match="matches several commits"):
+        store.load("abc")
+    with pytest.raises(ValueError, match="No stored benchmark results"):
+        store.load("missing")
+    # results of another runtime environment are never compared
+    with pytest.raises(ValueError, match="No stored benchmark results"):
+        BenchmarkStore("other").load("main")
+
+
+def test_bench_fails_on_a_regression(bench_path):
+    name = f"{bench_path}::bench_sum"
+    BenchmarkStore(RUNTIME_ENVIRONMENT).save({name: _get_result(name, 1e-12)}, "abc123", baseline="fast")
+
+    with pytest.raises(SystemExit) as exit_info:
+        bench([bench_path], rounds=2, pin=False, compare="fast")
+    assert exit_info.value.code == 1
+
+
+def test_bench_passes_on_an_improvement(bench_path):
+    name = f"{bench_path}::bench_sum"
+    BenchmarkStore(RUNTIME_ENVIRONMENT).save({name: _get_result(name, 1.0)}, "abc123", baseline="slow")
+
+    bench([bench_path], rounds=2, pin=False, compare="slow", save_baseline="new")
+    assert BenchmarkStore(RUNTIME_ENVIRONMENT).load("new")[name].median < 1.0
+
+
+def test_bench_fails_without_the_compared_baseline(bench_path):
+    with pytest.raises(SystemExit) as exit_info:
+        bench([bench_path], rounds=2, pin=False, compare="missing")
+    assert exit_info.value.code == 1
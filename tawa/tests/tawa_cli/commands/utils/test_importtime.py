@@ -0,0 +1,36 @@
+from tawa.tawa_inner_cli.commands.utils.importtime import ImportRecord, format_importtime_report, parse_importtime
+
+# site at startup, then the profiled module importing two modules, one with a nested import
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:      3000 |       3000 | site
+some warning printed by an import
+import time: truncated line
+import time:      abc |          1 | broken
+import time:        50 |         50 |     pkg.deep
+import time:       100 |        150 |   pkg.sub
+import time:      2000 |       2000 |   heavy
+import time:        10 |       2160 | pkg
+"""
+
+
+def test_importtime_output_is_parsed():
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert records == [
+        ImportRecord(module="site", self_us=3000, cumulative_us=3000, depth=0),
+        ImportRecord(module="pkg.deep", self_us=50, cumulative_us=50, depth=2),
+        ImportRecord(module="pkg.sub", self_us=100, cumulative_us=150, depth=1),
+        ImportRecord(module="heavy", self_us=2000, cumulative_us=2000, depth=1),
+        ImportRecord(module="pkg", self_us=10, cumulative_us=2160, depth=0),
+    ]
+
+
+def test_report_orders_the_subtree_by_self_time():
+    report = format_importtime_report({"pkg": parse_importtime(IMPORTTIME_OUTPUT), "missing": []}, top=3)
+    lines = report.splitlines()
+
+    assert lines[0] == "pkg: 0.002s import of 4 modules after 0.003s interpreter startup, slowest by self time:"
+    # site is interpreter startup, not part of the import of pkg
+    assert [line.split()[-1] for line in lines[1:4]] == ["heavy", "pkg.sub", "pkg.deep"]
+    assert lines[1].split()[:4] == ["2.0ms", "self", "2.0ms", "cumulative"]
+    assert lines[5] == "missing: import failed"
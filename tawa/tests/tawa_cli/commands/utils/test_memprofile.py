@@ -0,0 +1,142 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tawa.tawa_inner_cli.commands.utils.memprofile import (
+    format_bytes,
+    format_memprofile_report,
+    read_peak_rss,
+    run_with_memprofile,
+)
+
+PLUGIN = "tawa.tawa_inner_cli.commands.utils.pytest_memprofile"
+MIB = 1024 * 1024
+
+# the parent holds 64MiB, a forked child 32MiB more, both stay alive long enough to be polled
+ALLOCATING_SCRIPT = """
+import os
+import sys
+import time
+
+parent_block = b"p" * (64 * 1024 * 1024)
+pid = os.fork()
+if pid == 0:
+    child_block = b"c" * (32 * 1024 * 1024)
+    time.sleep(0.5)
+    sys.exit(0)
+time.sleep(0.5)
+os.waitpid(pid, 0)
+"""
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="reads /proc")
+
+
+def test_read_peak_rss():
+    assert read_peak_rss(os.getpid()) > 0
+    # pids are below the max pid
+    assert read_peak_rss(2**31 - 1) is None
+
+
+def test_command_tree_is_profiled(tmp_path):
+    script_path = tmp_path / "allocate.py"
+    script_path.write_text(ALLOCATING_SCRIPT)
+
+    returncode = run_with_memprofile([sys.executable, str(script_path)], str(tmp_path / "out"))
+
+    assert returncode == 0
+    with open(tmp_path / "out" / "processes.json") as processes_buffer:
+        processes_object = json.load(processes_buffer)
+    processes = processes_object["processes"]
+    assert len(processes) == 2
+    assert processes[0]["peak_rss"] >= 64 * MIB and "allocate.py" in processes[0]["cmdline"]
+    assert processes_object["children_max_rss"] >= 64 * MIB
+
+    # one allocation report per Python process, the forked child reports its own allocations
+    sites = {}
+    for process in processes:
+        with open(tmp_path / "out" / f"allocations-{process['pid']}.json") as allocations_buffer:
+            allocations_object = json.load(allocations_buffer)
+        assert allocations_object["traced_peak"] >= 64 * MIB
+        sites[process["pid"]] = {site["site"]: site["size"] for site in allocations_object["sites"]}
+    child_sites = [process_sites for process_sites in sites.values() if f"{script_path}:9" in process_sites]
+    assert len(child_sites) == 1 and child_sites[0][f"{script_path}:9"] >= 32 * MIB
+
+    report = format_memprofile_report(str(tmp_path / "out"))
+    assert "Peak RSS of the 2 largest of 2 processes:" in report
+    assert f"{script_path}:" in report
+
+
+def test_report_merges_allocation_sites(tmp_path):
+    with open(tmp_path / "processes.json", "w") as processes_buffer:
+        json.dump(
+            {
+                "command": ["python"],
+                "returncode": 0,
+                "children_max_rss": 3 * MIB,
+                "processes": [
+                    {"pid": 1, "cmdline": "python train.py", "peak_rss": 2 * MIB},
+                    {"pid": 2, "cmdline": "python worker.py", "peak_rss": MIB},
+                ],
+            },
+            processes_buffer,
+        )
+    for pid, sites in [(1, [("a.py:1", 100), ("b.py:2", 300)]), (2, [("a.py:1", 400)])]:
+        with open(tmp_path / f"allocations-{pid}.json", "w") as allocations_buffer:
+            json.dump(
+                {
+                    "pid": pid,
+                    "traced_peak": pid * 1000,
+                    "sites": [{"site": site, "size": size, "count": 1} for site, size in sites],
+                },
+                allocations_buffer,
+            )
+
+    lines = format_memprofile_report(str(tmp_path), top=1).splitlines()
+
+    assert lines[0] == "Peak RSS of the 1 largest of 2 processes:"
+    assert lines[1].split() == ["2.0MiB", "1", "python", "train.py"]
+    assert lines[2] == "Largest waited for subprocess peak RSS: 3.0MiB"
+    assert "largest traced peak 2.0KiB" in lines[4]
+    # sites of every process are summed
+    assert lines[5].split() == ["500B", "2", "blocks", "a.py:1"]
+    assert format_bytes(1536) == "1.5KiB"
+
+
+def test_pytest_plugin_records_every_test(tmp_path):
+    (tmp_path / "test_allocate.py").write_text(
+        "def test_allocate():\n"
+        "    block = b'x' * (16 * 1024 * 1024)\n"
+        "    assert len(block)\n\n\n"
+        "def test_nothing():\n"
+        "    pass\n"
+    )
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-p",
+            PLUGIN,
+            "-p",
+            "no:randomly",
+            "-p",
+            "no:cacheprovider",
+            f"--tawa-memprofile-dir={tmp_path / 'out'}",
+            str(tmp_path),
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    with open(tmp_path / "out" / "tests.json") as tests_buffer:
+        results = json.load(tests_buffer)
+    assert results["test_allocate.py::test_allocate"]["traced_peak"] >= 16 * 1024 * 1024
+    assert results["test_allocate.py::test_nothing"]["traced_peak"] < 1024 * 1024
+    assert results["test_allocate.py::test_allocate"]["peak_rss"] > 0
+    assert "tawa memory profile" in result.stdout
+    assert "test_allocate.py::test_allocate" in result.stdout
@@ -0,0 +1,36 @@
+import time
+from types import SimpleNamespace
+
+from tawa.tawa_inner_cli.commands.utils.pytest_collection_cache import CollectionCache
+
+
+def _get_module_hash(tmp_path, module_path):
+    config = SimpleNamespace(rootpath=tmp_path, inipath=None)
+    return CollectionCache(config, str(tmp_path / "cache.json")).get_module_hash(module_path)
+
+
+def test_module_hash_covers_local_imports_and_data_files(tmp_path):
+    (tmp_path / "helpers").mkdir()
+    (tmp_path / "helpers" / "__init__.py").write_text("")
+    (tmp_path / "helpers" / "cases.py").write_text("from .values import VALUES\n")
+    (tmp_path / "helpers" / "values.py").write_text("VALUES = [1, 2]\n")
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "data").mkdir()
+    (tmp_path / "tests" / "data" / "cases.json").write_text("[1, 2]")
+    (tmp_path / "tests" / "unrelated.py").write_text("")
+    module_path = tmp_path / "tests" / "test_cases.py"
+    module_path.write_text("import json\nimport pytest\nfrom helpers import cases\n")
+    initial_hash = _get_module_hash(tmp_path, module_path)
+
+    # a module it does not import
+    (tmp_path / "tests" / "unrelated.py").write_text("X = 1\n")
+    assert _get_module_hash(tmp_path, module_path) == initial_hash
+
+    # a module imported through another one
+    (tmp_path / "helpers" / "values.py").write_text("VALUES = [1, 2, 3]\n")
+    imports_hash = _get_module_hash(tmp_path, module_path)
+    assert imports_hash != initial_hash
+
+    time.sleep(0.01)
+    (tmp_path / "tests" / "data" / "cases.json").write_text("[1, 2, 3]")
+    assert _get_module_hash(tmp_path, module_path) != imports_hash
@@ -0,0 +1,77 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from tawa.tawa_inner_cli.commands.utils.pytest_history import TestStats, assign_shards, load_or_assign_shards
+
+PLUGIN = "tawa.tawa_inner_cli.commands.utils.pytest_history"
+NUM_TESTS = 20
+
+
+def _write_tests(test_dir):
+    # durations differ per test, so every recorded run changes the balance
+    test_dir.joinpath("test_sleeps.py").write_text(
+        "import time\n\n"
+        "import pytest\n\n\n"
+        f"@pytest.mark.parametrize('index', range({NUM_TESTS}))\n"
+        "def test_sleep(index):\n"
+        "    time.sleep((index % 7) * 0.005)\n"
+    )
+
+
+def _run_shard(test_dir, cache_dir, shard_index, shard_count):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-v",
+            "-p",
+            PLUGIN,
+            "-p",
+            "no:randomly",
+            "-p",
+            "no:cacheprovider",
+            f"--tawa-shard-count={shard_count}",
+            f"--tawa-shard-index={shard_index}",
+            str(test_dir),
+        ],
+        cwd=test_dir,
+        env={**os.environ, "TAWA_CACHE_DIR": str(cache_dir)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode in (0, 5), result.stdout + result.stderr
+    return re.findall(r"^(\S+::\S+) PASSED", result.stdout, flags=re.MULTILINE)
+
+
+@pytest.mark.parametrize("shard_count", [2, 3])
+def test_sequential_shards_run_every_test_once(tmp_path, shard_count):
+    test_dir = tmp_path / "project"
+    test_dir.mkdir()
+    _write_tests(test_dir)
+
+    # twice, the second time with the history and collection cache of the first
+    for _ in range(2):
+        ran = []
+        for shard_index in range(shard_count):
+            ran.extend(_run_shard(test_dir, tmp_path / "cache", shard_index, shard_count))
+        assert len(ran) == NUM_TESTS
+        assert len(set(ran)) == NUM_TESTS
+
+
+def test_shard_plans_are_reused(tmp_path):
+    nodeids = [f"test_a.py::test_{index}" for index in range(6)]
+    stats = {nodeid: TestStats(nodeid, 1, 0, float(index), "passed", 0) for index, nodeid in enumerate(nodeids)}
+
+    plan = load_or_assign_shards(nodeids, stats, 2, str(tmp_path))
+    assert plan == assign_shards(nodeids, stats, 2)
+    # a later history would balance differently, the persisted plan is kept
+    reversed_stats = {
+        nodeid: TestStats(nodeid, 1, 0, -float(index), "passed", 0) for index, nodeid in enumerate(nodeids)
+    }
+    assert load_or_assign_shards(list(reversed(nodeids)), reversed_stats, 2, str(tmp_path)) == plan
+    assert load_or_assign_shards(nodeids, reversed_stats, 3, str(tmp_path)) == assign_shards(nodeids, reversed_stats, 3)
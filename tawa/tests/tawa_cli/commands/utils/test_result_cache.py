@@ -0,0 +1,93 @@
+import pytest
+
+from tawa.tawa_inner_cli.commands import commands
+from tawa.tawa_inner_cli.commands.utils import result_cache
+from tawa.tawa_inner_cli.commands.utils.result_cache import (
+    compute_result_key,
+    get_config_dirs,
+    has_cached_success,
+    record_success,
+)
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    # outside of a git repository, the sources are found by walking the tree
+    project = tmp_path / "project"
+    (project / "pkg").mkdir(parents=True)
+    (project / "pkg" / "module.py").write_text("X = 1\n")
+    (project / "pkg" / "pyproject.toml").write_text("[project]\nname = 'pkg'\n")
+    (project / "pyproject.toml").write_text("[project]\nversion = '1.0'\n\n[tool.ruff]\nline-length = 120\n")
+    monkeypatch.chdir(project)
+    monkeypatch.setenv("TAWA_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(result_cache, "get_tool_version", lambda tool: f"{tool} 1.0")
+    return project
+
+
+def test_key_changes_with_the_sources(tree):
+    key = compute_result_key("ruff check .", "ruff")
+    assert compute_result_key("ruff check .", "ruff") == key
+    assert compute_result_key("ruff check --fix .", "ruff") != key
+
+    (tree / "pkg" / "module.py").write_text("X = 2\n")
+    changed_key = compute_result_key("ruff check .", "ruff")
+    assert changed_key != key
+    (tree / "pkg" / "new.py").write_text("")
+    assert compute_result_key("ruff check .", "ruff") != changed_key
+
+
+def test_key_changes_with_the_tool_config(tree):
+    key = compute_result_key("ruff check .", "ruff")
+    # sections of other tools do not count
+    (tree / "pyproject.toml").write_text("[project]\nversion = '1.1'\n\n[tool.ruff]\nline-length = 120\n")
+    assert compute_result_key("ruff check .", "ruff") == key
+
+    (tree / "pyproject.toml").write_text("[project]\nversion = '1.1'\n\n[tool.ruff]\nline-length = 100\n")
+    root_key = compute_result_key("ruff check .", "ruff")
+    assert root_key != key
+
+    # ruff reads the config closest to each file
+    (tree / "pkg" / "pyproject.toml").write_text("[tool.ruff]\nline-length = 80\n")
+    nested_key = compute_result_key("ruff check .", "ruff")
+    assert nested_key != root_key
+    (tree / "pkg" / "ruff.toml").write_text("line-length = 90\n")
+    assert compute_result_key("ruff check .", "ruff") != nested_key
+
+    mypy_key = compute_result_key("mypy .", "mypy")
+    (tree / "mypy.ini").write_text("[mypy]\nstrict = True\n")
+    assert compute_result_key("mypy .", "mypy") != mypy_key
+
+
+def test_mypy_only_reads_the_root_config(tree):
+    assert get_config_dirs("mypy", ["pkg/module.py"]) == ["."]
+    assert get_config_dirs("ruff", ["pkg/sub/module.py", "setup.py"]) == [".", "pkg", "pkg/sub"]
+
+    key = compute_result_key("mypy .", "mypy")
+    (tree / "pkg" / "mypy.ini").write_text("[mypy]\nstrict = True\n")
+    assert compute_result_key("mypy .", "mypy") == key
+
+
+def test_key_changes_with_the_tool_version(tree, monkeypatch):
+    key = compute_result_key("ruff check .", "ruff")
+    monkeypatch.setattr(result_cache, "get_tool_version", lambda tool: f"{tool} 2.0")
+    assert compute_result_key("ruff check .", "ruff") != key
+    # a tool that can not run is never cached
+    monkeypatch.setattr(result_cache, "get_tool_version", lambda tool: None)
+    assert compute_result_key("ruff check .", "ruff") is None
+
+
+def test_only_successes_are_recorded(tree):
+    key = compute_result_key("ruff check .", "ruff")
+    assert not has_cached_success(key)
+    record_success(key, "ruff check .")
+    assert has_cached_success(key)
+
+    with pytest.raises(SystemExit) as exit_info:
+        commands.run_cached_check("false", tool="false")
+    assert exit_info.value.code == 1
+    assert not has_cached_success(compute_result_key("false", "false"))
+
+    with pytest.raises(SystemExit) as exit_info:
+        commands.run_cached_check("true", tool="true")
+    assert exit_info.value.code == 0
+    assert has_cached_success(compute_result_key("true", "true"))